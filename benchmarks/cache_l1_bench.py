@@ -0,0 +1,58 @@
+"""
+L1 快取微基準測試
+以已填滿的快取量測隨機命中讀取，以及寫入新鍵（每次觸發一次 LRU 淘汰）的平均耗時
+
+    python benchmarks/cache_l1_bench.py [--sizes 1000 10000 100000 1000000]
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from potato_shared.cache_manager import CacheConfig, MultiLevelCacheManager  # noqa: E402
+
+
+async def bench(size: int, gets: int, sets: int, seed: int) -> tuple:
+    cache = MultiLevelCacheManager(CacheConfig(l1_max_size=size, enable_statistics=False))
+    for i in range(size):
+        await cache.set(f"key:{i}", i, ttl=3600)
+
+    rng = random.Random(seed)
+    keys = [f"key:{rng.randrange(size)}" for _ in range(gets)]
+    started = time.perf_counter()
+    for key in keys:
+        await cache.get(key)
+    get_us = (time.perf_counter() - started) / gets * 1e6
+
+    new_keys = [f"new:{i}" for i in range(sets)]
+    started = time.perf_counter()
+    for key in new_keys:
+        await cache.set(key, 0, ttl=3600)
+    set_us = (time.perf_counter() - started) / sets * 1e6
+    return get_us, set_us
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--gets", type=int, default=100_000)
+    parser.add_argument("--sets", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # 關閉初始化日誌，避免影響輸出
+    logging.disable(logging.CRITICAL)
+    print(f"{'entries':>10}  {'get (us)':>9}  {'set+evict (us)':>14}")
+    for size in args.sizes:
+        get_us, set_us = await bench(size, args.gets, args.sets, args.seed)
+        print(f"{size:>10,}  {get_us:>9.2f}  {set_us:>14.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
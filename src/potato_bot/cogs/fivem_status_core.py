@@ -1,4 +1,5 @@
 import asyncio
+import random
 import time
 from dataclasses import dataclass, field
 from typing import Optional
@@ -7,6 +8,7 @@ import discord
 from discord.ext import commands, tasks
 
 from potato_bot.db.fivem_dao import FiveMDAO
+from potato_bot.db.guild_settings_registry import guild_settings_registry
 from potato_bot.services.fivem_status_service import FiveMStatusService, FiveMStatusResult
 from potato_bot.utils.embed_builder import EmbedBuilder
 from potato_shared.config import (
@@ -58,6 +60,7 @@ class _FiveMGuildState:
     last_announced_event_type: Optional[str] = None
     last_announced_tx_state: Optional[str] = None
     last_api_poll_at: float = 0.0
+    api_poll_interval: int = 3
     starting_until: float = 0.0
     stop_override_until: float = 0.0
     stop_override_type: Optional[str] = None
@@ -74,6 +77,9 @@ class FiveMStatusCore(commands.Cog):
     """Server狀態播報"""
 
     STOP_DISPLAY_SECONDS = 15
+    # 各伺服器 txAdmin 狀態的檢查間隔與隨機抖動比例
+    TICK_SECONDS = 1.5
+    TICK_JITTER_RATIO = 0.1
     STARTING_TIMEOUT_SECONDS = 120
     TX_EVENT_ALLOWED = {"serverStarting", "serverStopping"}
     TX_STATE_ALLOWED = {"starting", "stopping"}
@@ -89,18 +95,23 @@ class FiveMStatusCore(commands.Cog):
         self.dao = FiveMDAO()
         self._guild_states: dict[int, _FiveMGuildState] = {}
         self._settings_cache: dict[int, tuple[Optional[str], Optional[str], int]] = {}
+        self._settings_versions: dict[int, int] = {}
         self._warned_missing: set[int] = set()
-        self._api_poll_interval = max(3, int(FIVEM_POLL_INTERVAL or 3))
+        self._guild_tasks: dict[int, asyncio.Task] = {}
         self.monitor_task.start()
         logger.info("✅ FiveM 狀態播報已啟動（使用資料庫設定）")
 
     def cog_unload(self):
         if self.monitor_task.is_running():
             self.monitor_task.cancel()
+        for task in list(self._guild_tasks.values()):
+            task.cancel()
+        self._guild_tasks.clear()
         for state in list(self._guild_states.values()):
             asyncio.create_task(state.service.close())
         self._guild_states.clear()
         self._settings_cache.clear()
+        self._settings_versions.clear()
 
     async def _get_channel(self, channel_id: int) -> Optional[discord.abc.Messageable]:
         if not channel_id:
@@ -148,7 +159,7 @@ class FiveMStatusCore(commands.Cog):
             logger.warning("FiveM 播報發送失敗: %s", exc)
 
     async def _resolve_settings(self, guild_id: int) -> tuple[Optional[str], Optional[str], int]:
-        settings = await self.dao.get_fivem_settings(guild_id)
+        settings = await guild_settings_registry.snapshot("fivem", guild_id)
         info_url = ""
         players_url = ""
         channel_id = int(settings.get("status_channel_id") or 0)
@@ -630,7 +641,9 @@ class FiveMStatusCore(commands.Cog):
                 async with state.lock:
                     await state.service.close()
             self._settings_cache.pop(guild.id, None)
+            self._settings_versions.pop(guild.id, None)
             self._warned_missing.discard(guild.id)
+            await guild_settings_registry.refresh("fivem", guild.id)
             new_state = await self._get_state(guild)
             return new_state is not None
         except Exception as exc:
@@ -654,12 +667,17 @@ class FiveMStatusCore(commands.Cog):
     async def _get_state(self, guild: discord.Guild) -> Optional[_FiveMGuildState]:
         if getattr(self.bot, "is_closing", False):
             return None
-        settings = await self.dao.get_fivem_settings(guild.id)
+        snapshot = await guild_settings_registry.snapshot("fivem", guild.id)
+        # 設定版本未變時直接沿用既有狀態，不必每輪重新解析
+        if snapshot.version and self._settings_versions.get(guild.id) == snapshot.version:
+            return self._guild_states.get(guild.id)
+        self._settings_versions[guild.id] = snapshot.version
+        settings = snapshot.data
         info_url = (settings.get("info_url") or "").strip() or None
         players_url = (settings.get("players_url") or "").strip() or None
         channel_id = int(settings.get("status_channel_id") or 0)
-        alert_role_ids = settings.get("alert_role_ids", []) or []
-        dm_role_ids = settings.get("dm_role_ids", []) or []
+        alert_role_ids = list(settings.get("alert_role_ids", []) or [])
+        dm_role_ids = list(settings.get("dm_role_ids", []) or [])
         panel_message_id = int(settings.get("panel_message_id") or 0)
         poll_interval = settings.get("poll_interval")
         starting_timeout = settings.get("starting_timeout")
@@ -684,9 +702,6 @@ class FiveMStatusCore(commands.Cog):
         if starting_timeout_value < 30:
             starting_timeout_value = self.STARTING_TIMEOUT_SECONDS
 
-        if poll_interval_value != self._api_poll_interval:
-            self._api_poll_interval = poll_interval_value
-
         if not channel_id:
             if guild.id not in self._warned_missing:
                 self._warned_missing.add(guild.id)
@@ -740,6 +755,7 @@ class FiveMStatusCore(commands.Cog):
                 status_image_url=status_image_url,
                 starting_timeout=starting_timeout_value,
                 maintenance_mode=maintenance_mode,
+                api_poll_interval=poll_interval_value,
             )
 
         state = self._guild_states.get(guild.id)
@@ -753,138 +769,229 @@ class FiveMStatusCore(commands.Cog):
             state.status_image_url = status_image_url
             state.starting_timeout = starting_timeout_value
             state.maintenance_mode = maintenance_mode
+            state.api_poll_interval = poll_interval_value
         return state
 
-    @tasks.loop(seconds=1.5)
+    @tasks.loop(seconds=5)
     async def monitor_task(self):
+        """依目前伺服器清單啟動 / 停止各伺服器的監控協程"""
         if getattr(self.bot, "is_closing", False):
             return
-        if not self.bot.guilds:
-            return
+        guild_ids = {guild.id for guild in self.bot.guilds}
+        for guild_id, task in list(self._guild_tasks.items()):
+            if guild_id not in guild_ids or task.done():
+                task.cancel()
+                self._guild_tasks.pop(guild_id, None)
+        for guild_id in guild_ids:
+            if guild_id not in self._guild_tasks:
+                self._guild_tasks[guild_id] = asyncio.create_task(
+                    self._guild_monitor_loop(guild_id), name=f"fivem-monitor-{guild_id}"
+                )
 
-        for guild in list(self.bot.guilds):
+    async def _guild_monitor_loop(self, guild_id: int):
+        """
+        單一伺服器的監控協程：各自依 TICK_SECONDS（加上隨機抖動）輪詢，
+        API 依該伺服器設定的間隔查詢；慢速或無回應的伺服器不影響其他伺服器
+        """
+        # 錯開各伺服器的起始時間，避免同時發出請求
+        await asyncio.sleep(random.uniform(0, self.TICK_SECONDS))
+        while not getattr(self.bot, "is_closing", False):
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                return
             try:
-                now = time.time()
-                state = await self._get_state(guild)
-                if not state:
-                    continue
+                await self._monitor_guild(guild)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error("FiveM 狀態輪詢失敗: %s", exc)
+            jitter = self.TICK_SECONDS * self.TICK_JITTER_RATIO
+            await asyncio.sleep(self.TICK_SECONDS + random.uniform(-jitter, jitter))
 
-                async with state.lock:
-                    mention_text = self._format_role_mentions(guild, state.alert_role_ids)
-                    allowed_mentions = (
-                        discord.AllowedMentions(roles=True) if mention_text else None
-                    )
-                    panel_result: Optional[FiveMStatusResult] = state.last_result
-                    previous_api_status = state.last_result.status if state.last_result else None
+    async def _monitor_guild(self, guild: discord.Guild):
+        now = time.time()
+        state = await self._get_state(guild)
+        if not state:
+            return
+
+        async with state.lock:
+            mention_text = self._format_role_mentions(guild, state.alert_role_ids)
+            allowed_mentions = discord.AllowedMentions(roles=True) if mention_text else None
+            panel_result: Optional[FiveMStatusResult] = state.last_result
+            previous_api_status = state.last_result.status if state.last_result else None
+            event_type = None
+            tx_state = None
+            previous_status = state.last_status
+
+            previous_event_type = state.last_event_type
+            previous_tx_state = state.last_tx_state
+            tx_status = await state.service.read_txadmin_status()
+            panel_tx_status = tx_status
+            if tx_status:
+                state.sftp_fail_count = 0
+                event_type = self._normalize_event_type(
+                    state.service.get_txadmin_event_type(tx_status)
+                )
+                tx_state = self._normalize_status(tx_status.get("state"))
+                if event_type and event_type not in self.TX_EVENT_ALLOWED:
                     event_type = None
+                if tx_state and tx_state not in self.TX_STATE_ALLOWED:
                     tx_state = None
-                    previous_status = state.last_status
-
-                    previous_event_type = state.last_event_type
-                    previous_tx_state = state.last_tx_state
-                    tx_status = await state.service.read_txadmin_status()
-                    panel_tx_status = tx_status
-                    if tx_status:
-                        state.sftp_fail_count = 0
-                        event_type = self._normalize_event_type(
-                            state.service.get_txadmin_event_type(tx_status)
-                        )
-                        tx_state = self._normalize_status(tx_status.get("state"))
-                        if event_type and event_type not in self.TX_EVENT_ALLOWED:
-                            event_type = None
-                        if tx_state and tx_state not in self.TX_STATE_ALLOWED:
-                            tx_state = None
-                        state.last_event_type = event_type
-                        state.last_tx_state = tx_state
-                        if event_type != previous_event_type or tx_state != previous_tx_state:
-                            state.last_panel_signature = None
-                        starting_now = event_type == "serverStarting" or tx_state == "starting"
-                        starting_before = (
-                            previous_event_type == "serverStarting" or previous_tx_state == "starting"
+                state.last_event_type = event_type
+                state.last_tx_state = tx_state
+                if event_type != previous_event_type or tx_state != previous_tx_state:
+                    state.last_panel_signature = None
+                starting_now = event_type == "serverStarting" or tx_state == "starting"
+                starting_before = (
+                    previous_event_type == "serverStarting" or previous_tx_state == "starting"
+                )
+                if starting_now and not starting_before:
+                    now = time.time()
+                    state.starting_until = now + FIVEM_STARTING_GRACE_SECONDS
+                    state.starting_since = now
+                    state.starting_alerted = False
+                    state.last_status = "starting"
+                    if state.stop_override_until:
+                        state.stop_override_until = 0.0
+                        state.stop_override_type = None
+                elif not starting_now:
+                    state.starting_since = 0.0
+                    state.starting_alerted = False
+
+                if event_type == "serverStopping":
+                    now = time.time()
+                    state.stop_override_until = max(
+                        state.stop_override_until, now + self.STOP_DISPLAY_SECONDS
+                    )
+                    state.stop_override_type = event_type
+
+                if event_type == "serverStopping" or tx_state == "stopping":
+                    state.last_status = "stopping"
+            else:
+                state.last_event_type = None
+                state.last_tx_state = None
+                state.last_announced_event_type = None
+                state.last_announced_tx_state = None
+                if state.stop_override_until and time.time() >= state.stop_override_until:
+                    state.stop_override_until = 0.0
+                    state.stop_override_type = None
+
+            starting_active = bool(state.starting_until and time.time() < state.starting_until)
+
+            if state.has_http:
+                if not state.last_api_poll_at or (now - state.last_api_poll_at) >= state.api_poll_interval:
+                    result = await state.service.poll_status()
+                    state.last_api_poll_at = now
+                    panel_result = result
+                    state.last_result = result
+                    if result.status == "online":
+                        stopping_now = tx_state in ("stopping", "offline", "crashed")
+                        stopping_now = stopping_now or event_type in (
+                            "serverStopping",
+                            "serverStopped",
+                            "serverCrashed",
                         )
-                        if starting_now and not starting_before:
-                            now = time.time()
-                            state.starting_until = now + FIVEM_STARTING_GRACE_SECONDS
-                            state.starting_since = now
-                            state.starting_alerted = False
-                            state.last_status = "starting"
-                            if state.stop_override_until:
-                                state.stop_override_until = 0.0
-                                state.stop_override_type = None
-                        elif not starting_now:
+                        if not stopping_now:
+                            if starting_active:
+                                state.starting_until = 0.0
                             state.starting_since = 0.0
                             state.starting_alerted = False
+                            state.last_status = "online"
+                    elif result.status == "offline":
+                        if not starting_active:
+                            should_skip = False
+                            if tx_status and state.service.should_announce_txadmin(tx_status):
+                                if event_type in ("serverStopping", "serverStopped", "serverCrashed"):
+                                    should_skip = True
+                            if not should_skip:
+                                state.last_status = "offline"
+            else:
+                state.last_result = None
+
+            if state.stop_override_until and time.time() < state.stop_override_until:
+                if state.stop_override_type:
+                    override = dict(panel_tx_status) if isinstance(panel_tx_status, dict) else {}
+                    override_event = override.get("event") or {}
+                    override["event"] = {**override_event, "type": state.stop_override_type}
+                    override.setdefault("updated_at", int(time.time()))
+                    panel_tx_status = override
+
+            if state.starting_since:
+                last_result = state.last_result
+                if (
+                    (not last_result or last_result.status != "online")
+                    and (now - state.starting_since) >= state.starting_timeout
+                    and not state.starting_alerted
+                ):
+                    state.starting_alerted = True
+                    await self._send_embed(
+                        state.channel_id,
+                        "⚠️ Server 啟動異常",
+                        "啟動超過 2 分鐘仍未偵測到 API 上線，請檢查伺服器狀態。",
+                        "warning",
+                        content=mention_text if mention_text else None,
+                        allowed_mentions=allowed_mentions,
+                    )
+                    await self._dm_alert_roles(
+                        guild,
+                        state.dm_role_ids,
+                        "⚠️ Server 啟動異常",
+                        "啟動超過 2 分鐘仍未偵測到 API 上線，請檢查伺服器狀態。",
+                        "warning",
+                    )
+
+            panel_status_label = self._compute_panel_status_label(
+                state,
+                panel_result,
+                panel_tx_status,
+                now_ts=now,
+            )
+            if panel_status_label != state.last_panel_status_label:
+                await self._announce_panel_status(
+                    state,
+                    panel_status_label,
+                    mention_text,
+                    allowed_mentions,
+                )
 
-                        if event_type == "serverStopping":
-                            now = time.time()
-                            state.stop_override_until = max(
-                                state.stop_override_until, now + self.STOP_DISPLAY_SECONDS
+            presence_state = self._get_presence_state(state)
+            if presence_state and presence_state != state.last_presence_state:
+                state.last_presence_state = presence_state
+                presence_text = self._format_presence_text(state, presence_state)
+                await self._notify_presence(guild, presence_text)
+
+            if not tx_status and not state.has_http:
+                read_status = state.service.get_txadmin_read_status()
+                if read_status is not None:
+                    state.sftp_fail_count += 1
+                    now = time.time()
+                    error_text = (read_status.get("error") or "").lower()
+                    is_crash = (
+                        "sftp_retries_exhausted" in error_text
+                        or "ftp_retries_exhausted" in error_text
+                    )
+                    if now - state.sftp_last_alert >= 600:
+                        if is_crash:
+                            await self._send_embed(
+                                state.channel_id,
+                                "🚨 Server崩潰",
+                                "伺服器異常，已通知相關單位處理，請耐心等候，謝謝。",
+                                "error",
+                                content=mention_text if mention_text else None,
+                                allowed_mentions=allowed_mentions,
                             )
-                            state.stop_override_type = event_type
-
-                        if event_type == "serverStopping" or tx_state == "stopping":
-                            state.last_status = "stopping"
-                    else:
-                        state.last_event_type = None
-                        state.last_tx_state = None
-                        state.last_announced_event_type = None
-                        state.last_announced_tx_state = None
-                        if state.stop_override_until and time.time() >= state.stop_override_until:
-                            state.stop_override_until = 0.0
-                            state.stop_override_type = None
-
-                    starting_active = bool(state.starting_until and time.time() < state.starting_until)
-
-                    if state.has_http:
-                        if not state.last_api_poll_at or (now - state.last_api_poll_at) >= self._api_poll_interval:
-                            result = await state.service.poll_status()
-                            state.last_api_poll_at = now
-                            panel_result = result
-                            state.last_result = result
-                            if result.status == "online":
-                                stopping_now = tx_state in ("stopping", "offline", "crashed")
-                                stopping_now = stopping_now or event_type in (
-                                    "serverStopping",
-                                    "serverStopped",
-                                    "serverCrashed",
-                                )
-                                if not stopping_now:
-                                    if starting_active:
-                                        state.starting_until = 0.0
-                                    state.starting_since = 0.0
-                                    state.starting_alerted = False
-                                    state.last_status = "online"
-                            elif result.status == "offline":
-                                if not starting_active:
-                                    should_skip = False
-                                    if tx_status and state.service.should_announce_txadmin(tx_status):
-                                        if event_type in ("serverStopping", "serverStopped", "serverCrashed"):
-                                            should_skip = True
-                                    if not should_skip:
-                                        state.last_status = "offline"
-                    else:
-                        state.last_result = None
-
-                    if state.stop_override_until and time.time() < state.stop_override_until:
-                        if state.stop_override_type:
-                            override = dict(panel_tx_status) if isinstance(panel_tx_status, dict) else {}
-                            override_event = override.get("event") or {}
-                            override["event"] = {**override_event, "type": state.stop_override_type}
-                            override.setdefault("updated_at", int(time.time()))
-                            panel_tx_status = override
-
-                    if state.starting_since:
-                        last_result = state.last_result
-                        if (
-                            (not last_result or last_result.status != "online")
-                            and (now - state.starting_since) >= state.starting_timeout
-                            and not state.starting_alerted
-                        ):
-                            state.starting_alerted = True
+                            await self._dm_alert_roles(
+                                guild,
+                                state.dm_role_ids,
+                                "🚨 Server崩潰",
+                                "SFTP 連線重試兩次仍失敗，判定伺服器異常崩潰。",
+                                "error",
+                            )
+                        else:
                             await self._send_embed(
                                 state.channel_id,
-                                "⚠️ Server 啟動異常",
-                                "啟動超過 2 分鐘仍未偵測到 API 上線，請檢查伺服器狀態。",
+                                "⚠️ Server 狀態異常",
+                                "伺服器異常，已通知相關單位處理，請耐心等候，謝謝。",
                                 "warning",
                                 content=mention_text if mention_text else None,
                                 allowed_mentions=allowed_mentions,
@@ -892,87 +999,21 @@ class FiveMStatusCore(commands.Cog):
                             await self._dm_alert_roles(
                                 guild,
                                 state.dm_role_ids,
-                                "⚠️ Server 啟動異常",
-                                "啟動超過 2 分鐘仍未偵測到 API 上線，請檢查伺服器狀態。",
+                                "⚠️ Server 狀態異常",
+                                "無法讀取 txAdmin 狀態檔（SFTP/檔案）。請檢查連線或路徑設定。",
                                 "warning",
                             )
-
-                    panel_status_label = self._compute_panel_status_label(
-                        state,
-                        panel_result,
-                        panel_tx_status,
-                        now_ts=now,
-                    )
-                    if panel_status_label != state.last_panel_status_label:
-                        await self._announce_panel_status(
-                            state,
-                            panel_status_label,
-                            mention_text,
-                            allowed_mentions,
-                        )
-
-                    presence_state = self._get_presence_state(state)
-                    if presence_state and presence_state != state.last_presence_state:
-                        state.last_presence_state = presence_state
-                        presence_text = self._format_presence_text(state, presence_state)
-                        await self._notify_presence(guild, presence_text)
-
-                    if not tx_status and not state.has_http:
-                        read_status = state.service.get_txadmin_read_status()
-                        if read_status is not None:
-                            state.sftp_fail_count += 1
-                            now = time.time()
-                            error_text = (read_status.get("error") or "").lower()
-                            is_crash = (
-                                "sftp_retries_exhausted" in error_text
-                                or "ftp_retries_exhausted" in error_text
-                            )
-                            if now - state.sftp_last_alert >= 600:
-                                if is_crash:
-                                    await self._send_embed(
-                                        state.channel_id,
-                                        "🚨 Server崩潰",
-                                        "伺服器異常，已通知相關單位處理，請耐心等候，謝謝。",
-                                        "error",
-                                        content=mention_text if mention_text else None,
-                                        allowed_mentions=allowed_mentions,
-                                    )
-                                    await self._dm_alert_roles(
-                                        guild,
-                                        state.dm_role_ids,
-                                        "🚨 Server崩潰",
-                                        "SFTP 連線重試兩次仍失敗，判定伺服器異常崩潰。",
-                                        "error",
-                                    )
-                                else:
-                                    await self._send_embed(
-                                        state.channel_id,
-                                        "⚠️ Server 狀態異常",
-                                        "伺服器異常，已通知相關單位處理，請耐心等候，謝謝。",
-                                        "warning",
-                                        content=mention_text if mention_text else None,
-                                        allowed_mentions=allowed_mentions,
-                                    )
-                                    await self._dm_alert_roles(
-                                        guild,
-                                        state.dm_role_ids,
-                                        "⚠️ Server 狀態異常",
-                                        "無法讀取 txAdmin 狀態檔（SFTP/檔案）。請檢查連線或路徑設定。",
-                                        "warning",
-                                    )
-                                state.sftp_last_alert = now
-
-                    await self._update_status_panel(
-                        guild,
-                        state,
-                        panel_result,
-                        panel_tx_status,
-                        status_label=panel_status_label,
-                        force=state.panel_message_id == 0,
-                    )
-                    state.last_panel_status_label = panel_status_label
-            except Exception as exc:
-                logger.error("FiveM 狀態輪詢失敗: %s", exc)
+                        state.sftp_last_alert = now
+
+            await self._update_status_panel(
+                guild,
+                state,
+                panel_result,
+                panel_tx_status,
+                status_label=panel_status_label,
+                force=state.panel_message_id == 0,
+            )
+            state.last_panel_status_label = panel_status_label
 
     @monitor_task.before_loop
     async def before_monitor(self):
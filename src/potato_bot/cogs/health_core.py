@@ -5,6 +5,7 @@ import discord
 from discord.ext import commands
 
 from potato_bot.db.pool import get_db_health
+from potato_bot.services.ticket_message_buffer import ticket_message_buffer
 from potato_bot.utils.cog_loader import discover_cog_modules
 from potato_shared.logger import logger
 
@@ -38,9 +39,41 @@ class HealthCore(commands.Cog):
                 color=discord.Color.green() if db_status == "healthy" else discord.Color.orange(),
             )
 
+            pool = db_health.get("pool", {})
+            metrics = db_health.get("metrics", {})
+            wait = metrics.get("wait_ms", {})
             embed.add_field(
                 name="🗄️ 資料庫",
-                value=f"狀態: {db_status}\n連接池: {db_health.get('pool', {})}",
+                value=(
+                    f"狀態: {db_status}（延遲 {db_health.get('latency', 'N/A')}）\n"
+                    f"連接池: 使用中 {pool.get('in_use', 0)} / 閒置 {pool.get('idle', 0)} / "
+                    f"上限 {pool.get('limit', 0)}（{pool.get('maxsize', 0)}~{pool.get('hard_maxsize', 0)}）\n"
+                    f"等待中: {pool.get('waiting', 0)}，取得等待 p50 {wait.get('p50', 0)}ms / "
+                    f"p95 {wait.get('p95', 0)}ms / 最大 {wait.get('max', 0)}ms\n"
+                    f"逾時: {metrics.get('timeouts', 0)}，擴充/縮減: "
+                    f"{metrics.get('grows', 0)}/{metrics.get('shrinks', 0)}"
+                ),
+                inline=False,
+            )
+            sites = metrics.get("sites", {})
+            if sites:
+                embed.add_field(
+                    name="📊 資料庫呼叫點（前 5）",
+                    value="\n".join(
+                        f"`{site}` {stats['calls']} 次，平均持有 {stats['avg_hold_ms']}ms"
+                        for site, stats in list(sites.items())[:5]
+                    ),
+                    inline=False,
+                )
+            buffer_stats = ticket_message_buffer.get_statistics()
+            embed.add_field(
+                name="📝 票券訊息緩衝",
+                value=(
+                    f"佇列深度: {buffer_stats['queue_depth']}\n"
+                    f"Flush 延遲: 最近 {buffer_stats['last_flush_ms']}ms / "
+                    f"平均 {buffer_stats['avg_flush_ms']}ms / 最大 {buffer_stats['max_flush_ms']}ms\n"
+                    f"已寫入: {buffer_stats['flushed_rows']} 列，失敗: {buffer_stats['failures']}"
+                ),
                 inline=False,
             )
             embed.add_field(
@@ -4,6 +4,7 @@
 提供抽獎相關的指令和功能
 """
 
+import asyncio
 from typing import Optional
 
 import discord
@@ -38,6 +39,17 @@ class LotteryCore(commands.Cog):
             "my_lottery_history",
         }
 
+    async def cog_load(self):
+        """Cog 載入時啟動開獎排程"""
+        try:
+            await self.lottery_manager.start_scheduler()
+            logger.info("LotteryCore 開獎排程已啟動")
+        except Exception as e:
+            logger.warning(f"LotteryCore 開獎排程啟動失敗: {e}")
+
+    def cog_unload(self):
+        asyncio.create_task(self.lottery_manager.stop_scheduler())
+
     @staticmethod
     def _can_use_lottery_panel(
         member: discord.Member, allowed_role_ids: list[int], is_owner: bool = False
@@ -7,8 +7,11 @@ from typing import Any, Dict, List, Optional
 import discord
 from discord.ext import commands, tasks
 
+from potato_bot.db.guild_settings_registry import guild_settings_registry
+from potato_bot.db.ticket_channel_index import ticket_channel_index
 from potato_bot.db.ticket_dao import TicketDAO
 from potato_bot.services.chat_transcript_manager import ChatTranscriptManager
+from potato_bot.services.ticket_message_buffer import ticket_message_buffer
 from potato_bot.utils.ticket_constants import get_priority_emoji
 from potato_bot.utils.ticket_utils import (
     TicketPermissionChecker,
@@ -30,6 +33,8 @@ class TicketListener(commands.Cog):
         self.bot = bot
         self.dao = TicketDAO()
         self.transcript_manager = ChatTranscriptManager()
+        self.message_buffer = ticket_message_buffer
+        self.channel_index = ticket_channel_index
 
         # 可選服務
         self.auto_reply_service = auto_reply_service or getattr(bot, "auto_reply_service", None)
@@ -59,6 +64,20 @@ class TicketListener(commands.Cog):
             return None
         return ticket_info.get("ticket_id") or ticket_info.get("id")
 
+    async def _get_open_ticket_info(self, channel) -> Optional[Dict[str, Any]]:
+        """取得頻道對應的開啟中票券"""
+        if self.channel_index.loaded:
+            entry = self.channel_index.get(channel.id)
+            return entry.to_ticket_info() if entry else None
+
+        # 索引尚未載入：退回名稱判斷 + 資料庫查詢
+        if not is_ticket_channel(channel):
+            return None
+        ticket_info = await self.dao.get_ticket_by_channel(channel.id)
+        if not ticket_info or ticket_info["status"] != "open":
+            return None
+        return ticket_info
+
     # ===== 訊息事件監聽 =====
 
     @commands.Cog.listener()
@@ -68,14 +87,10 @@ class TicketListener(commands.Cog):
         if message.author.bot or not message.guild:
             return
 
-        # 檢查是否為票券頻道
-        if not is_ticket_channel(message.channel):
-            return
-
         try:
-            # 取得票券資訊
-            ticket_info = await self.dao.get_ticket_by_channel(message.channel.id)
-            if not ticket_info or ticket_info["status"] != "open":
+            # 取得票券資訊（索引載入後只查記憶體，非票券頻道不會碰到資料庫）
+            ticket_info = await self._get_open_ticket_info(message.channel)
+            if not ticket_info:
                 return
 
             ticket_id = self._get_ticket_id(ticket_info)
@@ -83,11 +98,10 @@ class TicketListener(commands.Cog):
                 logger.warning("票券資訊缺少 ID，跳過訊息記錄")
                 return
 
-            # 記錄聊天訊息到資料庫
-            await self.transcript_manager.record_message(ticket_id, message)
-
-            # 更新票券活動時間
-            await self.dao.update_last_activity(ticket_id)
+            # 記錄聊天訊息並更新活動時間（寫入緩衝，批次落盤）
+            self.message_buffer.enqueue(
+                self.transcript_manager.build_message_row(ticket_id, message)
+            )
 
             # 處理不同類型的訊息
             if str(message.author.id) == ticket_info["discord_id"]:
@@ -116,8 +130,8 @@ class TicketListener(commands.Cog):
     async def _handle_staff_message(self, message: discord.Message, ticket_info: Dict):
         """處理客服訊息 - 增強版"""
         try:
-            # 取得伺服器設定
-            settings = await self.dao.get_guild_settings(message.guild.id)
+            # 取得伺服器設定（記憶體快照，不查詢資料庫）
+            settings = (await guild_settings_registry.snapshot("ticket", message.guild.id)).data
 
             # 檢查是否為客服人員
             support_roles = get_support_roles_for_ticket(settings, ticket_info.get("type"))
@@ -216,17 +230,15 @@ class TicketListener(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel: discord.TextChannel):
         """監聽頻道刪除事件 - 增強版"""
-        if not is_ticket_channel(channel):
-            return
-
         try:
             # 檢查是否為票券頻道
-            ticket_info = await self.dao.get_ticket_by_channel(channel.id)
-            if ticket_info and ticket_info["status"] == "open":
+            ticket_info = await self._get_open_ticket_info(channel)
+            if ticket_info:
                 # 自動關閉票券記錄
                 ticket_id = self._get_ticket_id(ticket_info)
                 if ticket_id:
                     await self.dao.close_ticket(ticket_id, "system", "頻道被刪除")
+            self.channel_index.remove_channel(channel.id)
 
         except Exception as e:
             logger.error(f"處理頻道刪除事件時發生錯誤: {e}")
@@ -348,7 +360,7 @@ class TicketListener(commands.Cog):
         """處理身分組變更"""
         try:
             # 取得設定
-            settings = await self.dao.get_guild_settings(after.guild.id)
+            settings = (await guild_settings_registry.snapshot("ticket", after.guild.id)).data
             support_roles = set(settings.get("support_roles", []))
             sponsor_roles = set(settings.get("sponsor_support_roles", []))
             staff_roles = support_roles | sponsor_roles
@@ -6,7 +6,7 @@
 
 import asyncio
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
 import discord
@@ -16,7 +16,11 @@ from discord.ext import commands, tasks
 
 # 導入快取優化的組件
 from potato_bot.db.cached_ticket_dao import cached_ticket_dao
+from potato_bot.db.guild_settings_registry import guild_settings_registry
+from potato_bot.db.ticket_channel_index import ticket_channel_index
+from potato_bot.services.data_export import data_export_service, ticket_dataset
 from potato_bot.services.ticket_manager import TicketManager
+from potato_bot.services.ticket_message_buffer import ticket_message_buffer
 from potato_bot.utils.embed_builder import EmbedBuilder
 from potato_bot.utils.helper import get_time_ago
 from potato_bot.utils.ticket_constants import TicketConstants
@@ -26,7 +30,7 @@ from potato_bot.utils.cog_loader import COGS_PREFIX
 from potato_bot.views.ticket_views import TicketControlView, TicketPanelView
 
 # 快取和監控
-from potato_shared.cache_manager import cache_manager, cached
+from potato_shared.cache_manager import cache_manager
 from potato_shared.logger import logger
 
 
@@ -195,7 +199,10 @@ class CachedTicketCore(commands.Cog):
     # ========== 快取優化的核心方法 ==========
 
     async def _is_ticket_channel(self, channel: discord.TextChannel) -> bool:
-        """判斷是否為票券頻道（帶快取）"""
+        """判斷是否為票券頻道（優先使用票券頻道索引）"""
+        if ticket_channel_index.loaded:
+            return ticket_channel_index.get(channel.id) is not None
+
         cache_key = f"is_ticket_channel:{channel.id}"
 
         # 嘗試從快取獲取
@@ -220,11 +227,10 @@ class CachedTicketCore(commands.Cog):
             await cache_manager.set(cache_key, result, 30)  # 短時間快取 fallback 結果
             return result
 
-    @cached("ticket_settings", ttl=600)
     async def get_cached_settings(self, guild_id: int) -> Dict[str, Any]:
-        """獲取伺服器設定（帶快取）"""
+        """獲取伺服器設定（讀取設定快照，更新設定時會即時推送）"""
         try:
-            return await self.cached_dao.ticket_dao.get_settings(guild_id)
+            return await guild_settings_registry.get("ticket", guild_id)
         except Exception as e:
             logger.error(f"❌ 獲取設定失敗 {guild_id}: {e}")
             return {}
@@ -272,45 +278,17 @@ class CachedTicketCore(commands.Cog):
 
     @app_commands.command(name="my_tickets", description="查看我的票券")
     async def my_tickets(self, interaction: discord.Interaction, status: str = None):
-        """查看用戶票券（快取優化版）"""
+        """查看用戶票券（keyset 分頁）"""
         try:
             await interaction.response.defer(ephemeral=True)
 
-            # 使用快取優化的查詢
-            tickets = await self.cached_dao.get_user_tickets(
-                interaction.user.id, interaction.guild.id, status, limit=10
-            )
-
-            if not tickets:
+            view = MyTicketsView(self.cached_dao.ticket_dao, interaction.user, interaction.guild.id, status)
+            embed = await view.load_page()
+            if embed is None:
                 await interaction.followup.send("📝 您目前沒有票券。", ephemeral=True)
                 return
 
-            embed = EmbedBuilder.build(
-                title=f"🎫 {interaction.user.display_name} 的票券",
-                description=f"找到 {len(tickets)} 張票券",
-                color=TicketConstants.COLORS["primary"],
-            )
-
-            for ticket in tickets[:10]:  # 最多顯示10張
-                status_emoji = {
-                    "open": "🟢",
-                    "closed": "🔴",
-                    "pending": "🟡",
-                }.get(ticket.get("status", "unknown"), "⚪")
-
-                embed.add_field(
-                    name=f"{status_emoji} 票券 #{ticket.get('id')}",
-                    value=f"標題：{ticket.get('title', 'N/A')}\n"
-                    f"狀態：{ticket.get('status', 'unknown')}\n"
-                    f"建立：{get_time_ago(ticket.get('created_at'))}",
-                    inline=True,
-                )
-
-            # 添加快取資訊
-            cache_info = "🚀 查詢耗時：<200ms（已快取）"
-            embed.set_footer(text=cache_info)
-
-            await interaction.followup.send(embed=embed, ephemeral=True)
+            await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
         except Exception as e:
             logger.error(f"❌ 用戶票券查詢失敗: {e}")
@@ -329,7 +307,32 @@ class CachedTicketCore(commands.Cog):
         view = TicketSettingsView(self.cached_dao.ticket_dao, interaction.guild, settings)
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
+    @app_commands.command(name="ticket_export", description="匯出票券與對話紀錄（gzip 壓縮）")
+    @app_commands.describe(days="只匯出最近幾天建立的票券（留空為全部）", fmt="匯出格式")
+    @app_commands.choices(
+        fmt=[
+            app_commands.Choice(name="CSV", value="csv"),
+            app_commands.Choice(name="JSON Lines", value="jsonl"),
+        ]
+    )
+    @app_commands.default_permissions(manage_guild=True)
+    async def ticket_export(
+        self,
+        interaction: discord.Interaction,
+        days: Optional[app_commands.Range[int, 1, 3650]] = None,
+        fmt: str = "csv",
+    ):
+        """串流匯出票券與訊息（管理員）"""
+        await interaction.response.defer(ephemeral=True)
+        try:
+            # 先寫入緩衝中的訊息，匯出內容才完整
+            await ticket_message_buffer.flush()
+            since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+            await data_export_service.send(interaction, ticket_dataset(interaction.guild.id, since), fmt)
 
+        except Exception as e:
+            logger.error(f"❌ 匯出票券資料失敗: {e}")
+            await interaction.followup.send("❌ 匯出票券資料時發生錯誤。", ephemeral=True)
 
     @commands.command(name="ticket_help")
     async def ticket_help(self, ctx: commands.Context):
@@ -345,6 +348,11 @@ class CachedTicketCore(commands.Cog):
             value="`/ticket_settings`（管理員，含贊助處理角色）",
             inline=False,
         )
+        embed.add_field(
+            name="匯出票券與對話紀錄",
+            value="`/ticket_export`（管理員，CSV / JSON Lines）",
+            inline=False,
+        )
         embed.add_field(
             name="查個人票券",
             value="已移除（統一由管理面板查看）",
@@ -360,6 +368,9 @@ class CachedTicketCore(commands.Cog):
         try:
             await self._cleanup_expired_tickets()
 
+            # 依保留期限清理封存的聊天記錄
+            await self.manager.transcript_manager.cleanup_old_transcripts()
+
             # 同時清理相關快取
             await cache_manager.clear_all("*expired*")
 
@@ -717,6 +728,85 @@ class LimitsModal(discord.ui.Modal):
         )
         await interaction.response.send_message("✅ 已更新限額設定", ephemeral=True)
 
+class MyTicketsView(discord.ui.View):
+    """用戶票券分頁（以游標翻頁，總數快取）"""
+
+    PAGE_SIZE = 10
+
+    def __init__(self, ticket_dao, user: discord.abc.User, guild_id: int, status: Optional[str]):
+        super().__init__(timeout=300)
+        self.ticket_dao = ticket_dao
+        self.user = user
+        self.guild_id = guild_id
+        self.status = status
+        self.page_number = 1
+        self.next_cursor: Optional[str] = None
+        self.prev_cursor: Optional[str] = None
+
+    async def load_page(self, cursor: Optional[str] = None) -> Optional[discord.Embed]:
+        page = await self.ticket_dao.get_tickets_page(
+            self.guild_id,
+            {"discord_id": self.user.id, "status": self.status},
+            limit=self.PAGE_SIZE,
+            cursor=cursor,
+            with_total=True,
+        )
+        if not page.items:
+            return None
+
+        self.next_cursor = page.next_cursor
+        self.prev_cursor = page.prev_cursor
+        self.previous_page.disabled = not page.has_prev
+        self.next_page.disabled = not page.has_next
+
+        total_count = page.total or 0
+        total_pages = max(self.page_number, (total_count + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
+
+        embed = EmbedBuilder.build(
+            title=f"🎫 {self.user.display_name} 的票券",
+            description=f"找到 {total_count} 張票券",
+            color=TicketConstants.COLORS["primary"],
+        )
+
+        for ticket in page.items:
+            status_emoji = {
+                "open": "🟢",
+                "closed": "🔴",
+                "pending": "🟡",
+            }.get(ticket.get("status", "unknown"), "⚪")
+
+            embed.add_field(
+                name=f"{status_emoji} 票券 #{ticket.get('id')}",
+                value=f"標題：{ticket.get('title', 'N/A')}\n"
+                f"狀態：{ticket.get('status', 'unknown')}\n"
+                f"建立：{get_time_ago(ticket.get('created_at'))}",
+                inline=True,
+            )
+
+        embed.set_footer(text=f"第 {self.page_number}/{total_pages} 頁")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user.id
+
+    @discord.ui.button(label="⬅️ 上一頁", style=discord.ButtonStyle.secondary, disabled=True)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page_number = max(1, self.page_number - 1)
+        await self._show(interaction, self.prev_cursor)
+
+    @discord.ui.button(label="下一頁 ➡️", style=discord.ButtonStyle.secondary, disabled=True)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page_number += 1
+        await self._show(interaction, self.next_cursor)
+
+    async def _show(self, interaction: discord.Interaction, cursor: Optional[str]):
+        embed = await self.load_page(cursor)
+        if embed is None:
+            await interaction.response.send_message("📝 沒有更多票券。", ephemeral=True)
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+
 async def setup(bot):
     """設置 Cog"""
     cog = CachedTicketCore(bot)
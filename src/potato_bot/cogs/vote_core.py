@@ -15,9 +15,10 @@ from typing import Any, Dict, List, Optional
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 from potato_bot.db import vote_dao
+from potato_bot.services.vote_tally import vote_tally_engine
 from potato_bot.utils.vote_utils import build_result_embed, build_vote_embed
 from potato_bot.views.vote_views import (
     VoteButtonView,
@@ -43,21 +44,29 @@ class VoteCore(ManagedCog):
         "vote_search",
     }
 
+    _SUBMIT_ERRORS = {
+        vote_dao.VoteSubmitStatus.ALREADY_VOTED: "❗ 你已參與過此投票，不能重複投票。",
+        vote_dao.VoteSubmitStatus.INVALID_OPTION: "❌ 你選擇的選項已失效。",
+        vote_dao.VoteSubmitStatus.CLOSED: "❌ 此投票已結束。",
+    }
+
     def __init__(self, bot):
         super().__init__(bot)
-        self._submit_locks: Dict[tuple[int, int], asyncio.Lock] = {}
 
     async def cog_load(self):
         """Cog 載入時執行的異步初始化"""
         try:
-            self.announce_expired_votes.start()
-            logger.info("VoteCore 背景任務已啟動")
+            # 截止時間排程：由未公告投票重建，只在下一個截止時間喚醒
+            vote_dao.vote_deadlines.configure(
+                self._announce_vote_deadline, vote_dao.get_pending_vote_deadlines
+            )
+            await vote_dao.vote_deadlines.start()
+            logger.info("VoteCore 投票截止排程已啟動")
         except Exception as e:
-            logger.warning(f"VoteCore 背景任務啟動失敗: {e}")
+            logger.warning(f"VoteCore 投票截止排程啟動失敗: {e}")
 
     def cog_unload(self):
-        if hasattr(self, "announce_expired_votes"):
-            self.announce_expired_votes.cancel()
+        asyncio.create_task(vote_dao.vote_deadlines.stop())
         # 清理資源
         VoteCore._vote_cache.clear()
         super().cog_unload()
@@ -80,65 +89,61 @@ class VoteCore(ManagedCog):
             self._vote_cache[cache_key] = {"data": vote, "cached_at": now}
         return vote
 
-    # ✅ 批次取得投票相關資料
-    async def _get_vote_full_data(self, vote_id: int) -> Optional[Dict[str, Any]]:
-        """批次取得投票完整資料（投票、選項、統計）"""
-        try:
-            # 並行執行多個資料庫查詢
-            vote_task = self._get_vote_with_cache(vote_id)
-            options_task = vote_dao.get_vote_options(vote_id)
-            stats_task = vote_dao.get_vote_statistics(vote_id)
-            participation_task = vote_dao.get_vote_participation_stats(vote_id)
-
-            vote, options, stats, participation = await asyncio.gather(
-                vote_task,
-                options_task,
-                stats_task,
-                participation_task,
-                return_exceptions=True,
-            )
+    # ✅ 投票定義快取（投票與選項建立後不會變動）
+    async def _get_vote_definition(self, vote_id: int) -> Optional[Dict[str, Any]]:
+        """取得投票與選項（含快取機制）"""
+        cache_key = f"vote_def_{vote_id}"
+        now = datetime.now(timezone.utc)
 
-            # 檢查是否有例外
-            if (
-                isinstance(vote, Exception)
-                or isinstance(options, Exception)
-                or isinstance(stats, Exception)
-                or isinstance(participation, Exception)
-            ):
+        cached = self._vote_cache.get(cache_key)
+        if cached and (now - cached["cached_at"]).total_seconds() < self._cache_timeout:
+            return cached["data"]
 
-                return None
+        vote, options = await asyncio.gather(
+            self._get_vote_with_cache(vote_id), vote_dao.get_vote_options(vote_id)
+        )
+        if not vote:
+            return None
 
-            if not vote:
-                return None
+        # 安全標準化 allowed_roles
+        allowed_roles = vote.get("allowed_roles") or []
+        if isinstance(allowed_roles, str):
+            try:
+                allowed_roles = json.loads(allowed_roles)
+            except Exception:
+                allowed_roles = []
+        vote["allowed_roles"] = allowed_roles
 
-            # 安全標準化 allowed_roles
-            allowed_roles = vote.get("allowed_roles") or []
-            if isinstance(allowed_roles, str):
-                try:
-                    allowed_roles = json.loads(allowed_roles)
-                except Exception:
-                    allowed_roles = []
-            vote["allowed_roles"] = allowed_roles
+        definition = {"vote": vote, "options": options or []}
+        self._vote_cache[cache_key] = {"data": definition, "cached_at": now}
+        return definition
+
+    def _invalidate_vote_cache(self, vote_id: int):
+        self._vote_cache.pop(f"vote_{vote_id}", None)
+        self._vote_cache.pop(f"vote_def_{vote_id}", None)
 
-            participants = 0
-            if participation and isinstance(participation, dict):
-                participants = participation.get("unique_users", 0) or 0
+    # ✅ 批次取得投票相關資料
+    async def _get_vote_full_data(self, vote_id: int) -> Optional[Dict[str, Any]]:
+        """取得投票完整資料（投票、選項，以及記憶體計票中的統計）"""
+        try:
+            definition, tally = await asyncio.gather(
+                self._get_vote_definition(vote_id), vote_tally_engine.get(vote_id)
+            )
+            if not definition:
+                return None
 
-            normalized_stats = {}
-            if isinstance(stats, dict) and options:
-                normalized_stats = {opt: stats.get(opt, 0) for opt in options}
-            elif isinstance(stats, dict):
-                normalized_stats = stats
+            options = definition["options"]
+            stats = tally.stats(options) if options else tally.stats()
 
             return {
-                "vote": vote,
+                "vote": definition["vote"],
                 "options": options,
-                "stats": normalized_stats,
-                "total": sum(normalized_stats.values()),
-                "participants": participants,
+                "stats": stats,
+                "total": sum(stats.values()),
+                "participants": tally.participants,
             }
-        except Exception:
-
+        except Exception as e:
+            logger.error(f"取得投票資料失敗 (vote_id: {vote_id}): {e}")
             return None
 
     @app_commands.command(name="vote", description="開始建立一個投票 | Create a new vote")
@@ -396,8 +401,7 @@ class VoteCore(ManagedCog):
                 return
 
             # 清除快取，更新結束時間
-            cache_key = f"vote_{vote_id}"
-            self._vote_cache.pop(cache_key, None)
+            self._invalidate_vote_cache(vote_id)
             data["vote"]["end_time"] = datetime.now(timezone.utc)
 
             await self._process_expired_vote(data["vote"])
@@ -419,32 +423,47 @@ class VoteCore(ManagedCog):
         page: int = 1,
         status: str = "all",
     ):
-        try:
-            guild = interaction.guild
-            if not guild:
-                await interaction.response.send_message(
-                    "❌ 僅能在伺服器中使用。", ephemeral=True
-                )
-                return
+        guild = interaction.guild
+        if not guild:
+            await interaction.response.send_message("❌ 僅能在伺服器中使用。", ephemeral=True)
+            return
 
-            await interaction.response.defer()
+        # 參數驗證
+        page = max(1, page)  # 確保頁數至少為1
+        if status not in ["all", "active", "finished"]:
+            status = "all"
 
-            # 參數驗證
-            page = max(1, page)  # 確保頁數至少為1
-            if status not in ["all", "active", "finished"]:
-                status = "all"
+        await self._send_vote_history(interaction, status, page)
 
-            # 查詢歷史記錄
-            votes = await vote_dao.get_vote_history(page, status, guild_id=guild.id)
-            total_count = await vote_dao.get_vote_count(status, guild_id=guild.id)
+    async def _send_vote_history(
+        self,
+        interaction: discord.Interaction,
+        status: str,
+        page: int,
+        cursor: Optional[str] = None,
+    ):
+        """查詢並送出一頁投票歷史（首次可直接跳頁，之後以游標翻頁）"""
+        try:
+            await interaction.response.defer()
+
+            per_page = 10
+            result = await vote_dao.get_vote_history_page(
+                status,
+                guild_id=interaction.guild.id,
+                per_page=per_page,
+                cursor=cursor,
+                with_total=True,
+                start_page=page,
+            )
+            votes = result.items
 
             if not votes:
                 await interaction.followup.send("📭 沒有找到符合條件的投票記錄。")
                 return
 
             # 建立分頁顯示
-            per_page = 10
-            total_pages = (total_count + per_page - 1) // per_page
+            total_count = result.total or 0
+            total_pages = max(page, (total_count + per_page - 1) // per_page)
 
             embed = discord.Embed(
                 title=f"📚 投票歷史記錄 ({self._get_status_name(status)})",
@@ -486,7 +505,7 @@ class VoteCore(ManagedCog):
                 )
 
             # 添加分頁按鈕
-            view = HistoryPaginationView(page, total_pages, status)
+            view = HistoryPaginationView(page, total_pages, status, result)
             await interaction.followup.send(embed=embed, view=view)
 
         except Exception:
@@ -888,135 +907,117 @@ class VoteCore(ManagedCog):
         vote_id: int,
         selected_options: List[str],
     ):
-        """✅ 優化版本：更好的錯誤處理和效能"""
-        lock_key = (vote_id, interaction.user.id)
-        lock = self._submit_locks.setdefault(lock_key, asyncio.Lock())
+        """✅ 記憶體計票版本：投票只更新計票並排入批次寫入，訊息更新合併處理"""
         try:
-            async with lock:
-                # ✅ 批次取得資料
-                data = await self._get_vote_full_data(vote_id)
-                if not data:
-                    await interaction.response.send_message("❌ 找不到此投票。", ephemeral=True)
-                    return
-
-                vote = data["vote"]
-
-                # ✅ 投票時間檢查
-                end_time = vote.get("end_time")
-                if end_time and end_time.tzinfo is None:
-                    end_time = end_time.replace(tzinfo=timezone.utc)
-                if end_time and datetime.now(timezone.utc) >= end_time:
-                    await interaction.response.send_message("❌ 此投票已結束。", ephemeral=True)
-                    return
+            definition = await self._get_vote_definition(vote_id)
+            if not definition:
+                await interaction.response.send_message("❌ 找不到此投票。", ephemeral=True)
+                return
 
-                # ✅ 基本選項驗證
-                if not selected_options:
-                    await interaction.response.send_message("❌ 請至少選擇一個選項。", ephemeral=True)
-                    return
+            vote = definition["vote"]
 
-                deduped = []
-                seen = set()
-                for opt in selected_options:
-                    if isinstance(opt, str) and opt not in seen:
-                        seen.add(opt)
-                        deduped.append(opt)
-                selected_options = deduped
+            # ✅ 投票時間檢查
+            end_time = vote.get("end_time")
+            if end_time and end_time.tzinfo is None:
+                end_time = end_time.replace(tzinfo=timezone.utc)
+            if end_time and datetime.now(timezone.utc) >= end_time:
+                await interaction.response.send_message("❌ 此投票已結束。", ephemeral=True)
+                return
 
-                if not vote.get("is_multi") and len(selected_options) > 1:
-                    await interaction.response.send_message("❌ 單選投票只能選擇一個選項。", ephemeral=True)
-                    return
+            # ✅ 基本選項驗證
+            if not selected_options:
+                await interaction.response.send_message("❌ 請至少選擇一個選項。", ephemeral=True)
+                return
 
-                valid_options = set(data["options"])
-                invalid = [opt for opt in selected_options if opt not in valid_options]
-                if invalid:
-                    await interaction.response.send_message("❌ 你選擇的選項已失效。", ephemeral=True)
-                    return
+            deduped = []
+            seen = set()
+            for opt in selected_options:
+                if isinstance(opt, str) and opt not in seen:
+                    seen.add(opt)
+                    deduped.append(opt)
+            selected_options = deduped
 
-                # ✅ 權限檢查優化
-                if vote["allowed_roles"] and not self._check_user_permission(
-                    interaction.user, vote["allowed_roles"]
-                ):
-                    await interaction.response.send_message("❌ 你沒有權限參與此投票。", ephemeral=True)
-                    return
+            if not vote.get("is_multi") and len(selected_options) > 1:
+                await interaction.response.send_message("❌ 單選投票只能選擇一個選項。", ephemeral=True)
+                return
 
-                # ✅ 重複投票檢查
-                if await vote_dao.has_voted(vote_id, interaction.user.id):
-                    await interaction.response.send_message(
-                        "❗ 你已參與過此投票，不能重複投票。", ephemeral=True
-                    )
-                    return
+            valid_options = set(definition["options"])
+            invalid = [opt for opt in selected_options if opt not in valid_options]
+            if invalid:
+                await interaction.response.send_message("❌ 你選擇的選項已失效。", ephemeral=True)
+                return
 
-                # ✅ 批次插入投票結果
-                await asyncio.gather(
-                    *[
-                        vote_dao.insert_vote_response(vote_id, interaction.user.id, opt)
-                        for opt in selected_options
-                    ]
-                )
+            # ✅ 權限檢查優化
+            if vote["allowed_roles"] and not self._check_user_permission(
+                interaction.user, vote["allowed_roles"]
+            ):
+                await interaction.response.send_message("❌ 你沒有權限參與此投票。", ephemeral=True)
+                return
 
+            # ✅ 記憶體計票：重複投票檢查與記錄為原子操作，寫入由背景批次或單一交易處理
+            result = await vote_tally_engine.record(vote_id, interaction.user.id, selected_options)
+            if not result.accepted:
                 await interaction.response.send_message(
-                    f"🎉 投票成功！你選擇了：{', '.join(selected_options)}",
+                    self._SUBMIT_ERRORS.get(result.status, "❌ 投票時發生錯誤，請稍後再試。"),
                     ephemeral=True,
                 )
+                return
 
-                # ✅ 清除快取，強制重新載入
-                cache_key = f"vote_{vote_id}"
-                if cache_key in self._vote_cache:
-                    del self._vote_cache[cache_key]
-
-                # ✅ 更新 UI（非阻塞）
-                self.create_task(self._update_vote_ui(interaction, vote_id))
+            await interaction.response.send_message(
+                f"🎉 投票成功！你選擇了：{', '.join(selected_options)}",
+                ephemeral=True,
+            )
 
-        except Exception:
+            # ✅ 更新 UI（同一訊息合併，間隔內最多編輯一次）
+            message = interaction.message
+            if message is not None:
+                vote_tally_engine.schedule_render(
+                    message.id, lambda: self._update_vote_ui(message, vote_id)
+                )
 
+        except Exception as e:
+            logger.error(f"投票處理失敗 (vote_id: {vote_id}): {e}")
             if not interaction.response.is_done():
                 await interaction.response.send_message(
                     "❌ 投票時發生錯誤，請稍後再試。", ephemeral=True
                 )
-        finally:
-            if not lock.locked():
-                # asyncio.Lock 沒有公開 waiters；用私有欄位判斷是否可清理避免累積。
-                waiters = getattr(lock, "_waiters", None)
-                if not waiters:
-                    self._submit_locks.pop(lock_key, None)
-
-    async def _update_vote_ui(self, interaction: discord.Interaction, vote_id: int):
-        """✅ 非同步更新投票 UI"""
-        try:
-            data = await self._get_vote_full_data(vote_id)
-            if not data:
-                return
 
-            vote = data["vote"]
-            embed = build_vote_embed(
-                vote["title"],
-                vote["start_time"],
-                vote["end_time"],
-                vote["is_multi"],
-                vote["anonymous"],
-                data["total"],
-                vote_id=vote_id,
-                stats=data["stats"],
-                participants=data.get("participants"),
-            )
+    async def _update_vote_ui(self, message: discord.Message, vote_id: int):
+        """✅ 依記憶體計票重新渲染投票訊息"""
+        data = await self._get_vote_full_data(vote_id)
+        if not data:
+            return
 
-            view = VoteButtonView(
-                vote_id,
-                data["options"],
-                vote["allowed_roles"],
-                vote["is_multi"],
-                vote["anonymous"],
-                data["stats"],
-                data["total"],
-            )
+        vote = data["vote"]
+        embed = build_vote_embed(
+            vote["title"],
+            vote["start_time"],
+            vote["end_time"],
+            vote["is_multi"],
+            vote["anonymous"],
+            data["total"],
+            vote_id=vote_id,
+            stats=data["stats"],
+            participants=data.get("participants"),
+        )
 
-            await interaction.message.edit(embed=embed, view=view)
-        except Exception as e:
-            logger.error(f"投票結果更新失敗: {e}")
+        view = VoteButtonView(
+            vote_id,
+            data["options"],
+            vote["allowed_roles"],
+            vote["is_multi"],
+            vote["anonymous"],
+            data["stats"],
+            data["total"],
+        )
+
+        await message.edit(embed=embed, view=view)
 
     async def _process_expired_vote(self, vote: Dict[str, Any]):
         """處理單個過期投票"""
         try:
+            # 寫入記憶體中尚未落盤的票並釋放計票
+            await vote_tally_engine.evict(vote["id"])
             stats = await vote_dao.get_vote_statistics(vote["id"])
             total = sum(stats.values())
             participation = await vote_dao.get_vote_participation_stats(vote["id"])
@@ -1032,6 +1033,7 @@ class VoteCore(ManagedCog):
             await vote_dao.mark_vote_announced(vote["id"])
         except Exception as e:
             logger.error(f"處理過期投票失敗: {e}")
+            raise
 
     # ✅ 輔助方法優化
     def _check_user_permission(self, user: discord.Member, allowed_roles: List[int]) -> bool:
@@ -1082,43 +1084,39 @@ class VoteCore(ManagedCog):
         """向後相容性方法"""
         return self._calculate_time_left(end_time, datetime.now(timezone.utc))
 
-    # ===== 背景任務 =====
-
-    @tasks.loop(minutes=5)
-    async def announce_expired_votes(self):
-        """定期檢查並公告過期投票結果"""
-        try:
-            expired_votes = await vote_dao.get_expired_votes_to_announce()
-            if not expired_votes:
-                return
+    # ===== 截止時間排程 =====
 
-            logger.info(f"發現 {len(expired_votes)} 個需要公告的過期投票")
+    async def _announce_vote_deadline(self, vote_id: int):
+        """投票截止時由排程器呼叫；失敗時拋出例外交由排程器重試"""
+        await self.bot.wait_until_ready()
 
-            # 並行處理過期投票
-            tasks = [self._process_expired_vote(vote) for vote in expired_votes]
-            await asyncio.gather(*tasks, return_exceptions=True)
+        vote = await vote_dao.get_unannounced_vote(vote_id)
+        if not vote:
+            return
 
-        except Exception as e:
-            logger.error(f"檢查過期投票時發生錯誤: {e}")
+        # 截止時間已被延後（或與資料庫時鐘有誤差）：依最新時間重新排程
+        if vote["end_time"] and vote["end_time"] > datetime.now(timezone.utc):
+            vote_dao.vote_deadlines.schedule(vote_id, vote["end_time"])
+            return
 
-    @announce_expired_votes.before_loop
-    async def before_announce_expired_votes(self):
-        """等待 bot 準備完成"""
-        await self.bot.wait_until_ready()
+        logger.info(f"投票 {vote_id} 已截止，公告結果")
+        await self._process_expired_vote(vote)
 
 
 # ✅ 分頁控制 View
 class HistoryPaginationView(discord.ui.View):
-    def __init__(self, current_page: int, total_pages: int, status: str):
+    def __init__(self, current_page: int, total_pages: int, status: str, result=None):
         super().__init__(timeout=300)
         self.current_page = current_page
         self.total_pages = total_pages
         self.status = status
+        self.next_cursor = result.next_cursor if result else None
+        self.prev_cursor = result.prev_cursor if result else None
 
-        # 根據頁數決定是否顯示按鈕
-        if current_page > 1:
+        # 根據游標決定是否顯示按鈕
+        if self.prev_cursor:
             self.add_item(PreviousPageButton())
-        if current_page < total_pages:
+        if self.next_cursor:
             self.add_item(NextPageButton())
 
 
@@ -1128,12 +1126,12 @@ class PreviousPageButton(discord.ui.Button):
 
     async def callback(self, interaction: discord.Interaction):
         view: HistoryPaginationView = self.view
-        new_page = view.current_page - 1
+        new_page = max(1, view.current_page - 1)
 
-        # 重新執行歷史查詢
+        # 以游標查詢上一頁
         cog = interaction.client.get_cog("VoteCore")
         if cog:
-            await cog.vote_history.callback(cog, interaction, new_page, view.status)
+            await cog._send_vote_history(interaction, view.status, new_page, view.prev_cursor)
 
 
 class NextPageButton(discord.ui.Button):
@@ -1144,10 +1142,10 @@ class NextPageButton(discord.ui.Button):
         view: HistoryPaginationView = self.view
         new_page = view.current_page + 1
 
-        # 重新執行歷史查詢
+        # 以游標查詢下一頁
         cog = interaction.client.get_cog("VoteCore")
         if cog:
-            await cog.vote_history.callback(cog, interaction, new_page, view.status)
+            await cog._send_vote_history(interaction, view.status, new_page, view.next_cursor)
 
 
 async def setup(bot):
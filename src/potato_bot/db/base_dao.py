@@ -11,9 +11,19 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 
 import aiomysql
 
+from potato_bot.db.pagination import (
+    KeysetPage,
+    SortKey,
+    build_keyset_query,
+    build_page,
+    cached_count,
+)
 from potato_bot.db.pool import db_pool
 from potato_shared.logger import logger
 
+# 批次寫入用的伺服器限制（max_allowed_packet 預算、auto_increment_increment），首次批次寫入時讀取
+_BULK_SERVER_LIMITS: Dict[str, int] = {}
+
 
 class BaseDAO(ABC):
     """DAO 基底抽象類別"""
@@ -183,22 +193,26 @@ class BaseDAO(ABC):
             logger.error(f"[{self.__class__.__name__}] 查詢所有記錄失敗：{e}")
             return []
 
-    async def count(self, where_clause: str = None, params: Tuple = None) -> int:
-        """計算記錄數量"""
+    async def fetch_count(self, where_clause: str = None, params: Tuple = None) -> int:
+        """計算記錄數量；查詢失敗時拋出例外（供快取載入使用，錯誤不會被當成 0 快取）"""
         if not self.table_name:
             raise NotImplementedError("table_name 必須被設定")
 
         await self._ensure_initialized()
 
-        try:
-            query = f"SELECT COUNT(*) FROM {self.table_name}"
-
-            if where_clause:
-                query += f" WHERE {where_clause}"
+        query = f"SELECT COUNT(*) FROM {self.table_name}"
+        if where_clause:
+            query += f" WHERE {where_clause}"
 
-            result = await self.execute_query(query, params, fetch_one=True)
-            return result[0] if result else 0
+        result = await self.execute_query(query, params, fetch_one=True)
+        return result[0] if result else 0
 
+    async def count(self, where_clause: str = None, params: Tuple = None) -> int:
+        """計算記錄數量"""
+        try:
+            return await self.fetch_count(where_clause, params)
+        except NotImplementedError:
+            raise
         except Exception as e:
             logger.error(f"[{self.__class__.__name__}] 計算記錄數失敗：{e}")
             return 0
@@ -248,6 +262,50 @@ class BaseDAO(ABC):
             logger.error(f"[{self.__class__.__name__}] 分頁查詢失敗：{e}")
             return [], 0
 
+    async def paginate_keyset(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        conditions: Optional[List[str]] = None,
+        params: Optional[List[Any]] = None,
+        order_keys: Optional[List[SortKey]] = None,
+        with_total: bool = False,
+    ) -> KeysetPage:
+        """
+        Keyset 分頁查詢（不使用 OFFSET，深頁成本與第一頁相同）
+        order_keys 最後一鍵需唯一（預設 id DESC）；with_total 時回傳快取的總數
+        """
+        if not self.table_name:
+            raise NotImplementedError("table_name 必須被設定")
+
+        await self._ensure_initialized()
+
+        keys = order_keys or [SortKey("id", "id")]
+        conditions = list(conditions or [])
+        params = list(params or [])
+
+        try:
+            sql, query_params, backwards = build_keyset_query(
+                f"SELECT * FROM {self.table_name}", conditions, params, keys, limit, cursor
+            )
+            rows = await self.execute_query(sql, tuple(query_params), fetch_all=True, dictionary=True)
+
+            total = None
+            if with_total:
+                where_sql = " AND ".join(conditions)
+                total = await cached_count(
+                    self.table_name,
+                    where_sql,
+                    params,
+                    lambda: self.fetch_count(where_sql or None, tuple(params)),
+                )
+
+            return build_page(rows or [], keys, limit, backwards, total)
+
+        except Exception as e:
+            logger.error(f"[{self.__class__.__name__}] Keyset 分頁查詢失敗：{e}")
+            return KeysetPage()
+
     # ===== 快取管理 =====
 
     def _get_from_cache(self, key: str) -> Any:
@@ -321,67 +379,224 @@ class BaseDAO(ABC):
 
     # ===== 批次操作 =====
 
+    # 單一語句的封包預算占 max_allowed_packet 的比例（保留 SQL 本身與協定開銷）
+    BULK_PACKET_RATIO = 0.75
+    # 單一語句最多列數（避免 CASE / VALUES 過長導致解析成本上升）
+    BULK_MAX_ROWS = 1000
+
+    async def _get_bulk_limits(self, cursor) -> Tuple[int, int]:
+        """取得 (封包位元組預算, auto_increment_increment)，每個連線池只查詢一次"""
+        if _BULK_SERVER_LIMITS:
+            return _BULK_SERVER_LIMITS["packet_budget"], _BULK_SERVER_LIMITS["increment"]
+
+        max_packet, increment = 4 * 1024 * 1024, 1
+        try:
+            await cursor.execute("SELECT @@max_allowed_packet, @@auto_increment_increment")
+            row = await cursor.fetchone()
+            if row:
+                max_packet = int(row[0] or max_packet)
+                increment = int(row[1] or increment)
+        except Exception as e:
+            logger.debug(f"[{self.__class__.__name__}] 讀取 max_allowed_packet 失敗，使用預設值：{e}")
+
+        _BULK_SERVER_LIMITS["packet_budget"] = int(max_packet * self.BULK_PACKET_RATIO)
+        _BULK_SERVER_LIMITS["increment"] = max(1, increment)
+        return _BULK_SERVER_LIMITS["packet_budget"], _BULK_SERVER_LIMITS["increment"]
+
+    @staticmethod
+    def _estimate_value_bytes(value: Any) -> int:
+        """估計參數轉義後的長度（略為高估即可）"""
+        if value is None:
+            return 4
+        if isinstance(value, (bytes, bytearray)):
+            return len(value) * 2 + 3
+        if isinstance(value, str):
+            return len(value.encode("utf-8")) * 2 + 2
+        return len(str(value)) + 2
+
+    def _chunk_rows(
+        self, rows: List[Tuple], base_bytes: int, packet_budget: int, batch_size: int
+    ) -> List[List[Tuple]]:
+        """依列數與封包大小切分，單列超過預算時仍獨立成一批交由伺服器回報錯誤"""
+        chunks: List[List[Tuple]] = []
+        current: List[Tuple] = []
+        current_bytes = base_bytes
+        max_rows = max(1, min(batch_size, self.BULK_MAX_ROWS))
+
+        for row in rows:
+            row_bytes = sum(self._estimate_value_bytes(v) for v in row) + len(row) + 3
+            if current and (
+                len(current) >= max_rows or current_bytes + row_bytes > packet_budget
+            ):
+                chunks.append(current)
+                current, current_bytes = [], base_bytes
+            current.append(row)
+            current_bytes += row_bytes
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _group_by_columns(data_list: List[Dict[str, Any]]) -> List[Tuple[Tuple[str, ...], List[Tuple]]]:
+        """將連續且欄位相同的資料分組（保持原順序，以便對應回傳的 ID）"""
+        groups: List[Tuple[Tuple[str, ...], List[Tuple]]] = []
+        for data in data_list:
+            columns = tuple(data.keys())
+            if not groups or groups[-1][0] != columns:
+                groups.append((columns, []))
+            groups[-1][1].append(tuple(data.values()))
+        return groups
+
     async def bulk_insert(
-        self, data_list: List[Dict[str, Any]], batch_size: int = 100
+        self,
+        data_list: List[Dict[str, Any]],
+        batch_size: int = BULK_MAX_ROWS,
+        ignore: bool = False,
     ) -> List[int]:
-        """批次插入"""
+        """
+        批次插入（多列 INSERT ... VALUES (...),(...)，依 max_allowed_packet 切分）
+        全部成功才提交，回傳與 data_list 同順序的 ID；ignore=True 時被略過的列無法對應 ID，回傳空列表
+        """
         if not self.table_name or not data_list:
             return []
 
         await self._ensure_initialized()
 
-        inserted_ids = []
+        inserted_ids: List[int] = []
+        verb = "INSERT IGNORE" if ignore else "INSERT"
 
         try:
-            for i in range(0, len(data_list), batch_size):
-                batch = data_list[i : i + batch_size]
-
-                async with self.db.connection() as conn:
-                    async with conn.cursor() as cursor:
-                        for data in batch:
-                            columns = list(data.keys())
-                            placeholders = ", ".join(["%s"] * len(columns))
-                            query = f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES ({placeholders})"
-
-                            await cursor.execute(query, tuple(data.values()))
-                            inserted_ids.append(cursor.lastrowid)
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    packet_budget, increment = await self._get_bulk_limits(cursor)
+                    try:
+                        for columns, rows in self._group_by_columns(data_list):
+                            prefix = f"{verb} INTO {self.table_name} ({', '.join(columns)}) VALUES "
+                            row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+                            id_index = columns.index("id") if "id" in columns else None
+
+                            for chunk in self._chunk_rows(
+                                rows, len(prefix), packet_budget, batch_size
+                            ):
+                                query = prefix + ", ".join([row_placeholder] * len(chunk))
+                                await cursor.execute(query, [v for row in chunk for v in row])
+
+                                if ignore:
+                                    continue
+                                if id_index is not None:
+                                    inserted_ids.extend(row[id_index] for row in chunk)
+                                elif cursor.lastrowid:
+                                    # 多列 INSERT 的 lastrowid 為第一列 ID，同一語句內的 ID 連續配置
+                                    first_id = cursor.lastrowid
+                                    inserted_ids.extend(
+                                        first_id + i * increment for i in range(len(chunk))
+                                    )
 
                         await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
 
-            return inserted_ids
+            return [] if ignore else inserted_ids
 
         except Exception as e:
             logger.error(f"[{self.__class__.__name__}] 批次插入失敗：{e}")
             return []
 
+    async def bulk_upsert(
+        self,
+        data_list: List[Dict[str, Any]],
+        update_columns: Optional[List[str]] = None,
+        batch_size: int = BULK_MAX_ROWS,
+    ) -> int:
+        """
+        批次 upsert（INSERT ... ON DUPLICATE KEY UPDATE）
+        update_columns 預設為 id 以外的所有欄位；回傳 MySQL 影響列數（新增 1、更新 2、未變更 0）
+        """
+        if not self.table_name or not data_list:
+            return 0
+
+        await self._ensure_initialized()
+
+        affected = 0
+
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    packet_budget, _ = await self._get_bulk_limits(cursor)
+                    try:
+                        for columns, rows in self._group_by_columns(data_list):
+                            targets = update_columns or [c for c in columns if c != "id"]
+                            if not targets:
+                                targets = list(columns)
+                            prefix = f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES "
+                            suffix = " ON DUPLICATE KEY UPDATE " + ", ".join(
+                                f"{c} = VALUES({c})" for c in targets
+                            )
+                            row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+
+                            for chunk in self._chunk_rows(
+                                rows, len(prefix) + len(suffix), packet_budget, batch_size
+                            ):
+                                query = prefix + ", ".join([row_placeholder] * len(chunk)) + suffix
+                                await cursor.execute(query, [v for row in chunk for v in row])
+                                affected += cursor.rowcount
+
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+
+            return affected
+
+        except Exception as e:
+            logger.error(f"[{self.__class__.__name__}] 批次 upsert 失敗：{e}")
+            return 0
+
     async def bulk_update(
         self,
         updates: List[Tuple[Union[int, str], Dict[str, Any]]],
-        batch_size: int = 100,
+        batch_size: int = BULK_MAX_ROWS,
     ) -> int:
-        """批次更新"""
+        """
+        批次更新（UPDATE ... SET col = CASE id WHEN ... END WHERE id IN (...)）
+        相同欄位組合的更新合併成一個語句；同一 ID 出現多次時以最後一筆為準；回傳實際變更列數
+        """
         if not self.table_name or not updates:
             return 0
 
         await self._ensure_initialized()
 
-        updated_count = 0
+        # 依欄位組合分組（同一 ID 的多筆更新先合併）
+        merged: Dict[Union[int, str], Dict[str, Any]] = {}
+        for record_id, data in updates:
+            if data:
+                merged.setdefault(record_id, {}).update(data)
 
-        try:
-            for i in range(0, len(updates), batch_size):
-                batch = updates[i : i + batch_size]
+        groups: Dict[Tuple[str, ...], List[Tuple]] = {}
+        for record_id, data in merged.items():
+            columns = tuple(data.keys())
+            groups.setdefault(columns, []).append((record_id, *data.values()))
 
-                async with self.db.connection() as conn:
-                    async with conn.cursor() as cursor:
-                        for record_id, data in batch:
-                            set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
-                            query = f"UPDATE {self.table_name} SET {set_clause} WHERE id = %s"
-                            params = tuple(data.values()) + (record_id,)
+        updated_count = 0
 
-                            await cursor.execute(query, params)
-                            updated_count += cursor.rowcount
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    packet_budget, _ = await self._get_bulk_limits(cursor)
+                    try:
+                        for columns, rows in groups.items():
+                            base_bytes = len(self.table_name) + sum(len(c) * 3 + 30 for c in columns)
+                            for chunk in self._chunk_rows(rows, base_bytes, packet_budget, batch_size):
+                                query, params = self._build_case_update(columns, chunk)
+                                await cursor.execute(query, params)
+                                updated_count += cursor.rowcount
 
                         await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
 
             return updated_count
 
@@ -389,6 +604,56 @@ class BaseDAO(ABC):
             logger.error(f"[{self.__class__.__name__}] 批次更新失敗：{e}")
             return 0
 
+    def _build_case_update(
+        self, columns: Tuple[str, ...], chunk: List[Tuple]
+    ) -> Tuple[str, List[Any]]:
+        """組出 CASE id WHEN 形式的批次 UPDATE"""
+        params: List[Any] = []
+        set_clauses = []
+        when_sql = " ".join(["WHEN %s THEN %s"] * len(chunk))
+        for index, column in enumerate(columns, start=1):
+            set_clauses.append(f"{column} = CASE id {when_sql} ELSE {column} END")
+            for row in chunk:
+                params.extend((row[0], row[index]))
+
+        params.extend(row[0] for row in chunk)
+        id_placeholders = ", ".join(["%s"] * len(chunk))
+        query = (
+            f"UPDATE {self.table_name} SET {', '.join(set_clauses)} "
+            f"WHERE id IN ({id_placeholders})"
+        )
+        return query, params
+
+    async def execute_many(
+        self, query: str, params_list: List[Tuple], batch_size: int = BULK_MAX_ROWS
+    ) -> int:
+        """以 executemany 執行同一語句（單一交易），回傳總影響列數"""
+        if not params_list:
+            return 0
+
+        await self._ensure_initialized()
+
+        affected = 0
+
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    try:
+                        for i in range(0, len(params_list), batch_size):
+                            await cursor.executemany(query, params_list[i : i + batch_size])
+                            affected += cursor.rowcount
+
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+
+            return affected
+
+        except Exception as e:
+            logger.error(f"[{self.__class__.__name__}] executemany 失敗：{query[:100]}... - {e}")
+            return 0
+
     # ===== 統計和分析 =====
 
     async def get_statistics(self) -> Dict[str, Any]:
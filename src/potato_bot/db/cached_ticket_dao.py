@@ -13,7 +13,7 @@ import asyncio
 from typing import Any, Dict, List, Optional, Tuple
 
 from potato_bot.db.ticket_dao import TicketDAO
-from potato_shared.cache_manager import CacheStrategy, cache_manager, cached
+from potato_shared.cache_manager import MISSING, cache_manager
 from potato_shared.logger import logger
 
 
@@ -27,7 +27,9 @@ class CachedTicketDAO:
         # 快取配置
         self.DEFAULT_TTL = 300  # 5分鐘
         self.LIST_TTL = 180  # 列表數據3分鐘
+        self.LIST_STALE_TTL = 30  # 列表過期後30秒內先回傳舊值並背景更新
         self.DETAIL_TTL = 600  # 詳細數據10分鐘
+        self.NEGATIVE_TTL = 60  # 查無票券1分鐘
 
         logger.info("🚀 快取優化票券 DAO 初始化完成")
 
@@ -40,27 +42,34 @@ class CachedTicketDAO:
 
     # ========== 快取優化的基礎 CRUD 操作 ==========
 
-    @cached("ticket", ttl=600, strategy=CacheStrategy.WRITE_THROUGH)
     async def get_ticket(self, ticket_id: int) -> Optional[Dict]:
-        """獲取票券詳情（帶快取）"""
+        """獲取票券詳情（帶快取；查無票券會以較短 TTL 負向快取）"""
         try:
-            ticket = await self.ticket_dao.get_ticket(ticket_id)
-
-            if ticket:
-                # 記錄存取，用於熱點分析
-                await self._record_access(f"ticket:{ticket_id}")
-
-                # 預載相關數據
-                asyncio.create_task(self._preload_related_data(ticket))
-
-            return ticket
+            return await self.cache.get_or_load(
+                f"ticket:{ticket_id}",
+                lambda: self._load_ticket(ticket_id),
+                self.DETAIL_TTL,
+                negative_ttl=self.NEGATIVE_TTL,
+            )
 
         except Exception as e:
+            # 查詢失敗不寫入快取，下次請求會重新查詢
             logger.error(f"❌ 獲取票券失敗 {ticket_id}: {e}")
-            # 快取穿透保護：快取空結果短時間
-            await self.cache.set(f"ticket:empty:{ticket_id}", None, 60)
             return None
 
+    async def _load_ticket(self, ticket_id: int) -> Optional[Dict]:
+        """快取未命中時載入票券"""
+        ticket = await self.ticket_dao.fetch_ticket_by_id(ticket_id)
+
+        if ticket:
+            # 記錄存取，用於熱點分析
+            await self._record_access(f"ticket:{ticket_id}")
+
+            # 預載相關數據
+            asyncio.create_task(self._preload_related_data(ticket))
+
+        return ticket
+
     async def create_ticket(self, ticket_data: Dict) -> Optional[int]:
         """創建票券（帶快取失效）"""
         try:
@@ -152,14 +161,14 @@ class CachedTicketDAO:
         # 生成快取鍵
         cache_key = f"user_tickets:{user_id}:{guild_id}:{status}:{limit}"
 
-        # 嘗試從快取獲取
-        cached_result = await self.cache.get(cache_key)
-        if cached_result is not None:
-            return cached_result
-
-        tickets = await self.ticket_dao.get_user_tickets(user_id, guild_id, status, limit)
-        await self.cache.set(cache_key, tickets, self.LIST_TTL)
-        return tickets
+        # 快取未命中時，同一鍵的並發請求共用一次查詢
+        return await self.cache.get_or_load(
+            cache_key,
+            lambda: self.ticket_dao.get_user_tickets(user_id, guild_id, status, limit),
+            self.LIST_TTL,
+            tags=self._list_tags(guild_id, user_id),
+            stale_ttl=self.LIST_STALE_TTL,
+        )
 
     async def get_guild_tickets(
         self,
@@ -171,40 +180,47 @@ class CachedTicketDAO:
         """獲取伺服器票券列表（帶快取和分頁）"""
         try:
             list_cache_key = f"guild_tickets:{guild_id}:{status}:{limit}:{offset}"
-            cached_result = await self.cache.get(list_cache_key)
-            if cached_result is not None:
-                return cached_result
 
-            tickets, total = await self.ticket_dao.get_guild_tickets(
-                guild_id, status, limit, offset
+            async def load():
+                tickets, total = await self.ticket_dao.get_guild_tickets(
+                    guild_id, status, limit, offset
+                )
+
+                # 快取個別票券
+                for ticket in tickets:
+                    ticket_cache_key = f"ticket:{ticket['id']}"
+                    await self.cache.set(ticket_cache_key, ticket, self.DETAIL_TTL)
+
+                return tickets, total
+
+            # 快取未命中時，同一鍵的並發請求共用一次查詢
+            return await self.cache.get_or_load(
+                list_cache_key,
+                load,
+                self.LIST_TTL,
+                tags=self._list_tags(guild_id),
+                stale_ttl=self.LIST_STALE_TTL,
             )
 
-            # 快取個別票券
-            for ticket in tickets:
-                ticket_cache_key = f"ticket:{ticket['id']}"
-                await self.cache.set(ticket_cache_key, ticket, self.DETAIL_TTL)
-
-            await self.cache.set(list_cache_key, (tickets, total), self.LIST_TTL)
-
-            return tickets, total
-
         except Exception as e:
             logger.error(f"❌ 獲取伺服器票券失敗 {guild_id}: {e}")
             return [], 0
 
     # ========== 快取管理操作 ==========
 
+    @staticmethod
+    def _list_tags(guild_id: int, user_id: int = None) -> List[str]:
+        """列表快取的標籤（guild_tickets / user_tickets 皆掛在伺服器標籤下）"""
+        tags = [f"ticket_lists:guild:{guild_id}"]
+        if user_id is not None:
+            tags.append(f"ticket_lists:user:{user_id}:{guild_id}")
+        return tags
+
     async def _invalidate_related_caches(self, guild_id: int):
         """失效相關快取"""
         try:
-            # 清理伺服器相關快取
-            patterns = [
-                f"guild_tickets:{guild_id}:*",
-                f"user_tickets:*:{guild_id}:*",
-            ]
-
-            for pattern in patterns:
-                await self.cache.clear_all(pattern)
+            # 清理伺服器相關列表快取（guild_tickets:{gid}:* 與 user_tickets:*:{gid}:*）
+            await self.cache.invalidate_tags(f"ticket_lists:guild:{guild_id}")
 
         except Exception as e:
             logger.error(f"❌ 失效相關快取失敗: {e}")
@@ -260,9 +276,10 @@ class CachedTicketDAO:
         # 先從快取獲取
         for ticket_id in ticket_ids:
             cache_key = f"ticket:{ticket_id}"
-            cached_ticket = await self.cache.get(cache_key)
+            cached_ticket = await self.cache.get(cache_key, MISSING)
 
-            if cached_ticket is not None:
+            if cached_ticket is not MISSING:
+                # 包含負向快取（已知不存在的票券為 None）
                 results[ticket_id] = cached_ticket
             else:
                 cache_misses.append(ticket_id)
@@ -15,7 +15,7 @@ class DatabaseManager:
 
     def __init__(self):
         self.db = db_pool
-        self.current_version = "1.0.5"
+        self.current_version = "1.0.10"
         self._initialized = False
 
     async def initialize_all_tables(self, force_recreate: bool = False):
@@ -33,6 +33,9 @@ class DatabaseManager:
             db_version = await self._get_database_version()
 
             if db_version == self.current_version and not force_recreate:
+                # 欄位與索引檢查只查 information_schema，每次啟動都重做以補上先前失敗的 ALTER
+                await self._ensure_columns()
+                await self._ensure_indexes()
                 self._initialized = True
                 logger.info("✅ 資料庫版本一致，跳過資料表初始化")
                 return
@@ -59,9 +62,17 @@ class DatabaseManager:
             await self._create_category_auto_tables()
             await self._create_webhook_tables()
             await self._create_cleanup_tables()
+            await self._create_stats_rollup_tables()
 
-            # 更新資料庫版本
-            await self._update_database_version(self.current_version)
+            # 補齊既有資料表的欄位與索引
+            columns_ok = await self._ensure_columns()
+            indexes_ok = await self._ensure_indexes()
+
+            # 更新資料庫版本（有 ALTER 失敗時保留舊版本，下次啟動重新執行遷移）
+            if columns_ok and indexes_ok:
+                await self._update_database_version(self.current_version)
+            else:
+                logger.warning("⚠️ 部分欄位或索引補齊失敗，資料庫版本維持不變，下次啟動將重試")
 
             self._initialized = True
             logger.info("✅ 資料庫表格初始化完成")
@@ -293,6 +304,7 @@ class DatabaseManager:
                     closed_by VARCHAR(20) NULL COMMENT '關閉者 ID',
                     close_reason TEXT NULL COMMENT '關閉原因',
                     last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最後活動時間',
+                    history_checkpoint BIGINT NULL COMMENT '頻道歷史回填進度（最後寫入的訊息 ID）',
 
                     INDEX idx_guild_status (guild_id, status),
                     INDEX idx_created (created_at),
@@ -359,6 +371,7 @@ class DatabaseManager:
                     message_count INT DEFAULT 0 COMMENT '訊息數量',
                     file_path VARCHAR(500) COMMENT '檔案路徑',
                     file_size BIGINT DEFAULT 0 COMMENT '檔案大小',
+                    content_hash CHAR(64) NULL COMMENT '檔案 SHA-256',
                     export_format VARCHAR(20) DEFAULT 'html' COMMENT '匯出格式',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '建立時間',
 
@@ -445,6 +458,90 @@ class DatabaseManager:
 
         await self._create_tables_batch(tables, "投票系統")
 
+    # (資料表, 索引名稱, 索引定義)：keyset 分頁需要「篩選欄位 + 排序欄位」的複合索引
+    EXTRA_INDEXES = [
+        ("tickets", "idx_guild_created", "(guild_id, created_at)"),
+        ("votes", "idx_guild_start", "(guild_id, start_time)"),
+        ("webhook_logs", "idx_webhook_created", "(webhook_id, created_at)"),
+        # 統計彙總依 (伺服器, 日期) 重新計算
+        ("lotteries", "idx_guild_created", "(guild_id, created_at)"),
+        ("welcome_logs", "idx_guild_created", "(guild_id, created_at)"),
+        # 開獎時依 id 順序串流讀取有效參與者
+        ("lottery_entries", "idx_lottery_valid", "(lottery_id, is_valid, id)"),
+    ]
+
+    # (資料表, 欄位名稱, 欄位定義)：既有資料表補上的欄位
+    EXTRA_COLUMNS = [
+        ("ticket_transcripts", "content_hash", "CHAR(64) NULL COMMENT '檔案 SHA-256' AFTER file_size"),
+        ("lotteries", "draw_seed", "VARCHAR(64) NULL COMMENT '開獎亂數種子' AFTER auto_end"),
+        ("lotteries", "draw_entry_count", "INT NULL COMMENT '開獎時有效參與人數' AFTER draw_seed"),
+        (
+            "tickets",
+            "history_checkpoint",
+            "BIGINT NULL COMMENT '頻道歷史回填進度（最後寫入的訊息 ID）' AFTER last_activity",
+        ),
+    ]
+
+    async def _ensure_columns(self) -> bool:
+        """為既有資料表補上缺少的欄位（已存在則略過；任一欄位失敗時回傳 False）"""
+        ok = True
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    for table_name, column_name, definition in self.EXTRA_COLUMNS:
+                        try:
+                            await cursor.execute(
+                                """
+                                SELECT COUNT(*) FROM information_schema.COLUMNS
+                                WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+                            """,
+                                (table_name, column_name),
+                            )
+                            if (await cursor.fetchone())[0]:
+                                continue
+                            await cursor.execute(
+                                f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}"
+                            )
+                            logger.info(f"✅ 已新增欄位 {table_name}.{column_name}")
+                        except Exception as column_error:
+                            ok = False
+                            logger.error(f"❌ 新增欄位 {table_name}.{column_name} 失敗: {column_error}")
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"❌ 欄位檢查失敗: {e}")
+            ok = False
+        return ok
+
+    async def _ensure_indexes(self) -> bool:
+        """為既有資料表補上缺少的索引（已存在則略過；任一索引失敗時回傳 False）"""
+        ok = True
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    for table_name, index_name, definition in self.EXTRA_INDEXES:
+                        try:
+                            await cursor.execute(
+                                """
+                                SELECT COUNT(*) FROM information_schema.STATISTICS
+                                WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                            """,
+                                (table_name, index_name),
+                            )
+                            if (await cursor.fetchone())[0]:
+                                continue
+                            await cursor.execute(
+                                f"ALTER TABLE {table_name} ADD INDEX {index_name} {definition}"
+                            )
+                            logger.info(f"✅ 已新增索引 {table_name}.{index_name}")
+                        except Exception as index_error:
+                            ok = False
+                            logger.error(f"❌ 新增索引 {table_name}.{index_name} 失敗: {index_error}")
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"❌ 索引檢查失敗: {e}")
+            ok = False
+        return ok
+
     async def _create_tables_batch(self, tables: Dict[str, str], system_name: str):
         """批次創建表格"""
         success_count = 0
@@ -714,6 +811,8 @@ class DatabaseManager:
                     end_time TIMESTAMP NOT NULL COMMENT '結束時間',
                     status ENUM('pending', 'active', 'ended', 'cancelled') DEFAULT 'pending' COMMENT '狀態',
                     auto_end BOOLEAN DEFAULT TRUE COMMENT '自動結束',
+                    draw_seed VARCHAR(64) NULL COMMENT '開獎亂數種子',
+                    draw_entry_count INT NULL COMMENT '開獎時有效參與人數',
 
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '創建時間',
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新時間',
@@ -940,6 +1039,34 @@ class DatabaseManager:
 
         await self._create_tables_batch(tables, "清理日誌")
 
+    async def _create_stats_rollup_tables(self):
+        """創建每日統計彙總表格（由 stats_rollup 維護）"""
+        logger.info("📊 創建統計彙總表格...")
+
+        tables = {
+            "guild_stats_daily": """
+                CREATE TABLE IF NOT EXISTS guild_stats_daily (
+                    guild_id BIGINT NOT NULL COMMENT '伺服器 ID',
+                    stat_date DATE NOT NULL COMMENT '統計日期',
+                    metric VARCHAR(64) NOT NULL COMMENT '指標（系統.名稱）',
+                    value BIGINT NOT NULL DEFAULT 0 COMMENT '數值',
+                    PRIMARY KEY (guild_id, stat_date, metric)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """,
+            "guild_stats_daily_users": """
+                CREATE TABLE IF NOT EXISTS guild_stats_daily_users (
+                    guild_id BIGINT NOT NULL COMMENT '伺服器 ID',
+                    metric VARCHAR(64) NOT NULL COMMENT '指標（系統.名稱）',
+                    stat_date DATE NOT NULL COMMENT '統計日期',
+                    user_id BIGINT NOT NULL COMMENT '用戶 ID',
+                    value INT NOT NULL DEFAULT 0 COMMENT '次數',
+                    PRIMARY KEY (guild_id, metric, stat_date, user_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """,
+        }
+
+        await self._create_tables_batch(tables, "統計彙總")
+
 # ===== 單例模式實現 =====
 
 _database_manager_instance = None
@@ -4,13 +4,14 @@ FiveM 狀態設定資料存取
 """
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import aiomysql
 
 from potato_shared.logger import logger
 
 from .base_dao import BaseDAO
+from .guild_settings_registry import guild_settings_registry
 
 
 class FiveMDAO(BaseDAO):
@@ -99,79 +100,88 @@ class FiveMDAO(BaseDAO):
 
         logger.info("✅ FiveMDAO 初始化完成")
 
+    @staticmethod
+    def _default_settings(guild_id: int) -> Dict[str, Any]:
+        return {
+            "guild_id": guild_id,
+            "info_url": None,
+            "players_url": None,
+            "status_channel_id": 0,
+            "alert_role_ids": [],
+            "dm_role_ids": [],
+            "panel_message_id": 0,
+            "poll_interval": None,
+            "starting_timeout": None,
+            "maintenance_mode": False,
+            "server_link": None,
+            "status_image_url": None,
+            "exists": False,
+        }
+
+    @staticmethod
+    def _normalize_settings(result: Dict[str, Any]) -> Dict[str, Any]:
+        """將資料列轉為呼叫端使用的格式"""
+        result["status_channel_id"] = int(result.get("status_channel_id") or 0)
+        raw_alert_roles = result.get("alert_role_ids")
+        if isinstance(raw_alert_roles, str) and raw_alert_roles:
+            result["alert_role_ids"] = json.loads(raw_alert_roles)
+        elif isinstance(raw_alert_roles, list):
+            result["alert_role_ids"] = raw_alert_roles
+        else:
+            result["alert_role_ids"] = []
+        raw_dm_roles = result.get("dm_role_ids")
+        if isinstance(raw_dm_roles, str) and raw_dm_roles:
+            result["dm_role_ids"] = json.loads(raw_dm_roles)
+        elif isinstance(raw_dm_roles, list):
+            result["dm_role_ids"] = raw_dm_roles
+        else:
+            result["dm_role_ids"] = []
+        result["panel_message_id"] = int(result.get("panel_message_id") or 0)
+        result["poll_interval"] = (
+            int(result.get("poll_interval")) if result.get("poll_interval") else None
+        )
+        result["starting_timeout"] = (
+            int(result.get("starting_timeout")) if result.get("starting_timeout") else None
+        )
+        result["maintenance_mode"] = bool(result.get("maintenance_mode"))
+        result["server_link"] = result.get("server_link")
+        result["status_image_url"] = result.get("status_image_url")
+        result["exists"] = True
+        return result
+
     async def get_fivem_settings(self, guild_id: int) -> Dict[str, Any]:
         """取得 FiveM 狀態設定"""
+        try:
+            return await self.fetch_fivem_settings(guild_id)
+        except Exception as e:
+            logger.error(f"取得 FiveM 設定失敗: {e}")
+            return self._default_settings(guild_id)
+
+    async def fetch_fivem_settings(self, guild_id: int) -> Dict[str, Any]:
+        """從資料庫讀取 FiveM 狀態設定（錯誤時拋出例外）"""
+        await self._ensure_initialized()
+        async with self.db.connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                query = "SELECT * FROM fivem_settings WHERE guild_id = %s"
+                await cursor.execute(query, (guild_id,))
+                result = await cursor.fetchone()
+
+        if result:
+            return self._normalize_settings(result)
+        return self._default_settings(guild_id)
+
+    async def get_all_fivem_settings(self) -> List[Dict[str, Any]]:
+        """取得所有伺服器的 FiveM 狀態設定（啟動預載用）"""
         await self._ensure_initialized()
         try:
             async with self.db.connection() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    query = "SELECT * FROM fivem_settings WHERE guild_id = %s"
-                    await cursor.execute(query, (guild_id,))
-                    result = await cursor.fetchone()
-
-                    if result:
-                        result["status_channel_id"] = int(result.get("status_channel_id") or 0)
-                        raw_alert_roles = result.get("alert_role_ids")
-                        if isinstance(raw_alert_roles, str) and raw_alert_roles:
-                            result["alert_role_ids"] = json.loads(raw_alert_roles)
-                        elif isinstance(raw_alert_roles, list):
-                            result["alert_role_ids"] = raw_alert_roles
-                        else:
-                            result["alert_role_ids"] = []
-                        raw_dm_roles = result.get("dm_role_ids")
-                        if isinstance(raw_dm_roles, str) and raw_dm_roles:
-                            result["dm_role_ids"] = json.loads(raw_dm_roles)
-                        elif isinstance(raw_dm_roles, list):
-                            result["dm_role_ids"] = raw_dm_roles
-                        else:
-                            result["dm_role_ids"] = []
-                        result["panel_message_id"] = int(result.get("panel_message_id") or 0)
-                        result["poll_interval"] = (
-                            int(result.get("poll_interval")) if result.get("poll_interval") else None
-                        )
-                        result["starting_timeout"] = (
-                            int(result.get("starting_timeout"))
-                            if result.get("starting_timeout")
-                            else None
-                        )
-                        result["maintenance_mode"] = bool(result.get("maintenance_mode"))
-                        result["server_link"] = result.get("server_link")
-                        result["status_image_url"] = result.get("status_image_url")
-                        result["exists"] = True
-                        return result
-
-                    return {
-                        "guild_id": guild_id,
-                        "info_url": None,
-                        "players_url": None,
-                        "status_channel_id": 0,
-                        "alert_role_ids": [],
-                        "dm_role_ids": [],
-                        "panel_message_id": 0,
-                        "poll_interval": None,
-                        "starting_timeout": None,
-                        "maintenance_mode": False,
-                        "server_link": None,
-                        "status_image_url": None,
-                        "exists": False,
-                    }
+                    await cursor.execute("SELECT * FROM fivem_settings")
+                    results = await cursor.fetchall()
+            return [self._normalize_settings(row) for row in results]
         except Exception as e:
-            logger.error(f"取得 FiveM 設定失敗: {e}")
-            return {
-                "guild_id": guild_id,
-                "info_url": None,
-                "players_url": None,
-                "status_channel_id": 0,
-                "alert_role_ids": [],
-                "dm_role_ids": [],
-                "panel_message_id": 0,
-                "poll_interval": None,
-                "starting_timeout": None,
-                "maintenance_mode": False,
-                "server_link": None,
-                "status_image_url": None,
-                "exists": False,
-            }
+            logger.error(f"取得所有 FiveM 設定失敗: {e}")
+            return []
 
     async def update_fivem_settings(self, guild_id: int, settings: Dict[str, Any]) -> bool:
         """更新 FiveM 狀態設定"""
@@ -215,7 +225,8 @@ class FiveMDAO(BaseDAO):
                         ),
                     )
                     await conn.commit()
-                    return True
+            await guild_settings_registry.refresh("fivem", guild_id)
+            return True
         except Exception as e:
             logger.error(f"更新 FiveM 設定失敗: {e}")
             return False
@@ -235,7 +246,8 @@ class FiveMDAO(BaseDAO):
                     """
                     await cursor.execute(query, (guild_id, message_id))
                     await conn.commit()
-                    return True
+            await guild_settings_registry.refresh("fivem", guild_id)
+            return True
         except Exception as e:
             logger.error(f"更新 FiveM 面板訊息ID失敗: {e}")
             return False
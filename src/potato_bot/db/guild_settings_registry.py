@@ -0,0 +1,327 @@
+# bot/db/guild_settings_registry.py
+"""
+伺服器設定快照中心
+啟動時批次載入各設定表，之後熱路徑只讀記憶體中的不可變快照；
+DAO 寫入成功後主動 refresh 對應區段，並遞增版本號供呼叫端判斷是否需要重建狀態
+"""
+
+import asyncio
+import copy
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from potato_shared.config import GUILD_SETTINGS_MAX_AGE
+from potato_shared.logger import logger
+
+SettingsLoader = Callable[[int], Awaitable[Optional[Dict[str, Any]]]]
+BulkLoader = Callable[[], Awaitable[Iterable[Dict[str, Any]]]]
+DefaultFactory = Callable[[int], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """單一伺服器、單一區段的設定快照（唯讀）"""
+
+    guild_id: int
+    section: str
+    data: Mapping[str, Any]
+    version: int
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """取得可修改的副本"""
+        return copy.deepcopy(dict(self.data))
+
+
+@dataclass
+class _Section:
+    loader: SettingsLoader
+    bulk_loader: Optional[BulkLoader] = None
+    default: Optional[DefaultFactory] = None
+
+
+class GuildSettingsRegistry:
+    """伺服器設定快照中心"""
+
+    def __init__(self, max_age: float = GUILD_SETTINGS_MAX_AGE):
+        self.max_age = max(1.0, float(max_age))
+
+        self._sections: Dict[str, _Section] = {}
+        self._snapshots: Dict[Tuple[str, int], SettingsSnapshot] = {}
+        self._versions: Dict[Tuple[str, int], int] = {}
+        # 每次 refresh 遞增，用來丟棄「寫入前就開始」的舊載入結果
+        self._generations: Dict[Tuple[str, int], int] = {}
+        self._inflight: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._global_version = 0
+
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "refreshes": 0,
+            "background_refreshes": 0,
+            "discarded_loads": 0,
+        }
+
+    # ===== 區段註冊 =====
+
+    def register(
+        self,
+        section: str,
+        loader: SettingsLoader,
+        bulk_loader: Optional[BulkLoader] = None,
+        default: Optional[DefaultFactory] = None,
+    ) -> None:
+        """註冊設定區段：loader 需在資料庫錯誤時拋出例外，避免錯誤結果被當成設定保存"""
+        self._sections[section] = _Section(loader, bulk_loader, default)
+
+    # ===== 讀取 =====
+
+    async def snapshot(self, section: str, guild_id: int) -> SettingsSnapshot:
+        """取得唯讀快照；首次讀取時載入，過舊時背景重新整理並先回傳現有快照"""
+        key = (section, guild_id)
+        current = self._snapshots.get(key)
+        if current is not None:
+            self._stats["hits"] += 1
+            if time.monotonic() - current.loaded_at > self.max_age and key not in self._inflight:
+                self._stats["background_refreshes"] += 1
+                self._start_load(key)
+            return current
+
+        self._stats["misses"] += 1
+        task = self._inflight.get(key) or self._start_load(key)
+        try:
+            loaded = await asyncio.shield(task)
+        except Exception:
+            loaded = None
+
+        if loaded is not None:
+            return loaded
+        # 載入失敗：回傳預設值但不保存，下次讀取再試
+        return self._build_snapshot(key, self._default_data(section, guild_id), version=0)
+
+    async def get(self, section: str, guild_id: int) -> Dict[str, Any]:
+        """取得設定副本（相容原本回傳 dict 的呼叫端）"""
+        return (await self.snapshot(section, guild_id)).to_dict()
+
+    def peek(self, section: str, guild_id: int) -> Optional[SettingsSnapshot]:
+        """只讀記憶體，不觸發載入"""
+        return self._snapshots.get((section, guild_id))
+
+    def version(self, section: str, guild_id: int) -> int:
+        return self._versions.get((section, guild_id), 0)
+
+    @property
+    def global_version(self) -> int:
+        return self._global_version
+
+    # ===== 更新推送 =====
+
+    async def refresh(self, section: str, guild_id: int) -> Optional[SettingsSnapshot]:
+        """設定寫入後呼叫：重新讀取並發佈新版本（不會拋出例外）"""
+        if section not in self._sections:
+            return None
+        key = (section, guild_id)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._stats["refreshes"] += 1
+        task = self._start_load(key)
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # 讀取失敗時移除舊快照，避免繼續使用寫入前的設定
+            self._drop(key)
+            return None
+
+    def invalidate(self, section: str, guild_id: int) -> None:
+        """移除快照，下次讀取時重新載入"""
+        key = (section, guild_id)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._drop(key)
+
+    async def load_all(self) -> int:
+        """啟動時批次載入所有區段，回傳載入的快照數"""
+        total = 0
+        for section, spec in self._sections.items():
+            if not spec.bulk_loader:
+                continue
+            try:
+                rows = await spec.bulk_loader()
+            except Exception as e:
+                logger.error(f"❌ 預載伺服器設定失敗 ({section}): {e}")
+                continue
+
+            count = 0
+            for row in rows or []:
+                guild_id = row.get("guild_id")
+                if not guild_id:
+                    continue
+                self._publish((section, int(guild_id)), row)
+                count += 1
+            total += count
+            logger.info(f"✅ 已預載 {count} 筆 {section} 設定")
+        return total
+
+    def get_statistics(self) -> Dict[str, Any]:
+        requests = self._stats["hits"] + self._stats["misses"]
+        return {
+            "snapshots": len(self._snapshots),
+            "sections": list(self._sections),
+            "global_version": self._global_version,
+            "hit_rate": round(self._stats["hits"] / requests * 100, 2) if requests else 0.0,
+            "inflight": len(self._inflight),
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    def _start_load(self, key: Tuple[str, int]) -> asyncio.Task:
+        generation = self._generations.get(key, 0)
+        task = asyncio.create_task(self._load(key, generation))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t, k=key: self._finish_load(k, t))
+        return task
+
+    def _finish_load(self, key: Tuple[str, int], task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # 取出例外，避免「never retrieved」警告
+
+    async def _load(self, key: Tuple[str, int], generation: int) -> Optional[SettingsSnapshot]:
+        section, guild_id = key
+        self._stats["loads"] += 1
+        try:
+            data = await self._sections[section].loader(guild_id)
+        except Exception as e:
+            self._stats["load_errors"] += 1
+            logger.error(f"❌ 載入伺服器設定失敗 ({section}, guild_id: {guild_id}): {e}")
+            raise
+
+        if self._generations.get(key, 0) != generation:
+            # 載入期間設定已被改寫，交由較新的 refresh 發佈
+            self._stats["discarded_loads"] += 1
+            return self._snapshots.get(key)
+
+        if data is None:
+            data = self._default_data(section, guild_id)
+        return self._publish(key, data)
+
+    def _publish(self, key: Tuple[str, int], data: Dict[str, Any]) -> SettingsSnapshot:
+        current = self._snapshots.get(key)
+        frozen = copy.deepcopy(dict(data))
+        if current is not None and dict(current.data) == frozen:
+            # 內容未變：只更新載入時間，版本號不動
+            snapshot = self._build_snapshot(key, frozen, current.version)
+        else:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            self._global_version += 1
+            snapshot = self._build_snapshot(key, frozen, version)
+        self._snapshots[key] = snapshot
+        return snapshot
+
+    def _drop(self, key: Tuple[str, int]) -> None:
+        if self._snapshots.pop(key, None) is not None:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._global_version += 1
+
+    def _default_data(self, section: str, guild_id: int) -> Dict[str, Any]:
+        spec = self._sections.get(section)
+        if spec and spec.default:
+            return spec.default(guild_id)
+        return {}
+
+    @staticmethod
+    def _build_snapshot(
+        key: Tuple[str, int], data: Dict[str, Any], version: int
+    ) -> SettingsSnapshot:
+        section, guild_id = key
+        return SettingsSnapshot(
+            guild_id=guild_id,
+            section=section,
+            data=MappingProxyType(data),
+            version=version,
+        )
+
+
+# ===== 內建區段（延遲匯入 DAO，避免與 DAO 互相匯入）=====
+
+_daos: Dict[str, Any] = {}
+
+
+def _dao(name: str) -> Any:
+    if name not in _daos:
+        if name == "ticket":
+            from .ticket_dao import TicketDAO
+
+            _daos[name] = TicketDAO()
+        elif name == "fivem":
+            from .fivem_dao import FiveMDAO
+
+            _daos[name] = FiveMDAO()
+        elif name == "whitelist_interview":
+            from .whitelist_interview_dao import WhitelistInterviewDAO
+
+            _daos[name] = WhitelistInterviewDAO()
+        elif name == "system":
+            from .welcome_dao import WelcomeDAO
+
+            _daos[name] = WelcomeDAO()
+    return _daos[name]
+
+
+async def _load_ticket(guild_id: int) -> Dict[str, Any]:
+    return await _dao("ticket").fetch_settings(guild_id)
+
+
+async def _load_all_ticket() -> List[Dict[str, Any]]:
+    return await _dao("ticket").get_all_ticket_settings()
+
+
+async def _load_fivem(guild_id: int) -> Dict[str, Any]:
+    return await _dao("fivem").fetch_fivem_settings(guild_id)
+
+
+async def _load_all_fivem() -> List[Dict[str, Any]]:
+    return await _dao("fivem").get_all_fivem_settings()
+
+
+def _default_fivem(guild_id: int) -> Dict[str, Any]:
+    from .fivem_dao import FiveMDAO
+
+    return FiveMDAO._default_settings(guild_id)
+
+
+async def _load_whitelist_interview(guild_id: int) -> Dict[str, Any]:
+    return await _dao("whitelist_interview").get_settings(guild_id)
+
+
+async def _load_all_whitelist_interview() -> List[Dict[str, Any]]:
+    return await _dao("whitelist_interview").get_all_settings()
+
+
+async def _load_system(guild_id: int) -> Optional[Dict[str, Any]]:
+    settings = await _dao("system").fetch_system_settings(guild_id)
+    if settings is not None:
+        settings["guild_id"] = guild_id
+    return settings
+
+
+async def _load_all_system() -> List[Dict[str, Any]]:
+    return await _dao("system").get_all_system_settings()
+
+
+# 全域實例
+guild_settings_registry = GuildSettingsRegistry()
+guild_settings_registry.register("ticket", _load_ticket, _load_all_ticket)
+guild_settings_registry.register("fivem", _load_fivem, _load_all_fivem, _default_fivem)
+guild_settings_registry.register(
+    "whitelist_interview", _load_whitelist_interview, _load_all_whitelist_interview
+)
+guild_settings_registry.register("system", _load_system, _load_all_system)
@@ -11,10 +11,22 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import aiomysql
 
+from potato_bot.db.stats_rollup import stats_rollup
+from potato_bot.utils.deadline_scheduler import DeadlineScheduler
+from potato_bot.utils.reservoir_sampler import ReservoirSampler
+from potato_shared.cache_manager import cache_manager
 from potato_shared.logger import logger
 
 from .base_dao import BaseDAO
 
+LOTTERY_DRAW_CONCURRENCY = 10  # 同時進行的開獎數上限
+DRAW_FETCH_SIZE = 5000  # 開獎時每次由伺服器端游標讀取的參與者 ID 數
+
+# 抽獎開獎排程（由 LotteryCore 設定開獎處理並啟動；end_time 為本地時間）
+lottery_deadlines = DeadlineScheduler(
+    "抽獎開獎", assume_utc=False, max_concurrency=LOTTERY_DRAW_CONCURRENCY
+)
+
 
 @dataclass
 class LotteryData:
@@ -46,6 +58,10 @@ class LotteryData:
 class LotteryDAO(BaseDAO):
     """抽獎系統資料存取物件"""
 
+    LOTTERY_CACHE_TTL = 60  # 抽獎資料快取秒數
+    LOTTERY_NEGATIVE_TTL = 30  # 「抽獎不存在」快取秒數
+    LOTTERY_CACHE_TAG = "lotteries"
+
     def __init__(self):
         super().__init__()
         self.table_name = "lotteries"
@@ -104,6 +120,8 @@ class LotteryDAO(BaseDAO):
 
                     lottery_id = cursor.lastrowid
                     await conn.commit()
+                    await self._invalidate_lottery_cache(lottery_id)
+                    stats_rollup.mark("lottery", lottery_id)
 
                     logger.info(f"創建抽獎成功: {lottery_id} - {lottery_data.name}")
                     return lottery_id
@@ -113,29 +131,48 @@ class LotteryDAO(BaseDAO):
             raise
 
     async def get_lottery(self, lottery_id: int) -> Optional[Dict]:
-        """獲取單個抽獎"""
+        """獲取單個抽獎（含負向快取：不存在的抽獎短時間內不再查詢）"""
         try:
-            async with self.db.connection() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    query = "SELECT * FROM lotteries WHERE id = %s"
-                    await cursor.execute(query, (lottery_id,))
-                    result = await cursor.fetchone()
-
-                    if result:
-                        # 解析JSON欄位
-                        if result["prize_data"]:
-                            result["prize_data"] = json.loads(result["prize_data"])
-                        if result["required_roles"]:
-                            result["required_roles"] = json.loads(result["required_roles"])
-                        if result["excluded_roles"]:
-                            result["excluded_roles"] = json.loads(result["excluded_roles"])
-
-                    return result
+            lottery = await cache_manager.get_or_load(
+                f"lottery:{lottery_id}",
+                lambda: self._fetch_lottery(lottery_id),
+                self.LOTTERY_CACHE_TTL,
+                negative_ttl=self.LOTTERY_NEGATIVE_TTL,
+                tags=[self.LOTTERY_CACHE_TAG],
+            )
+            # 回傳副本，避免呼叫端修改到快取內容
+            return dict(lottery) if lottery else None
 
         except Exception as e:
             logger.error(f"獲取抽獎失敗: {e}")
             return None
 
+    async def _fetch_lottery(self, lottery_id: int) -> Optional[Dict]:
+        """從資料庫讀取單個抽獎（錯誤時拋出例外，避免被當成查無資料快取）"""
+        async with self.db.connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                query = "SELECT * FROM lotteries WHERE id = %s"
+                await cursor.execute(query, (lottery_id,))
+                result = await cursor.fetchone()
+
+                if result:
+                    # 解析JSON欄位
+                    if result["prize_data"]:
+                        result["prize_data"] = json.loads(result["prize_data"])
+                    if result["required_roles"]:
+                        result["required_roles"] = json.loads(result["required_roles"])
+                    if result["excluded_roles"]:
+                        result["excluded_roles"] = json.loads(result["excluded_roles"])
+
+                return result
+
+    async def _invalidate_lottery_cache(self, lottery_id: Optional[int] = None):
+        """抽獎資料異動後清除快取（未指定 ID 時清除全部抽獎快取）"""
+        if lottery_id is None:
+            await cache_manager.invalidate_tags(self.LOTTERY_CACHE_TAG)
+        else:
+            await cache_manager.delete(f"lottery:{lottery_id}")
+
     async def get_active_lotteries(self, guild_id: int) -> List[Dict]:
         """獲取活躍抽獎列表"""
         try:
@@ -183,6 +220,7 @@ class LotteryDAO(BaseDAO):
 
                     await cursor.execute(query, (lottery_id, user_id, username, entry_method))
                     await conn.commit()
+                    stats_rollup.mark("lottery", lottery_id)
 
                     return True
 
@@ -198,6 +236,7 @@ class LotteryDAO(BaseDAO):
                     query = "DELETE FROM lottery_entries WHERE lottery_id = %s AND user_id = %s"
                     await cursor.execute(query, (lottery_id, user_id))
                     await conn.commit()
+                    stats_rollup.mark("lottery", lottery_id)
 
                     return cursor.rowcount > 0
 
@@ -222,8 +261,60 @@ class LotteryDAO(BaseDAO):
             logger.error(f"獲取抽獎參與者失敗: {e}")
             return []
 
-    async def select_winners(self, lottery_id: int, winners: List[Tuple[int, str, int]]) -> bool:
-        """選出中獎者"""
+    async def draw_winners(
+        self, lottery_id: int, winner_count: int, seed: str
+    ) -> Tuple[List[Tuple[int, str, int]], int]:
+        """
+        串流抽出中獎者，回傳 ([(user_id, username, 名次), ...], 有效參與人數)
+        以伺服器端游標依 id 順序讀取有效參與者 ID，以 ReservoirSampler(seed) 抽樣後
+        再洗牌決定名次；同一份參與者與種子必得到相同結果，可供事後稽核。
+        只有中獎者的完整資料會被讀取
+        """
+        sampler: ReservoirSampler[int] = ReservoirSampler(winner_count, seed)
+        async with self.db.connection() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(
+                    """
+                    SELECT id FROM lottery_entries
+                    WHERE lottery_id = %s AND is_valid = TRUE
+                    ORDER BY id
+                """,
+                    (lottery_id,),
+                )
+                while True:
+                    rows = await cursor.fetchmany(DRAW_FETCH_SIZE)
+                    if not rows:
+                        break
+                    for (entry_id,) in rows:
+                        sampler.add(entry_id)
+
+            reservoir = sampler.draw()
+            if not reservoir:
+                return [], sampler.seen
+
+            async with conn.cursor() as cursor:
+                placeholders = ", ".join(["%s"] * len(reservoir))
+                await cursor.execute(
+                    f"SELECT id, user_id, username FROM lottery_entries WHERE id IN ({placeholders})",
+                    reservoir,
+                )
+                rows = {row[0]: (row[1], row[2]) for row in await cursor.fetchall()}
+
+        winners = []
+        for entry_id in reservoir:
+            if entry_id in rows:
+                user_id, username = rows[entry_id]
+                winners.append((user_id, username, len(winners) + 1))
+        return winners, sampler.seen
+
+    async def select_winners(
+        self,
+        lottery_id: int,
+        winners: List[Tuple[int, str, int]],
+        seed: Optional[str] = None,
+        entry_count: Optional[int] = None,
+    ) -> bool:
+        """選出中獎者（seed / entry_count 為開獎種子與參與人數，寫入抽獎資料供稽核）"""
         try:
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
@@ -256,10 +347,21 @@ class LotteryDAO(BaseDAO):
                         )
 
                     # 更新抽獎狀態
-                    update_query = "UPDATE lotteries SET status = 'ended' WHERE id = %s"
-                    await cursor.execute(update_query, (lottery_id,))
+                    if seed is not None:
+                        update_query = """
+                        UPDATE lotteries
+                        SET status = 'ended', draw_seed = %s, draw_entry_count = %s
+                        WHERE id = %s
+                        """
+                        await cursor.execute(update_query, (seed, entry_count, lottery_id))
+                    else:
+                        update_query = "UPDATE lotteries SET status = 'ended' WHERE id = %s"
+                        await cursor.execute(update_query, (lottery_id,))
 
                     await conn.commit()
+                    await self._invalidate_lottery_cache(lottery_id)
+                    stats_rollup.mark("lottery", lottery_id)
+                    lottery_deadlines.cancel(lottery_id)
                     return True
 
         except Exception as e:
@@ -298,6 +400,7 @@ class LotteryDAO(BaseDAO):
                     query = "DELETE FROM lottery_winners WHERE lottery_id = %s"
                     await cursor.execute(query, (lottery_id,))
                     await conn.commit()
+                    stats_rollup.mark("lottery", lottery_id)
                     return True
         except Exception as e:
             logger.error(f"刪除中獎者失敗: {e}")
@@ -318,6 +421,10 @@ class LotteryDAO(BaseDAO):
                         await cursor.execute(query, (status, lottery_id))
 
                     await conn.commit()
+                    await self._invalidate_lottery_cache(lottery_id)
+                    stats_rollup.mark("lottery", lottery_id)
+                    if status in ("ended", "cancelled"):
+                        lottery_deadlines.cancel(lottery_id)
                     return cursor.rowcount > 0
 
         except Exception as e:
@@ -398,127 +505,74 @@ class LotteryDAO(BaseDAO):
             logger.error(f"更新抽獎設定失敗: {e}")
             return False
 
-    async def cleanup_expired_lotteries(self) -> int:
-        """清理過期抽獎"""
-        try:
-            async with self.db.connection() as conn:
-                async with conn.cursor() as cursor:
-                    # 自動結束過期的活躍抽獎
-                    query = """
-                    UPDATE lotteries
-                    SET status = 'ended'
-                    WHERE status = 'active'
-                    AND end_time <= NOW()
-                    AND auto_end = TRUE
+    async def get_pending_end_times(self) -> List[Tuple[int, datetime]]:
+        """取得所有自動結束的進行中抽獎截止時間（供開獎排程啟動時重建，依 idx_end_time 排序）"""
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
                     """
-
-                    await cursor.execute(query)
-                    updated_count = cursor.rowcount
-                    await conn.commit()
-
-                    if updated_count > 0:
-                        logger.info(f"自動結束了 {updated_count} 個過期抽獎")
-
-                    return updated_count
-
-        except Exception as e:
-            logger.error(f"清理過期抽獎失敗: {e}")
-            return 0
+                    SELECT id, end_time FROM lotteries
+                    WHERE status = 'active' AND auto_end = TRUE
+                    ORDER BY end_time
+                """
+                )
+                return [(row[0], row[1]) for row in await cursor.fetchall()]
 
     async def get_lottery_statistics(self, guild_id: int, days: int = 30) -> Dict[str, Any]:
-        """獲取抽獎統計資料"""
+        """
+        獲取抽獎統計資料（讀取每日彙總，查詢量與歷史資料量無關）
+        參與與中獎次數依抽獎建立日期歸類
+        """
         try:
-            async with self.db.connection() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    # 基本統計
-                    basic_query = """
-                    SELECT
-                        COUNT(*) as total_lotteries,
-                        COUNT(CASE WHEN status = 'active' THEN 1 END) as active_lotteries,
-                        COUNT(CASE WHEN status = 'ended' THEN 1 END) as completed_lotteries,
-                        COUNT(CASE WHEN status = 'cancelled' THEN 1 END) as cancelled_lotteries,
-                        AVG(winner_count) as avg_winner_count,
-                        COUNT(CASE WHEN created_at >= DATE_SUB(NOW(), INTERVAL 1 DAY) THEN 1 END) as daily_lotteries,
-                        COUNT(CASE WHEN created_at >= DATE_SUB(NOW(), INTERVAL 7 DAY) THEN 1 END) as weekly_lotteries,
-                        COUNT(CASE WHEN created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY) THEN 1 END) as monthly_lotteries
-                    FROM lotteries
-                    WHERE guild_id = %s AND created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    """
-
-                    await cursor.execute(basic_query, (guild_id, days))
-                    basic_stats = await cursor.fetchone()
-
-                    # 參與統計
-                    participation_query = """
-                    SELECT
-                        COUNT(*) as total_participations,
-                        COUNT(DISTINCT user_id) as unique_participants
-                    FROM lottery_entries lp
-                    JOIN lotteries l ON lp.lottery_id = l.id
-                    WHERE l.guild_id = %s AND lp.entry_time >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    """
-
-                    await cursor.execute(participation_query, (guild_id, days))
-                    participation_stats = await cursor.fetchone()
-
-                    # 中獎統計
-                    winner_query = """
-                    SELECT
-                        COUNT(*) as total_wins,
-                        COUNT(DISTINCT user_id) as unique_winners
-                    FROM lottery_winners lw
-                    JOIN lotteries l ON lw.lottery_id = l.id
-                    WHERE l.guild_id = %s AND l.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    """
-
-                    await cursor.execute(winner_query, (guild_id, days))
-                    winner_stats = await cursor.fetchone()
-
-                    # 平均參與數
-                    avg_participants_query = """
-                    SELECT
-                        AVG(participant_count) as avg_participants
-                    FROM (
-                        SELECT COUNT(*) as participant_count
-                        FROM lottery_entries lp
-                        JOIN lotteries l ON lp.lottery_id = l.id
-                        WHERE l.guild_id = %s AND l.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                        GROUP BY lp.lottery_id
-                    ) as pc
-                    """
-
-                    await cursor.execute(avg_participants_query, (guild_id, days))
-                    avg_result = await cursor.fetchone()
-
-                    # 合併統計結果
-                    stats = {
-                        "total_lotteries": basic_stats["total_lotteries"] or 0,
-                        "active_lotteries": basic_stats["active_lotteries"] or 0,
-                        "completed_lotteries": basic_stats["completed_lotteries"] or 0,
-                        "cancelled_lotteries": basic_stats["cancelled_lotteries"] or 0,
-                        "daily_lotteries": basic_stats["daily_lotteries"] or 0,
-                        "weekly_lotteries": basic_stats["weekly_lotteries"] or 0,
-                        "monthly_lotteries": basic_stats["monthly_lotteries"] or 0,
-                        "total_participations": participation_stats["total_participations"] or 0,
-                        "unique_participants": participation_stats["unique_participants"] or 0,
-                        "total_wins": winner_stats["total_wins"] or 0,
-                        "unique_winners": winner_stats["unique_winners"] or 0,
-                        "avg_participants": float(avg_result["avg_participants"] or 0),
-                        "avg_winner_count": float(basic_stats["avg_winner_count"] or 1),
-                    }
-
-                    return stats
+            daily = await stats_rollup.daily(guild_id, "lottery", max(days, 30))
+            window = stats_rollup.sum_days(daily, days)
+            total = window.get("created", 0)
+            with_entries = window.get("with_entries", 0)
+
+            def created_within(period: int) -> int:
+                return stats_rollup.sum_days(daily, min(days, period)).get("created", 0)
+
+            return {
+                "total_lotteries": total,
+                "active_lotteries": window.get("status_active", 0),
+                "completed_lotteries": window.get("status_ended", 0),
+                "cancelled_lotteries": window.get("status_cancelled", 0),
+                "daily_lotteries": created_within(1),
+                "weekly_lotteries": created_within(7),
+                "monthly_lotteries": created_within(30),
+                "total_participations": window.get("entries", 0),
+                "unique_participants": await stats_rollup.count_users(
+                    guild_id, "lottery.participant", days
+                ),
+                "total_wins": window.get("wins", 0),
+                "unique_winners": await stats_rollup.count_users(guild_id, "lottery.winner", days),
+                "avg_participants": (window.get("entries", 0) / with_entries) if with_entries else 0.0,
+                "avg_winner_count": (window.get("winner_slots", 0) / total) if total else 1.0,
+            }
 
         except Exception as e:
             logger.error(f"獲取抽獎統計失敗: {e}")
             return {}
 
+    async def get_winners_leaderboard(
+        self, guild_id: int, days: int = 30, limit: int = 20
+    ) -> List[Tuple[int, int]]:
+        """中獎排行榜 [(user_id, 中獎次數), ...]（讀取每日彙總）"""
+        try:
+            return await stats_rollup.top_users(guild_id, "lottery.winner", days, limit)
+        except Exception as e:
+            logger.error(f"獲取中獎排行榜失敗: {e}")
+            return []
+
     async def get_participant_count(self, lottery_id: int) -> int:
         """獲取抽獎參與人數"""
         try:
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
-                    query = "SELECT COUNT(*) FROM lottery_entries WHERE lottery_id = %s"
+                    query = """
+                    SELECT COUNT(*) FROM lottery_entries
+                    WHERE lottery_id = %s AND is_valid = TRUE
+                    """
                     await cursor.execute(query, (lottery_id,))
                     result = await cursor.fetchone()
                     return result[0] if result else 0
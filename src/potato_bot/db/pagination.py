@@ -0,0 +1,215 @@
+# bot/db/pagination.py
+"""
+Keyset（seek）分頁工具
+以排序鍵比較取代 LIMIT/OFFSET，深頁不再掃描並丟棄前段資料；
+游標為不透明字串，內容為最後一筆（或第一筆）的排序鍵值與方向
+"""
+
+import base64
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from potato_shared.cache_manager import cache_manager
+from potato_shared.logger import logger
+
+COUNT_CACHE_TTL = 60  # 總數快取秒數（翻頁不重新 COUNT）
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """排序鍵：expr 用於 SQL，field 為結果列中對應的欄位名稱"""
+
+    expr: str
+    field: str
+    descending: bool = True
+
+
+@dataclass
+class KeysetPage:
+    """單頁結果"""
+
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+# ===== 游標編碼 =====
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if "$d" in value:
+            return date.fromisoformat(value["$d"])
+        if "$dec" in value:
+            return Decimal(value["$dec"])
+    return value
+
+
+def _keys_fingerprint(keys: Sequence[SortKey]) -> str:
+    raw = "|".join(f"{k.expr}:{int(k.descending)}" for k in keys)
+    return hashlib.md5(raw.encode()).hexdigest()[:8]
+
+
+def encode_cursor(keys: Sequence[SortKey], row: Dict[str, Any], backwards: bool = False) -> str:
+    payload = {
+        "k": _keys_fingerprint(keys),
+        "v": [_encode_value(row.get(key.field)) for key in keys],
+        "b": 1 if backwards else 0,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(keys: Sequence[SortKey], cursor: str) -> Tuple[List[Any], bool]:
+    """解析游標，格式錯誤或與排序鍵不符時拋出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(v) for v in payload["v"]]
+        backwards = bool(payload.get("b"))
+        fingerprint = payload["k"]
+    except Exception as e:
+        raise ValueError(f"無效的分頁游標: {e}") from e
+
+    if fingerprint != _keys_fingerprint(keys) or len(values) != len(keys):
+        raise ValueError("分頁游標與查詢排序不符")
+    return values, backwards
+
+
+# ===== SQL 組裝 =====
+
+
+def _seek_condition(
+    keys: Sequence[SortKey], values: List[Any], backwards: bool
+) -> Tuple[str, List[Any]]:
+    """
+    展開為 (a < x) OR (a = x AND b < y) ...，
+    不使用列建構式比較，讓混合升降冪與舊版 MariaDB 都能走索引
+    """
+    clauses = []
+    params: List[Any] = []
+    for i, key in enumerate(keys):
+        descending = key.descending != backwards
+        operator = "<" if descending else ">"
+        parts = [f"{keys[j].expr} = %s" for j in range(i)]
+        parts.append(f"{key.expr} {operator} %s")
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(values[:i])
+        params.append(values[i])
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def build_keyset_query(
+    select_sql: str,
+    conditions: Sequence[str],
+    params: Sequence[Any],
+    keys: Sequence[SortKey],
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[str, List[Any], Optional[bool]]:
+    """
+    組出 keyset 查詢，回傳 (sql, params, backwards)
+    backwards 為 None 表示第一頁；select_sql 為不含 WHERE 的 SELECT ... FROM ...，
+    多查一筆用來判斷是否還有下一頁
+    """
+    where = list(conditions)
+    query_params = list(params)
+    backwards: Optional[bool] = None
+
+    if cursor:
+        try:
+            values, backwards = decode_cursor(keys, cursor)
+            seek_sql, seek_params = _seek_condition(keys, values, backwards)
+            where.append(seek_sql)
+            query_params.extend(seek_params)
+        except ValueError as e:
+            logger.warning(f"⚠️ {e}，改為查詢第一頁")
+            backwards = None
+
+    order_sql = ", ".join(
+        f"{key.expr} {'DESC' if key.descending != bool(backwards) else 'ASC'}" for key in keys
+    )
+    where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+    sql = f"{select_sql}{where_sql} ORDER BY {order_sql} LIMIT %s"
+    query_params.append(limit + 1)
+    return sql, query_params, backwards
+
+
+def build_page(
+    rows: List[Dict[str, Any]],
+    keys: Sequence[SortKey],
+    limit: int,
+    backwards: Optional[bool],
+    total: Optional[int] = None,
+) -> KeysetPage:
+    """由多查一筆的結果組出單頁與前後游標"""
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(items=[], total=total)
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, backwards is not None
+
+    return KeysetPage(
+        items=rows,
+        next_cursor=encode_cursor(keys, rows[-1]) if has_next else None,
+        prev_cursor=encode_cursor(keys, rows[0], backwards=True) if has_prev else None,
+        total=total,
+    )
+
+
+# ===== 總數快取 =====
+
+
+async def cached_count(
+    namespace: str,
+    where_sql: str,
+    params: Sequence[Any],
+    loader: Callable[[], Awaitable[int]],
+    ttl: int = COUNT_CACHE_TTL,
+    tags: Optional[List[str]] = None,
+) -> int:
+    """依查詢條件快取 COUNT(*) 結果，翻頁時不再重新計數（數值可能落後 ttl 秒）"""
+    digest = hashlib.md5(
+        json.dumps([where_sql, [_encode_value(p) for p in params]], default=str).encode()
+    ).hexdigest()
+    try:
+        total = await cache_manager.get_or_load(
+            f"count:{namespace}:{digest}", loader, ttl, tags=tags
+        )
+        return int(total or 0)
+    except Exception as e:
+        logger.error(f"❌ 取得總數失敗 ({namespace}): {e}")
+        return 0
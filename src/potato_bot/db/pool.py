@@ -4,14 +4,125 @@
 
 import asyncio
 import logging
+import sys
+import time
+from collections import deque
 from contextlib import asynccontextmanager
-from typing import Any, Dict, Optional
+from typing import Any, Deque, Dict, List, Optional
 
 import aiomysql
 
+from potato_shared.config import (
+    DB_POOL_ACQUIRE_TIMEOUT,
+    DB_POOL_HARD_MAX,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+)
+
 # 設置日誌
 logger = logging.getLogger(__name__)
 
+# 取得連線等待時間直方圖的桶（毫秒，最後一桶為 +Inf）
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# 自動擴充：最近 GROW_WINDOW 次取得中有過半等待超過 GROW_WAIT_MS 視為持續壓力
+GROW_WAIT_MS = 50.0
+GROW_WINDOW = 20
+RESIZE_COOLDOWN = 5.0
+# 超過此秒數沒有等待壓力時逐步縮回原始上限
+SHRINK_IDLE_SECONDS = 300.0
+MAX_TRACKED_SITES = 500
+
+
+class PoolMetrics:
+    """連線池統計：等待時間直方圖、取得/逾時次數、各呼叫點使用量"""
+
+    def __init__(self):
+        self.wait_histogram: List[int] = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.recent_waits: Deque[float] = deque(maxlen=256)
+        self.counters: Dict[str, int] = {
+            "acquires": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "grows": 0,
+            "shrinks": 0,
+        }
+        self.max_wait_ms = 0.0
+        self.total_wait_ms = 0.0
+        self.sites: Dict[str, Dict[str, float]] = {}
+
+    def record_wait(self, wait_ms: float) -> None:
+        self.counters["acquires"] += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.recent_waits.append(wait_ms)
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                self.wait_histogram[i] += 1
+                return
+        self.wait_histogram[-1] += 1
+
+    def record_site(self, site: str, wait_ms: float, hold_ms: float, failed: bool) -> None:
+        stats = self.sites.get(site)
+        if stats is None:
+            if len(self.sites) >= MAX_TRACKED_SITES:
+                site = "other"
+                stats = self.sites.get(site)
+            if stats is None:
+                stats = self.sites[site] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "wait_ms": 0.0,
+                    "hold_ms": 0.0,
+                }
+        stats["calls"] += 1
+        stats["wait_ms"] += wait_ms
+        stats["hold_ms"] += hold_ms
+        if failed:
+            stats["errors"] += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent_waits:
+            return 0.0
+        ordered = sorted(self.recent_waits)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return round(ordered[index], 2)
+
+    def snapshot(self, top_sites: int = 10) -> Dict[str, Any]:
+        acquires = self.counters["acquires"]
+        histogram = {f"le_{bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_histogram)}
+        histogram["le_inf"] = self.wait_histogram[-1]
+        busiest = sorted(self.sites.items(), key=lambda item: item[1]["calls"], reverse=True)
+        return {
+            **self.counters,
+            "wait_ms": {
+                "avg": round(self.total_wait_ms / acquires, 2) if acquires else 0.0,
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "max": round(self.max_wait_ms, 2),
+            },
+            "wait_histogram": histogram,
+            "sites": {
+                site: {
+                    "calls": int(stats["calls"]),
+                    "errors": int(stats["errors"]),
+                    "avg_wait_ms": round(stats["wait_ms"] / stats["calls"], 2),
+                    "avg_hold_ms": round(stats["hold_ms"] / stats["calls"], 2),
+                }
+                for site, stats in busiest[:top_sites]
+            },
+        }
+
+
+def _call_site(frame) -> str:
+    """以呼叫端的類別（DAO）與函式名稱作為呼叫點標籤"""
+    if frame is None:
+        return "unknown"
+    owner = frame.f_locals.get("self")
+    if owner is not None:
+        return f"{type(owner).__name__}.{frame.f_code.co_name}"
+    module = frame.f_globals.get("__name__", "?").rsplit(".", 1)[-1]
+    return f"{module}.{frame.f_code.co_name}"
+
 
 class MariaDBPool:
     """
@@ -31,6 +142,21 @@ class MariaDBPool:
         self._closing = False
         self._tasks = set()  # 追蹤活躍的任務
 
+        # 併發上限（軟上限，可在 base_maxsize 與 hard_maxsize 之間自動調整）
+        self.acquire_timeout = DB_POOL_ACQUIRE_TIMEOUT
+        self.base_maxsize = DB_POOL_MAX_SIZE
+        self.hard_maxsize = max(DB_POOL_HARD_MAX, DB_POOL_MAX_SIZE)
+        self._limit = self.base_maxsize
+        self._in_use = 0
+        self._waiting = 0
+        # 連線池世代：重建連線池時遞增，借出的連線記錄所屬世代（以 id(conn) 為鍵）
+        self._generation = 0
+        self._borrowed: Dict[int, int] = {}
+        self._slot_cond = asyncio.Condition()
+        self._last_resize = 0.0
+        self._last_pressure = 0.0
+        self.metrics = PoolMetrics()
+
     async def initialize(
         self,
         host: str,
@@ -47,6 +173,11 @@ class MariaDBPool:
                 return
 
             try:
+                self.base_maxsize = kwargs.get("maxsize", self.base_maxsize)
+                self.hard_maxsize = max(kwargs.get("hard_maxsize", self.hard_maxsize), self.base_maxsize)
+                self.acquire_timeout = kwargs.get("acquire_timeout", self.acquire_timeout)
+                self._limit = self.base_maxsize
+
                 # 修復：添加更好的連接池參數
                 self._connection_params = {
                     "host": host,
@@ -56,8 +187,9 @@ class MariaDBPool:
                     "db": database,
                     "charset": kwargs.get("charset", "utf8mb4"),
                     "autocommit": kwargs.get("autocommit", True),
-                    "minsize": kwargs.get("minsize", 1),  # 修復：從5改為1
-                    "maxsize": kwargs.get("maxsize", 10),  # 修復：從20改為10
+                    "minsize": kwargs.get("minsize", DB_POOL_MIN_SIZE),
+                    # aiomysql 以硬上限建立，實際併發由 self._limit 控制
+                    "maxsize": self.hard_maxsize,
                     "pool_recycle": kwargs.get("pool_recycle", 3600),
                     "echo": kwargs.get("echo", False),
                     # 修復：添加超時設定
@@ -98,27 +230,67 @@ class MariaDBPool:
 
     async def acquire(self):
         """
-        取得一條資料庫連線（修復版）
+        取得一條資料庫連線
+        逾時直接失敗（不重建連線池），只有連線池本身已關閉時才重新建立
         """
+        conn, _ = await self._acquire()
+        return conn
+
+    async def _acquire(self):
         if not self._initialized or not self.pool:
             raise RuntimeError("資料庫連線池尚未初始化")
 
+        loop = asyncio.get_running_loop()
+        start = loop.time()
         try:
-            # 獲取連接，設置超時
-            conn = await asyncio.wait_for(self.pool.acquire(), timeout=10.0)
-            return conn
+            await asyncio.wait_for(self._reserve_slot(), timeout=self.acquire_timeout)
         except asyncio.TimeoutError:
-            logger.error("獲取資料庫連接超時")
+            self.metrics.counters["timeouts"] += 1
+            self._last_pressure = time.monotonic()
+            logger.error(
+                f"獲取資料庫連接超時（{self.acquire_timeout}s，使用中 {self._in_use}/{self._limit}，"
+                f"等待中 {self._waiting}）"
+            )
             raise RuntimeError("獲取資料庫連接超時")
-        except Exception as e:
-            logger.error(f"獲取資料庫連接失敗：{e}")
-            # 嘗試重新初始化連接池
-            await self._reconnect()
+
+        try:
+            remaining = max(0.1, self.acquire_timeout - (loop.time() - start))
+            conn = await asyncio.wait_for(self.pool.acquire(), timeout=remaining)
+        except asyncio.TimeoutError:
+            await self._release_slot()
+            self.metrics.counters["timeouts"] += 1
+            logger.error("獲取資料庫連接超時（建立新連線逾時）")
+            raise RuntimeError("獲取資料庫連接超時")
+        except BaseException as e:
+            await self._release_slot()
+            if isinstance(e, Exception):
+                self.metrics.counters["errors"] += 1
+                logger.error(f"獲取資料庫連接失敗：{e}")
+                if getattr(self.pool, "_closed", False):
+                    await self._reconnect()
             raise
 
+        self._borrowed[id(conn)] = self._generation
+        wait_ms = (loop.time() - start) * 1000
+        self.metrics.record_wait(wait_ms)
+        await self._maybe_resize(wait_ms)
+        return conn, wait_ms
+
     async def release(self, conn):
-        """釋放連線（修復版）"""
-        if self.pool and conn and not self._closing:
+        """
+        釋放連線（修復版）
+        連線池重建前借出的連線不歸還新連線池，也不佔用新世代的併發名額，直接關閉
+        """
+        if not conn:
+            return
+        generation = self._borrowed.pop(id(conn), self._generation)
+        if generation != self._generation:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+        if self.pool and not self._closing:
             try:
                 # 修復：正確的釋放方式
                 self.pool.release(conn)
@@ -130,24 +302,103 @@ class MariaDBPool:
                         conn.close()
                 except:
                     pass
+        await self._release_slot()
+
+    def connection(self, tag: Optional[str] = None):
+        """非同步上下文管理器；tag 未指定時以呼叫端 DAO 類別與方法名稱統計"""
+        if tag is None:
+            tag = _call_site(sys._getframe(1))
+        return self._connection(tag)
 
     @asynccontextmanager
-    async def connection(self):
-        """非同步上下文管理器（修復版）"""
+    async def _connection(self, tag: str):
         if self._closing:
             raise RuntimeError("連線池正在關閉中")
 
         conn = None
+        wait_ms = 0.0
+        acquired_at = 0.0
+        failed = False
         try:
-            conn = await self.acquire()
+            conn, wait_ms = await self._acquire()
+            acquired_at = time.perf_counter()
             yield conn
         except Exception as e:
+            failed = True
             logger.error(f"資料庫操作錯誤：{e}")
             raise
         finally:
             if conn:
+                hold_ms = (time.perf_counter() - acquired_at) * 1000
+                self.metrics.record_site(tag, wait_ms, hold_ms, failed)
                 await self.release(conn)
 
+    # ===== 併發上限與自動調整 =====
+
+    async def _reserve_slot(self):
+        async with self._slot_cond:
+            self._waiting += 1
+            try:
+                await self._slot_cond.wait_for(lambda: self._in_use < self._limit)
+            finally:
+                self._waiting -= 1
+            self._in_use += 1
+
+    async def _release_slot(self):
+        async with self._slot_cond:
+            self._in_use = max(0, self._in_use - 1)
+            self._slot_cond.notify()
+
+    async def _maybe_resize(self, wait_ms: float):
+        now = time.monotonic()
+        if wait_ms > GROW_WAIT_MS:
+            self._last_pressure = now
+        if now - self._last_resize < RESIZE_COOLDOWN:
+            return
+
+        recent = list(self.metrics.recent_waits)[-GROW_WINDOW:]
+        slow = sum(1 for value in recent if value > GROW_WAIT_MS)
+        if (
+            len(recent) >= GROW_WINDOW
+            and slow * 2 > len(recent)
+            and self._limit < self.hard_maxsize
+        ):
+            async with self._slot_cond:
+                self._limit += 1
+                self._slot_cond.notify()
+            self._last_resize = now
+            self.metrics.counters["grows"] += 1
+            logger.warning(
+                f"⚠️ 資料庫連線持續等待（p95 {self.metrics.percentile(95)}ms），"
+                f"併發上限擴充至 {self._limit}"
+            )
+        elif (
+            self._limit > self.base_maxsize
+            and now - self._last_pressure > SHRINK_IDLE_SECONDS
+            and self._in_use < self._limit - 1
+        ):
+            self._limit -= 1
+            self._last_resize = now
+            self.metrics.counters["shrinks"] += 1
+            logger.info(f"資料庫連線壓力解除，併發上限縮回 {self._limit}")
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """連線池即時數值（不查詢資料庫）"""
+        size = getattr(self.pool, "size", 0) if self.pool else 0
+        idle = getattr(self.pool, "freesize", 0) if self.pool else 0
+        return {
+            "size": size,
+            "used": self._in_use,
+            "in_use": self._in_use,
+            "idle": idle,
+            "free": idle,
+            "waiting": self._waiting,
+            "limit": self._limit,
+            "minsize": self._connection_params.get("minsize", 0),
+            "maxsize": self.base_maxsize,
+            "hard_maxsize": self.hard_maxsize,
+        }
+
     async def _reconnect(self):
         """重新連接資料庫"""
         async with self._lock:
@@ -166,6 +417,12 @@ class MariaDBPool:
                 self._initialized = False
                 raise
 
+            # 舊世代借出的連線釋放時直接關閉、不再扣減計數，因此可安全重置
+            async with self._slot_cond:
+                self._generation += 1
+                self._in_use = 0
+                self._slot_cond.notify_all()
+
     async def health_check(self) -> Dict[str, Any]:
         """健康檢查（修復版）"""
         try:
@@ -180,14 +437,7 @@ class MariaDBPool:
             # 測量延遲
             start_time = asyncio.get_event_loop().time()
 
-            # 修復：添加連線池狀態檢查
-            pool_info = {
-                "size": getattr(self.pool, "_size", getattr(self.pool, "size", 0)),
-                "used": getattr(self.pool, "_used_size", getattr(self.pool, "used_size", 0)),
-                "free": getattr(self.pool, "_free_size", getattr(self.pool, "free_size", 0)),
-                "minsize": getattr(self.pool, "_minsize", getattr(self.pool, "minsize", 0)),
-                "maxsize": getattr(self.pool, "_maxsize", getattr(self.pool, "maxsize", 0)),
-            }
+            pool_info = self.get_pool_stats()
 
             # 快速測試查詢
             async with self.connection() as conn:
@@ -200,7 +450,7 @@ class MariaDBPool:
             latency_ms = round((end_time - start_time) * 1000, 2)
 
             # 建構連線池狀態描述
-            pool_status = f"{pool_info['used']}/{pool_info['maxsize']} (已使用/最大)"
+            pool_status = f"{pool_info['in_use']}/{pool_info['limit']} (已使用/上限)"
 
             return {
                 "status": "healthy",
@@ -212,6 +462,7 @@ class MariaDBPool:
                     "connection_id": connection_id,
                 },
                 "pool": pool_info,
+                "metrics": self.metrics.snapshot(),
             }
 
         except Exception as e:
@@ -249,6 +500,9 @@ class MariaDBPool:
                 self.pool = None
                 self._initialized = False
                 self._closing = False
+                self._generation += 1
+                self._in_use = 0
+                self._limit = self.base_maxsize
 
 
 # ✅ 全域單例實體（專案統一使用這個變數）
@@ -0,0 +1,314 @@
+# bot/db/search_index.py
+"""
+記憶體全文索引
+以倒排索引取代 `LIKE '%kw%'` 全表掃描：英數字以單字為詞、中日韓文字以相鄰兩字（bigram）為詞，
+首次搜尋時由資料庫分批載入，之後由 DAO 的新增/刪除即時更新；
+查詢為 AND 語意（英數字詞支援前綴比對），以 BM25 排序回傳前 k 筆
+"""
+
+import asyncio
+import heapq
+import math
+import re
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from potato_shared.logger import logger
+
+# (after_id, limit) → [(doc_id, guild_id, text), ...]，依 doc_id 遞增
+SearchLoader = Callable[[int, int], Awaitable[Sequence[Tuple[int, int, str]]]]
+
+_TOKEN_RE = re.compile(
+    r"[0-9a-z]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+"
+)
+_GUILD_PREFIX = "\x00g:"  # 伺服器以特殊詞存入倒排索引，篩選時與關鍵字一起取交集
+
+LOAD_BATCH_SIZE = 5000
+PREFIX_EXPANSION_LIMIT = 50  # 單一前綴最多展開的詞數
+PREFIX_WEIGHT = 0.6  # 前綴比對的權重（完整單字為 1）
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """切詞：英數字取整個單字，中日韓文字取 bigram（單一字保留為單字詞）"""
+    tokens: List[str] = []
+    if not text:
+        return tokens
+    for run in _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).lower()):
+        if run[0].isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class SearchIndex:
+    """倒排索引（每個詞對應依 doc_id 排序的陣列）"""
+
+    def __init__(self, name: str, loader: Optional[SearchLoader] = None):
+        self.name = name
+        self.loader = loader
+
+        self._postings: Dict[str, array] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._vocab: List[str] = []  # 可前綴展開的詞（排序後供二分搜尋）
+        self._vocab_sorted = False
+        self._stale = 0  # 已刪除但仍留在倒排陣列中的文件數
+
+        self._loaded = False
+        self._load_task: Optional[asyncio.Task] = None
+        # 載入期間被刪除的文件，避免載入批次把它加回來
+        self._removed_while_loading: Set[int] = set()
+
+        self._stats: Dict[str, Any] = {
+            "searches": 0,
+            "fallbacks": 0,
+            "adds": 0,
+            "removes": 0,
+            "load_seconds": 0.0,
+        }
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    # ===== 載入 =====
+
+    async def ensure_loaded(self) -> bool:
+        """首次使用時載入索引（同時只會有一個載入任務），回傳是否可用"""
+        if self._loaded:
+            return True
+        if not self.loader:
+            return False
+
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.create_task(self._load(), name=f"search-index-{self.name}")
+        try:
+            return await asyncio.shield(self._load_task)
+        except Exception:
+            return False
+
+    async def _load(self) -> bool:
+        started = time.perf_counter()
+        after_id = 0
+        try:
+            while True:
+                rows = await self.loader(after_id, LOAD_BATCH_SIZE)
+                for doc_id, guild_id, text in rows:
+                    if doc_id not in self._removed_while_loading:
+                        self.add(doc_id, guild_id, text)
+                if len(rows) < LOAD_BATCH_SIZE:
+                    break
+                after_id = rows[-1][0]
+                # 讓出事件迴圈，避免大量資料時卡住其他任務
+                await asyncio.sleep(0)
+        except Exception as e:
+            logger.error(f"❌ 載入{self.name}搜尋索引失敗: {e}")
+            raise
+        finally:
+            self._removed_while_loading.clear()
+
+        self._loaded = True
+        self._stats["load_seconds"] = round(time.perf_counter() - started, 2)
+        logger.info(
+            f"✅ {self.name}搜尋索引載入完成: {len(self._lengths)} 筆 / "
+            f"{len(self._postings)} 詞 ({self._stats['load_seconds']}s)"
+        )
+        return True
+
+    # ===== 更新 =====
+
+    def add(self, doc_id: int, guild_id: Optional[int], text: str) -> None:
+        """加入文件（已存在時略過；只適合索引建立後不會再修改的欄位）"""
+        doc_id = int(doc_id)
+        if doc_id in self._lengths:
+            return
+        tokens = tokenize(text)
+        self._lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+
+        terms = set(tokens)
+        if guild_id:
+            terms.add(f"{_GUILD_PREFIX}{int(guild_id)}")
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                self._postings[term] = array("q", (doc_id,))
+                if self._vocab_sorted and self._is_prefix_term(term):
+                    insort(self._vocab, term)
+            elif postings[-1] < doc_id:
+                postings.append(doc_id)
+            else:
+                i = bisect_left(postings, doc_id)
+                if i == len(postings) or postings[i] != doc_id:
+                    postings.insert(i, doc_id)
+        self._stats["adds"] += 1
+
+    def remove(self, doc_id: int) -> None:
+        """
+        移除文件：只標記刪除，倒排陣列中的 id 於查詢時略過，
+        累積過多時再一次性壓縮
+        """
+        doc_id = int(doc_id)
+        if self._load_task is not None and not self._load_task.done():
+            self._removed_while_loading.add(doc_id)
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        self._stale += 1
+        self._stats["removes"] += 1
+        if self._stale > max(1000, len(self._lengths) // 5):
+            self._compact()
+
+    # ===== 查詢 =====
+
+    async def search(
+        self, query: str, guild_id: Optional[int] = None, limit: int = 20
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        搜尋並依分數排序回傳 [(doc_id, score), ...]
+        回傳 None 表示索引無法處理此查詢（未載入、或只有單一中文字），呼叫端應退回 LIKE 查詢
+        """
+        if not await self.ensure_loaded():
+            self._stats["fallbacks"] += 1
+            return None
+        return self.search_loaded(query, guild_id, limit)
+
+    def search_loaded(
+        self, query: str, guild_id: Optional[int] = None, limit: int = 20
+    ) -> Optional[List[Tuple[int, float]]]:
+        """同 search，但不觸發載入（供已確認載入後的同步路徑使用）"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or any(not t.isascii() and len(t) == 1 for t in terms):
+            self._stats["fallbacks"] += 1
+            return None
+        self._stats["searches"] += 1
+
+        doc_count = max(1, len(self._lengths))
+        # 每個查詢詞展開為 [(postings, 權重 × idf), ...]，詞內為 OR、詞間為 AND
+        groups: List[List[Tuple[array, float]]] = []
+        for term in terms:
+            variants = self._expand(term)
+            if not variants:
+                return []
+            group = []
+            for variant, weight in variants:
+                postings = self._postings[variant]
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                group.append((postings, weight * idf))
+            groups.append(group)
+
+        if guild_id:
+            guild_postings = self._postings.get(f"{_GUILD_PREFIX}{int(guild_id)}")
+            if guild_postings is None:
+                return []
+            groups.append([(guild_postings, 0.0)])
+
+        groups.sort(key=lambda g: sum(len(p) for p, _ in g))
+        # 由最小的詞組開始取交集；單一變體的詞組權重對所有文件相同，只需累加常數
+        base = 0.0
+        extra: Dict[int, float] = {}
+        candidates: Optional[List[int]] = None
+        for group in groups:
+            if len(group) == 1:
+                postings, weight = group[0]
+                candidates = list(postings) if candidates is None else self._members(postings, candidates)
+                base += weight
+            else:
+                best: Dict[int, float] = {}
+                # 權重高的變體優先，同一文件只取最高權重
+                for postings, weight in sorted(group, key=lambda item: -item[1]):
+                    if candidates is None:
+                        members: Iterable[int] = postings
+                    else:
+                        members = self._members(postings, [d for d in candidates if d not in best])
+                    for doc_id in members:
+                        best.setdefault(doc_id, weight)
+                candidates = list(best)
+                for doc_id, weight in best.items():
+                    extra[doc_id] = extra.get(doc_id, 0.0) + weight
+            if not candidates:
+                return []
+
+        lengths = self._lengths
+        avg_length = self._total_length / doc_count or 1.0
+        ranked = (
+            (
+                (base + extra.get(doc_id, 0.0)) * (BM25_K1 + 1)
+                / (1 + BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / avg_length)),
+                doc_id,
+            )
+            for doc_id in candidates
+            if doc_id in lengths
+        )
+        # 分數相同時較新的文件（id 較大）優先
+        top = heapq.nlargest(max(1, limit), ranked)
+        return [(doc_id, round(score, 4)) for score, doc_id in top]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "loaded": self._loaded,
+            "documents": len(self._lengths),
+            "terms": len(self._postings),
+            "stale": self._stale,
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """英數字詞展開為以其為前綴的詞（完整相符權重最高），中文 bigram 只做完整比對"""
+        variants: List[Tuple[str, float]] = []
+        if term in self._postings:
+            variants.append((term, 1.0))
+        if not term.isascii():
+            return variants
+
+        vocab = self._sorted_vocab()
+        i = bisect_left(vocab, term)
+        while i < len(vocab) and vocab[i].startswith(term) and len(variants) < PREFIX_EXPANSION_LIMIT:
+            if vocab[i] != term:
+                variants.append((vocab[i], PREFIX_WEIGHT))
+            i += 1
+        return variants
+
+    @staticmethod
+    def _members(postings: array, doc_ids: List[int]) -> List[int]:
+        """doc_ids 中出現在 postings 的項目：候選少時二分搜尋，否則轉為集合取交集"""
+        if len(postings) <= 8 * len(doc_ids):
+            return list(set(postings).intersection(doc_ids))
+        found = []
+        for doc_id in doc_ids:
+            i = bisect_left(postings, doc_id)
+            if i < len(postings) and postings[i] == doc_id:
+                found.append(doc_id)
+        return found
+
+    def _sorted_vocab(self) -> List[str]:
+        if not self._vocab_sorted:
+            self._vocab = sorted(t for t in self._postings if self._is_prefix_term(t))
+            self._vocab_sorted = True
+        return self._vocab
+
+    def _compact(self) -> None:
+        """移除倒排陣列中已刪除的文件"""
+        lengths = self._lengths
+        for term in list(self._postings):
+            kept = array("q", (doc_id for doc_id in self._postings[term] if doc_id in lengths))
+            if kept:
+                self._postings[term] = kept
+            else:
+                del self._postings[term]
+        self._stale = 0
+        self._vocab_sorted = False
+
+    @staticmethod
+    def _is_prefix_term(term: str) -> bool:
+        return term.isascii() and not term.startswith(_GUILD_PREFIX)
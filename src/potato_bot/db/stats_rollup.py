@@ -0,0 +1,561 @@
+# bot/db/stats_rollup.py
+"""
+每日統計彙總
+各系統的儀表板統計改讀彙總表：guild_stats_daily（伺服器 × 日期 × 指標）與
+guild_stats_daily_users（伺服器 × 指標 × 日期 × 用戶，供不重複人數與排行榜），
+查詢只掃描指定天數內的彙總列，與歷史資料量無關。
+DAO 寫入後以 mark() 標記受影響的資料列，背景任務定期只重新計算被標記的 (伺服器, 日期)；
+重新計算為覆寫而非累加，重複標記或重試都不會重複計數。
+首次啟動的回填在背景逐伺服器進行；回填期間讀取尚未回填的伺服器時只先重建該伺服器，
+不等待整個回填完成
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from potato_bot.db.pool import db_pool
+from potato_shared.config import STATS_ROLLUP_INTERVAL
+from potato_shared.logger import logger
+
+# {day: {metric: value}}
+MetricRows = Dict[date, Dict[str, int]]
+# {(day, metric): {user_id: value}}
+UserRows = Dict[Tuple[date, str], Dict[int, int]]
+# (cursor, where_sql, params) → 單一伺服器（及日期範圍）的彙總結果
+DomainCompute = Callable[[Any, str, List[Any]], Awaitable[Tuple[MetricRows, UserRows]]]
+
+RESOLVE_CHUNK = 500
+INSERT_CHUNK = 1000
+BACKFILL_GUILD_ID = 0  # 記錄已完成回填的系統（真實伺服器 id 不會是 0）
+
+
+@dataclass(frozen=True)
+class _Domain:
+    table: str
+    alias: str
+    guild_column: str
+    time_column: str
+    compute: DomainCompute
+
+
+class StatsRollup:
+    """每日統計彙總（標記變動 → 重新計算變動日期 → 讀取視窗內彙總）"""
+
+    def __init__(self, interval: float = STATS_ROLLUP_INTERVAL):
+        self.db = db_pool
+        self.interval = max(1.0, float(interval))
+
+        self._domains: Dict[str, _Domain] = {}
+        self._dirty_rows: Dict[str, Set[int]] = {}
+        self._dirty_buckets: Set[Tuple[str, int, date]] = set()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._backfill_task: Optional[asyncio.Task] = None
+        # 回填中的系統與其中已完成的伺服器
+        self._backfilling: Set[str] = set()
+        self._backfilled: Set[Tuple[str, int]] = set()
+
+        self._stats: Dict[str, Any] = {
+            "marked_rows": 0,
+            "recomputed_buckets": 0,
+            "backfilled_guilds": 0,
+            "failures": 0,
+            "last_compact_ms": 0.0,
+        }
+
+    # ===== 註冊 =====
+
+    def register(
+        self,
+        domain: str,
+        table: str,
+        alias: str,
+        guild_column: str,
+        time_column: str,
+        compute: DomainCompute,
+    ) -> None:
+        """註冊系統：資料列依 DATE(time_column) 歸入每日彙總，指標名稱以「domain.」為前綴"""
+        self._domains[domain] = _Domain(table, alias, guild_column, time_column, compute)
+
+    # ===== 標記變動 =====
+
+    def mark(self, domain: str, row_id: Optional[int]) -> None:
+        """標記來源資料列已變動（例如新增投票回應時標記該投票）"""
+        if row_id:
+            self._dirty_rows.setdefault(domain, set()).add(int(row_id))
+            self._stats["marked_rows"] += 1
+
+    def mark_many(self, domain: str, row_ids: Iterable[int]) -> None:
+        for row_id in row_ids:
+            self.mark(domain, row_id)
+
+    # ===== 生命週期 =====
+
+    async def start(self) -> None:
+        """啟動背景重新計算；尚未回填的系統在背景由原始資料表回填"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="stats-rollup")
+        if self._backfill_task is None or self._backfill_task.done():
+            self._backfill_task = asyncio.create_task(self._backfill_missing(), name="stats-rollup-backfill")
+
+    async def close(self) -> None:
+        for task in (self._task, self._backfill_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._backfill_task = None
+        try:
+            await self.compact()
+        except Exception as e:
+            logger.error(f"❌ 關閉前重新計算統計彙總失敗: {e}")
+
+    # ===== 重新計算 =====
+
+    async def compact(self, guild_id: Optional[int] = None) -> int:
+        """重新計算被標記的 (伺服器, 日期)；指定 guild_id 時只處理該伺服器，回傳處理的日期數"""
+        async with self._lock:
+            started = time.perf_counter()
+            try:
+                await self._resolve_dirty_rows()
+            except Exception as e:
+                self._stats["failures"] += 1
+                logger.error(f"❌ {e}")
+
+            buckets = [b for b in self._dirty_buckets if guild_id is None or b[1] == guild_id]
+            done = 0
+            for bucket in sorted(buckets, key=lambda b: (b[0], b[1], b[2])):
+                domain, bucket_guild, day = bucket
+                try:
+                    await self._recompute(domain, bucket_guild, day)
+                except Exception as e:
+                    self._stats["failures"] += 1
+                    logger.error(f"❌ 重新計算統計彙總失敗 ({domain}, {bucket_guild}, {day}): {e}")
+                    continue
+                self._dirty_buckets.discard(bucket)
+                done += 1
+
+            self._stats["recomputed_buckets"] += done
+            self._stats["last_compact_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return done
+
+    async def backfill(self, domain: str) -> int:
+        """由原始資料表重建某系統所有伺服器的彙總（逐伺服器處理），回傳伺服器數"""
+        spec = self._domains[domain]
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    f"SELECT DISTINCT {spec.guild_column} FROM {spec.table} "
+                    f"WHERE {spec.guild_column} IS NOT NULL"
+                )
+                guild_ids = [row[0] for row in await cursor.fetchall()]
+
+        for guild_id in guild_ids:
+            await self._backfill_guild(domain, int(guild_id))
+
+        await self._write_backfill_marker(domain)
+        self._backfilling.discard(domain)
+        self._backfilled = {item for item in self._backfilled if item[0] != domain}
+        logger.info(f"✅ {domain} 統計彙總回填完成: {len(guild_ids)} 個伺服器")
+        return len(guild_ids)
+
+    # ===== 查詢 =====
+
+    async def daily(self, guild_id: int, domain: str, days: int) -> MetricRows:
+        """最近 days 天（含今天）的每日指標"""
+        await self._prepare_read(guild_id, domain)
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    SELECT stat_date, metric, value FROM guild_stats_daily
+                    WHERE guild_id = %s AND metric LIKE %s
+                    AND stat_date > DATE_SUB(CURDATE(), INTERVAL %s DAY)
+                """,
+                    (guild_id, f"{domain}.%", days),
+                )
+                rows = await cursor.fetchall()
+
+        result: MetricRows = {}
+        prefix = len(domain) + 1
+        for stat_date, metric, value in rows:
+            result.setdefault(stat_date, {})[metric[prefix:]] = int(value or 0)
+        return result
+
+    async def totals(self, guild_id: int, domain: str, days: int) -> Dict[str, int]:
+        """最近 days 天的指標合計"""
+        return self.sum_days(await self.daily(guild_id, domain, days))
+
+    @staticmethod
+    def sum_days(daily: MetricRows, days: Optional[int] = None) -> Dict[str, int]:
+        """合計每日指標；指定 days 時只取最近 days 天（含今天）"""
+        cutoff = date.today() - timedelta(days=days) if days is not None else None
+        totals: Dict[str, int] = {}
+        for stat_date, metrics in daily.items():
+            if cutoff is not None and stat_date <= cutoff:
+                continue
+            for metric, value in metrics.items():
+                totals[metric] = totals.get(metric, 0) + value
+        return totals
+
+    async def count_users(self, guild_id: int, metric: str, days: int) -> int:
+        """最近 days 天內的不重複用戶數"""
+        await self._prepare_read(guild_id, metric.split(".", 1)[0])
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    SELECT COUNT(DISTINCT user_id) FROM guild_stats_daily_users
+                    WHERE guild_id = %s AND metric = %s
+                    AND stat_date > DATE_SUB(CURDATE(), INTERVAL %s DAY)
+                """,
+                    (guild_id, metric, days),
+                )
+                row = await cursor.fetchone()
+                return int(row[0] or 0) if row else 0
+
+    async def top_users(
+        self, guild_id: int, metric: str, days: int, limit: int = 10
+    ) -> List[Tuple[int, int]]:
+        """最近 days 天內依數值排序的用戶 [(user_id, value), ...]"""
+        await self._prepare_read(guild_id, metric.split(".", 1)[0])
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    SELECT user_id, SUM(value) AS total FROM guild_stats_daily_users
+                    WHERE guild_id = %s AND metric = %s
+                    AND stat_date > DATE_SUB(CURDATE(), INTERVAL %s DAY)
+                    GROUP BY user_id
+                    ORDER BY total DESC, user_id
+                    LIMIT %s
+                """,
+                    (guild_id, metric, days, limit),
+                )
+                return [(int(row[0]), int(row[1] or 0)) for row in await cursor.fetchall()]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "domains": list(self._domains),
+            "dirty_rows": sum(len(ids) for ids in self._dirty_rows.values()),
+            "dirty_buckets": len(self._dirty_buckets),
+            "backfilling": sorted(self._backfilling),
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    async def _prepare_read(self, guild_id: int, domain: str) -> None:
+        """
+        讀取前先處理該伺服器的變動，讓儀表板看到最新資料；
+        系統仍在回填且該伺服器尚未回填時，只先重建這一個伺服器
+        """
+        if domain in self._backfilling and (domain, guild_id) not in self._backfilled:
+            try:
+                await self._backfill_guild(domain, guild_id)
+            except Exception as e:
+                self._stats["failures"] += 1
+                logger.error(f"❌ {domain} 伺服器 {guild_id} 統計彙總回填失敗: {e}")
+        await self.compact(guild_id)
+
+    async def _backfill_guild(self, domain: str, guild_id: int) -> None:
+        async with self._lock:
+            if (domain, guild_id) in self._backfilled:
+                return
+            await self._recompute(domain, guild_id, None)
+            self._backfilled.add((domain, guild_id))
+        self._stats["backfilled_guilds"] += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                await self.compact()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 統計彙總迴圈錯誤: {e}")
+
+    async def _backfill_missing(self) -> None:
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        "SELECT metric FROM guild_stats_daily WHERE guild_id = %s",
+                        (BACKFILL_GUILD_ID,),
+                    )
+                    done = {row[0] for row in await cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"❌ 讀取統計彙總回填狀態失敗: {e}")
+            return
+
+        self._backfilling = {d for d in self._domains if f"{d}._backfill" not in done}
+        for domain in list(self._domains):
+            if domain not in self._backfilling:
+                continue
+            try:
+                await self.backfill(domain)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["failures"] += 1
+                logger.error(f"❌ {domain} 統計彙總回填失敗: {e}")
+
+    async def _write_backfill_marker(self, domain: str) -> None:
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    INSERT INTO guild_stats_daily (guild_id, stat_date, metric, value)
+                    VALUES (%s, CURDATE(), %s, 1)
+                    ON DUPLICATE KEY UPDATE value = 1
+                """,
+                    (BACKFILL_GUILD_ID, f"{domain}._backfill"),
+                )
+                await conn.commit()
+
+    async def _resolve_dirty_rows(self) -> None:
+        """將標記的資料列換算為 (系統, 伺服器, 日期)"""
+        dirty, self._dirty_rows = self._dirty_rows, {}
+        for domain, row_ids in dirty.items():
+            spec = self._domains.get(domain)
+            if spec is None or not row_ids:
+                continue
+            ids = list(row_ids)
+            try:
+                async with self.db.connection() as conn:
+                    async with conn.cursor() as cursor:
+                        for i in range(0, len(ids), RESOLVE_CHUNK):
+                            chunk = ids[i : i + RESOLVE_CHUNK]
+                            placeholders = ", ".join(["%s"] * len(chunk))
+                            await cursor.execute(
+                                f"""
+                                SELECT DISTINCT {spec.guild_column}, DATE({spec.time_column})
+                                FROM {spec.table} WHERE id IN ({placeholders})
+                            """,
+                                chunk,
+                            )
+                            for guild_id, day in await cursor.fetchall():
+                                if guild_id and day:
+                                    self._dirty_buckets.add((domain, int(guild_id), day))
+            except Exception as e:
+                # 保留標記，下次再換算
+                self._dirty_rows.setdefault(domain, set()).update(row_ids)
+                raise RuntimeError(f"換算 {domain} 變動資料列失敗: {e}") from e
+
+    async def _recompute(self, domain: str, guild_id: int, day: Optional[date]) -> None:
+        """重新計算單一伺服器某一天（day 為 None 時為全部日期）的彙總並覆寫"""
+        spec = self._domains[domain]
+        where = f"{spec.alias}.{spec.guild_column} = %s"
+        params: List[Any] = [guild_id]
+        day_filter = ""
+        day_params: List[Any] = []
+        if day is not None:
+            start = datetime.combine(day, datetime.min.time())
+            where += (
+                f" AND {spec.alias}.{spec.time_column} >= %s"
+                f" AND {spec.alias}.{spec.time_column} < %s"
+            )
+            params.extend([start, start + timedelta(days=1)])
+            day_filter = " AND stat_date = %s"
+            day_params = [day]
+
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                metrics, users = await spec.compute(cursor, where, params)
+                try:
+                    await cursor.execute(
+                        f"DELETE FROM guild_stats_daily WHERE guild_id = %s AND metric LIKE %s{day_filter}",
+                        [guild_id, f"{domain}.%", *day_params],
+                    )
+                    await cursor.execute(
+                        f"DELETE FROM guild_stats_daily_users WHERE guild_id = %s AND metric LIKE %s{day_filter}",
+                        [guild_id, f"{domain}.%", *day_params],
+                    )
+
+                    metric_rows = [
+                        (guild_id, stat_date, f"{domain}.{metric}", value)
+                        for stat_date, values in metrics.items()
+                        for metric, value in values.items()
+                        if value
+                    ]
+                    await self._insert_rows(
+                        cursor,
+                        "guild_stats_daily (guild_id, stat_date, metric, value)",
+                        metric_rows,
+                    )
+
+                    user_rows = [
+                        (guild_id, f"{domain}.{metric}", stat_date, user_id, value)
+                        for (stat_date, metric), values in users.items()
+                        for user_id, value in values.items()
+                    ]
+                    await self._insert_rows(
+                        cursor,
+                        "guild_stats_daily_users (guild_id, metric, stat_date, user_id, value)",
+                        user_rows,
+                    )
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+
+    @staticmethod
+    async def _insert_rows(cursor, target: str, rows: List[Tuple[Any, ...]]) -> None:
+        if not rows:
+            return
+        width = len(rows[0])
+        row_sql = "(" + ", ".join(["%s"] * width) + ")"
+        for i in range(0, len(rows), INSERT_CHUNK):
+            chunk = rows[i : i + INSERT_CHUNK]
+            await cursor.execute(
+                f"INSERT INTO {target} VALUES {', '.join([row_sql] * len(chunk))}",
+                [value for row in chunk for value in row],
+            )
+
+
+# ===== 各系統的彙總計算 =====
+
+
+def _add_user(users: UserRows, day: date, metric: str, user_id: int, value: int) -> None:
+    users.setdefault((day, metric), {})[int(user_id)] = int(value)
+
+
+async def _compute_votes(cursor, where: str, params: List[Any]) -> Tuple[MetricRows, UserRows]:
+    """投票依開始日期歸類：建立數 / 回應數，建立者與參與者"""
+    metrics: MetricRows = {}
+    users: UserRows = {}
+
+    await cursor.execute(
+        f"""
+        SELECT DATE(v.start_time) AS d, v.creator_id, COUNT(*)
+        FROM votes v WHERE {where}
+        GROUP BY d, v.creator_id
+    """,
+        params,
+    )
+    for day, creator_id, count in await cursor.fetchall():
+        day_metrics = metrics.setdefault(day, {})
+        day_metrics["created"] = day_metrics.get("created", 0) + int(count)
+        _add_user(users, day, "creator", creator_id, count)
+
+    await cursor.execute(
+        f"""
+        SELECT DATE(v.start_time) AS d, vr.user_id, COUNT(*)
+        FROM vote_responses vr
+        JOIN votes v ON vr.vote_id = v.id
+        WHERE {where}
+        GROUP BY d, vr.user_id
+    """,
+        params,
+    )
+    for day, user_id, count in await cursor.fetchall():
+        day_metrics = metrics.setdefault(day, {})
+        day_metrics["responses"] = day_metrics.get("responses", 0) + int(count)
+        _add_user(users, day, "participant", user_id, count)
+
+    return metrics, users
+
+
+async def _compute_lotteries(cursor, where: str, params: List[Any]) -> Tuple[MetricRows, UserRows]:
+    """抽獎依建立日期歸類：各狀態數量 / 中獎名額 / 參與與中獎次數，參與者與中獎者"""
+    metrics: MetricRows = {}
+    users: UserRows = {}
+
+    await cursor.execute(
+        f"""
+        SELECT DATE(l.created_at) AS d, l.status, COUNT(*), SUM(l.winner_count)
+        FROM lotteries l WHERE {where}
+        GROUP BY d, l.status
+    """,
+        params,
+    )
+    for day, status, count, winner_slots in await cursor.fetchall():
+        day_metrics = metrics.setdefault(day, {})
+        day_metrics["created"] = day_metrics.get("created", 0) + int(count)
+        day_metrics[f"status_{status}"] = int(count)
+        day_metrics["winner_slots"] = day_metrics.get("winner_slots", 0) + int(winner_slots or 0)
+
+    await cursor.execute(
+        f"""
+        SELECT DATE(l.created_at) AS d, COUNT(DISTINCT lp.lottery_id)
+        FROM lottery_entries lp
+        JOIN lotteries l ON lp.lottery_id = l.id
+        WHERE {where}
+        GROUP BY d
+    """,
+        params,
+    )
+    for day, count in await cursor.fetchall():
+        metrics.setdefault(day, {})["with_entries"] = int(count)
+
+    await cursor.execute(
+        f"""
+        SELECT DATE(l.created_at) AS d, lp.user_id, COUNT(*)
+        FROM lottery_entries lp
+        JOIN lotteries l ON lp.lottery_id = l.id
+        WHERE {where}
+        GROUP BY d, lp.user_id
+    """,
+        params,
+    )
+    for day, user_id, count in await cursor.fetchall():
+        day_metrics = metrics.setdefault(day, {})
+        day_metrics["entries"] = day_metrics.get("entries", 0) + int(count)
+        _add_user(users, day, "participant", user_id, count)
+
+    await cursor.execute(
+        f"""
+        SELECT DATE(l.created_at) AS d, lw.user_id, COUNT(*)
+        FROM lottery_winners lw
+        JOIN lotteries l ON lw.lottery_id = l.id
+        WHERE {where}
+        GROUP BY d, lw.user_id
+    """,
+        params,
+    )
+    for day, user_id, count in await cursor.fetchall():
+        day_metrics = metrics.setdefault(day, {})
+        day_metrics["wins"] = day_metrics.get("wins", 0) + int(count)
+        _add_user(users, day, "winner", user_id, count)
+
+    return metrics, users
+
+
+async def _compute_welcome(cursor, where: str, params: List[Any]) -> Tuple[MetricRows, UserRows]:
+    """歡迎事件依發生日期歸類"""
+    metrics: MetricRows = {}
+    await cursor.execute(
+        f"""
+        SELECT
+            DATE(w.created_at) AS d,
+            COUNT(*),
+            SUM(CASE WHEN w.event_type = 'member_join' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN w.event_type = 'member_leave' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN w.welcome_sent = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN w.dm_sent = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN w.roles_assigned IS NOT NULL AND w.roles_assigned != '[]' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN w.error_message IS NOT NULL THEN 1 ELSE 0 END)
+        FROM welcome_logs w WHERE {where}
+        GROUP BY d
+    """,
+        params,
+    )
+    names = ("total_events", "joins", "leaves", "welcome_sent", "dm_sent", "roles_assigned", "errors")
+    for row in await cursor.fetchall():
+        metrics[row[0]] = {name: int(value or 0) for name, value in zip(names, row[1:])}
+    return metrics, {}
+
+
+# 全域實例
+stats_rollup = StatsRollup()
+stats_rollup.register("vote", "votes", "v", "guild_id", "start_time", _compute_votes)
+stats_rollup.register("lottery", "lotteries", "l", "guild_id", "created_at", _compute_lotteries)
+stats_rollup.register("welcome", "welcome_logs", "w", "guild_id", "created_at", _compute_welcome)
@@ -0,0 +1,182 @@
+# bot/db/ticket_channel_index.py
+"""
+票券頻道索引
+記憶體中維護 channel_id → 開啟中票券 的對照，
+啟動時由 tickets WHERE status='open' 載入，之後由 TicketDAO 的建立/關閉/刪除即時更新；
+一般訊息只需查字典即可判斷是否為票券頻道，不再查詢資料庫
+"""
+
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, Optional
+
+from potato_shared.logger import logger
+
+
+@dataclass(frozen=True)
+class TicketChannelEntry:
+    """開啟中票券的最小資訊"""
+
+    ticket_id: int
+    channel_id: int
+    guild_id: int
+    discord_id: str
+    type: str
+    priority: str = "medium"
+    status: str = "open"
+
+    def to_ticket_info(self) -> Dict[str, Any]:
+        """轉為與 get_ticket_by_channel 相容的欄位"""
+        return {
+            "id": self.ticket_id,
+            "ticket_id": self.ticket_id,
+            "channel_id": self.channel_id,
+            "guild_id": self.guild_id,
+            "discord_id": self.discord_id,
+            "type": self.type,
+            "priority": self.priority,
+            "status": self.status,
+        }
+
+
+class TicketChannelIndex:
+    """票券頻道索引"""
+
+    def __init__(self):
+        self._by_channel: Dict[int, TicketChannelEntry] = {}
+        self._channel_by_ticket: Dict[int, int] = {}
+        self._loaded = False
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "adds": 0, "removes": 0}
+
+    @property
+    def loaded(self) -> bool:
+        """索引是否已完成載入（未載入前呼叫端應退回資料庫查詢）"""
+        return self._loaded
+
+    # ===== 載入 =====
+
+    async def load(self) -> int:
+        """由資料庫載入所有開啟中票券，回傳筆數"""
+        from .ticket_dao import TicketDAO
+
+        try:
+            rows = await TicketDAO().get_open_ticket_channels()
+        except Exception as e:
+            logger.error(f"❌ 載入票券頻道索引失敗: {e}")
+            return 0
+
+        self.replace_all(rows)
+        logger.info(f"✅ 票券頻道索引載入完成: {len(self._by_channel)} 張開啟中票券")
+        return len(self._by_channel)
+
+    def replace_all(self, rows: Iterable[Dict[str, Any]]) -> None:
+        by_channel: Dict[int, TicketChannelEntry] = {}
+        channel_by_ticket: Dict[int, int] = {}
+        for row in rows:
+            entry = self._entry_from_row(row)
+            if entry is None:
+                continue
+            by_channel[entry.channel_id] = entry
+            channel_by_ticket[entry.ticket_id] = entry.channel_id
+        self._by_channel = by_channel
+        self._channel_by_ticket = channel_by_ticket
+        self._loaded = True
+
+    # ===== 查詢 =====
+
+    def get(self, channel_id: int) -> Optional[TicketChannelEntry]:
+        entry = self._by_channel.get(channel_id)
+        if entry is None:
+            self._stats["misses"] += 1
+        else:
+            self._stats["hits"] += 1
+        return entry
+
+    def get_by_ticket(self, ticket_id: int) -> Optional[TicketChannelEntry]:
+        channel_id = self._channel_by_ticket.get(ticket_id)
+        if channel_id is None:
+            return None
+        return self._by_channel.get(channel_id)
+
+    # ===== 更新 =====
+
+    def add(
+        self,
+        ticket_id: int,
+        channel_id: int,
+        guild_id: int,
+        discord_id: str,
+        ticket_type: str,
+        priority: str = "medium",
+    ) -> None:
+        entry = TicketChannelEntry(
+            ticket_id=int(ticket_id),
+            channel_id=int(channel_id),
+            guild_id=int(guild_id),
+            discord_id=str(discord_id),
+            type=ticket_type,
+            priority=priority or "medium",
+        )
+        self._by_channel[entry.channel_id] = entry
+        self._channel_by_ticket[entry.ticket_id] = entry.channel_id
+        self._stats["adds"] += 1
+
+    def add_row(self, row: Dict[str, Any]) -> None:
+        """以票券資料列加入（狀態非 open 時改為移除）"""
+        entry = self._entry_from_row(row)
+        if entry is None:
+            ticket_id = row.get("id") or row.get("ticket_id")
+            if ticket_id:
+                self.remove_ticket(int(ticket_id))
+            return
+        self._by_channel[entry.channel_id] = entry
+        self._channel_by_ticket[entry.ticket_id] = entry.channel_id
+        self._stats["adds"] += 1
+
+    def remove_ticket(self, ticket_id: int) -> Optional[TicketChannelEntry]:
+        channel_id = self._channel_by_ticket.pop(ticket_id, None)
+        if channel_id is None:
+            return None
+        self._stats["removes"] += 1
+        return self._by_channel.pop(channel_id, None)
+
+    def remove_channel(self, channel_id: int) -> Optional[TicketChannelEntry]:
+        entry = self._by_channel.pop(channel_id, None)
+        if entry is not None:
+            self._channel_by_ticket.pop(entry.ticket_id, None)
+            self._stats["removes"] += 1
+        return entry
+
+    def update_priority(self, ticket_id: int, priority: str) -> None:
+        entry = self.get_by_ticket(ticket_id)
+        if entry is not None:
+            self._by_channel[entry.channel_id] = replace(entry, priority=priority)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "loaded": self._loaded,
+            "open_tickets": len(self._by_channel),
+            "hit_rate": round(self._stats["hits"] / lookups * 100, 2) if lookups else 0.0,
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    @staticmethod
+    def _entry_from_row(row: Dict[str, Any]) -> Optional[TicketChannelEntry]:
+        ticket_id = row.get("id") or row.get("ticket_id")
+        channel_id = row.get("channel_id")
+        if not ticket_id or not channel_id or row.get("status", "open") != "open":
+            return None
+        return TicketChannelEntry(
+            ticket_id=int(ticket_id),
+            channel_id=int(channel_id),
+            guild_id=int(row.get("guild_id") or 0),
+            discord_id=str(row.get("discord_id") or ""),
+            type=row.get("type") or "",
+            priority=row.get("priority") or "medium",
+        )
+
+
+# 全域實例
+ticket_channel_index = TicketChannelIndex()
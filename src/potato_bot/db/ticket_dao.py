@@ -10,9 +10,42 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import aiomysql
 
+from potato_bot.db.guild_settings_registry import guild_settings_registry
+from potato_bot.db.pagination import (
+    KeysetPage,
+    SortKey,
+    build_keyset_query,
+    build_page,
+    cached_count,
+)
 from potato_bot.db.pool import db_pool
+from potato_bot.db.search_index import SearchIndex
+from potato_bot.db.ticket_channel_index import ticket_channel_index
+from potato_shared.cache_manager import cache_manager
 from potato_shared.logger import logger
 
+# 票券列表排序鍵（最新優先，id 作為唯一的次要鍵）
+TICKET_SORT_KEYS = [SortKey("created_at", "created_at"), SortKey("id", "id")]
+TICKET_SEARCH_LIMIT = 1000  # 關鍵字篩選最多取相關度前 N 張票券，超過時退回 LIKE 查詢
+
+
+async def _load_ticket_search_rows(after_id: int, limit: int) -> List[Tuple[int, int, str]]:
+    """依 id 分批讀取票券的用戶名稱與類型，供搜尋索引載入"""
+    async with db_pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                """
+                SELECT id, guild_id, CONCAT_WS(' ', username, type)
+                FROM tickets WHERE id > %s ORDER BY id LIMIT %s
+            """,
+                (after_id, limit),
+            )
+            return [(row[0], row[1], row[2] or "") for row in await cursor.fetchall()]
+
+
+# 票券搜尋索引（用戶名稱 + 類型；首次搜尋時載入，建立/刪除票券時更新）
+ticket_search_index = SearchIndex("票券", _load_ticket_search_rows)
+
 
 class TicketDAO:
     """票券資料存取層 - 完整修復版"""
@@ -91,8 +124,8 @@ class TicketDAO:
         return self.db
 
     async def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
-        """取得伺服器設定 - 修復缺失方法"""
-        return await self.get_settings(guild_id)
+        """取得伺服器設定（讀取設定快照，不查詢資料庫）"""
+        return await guild_settings_registry.get("ticket", guild_id)
 
     async def cleanup_old_logs(self, days: int = 30) -> int:
         """清理舊日誌 - 修復缺失方法"""
@@ -246,6 +279,11 @@ class TicketDAO:
                     )
 
                     await conn.commit()
+                    ticket_channel_index.add(
+                        ticket_id, channel_id, guild_id, discord_id, ticket_type, priority
+                    )
+                    ticket_search_index.add(ticket_id, guild_id, f"{username} {ticket_type}")
+                    await self._invalidate_ticket_lists(guild_id)
                     logger.info(f"建立票券 #{ticket_id:04d} - 用戶: {username}")
                     return ticket_id
 
@@ -253,24 +291,44 @@ class TicketDAO:
             logger.error(f"建立票券錯誤：{e}")
             return None
 
+    @staticmethod
+    async def _ticket_guild_id(cursor, ticket_id: int) -> Optional[int]:
+        """取得票券所屬伺服器（開啟中的票券直接查索引）"""
+        entry = ticket_channel_index.get_by_ticket(ticket_id)
+        if entry is not None:
+            return entry.guild_id
+        await cursor.execute("SELECT guild_id FROM tickets WHERE id = %s", (ticket_id,))
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    async def _invalidate_ticket_lists(guild_id: Optional[int]) -> None:
+        """票券寫入後失效該伺服器的列表與總數快取（TicketManager 直接呼叫本 DAO，不經 CachedTicketDAO）"""
+        if guild_id:
+            await cache_manager.invalidate_tags(f"ticket_lists:guild:{guild_id}")
+
     async def get_ticket_by_id(self, ticket_id: int) -> Optional[Dict[str, Any]]:
         """根據 ID 取得票券 - 修復異步"""
-        await self._ensure_initialized()
         try:
-            async with self.db.connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute("SELECT * FROM tickets WHERE id = %s", (ticket_id,))
-                    result = await cursor.fetchone()
-                    if result:
-                        columns = [desc[0] for desc in cursor.description]
-                        ticket = dict(zip(columns, result))
-                        ticket["ticket_id"] = ticket.get("id")
-                        return ticket
-                    return None
+            return await self.fetch_ticket_by_id(ticket_id)
         except Exception as e:
             logger.error(f"查詢票券錯誤：{e}")
             return None
 
+    async def fetch_ticket_by_id(self, ticket_id: int) -> Optional[Dict[str, Any]]:
+        """根據 ID 取得票券（錯誤時拋出例外，供快取層區分查無資料與查詢失敗）"""
+        await self._ensure_initialized()
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT * FROM tickets WHERE id = %s", (ticket_id,))
+                result = await cursor.fetchone()
+                if result:
+                    columns = [desc[0] for desc in cursor.description]
+                    ticket = dict(zip(columns, result))
+                    ticket["ticket_id"] = ticket.get("id")
+                    return ticket
+                return None
+
     async def get_ticket(self, ticket_id: int) -> Optional[Dict[str, Any]]:
         """取得票券（兼容快取 DAO）"""
         return await self.get_ticket_by_id(ticket_id)
@@ -281,9 +339,15 @@ class TicketDAO:
         try:
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
+                    guild_id = await self._ticket_guild_id(cursor, ticket_id)
                     await cursor.execute("DELETE FROM tickets WHERE id = %s", (ticket_id,))
                     await conn.commit()
-                    return cursor.rowcount > 0
+                    deleted = cursor.rowcount > 0
+                    ticket_channel_index.remove_ticket(ticket_id)
+                    ticket_search_index.remove(ticket_id)
+            if deleted:
+                await self._invalidate_ticket_lists(guild_id)
+            return deleted
         except Exception as e:
             logger.error(f"刪除票券錯誤：{e}")
             return False
@@ -340,15 +404,10 @@ class TicketDAO:
 
             where_clause = " AND ".join(where_conditions)
 
+            total = await self._count_tickets_cached(where_clause, params, guild_id)
+
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute(
-                        f"SELECT COUNT(*) FROM tickets WHERE {where_clause}",
-                        params,
-                    )
-                    total_result = await cursor.fetchone()
-                    total = total_result[0] if total_result else 0
-
                     await cursor.execute(
                         f"""
                         SELECT * FROM tickets
@@ -370,6 +429,20 @@ class TicketDAO:
             logger.error(f"查詢伺服器票券錯誤：{e}")
             return [], 0
 
+    async def get_open_ticket_channels(self) -> List[Dict[str, Any]]:
+        """取得所有開啟中票券的頻道資訊（建立頻道索引用，錯誤時拋出例外）"""
+        await self._ensure_initialized()
+        async with self.db.connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(
+                    """
+                    SELECT id, channel_id, guild_id, discord_id, type, priority, status
+                    FROM tickets
+                    WHERE status = 'open'
+                """
+                )
+                return list(await cursor.fetchall())
+
     async def get_ticket_by_channel(self, channel_id: int) -> Optional[Dict[str, Any]]:
         """根據頻道 ID 取得票券 - 修復異步"""
         await self._ensure_initialized()
@@ -415,16 +488,11 @@ class TicketDAO:
 
             where_clause = " AND ".join(where_conditions)
 
+            # 總數（快取，翻頁不重新計數）
+            total = await self._count_tickets_cached(where_clause, params, guild_id)
+
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
-                    # 總數查詢
-                    await cursor.execute(
-                        f"SELECT COUNT(*) FROM tickets WHERE {where_clause}",
-                        params,
-                    )
-                    total_result = await cursor.fetchone()
-                    total = total_result[0] if total_result else 0
-
                     # 分頁查詢
                     offset = (page - 1) * page_size
                     await cursor.execute(
@@ -455,6 +523,7 @@ class TicketDAO:
         try:
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
+                    guild_id = await self._ticket_guild_id(cursor, ticket_id)
                     await cursor.execute(
                         """
                         UPDATE tickets
@@ -479,15 +548,96 @@ class TicketDAO:
                         )
 
                         await conn.commit()
+                        ticket_channel_index.remove_ticket(ticket_id)
+                        await self._invalidate_ticket_lists(guild_id)
                         logger.debug(f"關閉票券 #{ticket_id:04d}")
                         return True
 
+            # 票券已非開啟狀態，確保索引不殘留
+            ticket_channel_index.remove_ticket(ticket_id)
             return False
 
         except Exception as e:
             logger.error(f"關閉票券錯誤：{e}")
             return False
 
+    @staticmethod
+    def _build_filter_conditions(
+        filters: Dict[str, Any],
+        guild_id: int = None,
+        search_ids: Optional[List[int]] = None,
+    ) -> Tuple[List[str], List[Any]]:
+        """
+        依篩選條件組出 WHERE 條件（列表查詢、計數與 keyset 分頁共用）
+        search_ids 為搜尋索引的結果；None 時關鍵字改以 LIKE 比對
+        """
+        where_conditions = []
+        params: List[Any] = []
+
+        if guild_id:
+            where_conditions.append("guild_id = %s")
+            params.append(guild_id)
+
+        status = filters.get("status")
+        if isinstance(status, (list, tuple)) and status:
+            placeholders = ", ".join(["%s"] * len(status))
+            where_conditions.append(f"status IN ({placeholders})")
+            params.extend(status)
+        elif status and status != "all":
+            where_conditions.append("status = %s")
+            params.append(status)
+
+        if filters.get("priority"):
+            where_conditions.append("priority = %s")
+            params.append(filters["priority"])
+
+        discord_id = filters.get("discord_id") or filters.get("user_id")
+        if discord_id:
+            where_conditions.append("discord_id = %s")
+            params.append(str(discord_id))
+
+        if filters.get("search") and search_ids is not None:
+            if search_ids:
+                where_conditions.append(f"id IN ({', '.join(['%s'] * len(search_ids))})")
+                params.extend(search_ids)
+            else:
+                where_conditions.append("1 = 0")
+        elif filters.get("search"):
+            where_conditions.append("(username LIKE %s OR type LIKE %s)")
+            search_param = f"%{filters['search']}%"
+            params.extend([search_param, search_param])
+
+        if filters.get("created_after") is not None:
+            where_conditions.append("created_at >= %s")
+            params.append(filters["created_after"])
+
+        if filters.get("created_before") is not None:
+            where_conditions.append("created_at <= %s")
+            params.append(filters["created_before"])
+
+        return where_conditions, params
+
+    async def _search_ticket_ids(
+        self, filters: Dict[str, Any], guild_id: int = None
+    ) -> Optional[List[int]]:
+        """
+        以搜尋索引取得關鍵字相符的票券 id（依相關度排序）
+        無關鍵字、索引無法處理，或相符票券超過 TICKET_SEARCH_LIMIT 時回傳 None 改用 LIKE：
+        截斷後的 id 清單再與狀態/優先級/用戶/日期條件取交集會漏掉相符的票券，總數也會被上限截斷
+        """
+        keyword = filters.get("search")
+        if not keyword:
+            return None
+        ranked = await ticket_search_index.search(
+            str(keyword), guild_id=guild_id, limit=TICKET_SEARCH_LIMIT + 1
+        )
+        if ranked is None:
+            return None
+        if len(ranked) > TICKET_SEARCH_LIMIT:
+            logger.debug(f"票券搜尋「{keyword}」相符超過 {TICKET_SEARCH_LIMIT} 筆，改用 LIKE 查詢")
+            return None
+        return [ticket_id for ticket_id, _ in ranked]
+
     async def get_tickets_with_filters(
         self,
         filters: Dict[str, Any],
@@ -495,42 +645,26 @@ class TicketDAO:
         offset: int = 0,
         guild_id: int = None,
     ) -> List[Dict[str, Any]]:
-        """根據篩選條件獲取票券列表"""
+        """根據篩選條件獲取票券列表（深頁請改用 get_tickets_page）"""
         try:
             await self._ensure_initialized()
 
-            # 構建查詢條件
-            where_conditions = ["1=1"]
-            params = []
-
-            if guild_id:
-                where_conditions.append("guild_id = %s")
-                params.append(guild_id)
-
-            if filters.get("status"):
-                where_conditions.append("status = %s")
-                params.append(filters["status"])
-
-            if filters.get("priority"):
-                where_conditions.append("priority = %s")
-                params.append(filters["priority"])
-
-
-            if filters.get("discord_id"):
-                where_conditions.append("discord_id = %s")
-                params.append(filters["discord_id"])
+            search_ids = await self._search_ticket_ids(filters, guild_id)
+            where_conditions, params = self._build_filter_conditions(
+                filters, guild_id, search_ids
+            )
+            where_clause = " AND ".join(where_conditions) or "1=1"
 
-            if filters.get("search"):
-                where_conditions.append("(username LIKE %s OR type LIKE %s)")
-                search_param = f"%{filters['search']}%"
-                params.extend([search_param, search_param])
-
-            where_clause = " AND ".join(where_conditions)
+            order_clause = "created_at DESC, id DESC"
+            if search_ids:
+                # 關鍵字搜尋時依相關度排序
+                order_clause = f"FIELD(id, {', '.join(['%s'] * len(search_ids))}), {order_clause}"
+                params.extend(search_ids)
 
             query = f"""
                 SELECT * FROM tickets
                 WHERE {where_clause}
-                ORDER BY created_at DESC
+                ORDER BY {order_clause}
                 LIMIT %s OFFSET %s
             """
             params.extend([limit, offset])
@@ -551,33 +685,11 @@ class TicketDAO:
         try:
             await self._ensure_initialized()
 
-            # 構建查詢條件（與 get_tickets_with_filters 相同）
-            where_conditions = ["1=1"]
-            params = []
-
-            if guild_id:
-                where_conditions.append("guild_id = %s")
-                params.append(guild_id)
-
-            if filters.get("status"):
-                where_conditions.append("status = %s")
-                params.append(filters["status"])
-
-            if filters.get("priority"):
-                where_conditions.append("priority = %s")
-                params.append(filters["priority"])
-
-
-            if filters.get("discord_id"):
-                where_conditions.append("discord_id = %s")
-                params.append(filters["discord_id"])
-
-            if filters.get("search"):
-                where_conditions.append("(username LIKE %s OR type LIKE %s)")
-                search_param = f"%{filters['search']}%"
-                params.extend([search_param, search_param])
-
-            where_clause = " AND ".join(where_conditions)
+            search_ids = await self._search_ticket_ids(filters, guild_id)
+            where_conditions, params = self._build_filter_conditions(
+                filters, guild_id, search_ids
+            )
+            where_clause = " AND ".join(where_conditions) or "1=1"
 
             query = f"SELECT COUNT(*) as count FROM tickets WHERE {where_clause}"
 
@@ -591,6 +703,72 @@ class TicketDAO:
             logger.error(f"統計票券數量失敗: {e}")
             return 0
 
+    async def _count_tickets_cached(
+        self, where_clause: str, params: List[Any], guild_id: int
+    ) -> int:
+        """COUNT(*) 結果快取（票券建立/關閉/更新/刪除時由 ticket_lists 標籤一併失效）"""
+
+        async def load() -> int:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        f"SELECT COUNT(*) FROM tickets WHERE {where_clause}", params
+                    )
+                    result = await cursor.fetchone()
+                    return result[0] if result else 0
+
+        return await cached_count(
+            "tickets", where_clause, params, load, tags=[f"ticket_lists:guild:{guild_id}"]
+        )
+
+    async def get_tickets_page(
+        self,
+        guild_id: int,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+    ) -> KeysetPage:
+        """
+        Keyset 分頁查詢票券（依 created_at DESC, id DESC）
+        filters 支援 status / priority / discord_id / search / created_after / created_before
+        """
+        await self._ensure_initialized()
+        filters = filters or {}
+        try:
+            search_ids = await self._search_ticket_ids(filters, guild_id)
+            where_conditions, params = self._build_filter_conditions(
+                filters, guild_id, search_ids
+            )
+            sql, query_params, backwards = build_keyset_query(
+                "SELECT * FROM tickets",
+                where_conditions,
+                params,
+                TICKET_SORT_KEYS,
+                limit,
+                cursor,
+            )
+
+            async with self.db.connection() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as db_cursor:
+                    await db_cursor.execute(sql, query_params)
+                    rows = await db_cursor.fetchall()
+
+            for row in rows:
+                row["ticket_id"] = row.get("id")
+
+            total = None
+            if with_total:
+                total = await self._count_tickets_cached(
+                    " AND ".join(where_conditions), params, guild_id
+                )
+
+            return build_page(rows, TICKET_SORT_KEYS, limit, backwards, total)
+
+        except Exception as e:
+            logger.error(f"Keyset 分頁查詢票券錯誤：{e}")
+            return KeysetPage()
+
     async def update_ticket(self, ticket_id: int, update_data: Dict[str, Any]) -> bool:
         """更新票券資料"""
         try:
@@ -631,7 +809,23 @@ class TicketDAO:
                 async with conn.cursor() as cursor:
                     await cursor.execute(query, params)
                     await conn.commit()
-                    return cursor.rowcount > 0
+                    updated = cursor.rowcount > 0
+                    if updated:
+                        guild_id = await self._ticket_guild_id(cursor, ticket_id)
+
+            if updated:
+                await self._invalidate_ticket_lists(guild_id)
+
+            if updated and "status" in update_data:
+                if update_data["status"] == "open":
+                    ticket = await self.get_ticket_by_id(ticket_id)
+                    if ticket:
+                        ticket_channel_index.add_row(ticket)
+                else:
+                    ticket_channel_index.remove_ticket(ticket_id)
+            elif updated and "priority" in update_data:
+                ticket_channel_index.update_priority(ticket_id, update_data["priority"])
+            return updated
 
         except Exception as e:
             logger.error(f"更新票券失敗: {e}")
@@ -660,7 +854,11 @@ class TicketDAO:
                     )
 
                     await conn.commit()
-                    return cursor.rowcount > 0
+                    updated = cursor.rowcount > 0
+                    ticket_channel_index.update_priority(ticket_id, priority)
+                    guild_id = await self._ticket_guild_id(cursor, ticket_id)
+            await self._invalidate_ticket_lists(guild_id)
+            return updated
 
         except Exception as e:
             logger.error(f"更新優先級錯誤：{e}")
@@ -757,48 +955,51 @@ class TicketDAO:
 
     async def get_settings(self, guild_id: int) -> Dict[str, Any]:
         """取得伺服器設定 - 修復異步"""
-        await self._ensure_initialized()
         try:
-            async with self.db.connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(
-                        "SELECT * FROM ticket_settings WHERE guild_id = %s",
-                        (guild_id,),
-                    )
-
-                    result = await cursor.fetchone()
-
-                    if not result:
-                        # 建立預設設定
-                        return await self.create_default_settings(guild_id)
-
-                    # 將結果轉換為字典
-                    columns = [desc[0] for desc in cursor.description]
-                    settings = dict(zip(columns, result))
+            return await self.fetch_settings(guild_id)
+        except Exception as e:
+            logger.error(f"取得設定錯誤：{e}")
+            return await self.create_default_settings(guild_id)
 
-                    # 解析 JSON 欄位
-                    if settings.get("support_roles"):
-                        try:
-                            settings["support_roles"] = json.loads(settings["support_roles"])
-                        except:
-                            settings["support_roles"] = []
-                    else:
+    async def fetch_settings(self, guild_id: int) -> Dict[str, Any]:
+        """從資料庫讀取伺服器設定（錯誤時拋出例外；查無資料時建立預設設定）"""
+        await self._ensure_initialized()
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT * FROM ticket_settings WHERE guild_id = %s",
+                    (guild_id,),
+                )
+
+                result = await cursor.fetchone()
+
+                if not result:
+                    # 建立預設設定
+                    return await self.create_default_settings(guild_id)
+
+                # 將結果轉換為字典
+                columns = [desc[0] for desc in cursor.description]
+                settings = dict(zip(columns, result))
+
+                # 解析 JSON 欄位
+                if settings.get("support_roles"):
+                    try:
+                        settings["support_roles"] = json.loads(settings["support_roles"])
+                    except:
                         settings["support_roles"] = []
-                    if settings.get("sponsor_support_roles"):
-                        try:
-                            settings["sponsor_support_roles"] = json.loads(
-                                settings["sponsor_support_roles"]
-                            )
-                        except:
-                            settings["sponsor_support_roles"] = []
-                    else:
+                else:
+                    settings["support_roles"] = []
+                if settings.get("sponsor_support_roles"):
+                    try:
+                        settings["sponsor_support_roles"] = json.loads(
+                            settings["sponsor_support_roles"]
+                        )
+                    except:
                         settings["sponsor_support_roles"] = []
+                else:
+                    settings["sponsor_support_roles"] = []
 
-                    return settings
-
-        except Exception as e:
-            logger.error(f"取得設定錯誤：{e}")
-            return await self.create_default_settings(guild_id)
+                return settings
 
     async def create_default_settings(self, guild_id: int) -> Dict[str, Any]:
         """建立預設設定 - 修復異步"""
@@ -879,7 +1080,11 @@ class TicketDAO:
                     )
 
                     await conn.commit()
-                    return cursor.rowcount > 0
+                    updated = cursor.rowcount > 0
+
+            if updated:
+                await guild_settings_registry.refresh("ticket", guild_id)
+            return updated
 
         except Exception as e:
             logger.error(f"更新設定錯誤：{e}")
@@ -932,7 +1137,11 @@ class TicketDAO:
                     """
                     await cursor.execute(sql, values)
                     await conn.commit()
-                    return cursor.rowcount > 0
+                    updated = cursor.rowcount > 0
+
+            if updated:
+                await guild_settings_registry.refresh("ticket", guild_id)
+            return updated
 
         except Exception as e:
             logger.error(f"批量更新設定錯誤：{e}")
@@ -952,7 +1161,8 @@ class TicketDAO:
                     deleted_count = cursor.rowcount
                     if deleted_count > 0:
                         logger.info(f"已刪除伺服器 {guild_id} 的票券設定。")
-                    return deleted_count > 0
+            guild_settings_registry.invalidate("ticket", guild_id)
+            return deleted_count > 0
         except Exception as e:
             logger.error(f"刪除伺服器設定錯誤：{e}")
             return False
@@ -1032,16 +1242,11 @@ class TicketDAO:
 
             where_clause = " AND ".join(conditions)
 
+            # 計算總數（快取，翻頁不重新計數）
+            total_count = await self._count_tickets_cached(where_clause, params, guild_id)
+
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
-                    # 計算總數
-                    count_sql = f"""
-                        SELECT COUNT(*) FROM tickets
-                        WHERE {where_clause}
-                    """
-                    await cursor.execute(count_sql, params)
-                    total_count = (await cursor.fetchone())[0]
-
                     # 計算分頁資訊
                     total_pages = (total_count + page_size - 1) // page_size
                     offset = (page - 1) * page_size
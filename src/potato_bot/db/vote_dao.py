@@ -5,14 +5,71 @@
 """
 
 import json
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
 
 import aiomysql
 
+from potato_bot.db.pagination import (
+    KeysetPage,
+    SortKey,
+    build_keyset_query,
+    build_page,
+    cached_count,
+    encode_cursor,
+)
 from potato_bot.db.pool import db_pool
+from potato_bot.db.search_index import SearchIndex
+from potato_bot.db.stats_rollup import stats_rollup
+from potato_bot.utils.deadline_scheduler import DeadlineScheduler
+from potato_shared.cache_manager import cache_manager
 from potato_shared.logger import logger
 
+VOTE_CACHE_TTL = 60  # 投票資料快取秒數
+VOTE_NEGATIVE_TTL = 30  # 「投票不存在」快取秒數
+MYSQL_DUPLICATE_ENTRY = 1062
+
+# 投票截止排程（由 VoteCore 設定公告處理並啟動，建立/提前結束投票時更新）
+vote_deadlines = DeadlineScheduler("投票公告")
+
+
+async def _load_vote_search_rows(after_id: int, limit: int) -> List[Tuple[int, int, str]]:
+    """依 id 分批讀取投票標題，供搜尋索引載入"""
+    async with db_pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT id, guild_id, title FROM votes WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, limit),
+            )
+            return [(row[0], row[1], row[2] or "") for row in await cur.fetchall()]
+
+
+# 投票標題搜尋索引（首次搜尋時載入，建立投票時更新）
+vote_search_index = SearchIndex("投票", _load_vote_search_rows)
+
+
+class VoteSubmitStatus(Enum):
+    """投票提交結果"""
+
+    ACCEPTED = "accepted"
+    ALREADY_VOTED = "already_voted"
+    INVALID_OPTION = "invalid_option"
+    CLOSED = "closed"
+    ERROR = "error"
+
+
+@dataclass(frozen=True)
+class VoteSubmitResult:
+    status: VoteSubmitStatus
+    options: Tuple[str, ...] = ()
+    invalid_options: Tuple[str, ...] = ()
+
+    @property
+    def accepted(self) -> bool:
+        return self.status is VoteSubmitStatus.ACCEPTED
+
 
 class VoteDAO:
     """投票系統資料存取層"""
@@ -31,51 +88,55 @@ class VoteDAO:
             if end_date.tzinfo is not None:
                 end_date = end_date.replace(tzinfo=None)
 
+            # 票數與選項數以分組子查詢一次取得（原本每筆投票各查一次）
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
                     await cursor.execute(
                         """
-                        SELECT id, title, is_multi, anonymous, creator_id,
-                               start_time, end_time, channel_id,
-                               (SELECT COUNT(*) FROM vote_responses vr WHERE vr.vote_id = v.id) as total_votes
+                        SELECT v.id, v.title, v.is_multi, v.anonymous, v.creator_id,
+                               v.start_time, v.end_time, v.channel_id,
+                               COALESCE(r.total_votes, 0) AS total_votes,
+                               COALESCE(o.options_count, 0) AS options_count
                         FROM votes v
-                        WHERE guild_id = %s AND start_time BETWEEN %s AND %s
-                        ORDER BY start_time DESC
+                        LEFT JOIN (
+                            SELECT vr.vote_id, COUNT(*) AS total_votes
+                            FROM vote_responses vr
+                            JOIN votes fv ON fv.id = vr.vote_id
+                            WHERE fv.guild_id = %s AND fv.start_time BETWEEN %s AND %s
+                            GROUP BY vr.vote_id
+                        ) r ON r.vote_id = v.id
+                        LEFT JOIN (
+                            SELECT vo.vote_id, COUNT(*) AS options_count
+                            FROM vote_options vo
+                            JOIN votes fv ON fv.id = vo.vote_id
+                            WHERE fv.guild_id = %s AND fv.start_time BETWEEN %s AND %s
+                            GROUP BY vo.vote_id
+                        ) o ON o.vote_id = v.id
+                        WHERE v.guild_id = %s AND v.start_time BETWEEN %s AND %s
+                        ORDER BY v.start_time DESC
                     """,
-                        (guild_id, start_date, end_date),
+                        (guild_id, start_date, end_date) * 3,
                     )
 
                     rows = await cursor.fetchall()
-                    votes = []
-
-                    for row in rows:
-                        # 取得選項數量
-                        await cursor.execute(
-                            "SELECT COUNT(*) FROM vote_options WHERE vote_id = %s",
-                            (row[0],),
-                        )
-                        options_count = (await cursor.fetchone())[0]
-
-                        vote = {
-                            "id": row[0],
-                            "title": row[1],
-                            "is_multi": bool(row[2]),
-                            "anonymous": bool(row[3]),
-                            "creator_id": row[4],
-                            "start_time": row[5],
-                            "end_time": row[6],
-                            "ended_at": (
-                                row[6]
-                                if row[6] and row[6] < datetime.now().replace(tzinfo=None)
-                                else None
-                            ),
-                            "channel_id": row[7],
-                            "total_votes": row[8],
-                            "options": {"count": options_count},
-                        }
-                        votes.append(vote)
 
-                    return votes
+            now = datetime.now().replace(tzinfo=None)
+            return [
+                {
+                    "id": row[0],
+                    "title": row[1],
+                    "is_multi": bool(row[2]),
+                    "anonymous": bool(row[3]),
+                    "creator_id": row[4],
+                    "start_time": row[5],
+                    "end_time": row[6],
+                    "ended_at": row[6] if row[6] and row[6] < now else None,
+                    "channel_id": row[7],
+                    "total_votes": row[8],
+                    "options": {"count": row[9]},
+                }
+                for row in rows
+            ]
 
         except Exception as e:
             logger.error(f"取得投票列表錯誤: {e}")
@@ -121,6 +182,10 @@ async def create_vote(session_data, creator_id):
 
                 vote_id = cur.lastrowid
                 await conn.commit()
+                await cache_manager.delete(f"vote:{vote_id}")
+                vote_deadlines.schedule(vote_id, session_data["end_time"])
+                vote_search_index.add(vote_id, session_data["guild_id"], session_data["title"])
+                stats_rollup.mark("vote", vote_id)
 
                 logger.info(f"成功創建投票 ID {vote_id}: {session_data['title']}")
                 return vote_id
@@ -134,23 +199,16 @@ async def create_vote(session_data, creator_id):
 
 
 async def get_vote_by_id(vote_id):
-    """查詢特定投票詳細資料"""
+    """查詢特定投票詳細資料（含負向快取：不存在的投票短時間內不再查詢）"""
     try:
-        async with db_pool.connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute(
-                    """
-                    SELECT id, title, is_multi, anonymous, allowed_roles, channel_id, end_time, start_time, announced, guild_id, creator_id
-                    FROM votes
-                    WHERE id = %s
-                """,
-                    (vote_id,),
-                )
-                vote = await cur.fetchone()
-
-                if not vote:
-                    return None
-                return vote
+        vote = await cache_manager.get_or_load(
+            f"vote:{vote_id}",
+            lambda: _fetch_vote_by_id(vote_id),
+            VOTE_CACHE_TTL,
+            negative_ttl=VOTE_NEGATIVE_TTL,
+        )
+        # 回傳副本，避免呼叫端修改到快取內容
+        return dict(vote) if vote else None
     except Exception as e:
         import traceback
 
@@ -159,6 +217,21 @@ async def get_vote_by_id(vote_id):
         return None
 
 
+async def _fetch_vote_by_id(vote_id):
+    """從資料庫讀取投票（錯誤時拋出例外，避免被當成查無資料快取）"""
+    async with db_pool.connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(
+                """
+                SELECT id, title, is_multi, anonymous, allowed_roles, channel_id, end_time, start_time, announced, guild_id, creator_id
+                FROM votes
+                WHERE id = %s
+            """,
+                (vote_id,),
+            )
+            return await cur.fetchone()
+
+
 async def add_vote_option(vote_id: int, option_text: str):
     """為投票添加選項"""
     try:
@@ -234,12 +307,88 @@ async def insert_vote_response(vote_id, user_id, option):
                     (vote_id, user_id, option),
                 )
                 await conn.commit()
+                stats_rollup.mark("vote", vote_id)
 
     except Exception as e:
         logger.error(f"寫入投票結果失敗: {e}")
         raise
 
 
+async def submit_vote(vote_id: int, user_id: int, options: List[str]) -> VoteSubmitResult:
+    """
+    以單一交易寫入用戶的所有選項（一次多列 INSERT ... SELECT）
+    選項有效性與投票是否結束在同一語句內判斷，重複投票由 (vote_id, user_id, option_text) 主鍵與
+    NOT EXISTS 條件擋下；只有未寫入任何列時才多查一次判斷原因
+    """
+    options = list(dict.fromkeys(options))
+    if not options:
+        return VoteSubmitResult(VoteSubmitStatus.INVALID_OPTION)
+
+    placeholders = ", ".join(["%s"] * len(options))
+    try:
+        async with db_pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await conn.begin()
+                try:
+                    await cur.execute(
+                        f"""
+                        INSERT INTO vote_responses (vote_id, user_id, option_text)
+                        SELECT o.vote_id, %s, o.option_text
+                        FROM vote_options o
+                        JOIN votes v ON v.id = o.vote_id
+                        WHERE o.vote_id = %s
+                          AND o.option_text IN ({placeholders})
+                          AND v.end_time > UTC_TIMESTAMP()
+                          AND NOT EXISTS (
+                              SELECT 1 FROM vote_responses r
+                              WHERE r.vote_id = %s AND r.user_id = %s
+                          )
+                    """,
+                        (user_id, vote_id, *options, vote_id, user_id),
+                    )
+                    inserted = cur.rowcount
+                    if inserted == len(options):
+                        await conn.commit()
+                        stats_rollup.mark("vote", vote_id)
+                        return VoteSubmitResult(VoteSubmitStatus.ACCEPTED, tuple(options))
+                    await conn.rollback()
+                except aiomysql.IntegrityError as e:
+                    await conn.rollback()
+                    if e.args and e.args[0] == MYSQL_DUPLICATE_ENTRY:
+                        return VoteSubmitResult(VoteSubmitStatus.ALREADY_VOTED)
+                    raise
+                except Exception:
+                    await conn.rollback()
+                    raise
+
+                # 未完整寫入：判斷是已投票、投票已結束或選項無效
+                await cur.execute(
+                    f"""
+                    SELECT
+                        EXISTS(SELECT 1 FROM vote_responses WHERE vote_id = %s AND user_id = %s),
+                        (SELECT end_time > UTC_TIMESTAMP() FROM votes WHERE id = %s),
+                        (SELECT GROUP_CONCAT(option_text SEPARATOR '\\n') FROM vote_options
+                         WHERE vote_id = %s AND option_text IN ({placeholders}))
+                """,
+                    (vote_id, user_id, vote_id, vote_id, *options),
+                )
+                voted, is_open, valid = await cur.fetchone()
+
+        if voted:
+            return VoteSubmitResult(VoteSubmitStatus.ALREADY_VOTED)
+        if not is_open:
+            return VoteSubmitResult(VoteSubmitStatus.CLOSED)
+        valid_options = set(valid.split("\n")) if valid else set()
+        return VoteSubmitResult(
+            VoteSubmitStatus.INVALID_OPTION,
+            invalid_options=tuple(opt for opt in options if opt not in valid_options),
+        )
+
+    except Exception as e:
+        logger.error(f"提交投票失敗 (vote_id: {vote_id}, user_id: {user_id}): {e}")
+        return VoteSubmitResult(VoteSubmitStatus.ERROR)
+
+
 async def get_vote_statistics(vote_id):
     """統計票數：依選項計算總票數"""
     try:
@@ -358,6 +507,36 @@ async def get_expired_votes_to_announce():
         return []
 
 
+async def get_pending_vote_deadlines() -> List[Tuple[int, datetime]]:
+    """取得所有尚未公告投票的截止時間（供排程器啟動時重建，依 idx_end_time 排序）"""
+    async with db_pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT id, end_time FROM votes
+                WHERE announced = FALSE AND end_time IS NOT NULL
+                ORDER BY end_time
+            """
+            )
+            return [(row[0], row[1]) for row in await cur.fetchall()]
+
+
+async def get_unannounced_vote(vote_id: int) -> Optional[Dict[str, Any]]:
+    """取得尚未公告的投票（不經快取，已公告或不存在時回傳 None）"""
+    try:
+        async with db_pool.connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(
+                    "SELECT * FROM votes WHERE id = %s AND announced = FALSE",
+                    (vote_id,),
+                )
+                row = await cur.fetchone()
+                return _normalize_history_row(row) if row else None
+    except Exception as e:
+        logger.error(f"get_unannounced_vote({vote_id}) 錯誤: {e}")
+        raise
+
+
 async def mark_vote_announced(vote_id):
     """將已公告的投票標記為 announced = TRUE"""
     try:
@@ -370,6 +549,7 @@ async def mark_vote_announced(vote_id):
                     (vote_id,),
                 )
                 await conn.commit()
+                await cache_manager.delete(f"vote:{vote_id}")
 
     except Exception as e:
         logger.error(f"標記投票為已公告時發生外層錯誤: {e}")
@@ -378,154 +558,202 @@ async def mark_vote_announced(vote_id):
 # ===== 歷史查詢功能 =====
 
 
+VOTE_HISTORY_SORT_KEYS = [SortKey("start_time", "start_time"), SortKey("id", "id")]
+
+
+def _history_conditions(status: str, guild_id: Optional[int]):
+    """投票歷史查詢條件（列表、計數與 keyset 分頁共用）"""
+    conditions = []
+    params: List[Any] = []
+
+    if guild_id is not None:
+        conditions.append("guild_id = %s")
+        params.append(guild_id)
+
+    # 根據狀態建立查詢條件
+    if status == "active":
+        conditions.append("end_time > UTC_TIMESTAMP()")
+    elif status == "finished":
+        conditions.append("end_time <= UTC_TIMESTAMP()")
+
+    return conditions, params
+
+
+def _normalize_history_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    row["is_multi"] = bool(row["is_multi"])
+    row["anonymous"] = bool(row["anonymous"])
+    row["announced"] = bool(row.get("announced", False))
+
+    # 處理 JSON 欄位
+    try:
+        row["allowed_roles"] = json.loads(row.get("allowed_roles", "[]"))
+    except:
+        row["allowed_roles"] = []
+
+    # 時區處理
+    if row["start_time"] and row["start_time"].tzinfo is None:
+        row["start_time"] = row["start_time"].replace(tzinfo=timezone.utc)
+    if row["end_time"] and row["end_time"].tzinfo is None:
+        row["end_time"] = row["end_time"].replace(tzinfo=timezone.utc)
+    return row
+
+
+_HISTORY_SELECT = """
+    SELECT id, title, is_multi, anonymous, allowed_roles,
+           channel_id, end_time, start_time, announced, guild_id, creator_id
+    FROM votes
+"""
+
+
 async def get_vote_history(
     page: int = 1,
     status: str = "all",
     per_page: int = 10,
     guild_id: Optional[int] = None,
 ):
-    """分頁查詢投票歷史記錄"""
+    """分頁查詢投票歷史記錄（深頁請改用 get_vote_history_page）"""
     try:
         offset = (page - 1) * per_page
 
-        conditions = []
-        params: List[Any] = []
-
-        if guild_id is not None:
-            conditions.append("guild_id = %s")
-            params.append(guild_id)
-
-        # 根據狀態建立查詢條件
-        if status == "active":
-            conditions.append("end_time > UTC_TIMESTAMP()")
-        elif status == "finished":
-            conditions.append("end_time <= UTC_TIMESTAMP()")
-
+        conditions, params = _history_conditions(status, guild_id)
         where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
         async with db_pool.connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
                 query = f"""
-                    SELECT id, title, is_multi, anonymous, allowed_roles,
-                           channel_id, end_time, start_time, announced, guild_id, creator_id
-                    FROM votes
+                    {_HISTORY_SELECT}
                     {where_clause}
-                    ORDER BY start_time DESC
+                    ORDER BY start_time DESC, id DESC
                     LIMIT %s OFFSET %s
                 """
                 await cur.execute(query, (*params, per_page, offset))
                 rows = await cur.fetchall()
 
-                # 處理資料格式
-                processed_votes = []
-                for row in rows:
-                    row["is_multi"] = bool(row["is_multi"])
-                    row["anonymous"] = bool(row["anonymous"])
-                    row["announced"] = bool(row.get("announced", False))
-
-                    # 處理 JSON 欄位
-                    try:
-                        row["allowed_roles"] = json.loads(row.get("allowed_roles", "[]"))
-                    except:
-                        row["allowed_roles"] = []
-
-                    # 時區處理
-                    if row["start_time"] and row["start_time"].tzinfo is None:
-                        row["start_time"] = row["start_time"].replace(tzinfo=timezone.utc)
-                    if row["end_time"] and row["end_time"].tzinfo is None:
-                        row["end_time"] = row["end_time"].replace(tzinfo=timezone.utc)
-
-                    processed_votes.append(row)
-
-                return processed_votes
+                return [_normalize_history_row(row) for row in rows]
 
     except Exception as e:
         logger.error(f"查詢投票歷史失敗: {e}")
         return []
 
 
-async def get_vote_count(status: str = "all", guild_id: Optional[int] = None) -> int:
-    """取得投票總數"""
+async def get_vote_history_page(
+    status: str = "all",
+    guild_id: Optional[int] = None,
+    per_page: int = 10,
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+    start_page: int = 1,
+) -> KeysetPage:
+    """
+    Keyset 分頁查詢投票歷史（依 start_time DESC, id DESC），回傳不透明游標
+    start_page 僅在沒有游標時使用（直接跳頁），之後翻頁一律走游標
+    """
     try:
-        conditions = []
-        params: List[Any] = []
+        conditions, params = _history_conditions(status, guild_id)
+        sql, query_params, backwards = build_keyset_query(
+            _HISTORY_SELECT, conditions, params, VOTE_HISTORY_SORT_KEYS, per_page, cursor
+        )
+        offset = 0
+        if backwards is None and start_page > 1:
+            offset = (start_page - 1) * per_page
+            sql += " OFFSET %s"
+            query_params.append(offset)
 
-        if guild_id is not None:
-            conditions.append("guild_id = %s")
-            params.append(guild_id)
+        async with db_pool.connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(sql, tuple(query_params))
+                rows = await cur.fetchall()
 
-        # 根據狀態建立查詢條件
-        if status == "active":
-            conditions.append("end_time > UTC_TIMESTAMP()")
-        elif status == "finished":
-            conditions.append("end_time <= UTC_TIMESTAMP()")
+        total = None
+        if with_total:
+            total = await cached_count(
+                "votes",
+                " AND ".join(conditions),
+                params,
+                lambda: fetch_vote_count(status, guild_id),
+            )
+
+        page = build_page(
+            [_normalize_history_row(row) for row in rows],
+            VOTE_HISTORY_SORT_KEYS,
+            per_page,
+            backwards,
+            total,
+        )
+        if offset and page.items:
+            page.prev_cursor = encode_cursor(VOTE_HISTORY_SORT_KEYS, page.items[0], backwards=True)
+        return page
 
-        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    except Exception as e:
+        logger.error(f"查詢投票歷史失敗: {e}")
+        return KeysetPage()
 
-        async with db_pool.connection() as conn:
-            async with conn.cursor() as cur:
-                query = f"SELECT COUNT(*) FROM votes {where_clause}"
-                await cur.execute(query, tuple(params))
-                result = await cur.fetchone()
-                return result[0] if result else 0
 
+async def fetch_vote_count(status: str = "all", guild_id: Optional[int] = None) -> int:
+    """取得投票總數；查詢失敗時拋出例外（供快取載入使用，錯誤不會被當成 0 快取）"""
+    conditions, params = _history_conditions(status, guild_id)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    async with db_pool.connection() as conn:
+        async with conn.cursor() as cur:
+            query = f"SELECT COUNT(*) FROM votes {where_clause}"
+            await cur.execute(query, tuple(params))
+            result = await cur.fetchone()
+            return result[0] if result else 0
+
+
+async def get_vote_count(status: str = "all", guild_id: Optional[int] = None) -> int:
+    """取得投票總數"""
+    try:
+        return await fetch_vote_count(status, guild_id)
     except Exception as e:
         logger.error(f"get_vote_count 錯誤: {e}")
         return 0
 
 
-async def get_user_vote_history(user_id: int):
-    """查詢特定用戶的投票記錄"""
+async def get_user_vote_history(user_id: int, limit: int = 50):
+    """查詢特定用戶的投票記錄（最近 limit 個投票與各自的選擇，單次查詢）"""
     try:
         async with db_pool.connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
-                # 修正 SQL 查詢
-                query = """
-                    SELECT DISTINCT
-                        vr.vote_id,
-                        v.title as vote_title,
-                        v.start_time,
-                        v.end_time
-                    FROM vote_responses vr
-                    JOIN votes v ON vr.vote_id = v.id
-                    WHERE vr.user_id = %s
-                    GROUP BY vr.vote_id, v.title, v.start_time, v.end_time
-                    ORDER BY v.start_time DESC
-                    LIMIT 50
-                """
-                await cur.execute(query, (user_id,))
-                votes = await cur.fetchall()
-
-                # 為每個投票取得用戶的選擇
-                result = []
-                for vote in votes:
-                    # 取得該用戶在這個投票中的所有選擇
-                    await cur.execute(
-                        """
-                        SELECT option_text FROM vote_responses
-                        WHERE vote_id = %s AND user_id = %s
-                    """,
-                        (vote["vote_id"], user_id),
-                    )
-
-                    choices = []
-                    async for choice_row in cur:
-                        choices.append(choice_row[0])
+                # 先取出最近參與的投票，再一次帶出該用戶在這些投票中的所有選擇
+                await cur.execute(
+                    """
+                    SELECT lv.id AS vote_id, lv.title AS vote_title, lv.start_time,
+                           vr.option_text
+                    FROM (
+                        SELECT v.id, v.title, v.start_time
+                        FROM votes v
+                        JOIN (
+                            SELECT DISTINCT vote_id FROM vote_responses WHERE user_id = %s
+                        ) uv ON uv.vote_id = v.id
+                        ORDER BY v.start_time DESC, v.id DESC
+                        LIMIT %s
+                    ) lv
+                    JOIN vote_responses vr ON vr.vote_id = lv.id AND vr.user_id = %s
+                    ORDER BY lv.start_time DESC, lv.id DESC, vr.voted_at, vr.option_text
+                """,
+                    (user_id, limit, user_id),
+                )
+                rows = await cur.fetchall()
 
-                    # 確保時間有時區資訊
-                    vote_time = vote["start_time"]
-                    if vote_time and vote_time.tzinfo is None:
-                        vote_time = vote_time.replace(tzinfo=timezone.utc)
-
-                    vote_info = {
-                        "vote_id": vote["vote_id"],
-                        "vote_title": vote["vote_title"],
-                        "vote_time": vote_time,
-                        "my_choices": choices,
-                    }
-                    result.append(vote_info)
+        result: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            vote_info = result.get(row["vote_id"])
+            if vote_info is None:
+                # 確保時間有時區資訊
+                vote_time = row["start_time"]
+                if vote_time and vote_time.tzinfo is None:
+                    vote_time = vote_time.replace(tzinfo=timezone.utc)
+                vote_info = result[row["vote_id"]] = {
+                    "vote_id": row["vote_id"],
+                    "vote_title": row["vote_title"],
+                    "vote_time": vote_time,
+                    "my_choices": [],
+                }
+            vote_info["my_choices"].append(row["option_text"])
 
-                return result
+        return list(result.values())
 
     except Exception as e:
         logger.error(f"get_user_vote_history({user_id}) 錯誤: {e}")
@@ -535,14 +763,25 @@ async def get_user_vote_history(user_id: int):
 async def search_votes(
     keyword: str, limit: int = 20, guild_id: Optional[int] = None
 ):
-    """根據關鍵字搜尋投票"""
+    """
+    根據關鍵字搜尋投票
+    優先使用記憶體全文索引依相關度排序；索引無法處理（未載入、單一中文字）時退回 LIKE 查詢
+    """
     try:
-        conditions = ["title LIKE %s"]
-        params: List[Any] = [f"%{keyword}%"]
-
-        if guild_id is not None:
-            conditions.append("guild_id = %s")
-            params.append(guild_id)
+        ranked = await vote_search_index.search(keyword, guild_id=guild_id, limit=limit)
+
+        if ranked is not None:
+            if not ranked:
+                return []
+            vote_ids = [vote_id for vote_id, _ in ranked]
+            conditions = [f"id IN ({', '.join(['%s'] * len(vote_ids))})"]
+            params: List[Any] = list(vote_ids)
+        else:
+            conditions = ["title LIKE %s"]
+            params = [f"%{keyword}%"]
+            if guild_id is not None:
+                conditions.append("guild_id = %s")
+                params.append(guild_id)
 
         where_clause = f"WHERE {' AND '.join(conditions)}"
 
@@ -570,7 +809,11 @@ async def search_votes(
 
                     results.append(row)
 
-                return results
+        if ranked is not None:
+            # 依索引的相關度排序
+            order = {vote_id: i for i, (vote_id, _) in enumerate(ranked)}
+            results.sort(key=lambda row: order.get(row["id"], len(order)))
+        return results
 
     except Exception as e:
         logger.error(f"search_votes 錯誤: {e}")
@@ -871,6 +1114,9 @@ async def close_vote_now(vote_id: int) -> bool:
                     (vote_id,),
                 )
                 await conn.commit()
+                await cache_manager.delete(f"vote:{vote_id}")
+                if cur.rowcount > 0:
+                    vote_deadlines.cancel(vote_id)
                 return cur.rowcount > 0
     except Exception as e:
         logger.error(f"close_vote_now({vote_id}) 錯誤: {e}")
@@ -878,68 +1124,41 @@ async def close_vote_now(vote_id: int) -> bool:
 
 
 async def get_guild_vote_stats(guild_id: int, days: int = 30):
-    """獲取指定伺服器的投票統計（指定天數內）"""
+    """
+    獲取指定伺服器的投票統計（指定天數內）
+    建立數、回應數與參與者讀取每日彙總；進行中的投票數隨時間變化，仍即時查詢（只掃描視窗內的投票）
+    """
     try:
+        totals = await stats_rollup.totals(guild_id, "vote", days)
+        unique_participants = await stats_rollup.count_users(guild_id, "vote.participant", days)
+        top_creators = await stats_rollup.top_users(guild_id, "vote.creator", days, 5)
+
         async with db_pool.connection() as conn:
             async with conn.cursor() as cur:
-                # 獲取基本統計
                 await cur.execute(
                     """
-                    SELECT
-                        COUNT(*) as total_votes,
-                        COUNT(CASE WHEN end_time > UTC_TIMESTAMP() THEN 1 END) as active_votes,
-                        COUNT(CASE WHEN end_time <= UTC_TIMESTAMP() THEN 1 END) as finished_votes
-                    FROM votes
+                    SELECT COUNT(*) FROM votes
                     WHERE guild_id = %s
-                    AND start_time >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL %s DAY)
-                """,
-                    (guild_id, days),
-                )
-
-                basic_stats = await cur.fetchone()
-
-                # 獲取參與統計
-                await cur.execute(
-                    """
-                    SELECT COUNT(DISTINCT vr.user_id) as unique_participants,
-                           COUNT(*) as total_responses
-                    FROM vote_responses vr
-                    JOIN votes v ON vr.vote_id = v.id
-                    WHERE v.guild_id = %s
-                    AND v.start_time >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL %s DAY)
+                    AND start_time >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+                    AND end_time > UTC_TIMESTAMP()
                 """,
-                    (guild_id, days),
+                    (guild_id, max(days - 1, 0)),
                 )
+                row = await cur.fetchone()
+                active_votes = row[0] if row else 0
 
-                participation_stats = await cur.fetchone()
-
-                # 獲取最活躍的投票創建者
-                await cur.execute(
-                    """
-                    SELECT creator_id, COUNT(*) as votes_created
-                    FROM votes
-                    WHERE guild_id = %s
-                    AND start_time >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL %s DAY)
-                    GROUP BY creator_id
-                    ORDER BY votes_created DESC
-                    LIMIT 5
-                """,
-                    (guild_id, days),
-                )
-
-                top_creators = await cur.fetchall()
-
-                return {
-                    "total_votes": basic_stats[0] if basic_stats else 0,
-                    "active_votes": basic_stats[1] if basic_stats else 0,
-                    "finished_votes": basic_stats[2] if basic_stats else 0,
-                    "unique_participants": (participation_stats[0] if participation_stats else 0),
-                    "total_responses": (participation_stats[1] if participation_stats else 0),
-                    "top_creators": [
-                        {"user_id": row[0], "votes_created": row[1]} for row in top_creators
-                    ],
-                    "days_range": days,
-                }
+        total_votes = totals.get("created", 0)
+        return {
+            "total_votes": total_votes,
+            "active_votes": active_votes,
+            "finished_votes": max(total_votes - active_votes, 0),
+            "unique_participants": unique_participants,
+            "total_responses": totals.get("responses", 0),
+            "top_creators": [
+                {"user_id": user_id, "votes_created": count} for user_id, count in top_creators
+            ],
+            "days_range": days,
+        }
 
     except Exception as e:
         logger.error(f"get_guild_vote_stats({guild_id}, {days}) 錯誤: {e}")
@@ -957,78 +1176,59 @@ async def get_guild_vote_stats(guild_id: int, days: int = 30):
 async def get_user_vote_history_detailed(user_id: int, guild_id: int = None, limit: int = 10):
     """獲取使用者詳細投票歷史（包含創建和參與的投票）"""
     try:
+        guild_filter = "AND guild_id = %s" if guild_id else ""
+        guild_params = (guild_id,) if guild_id else ()
+
+        # 創建與參與的投票以 UNION ALL 一次取得
         async with db_pool.connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
-                if guild_id:
-                    # 獲取該用戶創建的投票
-                    await cur.execute(
-                        """
-                        SELECT id, title, start_time, end_time, is_multi, anonymous
-                        FROM votes
-                        WHERE creator_id = %s AND guild_id = %s
-                        ORDER BY start_time DESC
-                        LIMIT %s
-                    """,
-                        (user_id, guild_id, limit),
-                    )
-                else:
-                    await cur.execute(
-                        """
-                        SELECT id, title, start_time, end_time, is_multi, anonymous, guild_id
+                await cur.execute(
+                    f"""
+                    (
+                        SELECT 'created' AS kind, id, title, start_time, end_time,
+                               is_multi, anonymous, guild_id, NULL AS voted_options
                         FROM votes
-                        WHERE creator_id = %s
+                        WHERE creator_id = %s {guild_filter}
                         ORDER BY start_time DESC
                         LIMIT %s
-                    """,
-                        (user_id, limit),
                     )
-
-                created_votes = await cur.fetchall()
-
-                # 獲取該用戶參與的投票
-                if guild_id:
-                    await cur.execute(
-                        """
-                        SELECT DISTINCT v.id, v.title, v.start_time, v.end_time,
-                               GROUP_CONCAT(vr.option_text) as voted_options
-                        FROM votes v
-                        JOIN vote_responses vr ON v.id = vr.vote_id
-                        WHERE vr.user_id = %s AND v.guild_id = %s
-                        GROUP BY v.id, v.title, v.start_time, v.end_time
-                        ORDER BY v.start_time DESC
-                        LIMIT %s
-                    """,
-                        (user_id, guild_id, limit),
-                    )
-                else:
-                    await cur.execute(
-                        """
-                        SELECT DISTINCT v.id, v.title, v.start_time, v.end_time, v.guild_id,
-                               GROUP_CONCAT(vr.option_text) as voted_options
+                    UNION ALL
+                    (
+                        SELECT 'participated' AS kind, v.id, v.title, v.start_time, v.end_time,
+                               v.is_multi, v.anonymous, v.guild_id,
+                               GROUP_CONCAT(vr.option_text ORDER BY vr.option_text) AS voted_options
                         FROM votes v
                         JOIN vote_responses vr ON v.id = vr.vote_id
-                        WHERE vr.user_id = %s
-                        GROUP BY v.id, v.title, v.start_time, v.end_time, v.guild_id
+                        WHERE vr.user_id = %s {guild_filter.replace("guild_id", "v.guild_id")}
+                        GROUP BY v.id, v.title, v.start_time, v.end_time,
+                                 v.is_multi, v.anonymous, v.guild_id
                         ORDER BY v.start_time DESC
                         LIMIT %s
-                    """,
-                        (user_id, limit),
                     )
+                """,
+                    (user_id, *guild_params, limit, user_id, *guild_params, limit),
+                )
+                rows = await cur.fetchall()
 
-                participated_votes = await cur.fetchall()
-
-                # 處理時區
-                for votes in [created_votes, participated_votes]:
-                    for vote in votes:
-                        if vote["start_time"] and vote["start_time"].tzinfo is None:
-                            vote["start_time"] = vote["start_time"].replace(tzinfo=timezone.utc)
-                        if vote["end_time"] and vote["end_time"].tzinfo is None:
-                            vote["end_time"] = vote["end_time"].replace(tzinfo=timezone.utc)
+        created_votes = []
+        participated_votes = []
+        for vote in rows:
+            kind = vote.pop("kind")
+            # 處理時區
+            if vote["start_time"] and vote["start_time"].tzinfo is None:
+                vote["start_time"] = vote["start_time"].replace(tzinfo=timezone.utc)
+            if vote["end_time"] and vote["end_time"].tzinfo is None:
+                vote["end_time"] = vote["end_time"].replace(tzinfo=timezone.utc)
+            if kind == "created":
+                vote.pop("voted_options", None)
+                created_votes.append(vote)
+            else:
+                participated_votes.append(vote)
 
-                return {
-                    "created_votes": list(created_votes),
-                    "participated_votes": list(participated_votes),
-                }
+        return {
+            "created_votes": created_votes,
+            "participated_votes": participated_votes,
+        }
 
     except Exception as e:
         logger.error(f"get_user_vote_history_detailed({user_id}, {guild_id}) 錯誤: {e}")
@@ -8,9 +8,20 @@ import json
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
+import aiomysql
+
 from potato_bot.db.base_dao import BaseDAO
+from potato_bot.db.pagination import (
+    KeysetPage,
+    SortKey,
+    build_keyset_query,
+    build_page,
+    cached_count,
+)
 from potato_shared.logger import logger
 
+WEBHOOK_LOG_SORT_KEYS = [SortKey("l.created_at", "created_at"), SortKey("l.id", "id")]
+
 
 class WebhookDAO(BaseDAO):
     """Webhook資料存取物件"""
@@ -402,6 +413,80 @@ class WebhookDAO(BaseDAO):
             logger.error(f"獲取Webhook執行日誌失敗: {e}")
             return [], 0
 
+    async def get_webhook_logs_page(
+        self,
+        webhook_id: Optional[str] = None,
+        days: int = 7,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+    ) -> KeysetPage:
+        """Keyset 分頁獲取Webhook執行日誌（依 created_at DESC, id DESC）"""
+        try:
+            await self._ensure_initialized()
+
+            conditions = []
+            params: List[Any] = []
+
+            if webhook_id:
+                conditions.append("l.webhook_id = %s")
+                params.append(webhook_id)
+
+            if days > 0:
+                # 取整到分鐘，讓同一分鐘內翻頁共用總數快取
+                start_date = (datetime.now(timezone.utc) - timedelta(days=days)).replace(
+                    second=0, microsecond=0
+                )
+                conditions.append("l.created_at >= %s")
+                params.append(start_date)
+
+            sql, query_params, backwards = build_keyset_query(
+                """
+                SELECT l.id, l.webhook_id, w.name as webhook_name, l.event_type,
+                       l.direction, l.status, l.http_status, l.error_message,
+                       l.execution_time, l.created_at
+                FROM webhook_logs l
+                LEFT JOIN webhooks w ON l.webhook_id = w.id
+                """,
+                conditions,
+                params,
+                WEBHOOK_LOG_SORT_KEYS,
+                limit,
+                cursor,
+            )
+
+            async with self.db.connection() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as db_cursor:
+                    await db_cursor.execute(sql, query_params)
+                    rows = await db_cursor.fetchall()
+
+            for row in rows:
+                row["execution_time"] = float(row["execution_time"] or 0.0)
+
+            total = None
+            if with_total:
+                where_sql = " AND ".join(conditions)
+                total = await cached_count(
+                    "webhook_logs",
+                    where_sql,
+                    params,
+                    lambda: self._count_webhook_logs(where_sql, params),
+                )
+
+            return build_page(rows, WEBHOOK_LOG_SORT_KEYS, limit, backwards, total)
+
+        except Exception as e:
+            logger.error(f"獲取Webhook執行日誌失敗: {e}")
+            return KeysetPage()
+
+    async def _count_webhook_logs(self, where_sql: str, params: List[Any]) -> int:
+        where_clause = f"WHERE {where_sql}" if where_sql else ""
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(f"SELECT COUNT(*) FROM webhook_logs l {where_clause}", params)
+                result = await cursor.fetchone()
+                return result[0] if result else 0
+
     # ========== 統計操作 ==========
 
     async def update_webhook_statistics(
@@ -475,7 +560,8 @@ class WebhookDAO(BaseDAO):
                             SUM(total_requests) as total_requests,
                             SUM(successful_requests) as successful_requests,
                             SUM(failed_requests) as failed_requests,
-                            AVG(avg_response_time) as avg_response_time
+                            SUM(avg_response_time * total_requests) / NULLIF(SUM(total_requests), 0)
+                                as avg_response_time
                         FROM webhook_statistics
                         WHERE webhook_id = %s AND date BETWEEN %s AND %s
                     """,
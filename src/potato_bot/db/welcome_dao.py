@@ -9,8 +9,13 @@ from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
 from potato_bot.db.base_dao import BaseDAO
+from potato_bot.db.guild_settings_registry import guild_settings_registry
+from potato_bot.db.stats_rollup import stats_rollup
 from potato_shared.logger import logger
 
+# log_welcome_event 的 action_type → welcome_logs.event_type
+WELCOME_EVENT_TYPES = {"join": "member_join", "leave": "member_leave"}
+
 
 def _normalize_color(value: Any, default: int = 0x00FF00) -> int:
     if value is None:
@@ -250,14 +255,15 @@ class WelcomeDAO(BaseDAO):
                     await cursor.execute(
                         """
                         INSERT INTO welcome_logs (
-                            guild_id, user_id, username,
+                            guild_id, user_id, username, event_type,
                             welcome_sent, roles_assigned, dm_sent, error_message
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                     """,
                         (
                             guild_id,
                             user_id,
                             username,
+                            WELCOME_EVENT_TYPES.get(action_type, action_type),
                             welcome_sent,
                             roles_json,
                             dm_sent,
@@ -267,6 +273,7 @@ class WelcomeDAO(BaseDAO):
 
                     log_id = cursor.lastrowid
                     await conn.commit()
+                    stats_rollup.mark("welcome", log_id)
                     return log_id
 
         except Exception as e:
@@ -321,56 +328,22 @@ class WelcomeDAO(BaseDAO):
             return []
 
     async def get_welcome_statistics(self, guild_id: int, days: int = 30) -> Dict[str, Any]:
-        """取得歡迎統計"""
+        """取得歡迎統計（讀取每日彙總）"""
         try:
-            end_date = datetime.now(timezone.utc)
-            start_date = end_date - timedelta(days=days)
-
-            async with self.db.connection() as conn:
-                async with conn.cursor() as cursor:
-                    # 基礎統計
-                    await cursor.execute(
-                        """
-                        SELECT
-                            COUNT(*) as total_events,
-                            SUM(CASE WHEN action_type = 'join' THEN 1 ELSE 0 END) as joins,
-                            SUM(CASE WHEN action_type = 'leave' THEN 1 ELSE 0 END) as leaves,
-                            SUM(CASE WHEN welcome_sent = 1 THEN 1 ELSE 0 END) as welcome_sent,
-                            SUM(CASE WHEN dm_sent = 1 THEN 1 ELSE 0 END) as dm_sent,
-                            SUM(CASE WHEN roles_assigned IS NOT NULL AND roles_assigned != '[]' THEN 1 ELSE 0 END) as roles_assigned
-                        FROM welcome_logs
-                        WHERE guild_id = %s AND created_at >= %s
-                    """,
-                        (guild_id, start_date),
-                    )
-
-                    result = await cursor.fetchone()
-
-                    statistics = {
-                        "total_events": result[0] or 0,
-                        "joins": result[1] or 0,
-                        "leaves": result[2] or 0,
-                        "welcome_sent": result[3] or 0,
-                        "dm_sent": result[4] or 0,
-                        "roles_assigned": result[5] or 0,
-                        "period_days": days,
-                        "net_growth": (result[1] or 0) - (result[2] or 0),
-                    }
-
-                    # 錯誤統計
-                    await cursor.execute(
-                        """
-                        SELECT COUNT(*) as error_count
-                        FROM welcome_logs
-                        WHERE guild_id = %s AND created_at >= %s AND error_message IS NOT NULL
-                    """,
-                        (guild_id, start_date),
-                    )
-
-                    error_result = await cursor.fetchone()
-                    statistics["errors"] = error_result[0] or 0
-
-                    return statistics
+            totals = await stats_rollup.totals(guild_id, "welcome", days)
+            joins = totals.get("joins", 0)
+            leaves = totals.get("leaves", 0)
+            return {
+                "total_events": totals.get("total_events", 0),
+                "joins": joins,
+                "leaves": leaves,
+                "welcome_sent": totals.get("welcome_sent", 0),
+                "dm_sent": totals.get("dm_sent", 0),
+                "roles_assigned": totals.get("roles_assigned", 0),
+                "period_days": days,
+                "net_growth": joins - leaves,
+                "errors": totals.get("errors", 0),
+            }
 
         except Exception as e:
             logger.error(f"取得歡迎統計錯誤 (guild_id: {guild_id}): {e}")
@@ -379,7 +352,52 @@ class WelcomeDAO(BaseDAO):
     # ========== 系統設定管理 ==========
 
     async def get_system_settings(self, guild_id: int) -> Optional[Dict[str, Any]]:
-        """取得系統設定"""
+        """取得系統設定（讀取設定快照：沒有設定列的伺服器也會保留空快照，不再重複查詢）"""
+        try:
+            snapshot = await guild_settings_registry.snapshot("system", guild_id)
+            if not snapshot.data:
+                return None
+            # 回傳副本，避免呼叫端修改到快照內容
+            return snapshot.to_dict()
+
+        except Exception as e:
+            logger.error(f"取得系統設定錯誤 (guild_id: {guild_id}): {e}")
+            return None
+
+    @staticmethod
+    def _parse_system_settings(row) -> Dict[str, Any]:
+        return {
+            "general_settings": (json.loads(row[0]) if row[0] else {}),
+            "channel_settings": (json.loads(row[1]) if row[1] else {}),
+            "role_settings": (json.loads(row[2]) if row[2] else {}),
+            "notification_settings": (json.loads(row[3]) if row[3] else {}),
+            "feature_toggles": (json.loads(row[4]) if row[4] else {}),
+            "custom_settings": (json.loads(row[5]) if row[5] else {}),
+        }
+
+    async def fetch_system_settings(self, guild_id: int) -> Optional[Dict[str, Any]]:
+        """從資料庫讀取系統設定（錯誤時拋出例外，避免被當成查無資料保存）"""
+        await self._ensure_initialized()
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    SELECT general_settings, channel_settings, role_settings,
+                           notification_settings, feature_toggles, custom_settings
+                    FROM system_settings
+                    WHERE guild_id = %s
+                """,
+                    (guild_id,),
+                )
+
+                result = await cursor.fetchone()
+                if not result:
+                    return None
+
+                return self._parse_system_settings(result)
+
+    async def get_all_system_settings(self) -> List[Dict[str, Any]]:
+        """取得所有伺服器的系統設定（啟動預載用）"""
         await self._ensure_initialized()
         try:
             async with self.db.connection() as conn:
@@ -387,30 +405,19 @@ class WelcomeDAO(BaseDAO):
                     await cursor.execute(
                         """
                         SELECT general_settings, channel_settings, role_settings,
-                               notification_settings, feature_toggles, custom_settings
+                               notification_settings, feature_toggles, custom_settings,
+                               guild_id
                         FROM system_settings
-                        WHERE guild_id = %s
-                    """,
-                        (guild_id,),
+                    """
                     )
+                    results = await cursor.fetchall()
 
-                    result = await cursor.fetchone()
-                    if result:
-                        settings = {
-                            "general_settings": (json.loads(result[0]) if result[0] else {}),
-                            "channel_settings": (json.loads(result[1]) if result[1] else {}),
-                            "role_settings": (json.loads(result[2]) if result[2] else {}),
-                            "notification_settings": (json.loads(result[3]) if result[3] else {}),
-                            "feature_toggles": (json.loads(result[4]) if result[4] else {}),
-                            "custom_settings": (json.loads(result[5]) if result[5] else {}),
-                        }
-                        return settings
-
-                    return None
-
+            return [
+                {**self._parse_system_settings(row), "guild_id": row[6]} for row in results
+            ]
         except Exception as e:
-            logger.error(f"取得系統設定錯誤 (guild_id: {guild_id}): {e}")
-            return None
+            logger.error(f"取得所有系統設定錯誤: {e}")
+            return []
 
     async def update_system_settings(
         self, guild_id: int, settings_type: str, settings: Dict[str, Any]
@@ -445,7 +452,9 @@ class WelcomeDAO(BaseDAO):
 
                     await cursor.execute(query, (guild_id, settings_json))
                     await conn.commit()
-                    return True
+
+            await guild_settings_registry.refresh("system", guild_id)
+            return True
 
         except Exception as e:
             logger.error(f"更新系統設定錯誤 (guild_id: {guild_id}, type: {settings_type}): {e}")
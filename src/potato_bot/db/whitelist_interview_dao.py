@@ -9,6 +9,7 @@ from datetime import date
 from typing import Any, Dict, List, Optional
 
 from potato_bot.db.base_dao import BaseDAO
+from potato_bot.db.guild_settings_registry import guild_settings_registry
 from potato_bot.db.pool import db_pool
 from potato_shared.logger import logger
 
@@ -60,6 +61,12 @@ class WhitelistInterviewDAO(BaseDAO):
         result = await self.execute_query(query, (guild_id,), fetch_one=True, dictionary=True)
         return result or {}
 
+    async def get_all_settings(self) -> List[Dict[str, Any]]:
+        """取得所有伺服器的面試設定（啟動預載用）"""
+        await self._ensure_initialized()
+        query = "SELECT * FROM whitelist_interview_settings"
+        return await self.execute_query(query, fetch_all=True, dictionary=True) or []
+
     async def upsert_settings(self, guild_id: int, **settings: Any) -> None:
         await self._ensure_initialized()
         keys = [
@@ -89,6 +96,7 @@ class WhitelistInterviewDAO(BaseDAO):
                 is_enabled=VALUES(is_enabled)
         """
         await self.execute_query(query, (guild_id, *values))
+        await guild_settings_registry.refresh("whitelist_interview", guild_id)
 
     async def update_enabled(self, guild_id: int, enabled: bool) -> None:
         await self._ensure_initialized()
@@ -98,6 +106,7 @@ class WhitelistInterviewDAO(BaseDAO):
             ON DUPLICATE KEY UPDATE is_enabled=VALUES(is_enabled)
         """
         await self.execute_query(query, (guild_id, enabled))
+        await guild_settings_registry.refresh("whitelist_interview", guild_id)
 
     # --------- Queue ----------
     async def get_or_create_queue_entry(
@@ -143,6 +143,9 @@ class PotatoBot(commands.Bot):
         await self._init_database_infra()
 
         # 3) 初始化核心服務（已停用 guild 管理）
+        await self._preload_guild_settings()
+        await self._load_ticket_channel_index()
+        await self._start_stats_rollup()
 
         # 4) 載入所有 Cogs（Plugin Orchestrator）
         await self._load_extensions()
@@ -209,6 +212,40 @@ class PotatoBot(commands.Bot):
                     logger.error(f"❌ DB 初始化最終失敗：{e}")
                     raise
 
+    # --------------------------
+    # ✅ 伺服器設定快照預載（之後由 DAO 寫入時推送更新）
+    # --------------------------
+    async def _preload_guild_settings(self) -> None:
+        try:
+            from potato_bot.db.guild_settings_registry import guild_settings_registry
+
+            count = await guild_settings_registry.load_all()
+            logger.info(f"✅ 伺服器設定快照預載完成：{count} 筆")
+        except Exception as e:
+            logger.error(f"❌ 預載伺服器設定失敗：{e}")
+
+    # --------------------------
+    # ✅ 票券頻道索引（channel_id → 開啟中票券）
+    # --------------------------
+    async def _load_ticket_channel_index(self) -> None:
+        try:
+            from potato_bot.db.ticket_channel_index import ticket_channel_index
+
+            await ticket_channel_index.load()
+        except Exception as e:
+            logger.error(f"❌ 載入票券頻道索引失敗：{e}")
+
+    # --------------------------
+    # ✅ 每日統計彙總（背景重新計算變動日期，首次啟動時回填）
+    # --------------------------
+    async def _start_stats_rollup(self) -> None:
+        try:
+            from potato_bot.db.stats_rollup import stats_rollup
+
+            await stats_rollup.start()
+        except Exception as e:
+            logger.error(f"❌ 啟動統計彙總失敗：{e}")
+
     # --------------------------
     # ✅ Cogs 載入（Plugin Orchestrator）
     # --------------------------
@@ -313,6 +350,42 @@ class PotatoBot(commands.Bot):
         except Exception as e:
             logger.error(f"❌ 取消背景任務時發生錯誤：{e}")
 
+        # 寫入票券訊息緩衝（需在關閉 DB 前完成）
+        try:
+            from potato_bot.services.ticket_message_buffer import ticket_message_buffer
+
+            await ticket_message_buffer.close()
+            logger.info("✅ 票券訊息緩衝已寫入")
+        except Exception as e:
+            logger.error(f"❌ 寫入票券訊息緩衝時發生錯誤：{e}")
+
+        # 寫入投票計票緩衝
+        try:
+            from potato_bot.services.vote_tally import vote_tally_engine
+
+            await vote_tally_engine.close()
+            logger.info("✅ 投票計票已寫入")
+        except Exception as e:
+            logger.error(f"❌ 寫入投票計票時發生錯誤：{e}")
+
+        # 寫入抽獎參與緩衝
+        try:
+            from potato_bot.services.lottery_entries import lottery_entry_buffer
+
+            await lottery_entry_buffer.close()
+            logger.info("✅ 抽獎參與記錄已寫入")
+        except Exception as e:
+            logger.error(f"❌ 寫入抽獎參與記錄時發生錯誤：{e}")
+
+        # 重新計算尚未處理的統計彙總
+        try:
+            from potato_bot.db.stats_rollup import stats_rollup
+
+            await stats_rollup.close()
+            logger.info("✅ 統計彙總已更新")
+        except Exception as e:
+            logger.error(f"❌ 更新統計彙總時發生錯誤：{e}")
+
         # 關閉 DB Pool
         try:
             await close_database()
@@ -1,24 +1,31 @@
 # bot/services/chat_transcript_manager.py
 """
 票券聊天記錄管理器
-負責記錄、存儲和匯出票券對話內容
+負責記錄、存儲和匯出票券對話內容（記錄檔由 transcript_builder 增量產生、transcript_store 壓縮封存）
 """
 
-import asyncio
 import json
+import re
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
-import aiofiles
 import aiomysql
 import discord
 
 from potato_bot.db.pool import db_pool
+from potato_bot.services.ticket_message_buffer import ticket_message_buffer
+from potato_bot.services.transcript_builder import TRANSCRIPT_FORMATS, transcript_builder
+from potato_bot.services.transcript_store import ArchivedTranscript, transcript_store
 from potato_bot.utils.ticket_constants import TicketConstants
 from potato_shared.logger import logger
 
+HISTORY_PAGE_SIZE = 100  # channel.history 每次 API 請求的訊息數
+
+# (已掃描訊息數, 已新增訊息數)
+HistoryProgress = Callable[[int, int], Awaitable[None]]
+
 
 @dataclass
 class ChatMessage:
@@ -52,32 +59,13 @@ class ChatTranscriptManager:
     def __init__(self, config: Optional[TranscriptConfig] = None):
         self.config = config or TranscriptConfig()
         self.db = db_pool
-        self.transcript_dir = Path("transcripts")
+        self.transcript_dir = transcript_builder.root
         self.transcript_dir.mkdir(exist_ok=True)
 
     async def record_message(self, ticket_id: int, message: discord.Message) -> bool:
         """記錄單一聊天訊息"""
         try:
-            # 判斷訊息類型
-            message_type = self._determine_message_type(message)
-
-            # 處理附件
-            attachments = []
-            if message.attachments:
-                for attachment in message.attachments:
-                    attachments.append(
-                        {
-                            "filename": attachment.filename,
-                            "url": attachment.url,
-                            "size": attachment.size,
-                            "content_type": attachment.content_type,
-                        }
-                    )
-
-            # 處理回覆
-            reply_to = None
-            if hasattr(message, "reference") and message.reference:
-                reply_to = message.reference.message_id
+            row = self.build_message_row(ticket_id, message)
 
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
@@ -91,26 +79,53 @@ class ChatTranscriptManager:
                         content = VALUES(content),
                         edited_timestamp = NOW()
                     """,
-                        (
-                            ticket_id,
-                            message.id,
-                            message.author.id,
-                            message.author.display_name,
-                            message.content or "[無文字內容]",
-                            json.dumps(attachments, ensure_ascii=False),
-                            message_type,
-                            message.created_at,
-                            reply_to,
-                        ),
+                        row,
                     )
 
                     await conn.commit()
-                    return True
+
+            await transcript_builder.append_rows([row])
+            return True
 
         except Exception as e:
             logger.error(f"記錄訊息失敗 (ticket_id={ticket_id}, message_id={message.id}): {e}")
             return False
 
+    def build_message_row(self, ticket_id: int, message: discord.Message) -> Tuple:
+        """將 Discord 訊息轉為 ticket_messages 的欄位值（順序與 INSERT 欄位一致）"""
+        # 判斷訊息類型
+        message_type = self._determine_message_type(message)
+
+        # 處理附件
+        attachments = []
+        if message.attachments:
+            for attachment in message.attachments:
+                attachments.append(
+                    {
+                        "filename": attachment.filename,
+                        "url": attachment.url,
+                        "size": attachment.size,
+                        "content_type": attachment.content_type,
+                    }
+                )
+
+        # 處理回覆
+        reply_to = None
+        if hasattr(message, "reference") and message.reference:
+            reply_to = message.reference.message_id
+
+        return (
+            ticket_id,
+            message.id,
+            message.author.id,
+            message.author.display_name,
+            message.content or "[無文字內容]",
+            json.dumps(attachments, ensure_ascii=False),
+            message_type,
+            message.created_at,
+            reply_to,
+        )
+
     def _determine_message_type(self, message: discord.Message) -> str:
         """判斷訊息類型"""
         if message.author.bot:
@@ -165,50 +180,58 @@ class ChatTranscriptManager:
             return []
 
     async def export_transcript(self, ticket_id: int, format_type: str = "html") -> Optional[str]:
-        """匯出票券聊天記錄"""
+        """
+        匯出票券聊天記錄
+        訊息已由 transcript_builder 增量寫入進行中檔案，這裡只補上頁尾並移到正式位置
+        """
         try:
-            # 獲取票券訊息
-            messages = await self.get_ticket_messages(ticket_id)
-            if not messages:
-                logger.warning(f"票券 {ticket_id} 沒有聊天記錄")
-                return None
+            if format_type not in TRANSCRIPT_FORMATS:
+                raise ValueError(f"不支援的格式: {format_type}")
 
             # 獲取票券基本資訊
             ticket_info = await self._get_ticket_info(ticket_id)
 
-            # 根據格式類型生成記錄
-            if format_type == "html":
-                content = await self._generate_html_transcript(ticket_info, messages)
-                file_extension = "html"
-            elif format_type == "text":
-                content = await self._generate_text_transcript(ticket_info, messages)
-                file_extension = "txt"
-            elif format_type == "json":
-                content = await self._generate_json_transcript(ticket_info, messages)
-                file_extension = "json"
-            else:
-                raise ValueError(f"不支援的格式: {format_type}")
-
             # 生成檔案路徑
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename_parts = [f"ticket_{ticket_id:04d}"]
             if ticket_info.get("type") == TicketConstants.SPONSOR_TICKET_NAME:
                 filename_parts.append("donate")
             filename_parts.append(timestamp)
-            filename = f"{'_'.join(filename_parts)}.{file_extension}"
-            file_path = self.transcript_dir / filename
+            filename = f"{'_'.join(filename_parts)}.{TRANSCRIPT_FORMATS[format_type]}"
 
-            # 寫入檔案
-            async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
-                await f.write(content)
+            # 完成的檔案先放在進行中目錄，封存後即移除
+            transcript = await transcript_builder.finalize(
+                ticket_id, format_type, transcript_builder.live_dir / filename, ticket_info
+            )
+            if transcript is None:
+                logger.warning(f"票券 {ticket_id} 沒有聊天記錄")
+                return None
 
-            # 保存到資料庫
+            # 壓縮後移入 伺服器/年-月 分目錄
+            archived = await transcript_store.archive(
+                transcript.path,
+                ticket_id=ticket_id,
+                fmt=format_type,
+                sha256=transcript.sha256,
+                guild_id=ticket_info.get("guild_id"),
+            )
+            file_path = str(transcript_store.root / archived.file)
+
+            # 資料庫只保存路徑與雜湊
             await self._save_transcript_record(
-                ticket_id, content, format_type, str(file_path), len(messages)
+                ticket_id,
+                format_type,
+                file_path,
+                archived.stored_size,
+                archived.sha256,
+                transcript.message_count,
             )
 
-            logger.info(f"✅ 票券 {ticket_id} 聊天記錄匯出完成: {filename}")
-            return str(file_path)
+            logger.info(
+                f"✅ 票券 {ticket_id} 聊天記錄匯出完成: {archived.file} "
+                f"({archived.raw_size} → {archived.stored_size} bytes)"
+            )
+            return file_path
 
         except Exception as e:
             logger.error(f"❌ 匯出票券 {ticket_id} 聊天記錄失敗: {e}")
@@ -221,7 +244,8 @@ class ChatTranscriptManager:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     await cursor.execute(
                         """
-                        SELECT * FROM tickets WHERE id = %s
+                        SELECT id, guild_id, username, type, status, created_at, closed_at
+                        FROM tickets WHERE id = %s
                     """,
                         (ticket_id,),
                     )
@@ -232,288 +256,86 @@ class ChatTranscriptManager:
             logger.error(f"獲取票券資訊失敗 (ticket_id={ticket_id}): {e}")
             return {}
 
-    async def _generate_html_transcript(
-        self, ticket_info: Dict, messages: List[ChatMessage]
-    ) -> str:
-        """生成 HTML 格式聊天記錄"""
-        html = f"""
-        <!DOCTYPE html>
-        <html lang="zh-TW">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>票券 #{ticket_info.get('id', 'Unknown'):04d} 聊天記錄</title>
-            <style>
-                body {{
-                    font-family: 'Microsoft JhengHei', Arial, sans-serif;
-                    margin: 20px;
-                    background-color: #f5f5f5;
-                }}
-                .header {{
-                    background: #7289da;
-                    color: white;
-                    padding: 20px;
-                    border-radius: 8px;
-                    margin-bottom: 20px;
-                }}
-                .message {{
-                    background: white;
-                    margin: 10px 0;
-                    padding: 15px;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                }}
-                .message.staff {{ background: #e8f5e8; }}
-                .message.bot {{ background: #fff2e8; }}
-                .message.system {{ background: #f0f0f0; }}
-                .author {{
-                    font-weight: bold;
-                    color: #7289da;
-                    margin-bottom: 5px;
-                }}
-                .timestamp {{
-                    font-size: 12px;
-                    color: #666;
-                    margin-bottom: 8px;
-                }}
-                .content {{
-                    line-height: 1.4;
-                    word-wrap: break-word;
-                }}
-                .attachments {{
-                    margin-top: 10px;
-                    padding: 10px;
-                    background: #f8f8f8;
-                    border-radius: 4px;
-                }}
-                .attachment {{
-                    margin: 5px 0;
-                }}
-                .reply {{
-                    border-left: 4px solid #7289da;
-                    padding-left: 10px;
-                    margin-bottom: 8px;
-                    background: rgba(114, 137, 218, 0.1);
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>票券 #{ticket_info.get('id', 'Unknown'):04d} 聊天記錄</h1>
-                <p><strong>建立者:</strong> {ticket_info.get('username', 'Unknown')}</p>
-                <p><strong>類型:</strong> {ticket_info.get('type', 'Unknown')}</p>
-                <p><strong>狀態:</strong> {ticket_info.get('status', 'Unknown')}</p>
-                <p><strong>建立時間:</strong> {ticket_info.get('created_at', 'Unknown')}</p>
-                <p><strong>訊息數量:</strong> {len(messages)} 條</p>
-            </div>
-        """
-
-        for message in messages:
-            # 處理回覆
-            reply_html = ""
-            if message.reply_to:
-                reply_html = '<div class="reply">回覆某則訊息</div>'
-
-            # 處理附件
-            attachments_html = ""
-            if message.attachments:
-                attachments_html = '<div class="attachments"><strong>附件:</strong><br>'
-                for att in message.attachments:
-                    attachments_html += f'<div class="attachment">📎 {att["filename"]} ({att.get("size", 0)} bytes)</div>'
-                attachments_html += "</div>"
-
-            # 處理訊息內容
-            content = (
-                message.content.replace("\n", "<br>").replace("<", "&lt;").replace(">", "&gt;")
-            )
-
-            html += f"""
-            <div class="message {message.message_type}">
-                <div class="author">{message.author_name} <span style="font-size: 12px; color: #888;">({message.message_type})</span></div>
-                <div class="timestamp">{message.timestamp.strftime('%Y-%m-%d %H:%M:%S')}</div>
-                {reply_html}
-                <div class="content">{content}</div>
-                {attachments_html}
-            </div>
-            """
-
-        html += """
-        </body>
-        </html>
-        """
-
-        return html
-
-    async def _generate_text_transcript(
-        self, ticket_info: Dict, messages: List[ChatMessage]
-    ) -> str:
-        """生成純文字格式聊天記錄"""
-        lines = [
-            f"票券 #{ticket_info.get('id', 'Unknown'):04d} 聊天記錄",
-            "=" * 50,
-            f"建立者: {ticket_info.get('username', 'Unknown')}",
-            f"類型: {ticket_info.get('type', 'Unknown')}",
-            f"狀態: {ticket_info.get('status', 'Unknown')}",
-            f"建立時間: {ticket_info.get('created_at', 'Unknown')}",
-            f"訊息數量: {len(messages)} 條",
-            "=" * 50,
-            "",
-        ]
-
-        for message in messages:
-            lines.append(
-                f"[{message.timestamp.strftime('%Y-%m-%d %H:%M:%S')}] {message.author_name} ({message.message_type}):"
-            )
-            lines.append(f"  {message.content}")
-
-            if message.attachments:
-                lines.append("  附件:")
-                for att in message.attachments:
-                    lines.append(f"    📎 {att['filename']}")
-
-            lines.append("")
-
-        return "\n".join(lines)
-
-    async def _generate_json_transcript(
-        self, ticket_info: Dict, messages: List[ChatMessage]
-    ) -> str:
-        """生成 JSON 格式聊天記錄"""
-        data = {
-            "ticket_info": {
-                "id": ticket_info.get("id"),
-                "username": ticket_info.get("username"),
-                "type": ticket_info.get("type"),
-                "status": ticket_info.get("status"),
-                "created_at": str(ticket_info.get("created_at")),
-                "message_count": len(messages),
-            },
-            "messages": [],
-        }
-
-        for message in messages:
-            data["messages"].append(
-                {
-                    "message_id": message.message_id,
-                    "author_id": message.author_id,
-                    "author_name": message.author_name,
-                    "content": message.content,
-                    "attachments": message.attachments,
-                    "message_type": message.message_type,
-                    "timestamp": message.timestamp.isoformat(),
-                    "edited_timestamp": (
-                        message.edited_timestamp.isoformat() if message.edited_timestamp else None
-                    ),
-                    "reply_to": message.reply_to,
-                }
-            )
-
-        return json.dumps(data, ensure_ascii=False, indent=2)
-
     async def _save_transcript_record(
         self,
         ticket_id: int,
-        content: str,
         format_type: str,
         file_path: str,
+        file_size: int,
+        content_hash: str,
         message_count: int,
     ):
-        """保存聊天記錄到資料庫"""
+        """保存聊天記錄檔案位置與雜湊到資料庫（不再保存完整內容）"""
         try:
-            file_size = Path(file_path).stat().st_size
-
             async with self.db.connection() as conn:
                 async with conn.cursor() as cursor:
-                    # 根據格式類型決定儲存欄位
-                    if format_type == "html":
-                        await cursor.execute(
-                            """
-                            INSERT INTO ticket_transcripts
-                            (ticket_id, transcript_html, message_count, file_path, file_size, export_format)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                            transcript_html = VALUES(transcript_html),
-                            message_count = VALUES(message_count),
-                            file_path = VALUES(file_path),
-                            file_size = VALUES(file_size),
-                            export_format = VALUES(export_format)
-                        """,
-                            (
-                                ticket_id,
-                                content,
-                                message_count,
-                                file_path,
-                                file_size,
-                                format_type,
-                            ),
-                        )
-                    elif format_type == "text":
-                        await cursor.execute(
-                            """
-                            INSERT INTO ticket_transcripts
-                            (ticket_id, transcript_text, message_count, file_path, file_size, export_format)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                            transcript_text = VALUES(transcript_text),
-                            message_count = VALUES(message_count),
-                            file_path = VALUES(file_path),
-                            file_size = VALUES(file_size),
-                            export_format = VALUES(export_format)
-                        """,
-                            (
-                                ticket_id,
-                                content,
-                                message_count,
-                                file_path,
-                                file_size,
-                                format_type,
-                            ),
-                        )
-                    elif format_type == "json":
-                        await cursor.execute(
-                            """
-                            INSERT INTO ticket_transcripts
-                            (ticket_id, transcript_json, message_count, file_path, file_size, export_format)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                            transcript_json = VALUES(transcript_json),
-                            message_count = VALUES(message_count),
-                            file_path = VALUES(file_path),
-                            file_size = VALUES(file_size),
-                            export_format = VALUES(export_format)
-                        """,
-                            (
-                                ticket_id,
-                                content,
-                                message_count,
-                                file_path,
-                                file_size,
-                                format_type,
-                            ),
-                        )
+                    await cursor.execute(
+                        """
+                        INSERT INTO ticket_transcripts
+                        (ticket_id, message_count, file_path, file_size, content_hash, export_format)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE
+                        transcript_html = NULL,
+                        transcript_text = NULL,
+                        transcript_json = NULL,
+                        message_count = VALUES(message_count),
+                        file_path = VALUES(file_path),
+                        file_size = VALUES(file_size),
+                        content_hash = VALUES(content_hash),
+                        export_format = VALUES(export_format)
+                    """,
+                        (ticket_id, message_count, file_path, file_size, content_hash, format_type),
+                    )
 
                     await conn.commit()
 
         except Exception as e:
             logger.error(f"保存聊天記錄到資料庫失敗 (ticket_id={ticket_id}): {e}")
 
-    async def cleanup_old_transcripts(self, days: int = 30) -> int:
-        """清理舊的聊天記錄檔案"""
+    async def cleanup_old_transcripts(self, days: Optional[int] = None) -> int:
+        """
+        清理超過保留期限的聊天記錄
+        封存區依 manifest 清理；根目錄中舊版未壓縮的檔案過期則刪除，否則移入封存區
+        """
+        days = days or self.config.retention_days
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            deleted_count = 0
+            removed = await transcript_store.prune(days)
+            await self._clear_transcript_paths(
+                [str(transcript_store.root / entry.file) for entry in removed]
+            )
+            deleted_count = len(removed)
 
-            # 清理檔案系統中的舊檔案
+            # 舊版直接存放在根目錄的未壓縮檔案
+            cutoff_date = datetime.now() - timedelta(days=days)
+            legacy_suffixes = {f".{ext}" for ext in TRANSCRIPT_FORMATS.values()}
+            format_by_suffix = {f".{ext}": fmt for fmt, ext in TRANSCRIPT_FORMATS.items()}
             for file_path in self.transcript_dir.iterdir():
-                if file_path.is_file():
+                if not file_path.is_file() or file_path.suffix not in legacy_suffixes:
+                    continue
+                try:
                     file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
                     if file_time < cutoff_date:
-                        try:
-                            file_path.unlink()
-                            deleted_count += 1
-                            logger.info(f"🗑️ 已刪除舊聊天記錄檔案: {file_path.name}")
-                        except Exception as e:
-                            logger.warning(f"刪除檔案 {file_path.name} 失敗: {e}")
+                        file_path.unlink()
+                        await self._clear_transcript_paths([str(file_path)])
+                        deleted_count += 1
+                        logger.info(f"🗑️ 已刪除舊聊天記錄檔案: {file_path.name}")
+                        continue
+
+                    match = re.match(r"ticket_(\d+)", file_path.name)
+                    archived = await transcript_store.archive(
+                        file_path,
+                        ticket_id=int(match.group(1)) if match else 0,
+                        fmt=format_by_suffix[file_path.suffix],
+                        archived_at=file_time,
+                    )
+                    await self._move_legacy_transcript(
+                        str(file_path), str(transcript_store.root / archived.file), archived
+                    )
+                except Exception as e:
+                    logger.warning(f"處理舊聊天記錄檔案 {file_path.name} 失敗: {e}")
+
+            # 未經正常關閉流程的進行中檔案
+            deleted_count += transcript_builder.cleanup_stale(days)
 
             return deleted_count
 
@@ -521,26 +343,142 @@ class ChatTranscriptManager:
             logger.error(f"清理舊聊天記錄失敗: {e}")
             return 0
 
-    async def batch_record_channel_history(
-        self, ticket_id: int, channel: discord.TextChannel, limit: int = None
-    ) -> int:
-        """批量記錄頻道歷史訊息"""
+    async def _clear_transcript_paths(self, file_paths: List[str]):
+        """檔案已刪除的聊天記錄：清除資料庫中的路徑"""
+        if not file_paths:
+            return
         try:
-            recorded_count = 0
-
-            logger.info(f"開始批量記錄頻道歷史訊息 (ticket_id={ticket_id}, channel={channel.id})")
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    for i in range(0, len(file_paths), 500):
+                        chunk = file_paths[i : i + 500]
+                        placeholders = ", ".join(["%s"] * len(chunk))
+                        await cursor.execute(
+                            f"""
+                            UPDATE ticket_transcripts SET file_path = NULL, file_size = 0
+                            WHERE file_path IN ({placeholders})
+                        """,
+                            chunk,
+                        )
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"清除聊天記錄路徑失敗: {e}")
 
-            async for message in channel.history(limit=limit, oldest_first=True):
-                success = await self.record_message(ticket_id, message)
-                if success:
-                    recorded_count += 1
+    async def _move_legacy_transcript(
+        self, old_path: str, new_path: str, archived: ArchivedTranscript
+    ) -> None:
+        """舊版檔案移入封存區：更新路徑與雜湊，並移除資料庫中重複保存的內容"""
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        UPDATE ticket_transcripts
+                        SET file_path = %s, file_size = %s, content_hash = %s,
+                            transcript_html = NULL, transcript_text = NULL, transcript_json = NULL
+                        WHERE file_path = %s
+                    """,
+                        (new_path, archived.stored_size, archived.sha256, old_path),
+                    )
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"更新舊聊天記錄路徑失敗 ({old_path}): {e}")
 
-                # 避免 API 限制
-                await asyncio.sleep(0.1)
+    async def batch_record_channel_history(
+        self,
+        ticket_id: int,
+        channel: discord.TextChannel,
+        limit: int = None,
+        progress: Optional[HistoryProgress] = None,
+    ) -> int:
+        """
+        批量記錄頻道歷史訊息
+        每頁（100 則，對應一次 API 請求）以單一多列 INSERT 寫入，已記錄的訊息略過，
+        其中被編輯過的訊息改以 UPDATE 更新內容；
+        速率限制由 discord.py 依回應標頭自動等待，不另外固定延遲。
+        每頁寫入後將進度存入 tickets.history_checkpoint，中斷（含重啟）後再次呼叫會從上次寫入的訊息之後繼續
+        """
+        try:
+            started = time.perf_counter()
+            stored_ids = await self._get_stored_message_ids(ticket_id)
+            resume_after = await self._get_history_checkpoint(ticket_id)
+
+            logger.info(
+                f"開始批量記錄頻道歷史訊息 (ticket_id={ticket_id}, channel={channel.id}, "
+                f"已記錄 {len(stored_ids)} 則"
+                + (f"，從 {resume_after} 之後繼續" if resume_after else "")
+                + ")"
+            )
 
-            logger.debug(f"✅ 批量記錄完成，共記錄 {recorded_count} 條訊息")
+            recorded_count = 0
+            scanned_count = 0
+            page: List[Tuple] = []
+            edited: List[Tuple] = []
+            history = channel.history(
+                limit=limit,
+                oldest_first=True,
+                after=discord.Object(id=resume_after) if resume_after else None,
+            )
+            async for message in history:
+                scanned_count += 1
+                if message.id not in stored_ids:
+                    page.append(self.build_message_row(ticket_id, message))
+                elif message.edited_at is not None:
+                    edited.append(self.build_message_row(ticket_id, message))
+
+                if scanned_count % HISTORY_PAGE_SIZE == 0:
+                    recorded_count += await ticket_message_buffer.insert_rows(page)
+                    await ticket_message_buffer.update_rows(edited)
+                    page, edited = [], []
+                    await self._set_history_checkpoint(ticket_id, message.id)
+                    if progress:
+                        await progress(scanned_count, recorded_count)
+
+            recorded_count += await ticket_message_buffer.insert_rows(page)
+            await ticket_message_buffer.update_rows(edited)
+            await self._set_history_checkpoint(ticket_id, None)
+            if progress:
+                await progress(scanned_count, recorded_count)
+
+            logger.debug(
+                f"✅ 批量記錄完成，掃描 {scanned_count} 則、新增 {recorded_count} 則 "
+                f"({time.perf_counter() - started:.1f}s)"
+            )
             return recorded_count
 
         except Exception as e:
             logger.error(f"❌ 批量記錄頻道歷史失敗: {e}")
             return 0
+
+    async def _get_history_checkpoint(self, ticket_id: int) -> Optional[int]:
+        """上次中斷的歷史回填進度"""
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT history_checkpoint FROM tickets WHERE id = %s", (ticket_id,)
+                )
+                row = await cursor.fetchone()
+                return int(row[0]) if row and row[0] else None
+
+    async def _set_history_checkpoint(self, ticket_id: int, message_id: Optional[int]) -> None:
+        """保存歷史回填進度（None 為已完成）；保留 last_activity 不被 ON UPDATE 更新"""
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    UPDATE tickets SET history_checkpoint = %s, last_activity = last_activity
+                    WHERE id = %s
+                """,
+                    (message_id, ticket_id),
+                )
+                await conn.commit()
+
+    async def _get_stored_message_ids(self, ticket_id: int) -> Set[int]:
+        """票券已記錄的訊息 ID"""
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT DISTINCT message_id FROM ticket_messages WHERE ticket_id = %s",
+                    (ticket_id,),
+                )
+                return {int(row[0]) for row in await cursor.fetchall()}
@@ -0,0 +1,367 @@
+# bot/services/data_export.py
+"""
+串流資料匯出
+伺服器端游標（SSCursor）逐批讀取 → CSV / JSONL 編碼 → gzip 壓縮寫檔，記憶體中只保留一批資料；
+編碼與壓縮在執行緒中進行，不阻塞事件迴圈。
+輸出超過 Discord 附件上限時自動分段，每段都是可獨立解壓、各自帶標題列的 .gz 檔
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+import aiomysql
+import discord
+
+from potato_bot.db.pool import db_pool
+from potato_shared.logger import logger
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = ("csv", "jsonl")
+MAX_CONCURRENT_EXPORTS = 2
+ATTACHMENTS_PER_MESSAGE = 10
+DEFAULT_PART_LIMIT = 8 * 1024 * 1024
+# gzip 內部仍有未寫出的壓縮資料，分段門檻保留餘裕
+PART_LIMIT_RATIO = 0.9
+WRITE_CHUNK_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    """匯出資料集：columns 需與 SELECT 欄位順序一致"""
+
+    name: str
+    sql: str
+    params: Tuple[Any, ...]
+    columns: Sequence[str]
+
+
+@dataclass
+class ExportResult:
+    """匯出結果（暫存目錄中的一或多個分段檔）"""
+
+    directory: Path
+    paths: List[Path] = field(default_factory=list)
+    rows: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _format_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    return value
+
+
+class _GzipPartWriter:
+    """
+    將資料列編碼後寫入 gzip 分段檔（同步物件，只在執行緒中呼叫）
+    壓縮後大小超過門檻時關閉目前分段並開新檔
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        basename: str,
+        fmt: str,
+        columns: Sequence[str],
+        part_limit: int,
+    ):
+        self.directory = directory
+        self.basename = basename
+        self.fmt = fmt
+        self.columns = list(columns)
+        self.part_limit = max(64 * 1024, int(part_limit * PART_LIMIT_RATIO))
+
+        self.paths: List[Path] = []
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self._raw_file = None
+        self._gzip: Optional[gzip.GzipFile] = None
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        # 以列為界切成小段寫入，每段後檢查分段門檻，避免單一批次讓分段超過上限
+        lines = self._encode(rows)
+        start = 0
+        size = 0
+        for i, line in enumerate(lines):
+            size += len(line)
+            if size >= WRITE_CHUNK_BYTES or i == len(lines) - 1:
+                self._write(b"".join(lines[start : i + 1]))
+                start = i + 1
+                size = 0
+
+    def close(self) -> None:
+        if self._gzip is None and not self.paths:
+            # 沒有任何資料列時仍輸出只含標題的檔案
+            self._open_part()
+        self._close_part()
+
+    def _write(self, payload: bytes) -> None:
+        if self._gzip is None:
+            self._open_part()
+        self._gzip.write(payload)
+        self.raw_bytes += len(payload)
+        if self._raw_file.tell() >= self.part_limit:
+            self._close_part()
+
+    def _encode(self, rows: Sequence[Sequence[Any]]) -> List[bytes]:
+        """每列編碼為一段 bytes（含換行）"""
+        if self.fmt == "jsonl":
+            return [
+                (
+                    json.dumps(
+                        dict(zip(self.columns, (_format_value(v) for v in row))),
+                        ensure_ascii=False,
+                        default=str,
+                    )
+                    + "\n"
+                ).encode("utf-8")
+                for row in rows
+            ]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        lines = []
+        for row in rows:
+            writer.writerow([_format_value(v) for v in row])
+            lines.append(buffer.getvalue().encode("utf-8"))
+            buffer.seek(0)
+            buffer.truncate()
+        return lines
+
+    def _open_part(self) -> None:
+        part = len(self.paths) + 1
+        path = self.directory / f"{self.basename}_part{part:02d}.{self.fmt}.gz"
+        self.paths.append(path)
+        self._raw_file = open(path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw_file, mode="wb", compresslevel=6)
+        if self.fmt == "csv":
+            # BOM 讓試算表軟體正確辨識 UTF-8 中文
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(self.columns)
+            header = ("\ufeff" + buffer.getvalue()).encode("utf-8")
+            self._gzip.write(header)
+            self.raw_bytes += len(header)
+
+    def _close_part(self) -> None:
+        if self._gzip is None:
+            return
+        self._gzip.close()
+        self.compressed_bytes += self._raw_file.tell()
+        self._raw_file.close()
+        self._gzip = None
+        self._raw_file = None
+
+
+class DataExportService:
+    """串流資料匯出服務"""
+
+    def __init__(self, batch_size: int = EXPORT_BATCH_SIZE):
+        self.db = db_pool
+        self.batch_size = max(1, batch_size)
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_EXPORTS)
+
+    # ===== 匯出 =====
+
+    async def export(
+        self, dataset: ExportDataset, fmt: str = "csv", part_limit: int = DEFAULT_PART_LIMIT
+    ) -> ExportResult:
+        """匯出資料集到暫存目錄；呼叫端使用完畢後需呼叫 result.cleanup()"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支援的匯出格式: {fmt}")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        result = ExportResult(directory=Path(tempfile.mkdtemp(prefix="potato_export_")))
+        writer = _GzipPartWriter(
+            result.directory, f"{dataset.name}_{timestamp}", fmt, dataset.columns, part_limit
+        )
+
+        try:
+            async with self._semaphore:
+                async for rows in self._stream_rows(dataset):
+                    # 等待寫入完成才讀下一批，記憶體只保留一批
+                    await asyncio.to_thread(writer.write_rows, rows)
+                    result.rows += len(rows)
+            await asyncio.to_thread(writer.close)
+        except Exception:
+            await asyncio.to_thread(writer.close)
+            result.cleanup()
+            raise
+
+        result.paths = writer.paths
+        result.raw_bytes = writer.raw_bytes
+        result.compressed_bytes = writer.compressed_bytes
+        logger.info(
+            f"📦 匯出 {dataset.name}: {result.rows} 列，{len(result.paths)} 個檔案 "
+            f"({result.raw_bytes} → {result.compressed_bytes} bytes)"
+        )
+        return result
+
+    async def send(
+        self, interaction: discord.Interaction, dataset: ExportDataset, fmt: str = "csv"
+    ) -> ExportResult:
+        """匯出並以附件回覆（interaction 需已 defer）；超過附件上限時分段、每則訊息最多 10 個附件"""
+        limit = interaction.guild.filesize_limit if interaction.guild else DEFAULT_PART_LIMIT
+        result = await self.export(dataset, fmt, part_limit=limit)
+        try:
+            paths = result.paths
+            for i in range(0, len(paths), ATTACHMENTS_PER_MESSAGE):
+                batch = paths[i : i + ATTACHMENTS_PER_MESSAGE]
+                content = None
+                if i == 0:
+                    content = (
+                        f"📥 已匯出 **{result.rows}** 筆資料"
+                        + (f"（共 {len(paths)} 個分段檔）" if len(paths) > 1 else "")
+                    )
+                await interaction.followup.send(
+                    content=content,
+                    files=[discord.File(str(path), filename=path.name) for path in batch],
+                    ephemeral=True,
+                )
+            return result
+        finally:
+            result.cleanup()
+
+    # ===== 內部 =====
+
+    async def _stream_rows(self, dataset: ExportDataset) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        async with self.db.connection() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(dataset.sql, dataset.params)
+                while True:
+                    rows = await cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+
+# ===== 資料集 =====
+
+
+def vote_dataset(guild_id: int) -> ExportDataset:
+    """投票與投票回應（匿名投票不輸出投票者）"""
+    return ExportDataset(
+        name=f"votes_{guild_id}",
+        sql="""
+            SELECT v.id, v.title, v.is_multi, v.anonymous, v.creator_id,
+                   v.start_time, v.end_time,
+                   CASE WHEN v.anonymous THEN NULL ELSE r.user_id END,
+                   r.option_text, r.voted_at
+            FROM votes v
+            LEFT JOIN vote_responses r ON r.vote_id = v.id
+            WHERE v.guild_id = %s
+            ORDER BY v.id
+        """,
+        params=(guild_id,),
+        columns=(
+            "vote_id",
+            "title",
+            "is_multi",
+            "anonymous",
+            "creator_id",
+            "start_time",
+            "end_time",
+            "user_id",
+            "option",
+            "voted_at",
+        ),
+    )
+
+
+def ticket_dataset(guild_id: int, since: Optional[datetime] = None) -> ExportDataset:
+    """票券與票券訊息"""
+    conditions = "t.guild_id = %s"
+    params: Tuple[Any, ...] = (guild_id,)
+    if since is not None:
+        conditions += " AND t.created_at >= %s"
+        params += (since,)
+    return ExportDataset(
+        name=f"tickets_{guild_id}",
+        sql=f"""
+            SELECT t.id, t.type, t.status, t.priority, t.discord_id, t.username,
+                   t.created_at, t.closed_at,
+                   m.message_id, m.author_id, m.author_name, m.message_type,
+                   m.content, m.attachments, m.timestamp
+            FROM tickets t
+            LEFT JOIN ticket_messages m ON m.ticket_id = t.id
+            WHERE {conditions}
+            ORDER BY t.id, m.id
+        """,
+        params=params,
+        columns=(
+            "ticket_id",
+            "type",
+            "status",
+            "priority",
+            "discord_id",
+            "username",
+            "created_at",
+            "closed_at",
+            "message_id",
+            "author_id",
+            "author_name",
+            "message_type",
+            "content",
+            "attachments",
+            "message_time",
+        ),
+    )
+
+
+def lottery_dataset(guild_id: int, since: Optional[datetime] = None) -> ExportDataset:
+    """抽獎參與者與中獎結果"""
+    conditions = "l.guild_id = %s"
+    params: Tuple[Any, ...] = (guild_id,)
+    if since is not None:
+        conditions += " AND l.created_at >= %s"
+        params += (since,)
+    return ExportDataset(
+        name=f"lotteries_{guild_id}",
+        sql=f"""
+            SELECT l.id, l.name, l.status, l.winner_count, l.created_at, l.end_time,
+                   e.user_id, e.username, e.entry_method, e.entry_time, e.is_valid,
+                   w.win_position, w.claim_status
+            FROM lotteries l
+            JOIN lottery_entries e ON e.lottery_id = l.id
+            LEFT JOIN lottery_winners w ON w.lottery_id = l.id AND w.user_id = e.user_id
+            WHERE {conditions}
+            ORDER BY l.id, e.id
+        """,
+        params=params,
+        columns=(
+            "lottery_id",
+            "name",
+            "status",
+            "winner_count",
+            "created_at",
+            "end_time",
+            "user_id",
+            "username",
+            "entry_method",
+            "entry_time",
+            "is_valid",
+            "win_position",
+            "claim_status",
+        ),
+    )
+
+
+# 全域實例
+data_export_service = DataExportService()
@@ -22,14 +22,24 @@ class FiveMStatusResult:
     players_ok: bool
 
 
-class FiveMStatusService:
+TxAdminSignature = tuple[int, int]
+
+
+class TxAdminStatusReader:
+    """
+    共用的 txAdmin 狀態檔讀取器（每個 本機路徑 / SFTP 主機+路徑 一個實例）
+    先 stat() 比對大小與修改時間，未變更時直接回傳上次解析結果，不下載也不重新解析；
+    短時間內的多次讀取（同一輪輪詢中的各伺服器）共用同一次檢查
+    """
+
+    # 同一輪輪詢內的讀取共用結果（monitor_task 每 1.5 秒一輪）
+    CHECK_INTERVAL = 1.0
+
+    _readers: dict[tuple, "TxAdminStatusReader"] = {}
+
     def __init__(
         self,
-        info_url: str,
-        players_url: str,
-        offline_threshold: int = 3,
         txadmin_status_file: Optional[str] = None,
-        restart_notify_seconds: Optional[list[int]] = None,
         sftp_host: Optional[str] = None,
         sftp_port: int = 22,
         sftp_user: Optional[str] = None,
@@ -37,164 +47,175 @@ class FiveMStatusService:
         sftp_path: Optional[str] = None,
         sftp_timeout: int = 10,
     ):
-        self.info_url = info_url
-        self.players_url = players_url
-        self.offline_threshold = max(1, offline_threshold)
         self.txadmin_status_file = txadmin_status_file
-        self.restart_notify_seconds = restart_notify_seconds or []
         self.sftp_host = sftp_host
         self.sftp_port = sftp_port
         self.sftp_user = sftp_user
         self.sftp_password = sftp_password
         self.sftp_path = sftp_path
         self.sftp_timeout = max(3, int(sftp_timeout or 10))
+        self._key: Optional[tuple] = None
+        self._refs = 0
 
         self._ssh_client: Optional[paramiko.SSHClient] = None
         self._sftp: Optional[paramiko.SFTPClient] = None
         self._sftp_last_used = 0.0
-        self._sftp_lock = asyncio.Lock()
-
-        self._last_txadmin_read_ok: Optional[bool] = None
-        self._last_txadmin_read_at: Optional[float] = None
-        self._last_txadmin_read_error: Optional[str] = None
-        self._last_txadmin_payload: Optional[dict] = None
-        self._last_txadmin_payload_at: Optional[float] = None
-
-        self._fail_count = 0
-        self._last_status: Optional[str] = None
-        self._last_txadmin_updated_at: Optional[int] = None
-        self._last_restart_seconds: Optional[int] = None
-
-        timeout = aiohttp.ClientTimeout(total=6)
-        self._session = aiohttp.ClientSession(timeout=timeout)
-
-    async def close(self):
-        if not self._session.closed:
-            await self._session.close()
-        if self._sftp_enabled() and (self._sftp or self._ssh_client):
-            async with self._sftp_lock:
-                await asyncio.to_thread(self._disconnect_sftp)
+        self._lock = asyncio.Lock()
+
+        self._last_checked_at = 0.0
+        self._last_result: Optional[dict] = None
+        self._signature: Optional[TxAdminSignature] = None
+        # SFTP 的修改時間只到秒：同一秒內改寫且大小不變時無法分辨，變更後再確認讀取一次
+        self._signature_confirmed = False
+
+        self._last_read_ok: Optional[bool] = None
+        self._last_read_at: Optional[float] = None
+        self._last_read_error: Optional[str] = None
+        self._last_payload: Optional[dict] = None
+        self._last_payload_at: Optional[float] = None
+
+        self._stats = {"checks": 0, "downloads": 0, "unchanged": 0, "shared": 0}
+
+    @classmethod
+    def acquire(cls, **config: Any) -> "TxAdminStatusReader":
+        """取得（或建立）對應設定的共用讀取器；不再使用時需呼叫 release()"""
+        key = cls._make_key(config)
+        reader = cls._readers.get(key)
+        if reader is None:
+            reader = cls(**config)
+            reader._key = key
+            cls._readers[key] = reader
+        reader._refs += 1
+        return reader
 
-    async def fetch_json(self, url: str) -> Optional[Any]:
-        if not url:
-            return None
-        last_exc: Optional[Exception] = None
-        for attempt in range(2):
-            try:
-                async with self._session.get(url) as response:
-                    if response.status != 200:
-                        return None
-                    return await response.json(content_type=None)
-            except (asyncio.TimeoutError, ClientConnectionError, ServerDisconnectedError) as exc:
-                last_exc = exc
-                if attempt == 0:
-                    await asyncio.sleep(0.3)
-                continue
-            except Exception as exc:
-                last_exc = exc
-                break
-        if last_exc:
-            logger.warning("FiveM 狀態請求失敗: %s (url=%s)", last_exc, url)
-        return None
-
-    async def poll_status(self) -> FiveMStatusResult:
-        info_data = await self.fetch_json(self.info_url)
-        players_data = await self.fetch_json(self.players_url)
-
-        info_ok = info_data is not None
-        players_ok = players_data is not None
-
-        if info_ok and players_ok:
-            self._fail_count = 0
-            status = "online"
-        else:
-            self._fail_count += 1
-            status = self._last_status or "unknown"
-            if self._fail_count >= self.offline_threshold:
-                status = "offline"
-
-        players = 0
-        max_players = None
-        hostname = None
-
-        if players_ok:
-            if isinstance(players_data, list):
-                players = len(players_data)
-            elif isinstance(players_data, dict):
-                players = int(players_data.get("players", 0) or 0)
-
-        if info_ok and isinstance(info_data, dict):
-            max_players = info_data.get("vars", {}).get("sv_maxClients")
-            hostname = info_data.get("vars", {}).get("sv_projectName") or info_data.get("vars", {}).get(
-                "sv_hostname"
+    @staticmethod
+    def _make_key(config: dict) -> tuple:
+        if config.get("sftp_host") and config.get("sftp_path"):
+            return (
+                "sftp",
+                config["sftp_host"],
+                int(config.get("sftp_port") or 22),
+                config.get("sftp_user"),
+                config["sftp_path"],
             )
-            try:
-                max_players = int(max_players) if max_players is not None else None
-            except (TypeError, ValueError):
-                max_players = None
+        return ("local", config.get("txadmin_status_file"))
 
-        result = FiveMStatusResult(
-            status=status,
-            players=players,
-            max_players=max_players,
-            hostname=hostname,
-            info_ok=info_ok,
-            players_ok=players_ok,
-        )
+    async def release(self) -> None:
+        """釋放引用；最後一個使用者釋放時關閉 SFTP 連線"""
+        self._refs = max(0, self._refs - 1)
+        if self._refs:
+            return
+        if self._key is not None and self._readers.get(self._key) is self:
+            del self._readers[self._key]
+        if self._sftp or self._ssh_client:
+            async with self._lock:
+                await asyncio.to_thread(self._disconnect_sftp)
 
-        self._last_status = status
-        return result
+    @property
+    def enabled(self) -> bool:
+        return self.sftp_enabled() or bool(self.txadmin_status_file)
 
-    async def read_txadmin_status(self) -> Optional[dict]:
-        if self._sftp_enabled():
-            async with self._sftp_lock:
-                return await asyncio.to_thread(self._read_txadmin_status_sftp)
-        return self._read_txadmin_status_local()
+    def sftp_enabled(self) -> bool:
+        return bool(self.sftp_host and self.sftp_path)
 
-    def get_txadmin_read_status(self) -> Optional[dict]:
+    async def read(self) -> Optional[dict]:
+        """
+        讀取狀態檔（回傳的 dict 由所有伺服器共用，呼叫端不可修改）
+        距上次檢查不到 CHECK_INTERVAL 秒，或其他伺服器的檢查仍在進行（例如 SFTP 卡住）時，
+        直接回傳上次結果，不等待
+        """
+        if self._lock.locked() and self._last_checked_at:
+            self._stats["shared"] += 1
+            return self._last_result
+        async with self._lock:
+            if self._last_checked_at and time.monotonic() - self._last_checked_at < self.CHECK_INTERVAL:
+                self._stats["shared"] += 1
+                return self._last_result
+            self._stats["checks"] += 1
+            if self.sftp_enabled():
+                result = await asyncio.to_thread(self._read_sftp)
+            else:
+                result = await asyncio.to_thread(self._read_local)
+            self._last_result = result
+            self._last_checked_at = time.monotonic()
+            return result
+
+    def get_read_status(self) -> Optional[dict]:
         """取得 txAdmin 狀態檔讀取狀態（None 表示未啟用）"""
-        if not self._sftp_enabled() and not self.txadmin_status_file:
+        if not self.enabled:
             return None
         return {
-            "ok": self._last_txadmin_read_ok,
-            "last_read_at": self._last_txadmin_read_at,
-            "error": self._last_txadmin_read_error,
+            "ok": self._last_read_ok,
+            "last_read_at": self._last_read_at,
+            "error": self._last_read_error,
         }
 
-    def get_last_txadmin_payload(self) -> Optional[dict]:
-        """取得最後一次成功讀取的 txAdmin JSON"""
-        return self._last_txadmin_payload
+    def get_last_payload(self) -> Optional[dict]:
+        return self._last_payload
 
-    def get_last_txadmin_payload_at(self) -> Optional[float]:
-        """取得最後一次成功讀取 txAdmin JSON 的時間戳"""
-        return self._last_txadmin_payload_at
+    def get_last_payload_at(self) -> Optional[float]:
+        return self._last_payload_at
 
-    def _sftp_enabled(self) -> bool:
-        return bool(self.sftp_host and self.sftp_path)
+    def get_statistics(self) -> dict:
+        return {"users": self._refs, **self._stats}
+
+    def is_sftp_connected(self) -> Optional[bool]:
+        """回報 SFTP 連線狀態（None 表示未啟用）"""
+        if not self.sftp_enabled():
+            return None
+        return self._sftp is not None and self._is_sftp_transport_active()
 
-    def _read_txadmin_status_local(self) -> Optional[dict]:
+    # ===== 讀取（在執行緒中執行）=====
+
+    def _unchanged(self, signature: TxAdminSignature, exact: bool) -> bool:
+        """檔案未變更且已有解析結果時回傳 True（exact 表示修改時間精度足以判斷）"""
+        if self._last_payload is None or signature != self._signature:
+            return False
+        if not exact and not self._signature_confirmed:
+            self._signature_confirmed = True
+            return False
+        self._stats["unchanged"] += 1
+        return True
+
+    def _accept(self, signature: TxAdminSignature, raw_data: Any) -> dict:
+        if isinstance(raw_data, (bytes, bytearray)):
+            raw_data = raw_data.decode("utf-8")
+        parsed = json.loads(raw_data)
+        self._stats["downloads"] += 1
+        if signature != self._signature:
+            self._signature = signature
+            self._signature_confirmed = False
+        self._mark_read(True, payload=parsed)
+        return parsed
+
+    def _read_local(self) -> Optional[dict]:
         if not self.txadmin_status_file:
-            self._mark_txadmin_read(None)
+            self._mark_read(None)
             return None
         path = os.path.expandvars(os.path.expanduser(self.txadmin_status_file))
-        if not os.path.isfile(path):
-            self._mark_txadmin_read(False, "file_not_found")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._mark_read(False, "file_not_found")
             return None
+        except OSError as exc:
+            logger.error("讀取 txAdmin 狀態檔失敗: %s", exc)
+            self._mark_read(False, str(exc))
+            return None
+
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._unchanged(signature, exact=True):
+            self._mark_read(True, payload=self._last_payload)
+            return self._last_payload
         try:
             with open(path, "r", encoding="utf-8") as handle:
-                data = json.load(handle)
-                self._mark_txadmin_read(True, payload=data)
-                return data
+                return self._accept(signature, handle.read())
         except Exception as exc:
             logger.error("讀取 txAdmin 狀態檔失敗: %s", exc)
-            self._mark_txadmin_read(False, str(exc))
-            return None
-
-    def _read_txadmin_status_sftp(self) -> Optional[dict]:
-        if not self._sftp_enabled():
-            self._mark_txadmin_read(None)
+            self._mark_read(False, str(exc))
             return None
 
+    def _read_sftp(self) -> Optional[dict]:
         last_error: Optional[str] = None
         for attempt in range(3):  # 1 次 + 2 次重試
             try:
@@ -210,17 +231,18 @@ class FiveMStatusService:
                         if not sftp:
                             raise RuntimeError("sftp_reconnect_failed")
 
+                attrs = sftp.stat(str(self.sftp_path))
+                self._sftp_last_used = time.time()
+                signature = (int(attrs.st_size or 0), int(attrs.st_mtime or 0))
+                if self._unchanged(signature, exact=False):
+                    self._mark_read(True, payload=self._last_payload)
+                    return self._last_payload
+
                 with sftp.file(str(self.sftp_path), "rb") as remote_file:
                     raw_data = remote_file.read()
 
                 self._sftp_last_used = time.time()
-                if isinstance(raw_data, (bytes, bytearray)):
-                    data = raw_data.decode("utf-8")
-                else:
-                    data = str(raw_data)
-                parsed = json.loads(data)
-                self._mark_txadmin_read(True, payload=parsed)
-                return parsed
+                return self._accept(signature, raw_data)
             except (FileNotFoundError, PermissionError) as exc:
                 last_error = str(exc)
                 logger.warning("SFTP 取檔失敗（權限/路徑）：%s", exc)
@@ -241,7 +263,7 @@ class FiveMStatusService:
             if attempt < 2:
                 time.sleep(0.2 * (attempt + 1))
 
-        self._mark_txadmin_read(False, f"sftp_retries_exhausted:{last_error}")
+        self._mark_read(False, f"sftp_retries_exhausted:{last_error}")
         return None
 
     def _ensure_sftp_connection(self) -> Optional[paramiko.SFTPClient]:
@@ -302,31 +324,162 @@ class FiveMStatusService:
         self._ssh_client = None
         self._sftp_last_used = 0.0
 
+    def _mark_read(
+        self, ok: Optional[bool], error: Optional[str] = None, payload: Optional[dict] = None
+    ) -> None:
+        if ok is None:
+            self._last_read_ok = None
+            self._last_read_at = None
+            self._last_read_error = None
+            return
+        self._last_read_ok = ok
+        self._last_read_at = time.time()
+        self._last_read_error = error
+        if ok and payload is not None:
+            self._last_payload = payload
+            self._last_payload_at = self._last_read_at
+
+
+class FiveMStatusService:
+    def __init__(
+        self,
+        info_url: str,
+        players_url: str,
+        offline_threshold: int = 3,
+        txadmin_status_file: Optional[str] = None,
+        restart_notify_seconds: Optional[list[int]] = None,
+        sftp_host: Optional[str] = None,
+        sftp_port: int = 22,
+        sftp_user: Optional[str] = None,
+        sftp_password: Optional[str] = None,
+        sftp_path: Optional[str] = None,
+        sftp_timeout: int = 10,
+    ):
+        self.info_url = info_url
+        self.players_url = players_url
+        self.offline_threshold = max(1, offline_threshold)
+        self.restart_notify_seconds = restart_notify_seconds or []
+        # 同一狀態檔由所有伺服器共用一個讀取器
+        self._txadmin = TxAdminStatusReader.acquire(
+            txadmin_status_file=txadmin_status_file,
+            sftp_host=sftp_host,
+            sftp_port=sftp_port,
+            sftp_user=sftp_user,
+            sftp_password=sftp_password,
+            sftp_path=sftp_path,
+            sftp_timeout=sftp_timeout,
+        )
+        self._txadmin_released = False
+
+        self._fail_count = 0
+        self._last_status: Optional[str] = None
+        self._last_txadmin_updated_at: Optional[int] = None
+        self._last_restart_seconds: Optional[int] = None
+
+        timeout = aiohttp.ClientTimeout(total=6)
+        self._session = aiohttp.ClientSession(timeout=timeout)
+
+    async def close(self):
+        if not self._session.closed:
+            await self._session.close()
+        if not self._txadmin_released:
+            self._txadmin_released = True
+            await self._txadmin.release()
+
+    async def fetch_json(self, url: str) -> Optional[Any]:
+        if not url:
+            return None
+        last_exc: Optional[Exception] = None
+        for attempt in range(2):
+            try:
+                async with self._session.get(url) as response:
+                    if response.status != 200:
+                        return None
+                    return await response.json(content_type=None)
+            except (asyncio.TimeoutError, ClientConnectionError, ServerDisconnectedError) as exc:
+                last_exc = exc
+                if attempt == 0:
+                    await asyncio.sleep(0.3)
+                continue
+            except Exception as exc:
+                last_exc = exc
+                break
+        if last_exc:
+            logger.warning("FiveM 狀態請求失敗: %s (url=%s)", last_exc, url)
+        return None
+
+    async def poll_status(self) -> FiveMStatusResult:
+        info_data, players_data = await asyncio.gather(
+            self.fetch_json(self.info_url), self.fetch_json(self.players_url)
+        )
+
+        info_ok = info_data is not None
+        players_ok = players_data is not None
+
+        if info_ok and players_ok:
+            self._fail_count = 0
+            status = "online"
+        else:
+            self._fail_count += 1
+            status = self._last_status or "unknown"
+            if self._fail_count >= self.offline_threshold:
+                status = "offline"
+
+        players = 0
+        max_players = None
+        hostname = None
+
+        if players_ok:
+            if isinstance(players_data, list):
+                players = len(players_data)
+            elif isinstance(players_data, dict):
+                players = int(players_data.get("players", 0) or 0)
+
+        if info_ok and isinstance(info_data, dict):
+            max_players = info_data.get("vars", {}).get("sv_maxClients")
+            hostname = info_data.get("vars", {}).get("sv_projectName") or info_data.get("vars", {}).get(
+                "sv_hostname"
+            )
+            try:
+                max_players = int(max_players) if max_players is not None else None
+            except (TypeError, ValueError):
+                max_players = None
+
+        result = FiveMStatusResult(
+            status=status,
+            players=players,
+            max_players=max_players,
+            hostname=hostname,
+            info_ok=info_ok,
+            players_ok=players_ok,
+        )
+
+        self._last_status = status
+        return result
+
+    async def read_txadmin_status(self) -> Optional[dict]:
+        return await self._txadmin.read()
+
+    def get_txadmin_read_status(self) -> Optional[dict]:
+        """取得 txAdmin 狀態檔讀取狀態（None 表示未啟用）"""
+        return self._txadmin.get_read_status()
+
+    def get_last_txadmin_payload(self) -> Optional[dict]:
+        """取得最後一次成功讀取的 txAdmin JSON"""
+        return self._txadmin.get_last_payload()
+
+    def get_last_txadmin_payload_at(self) -> Optional[float]:
+        """取得最後一次成功讀取 txAdmin JSON 的時間戳"""
+        return self._txadmin.get_last_payload_at()
+
     def is_sftp_connected(self) -> Optional[bool]:
         """回報 SFTP 連線狀態（None 表示未啟用）"""
-        if not self._sftp_enabled():
-            return None
-        return self._sftp is not None and self._is_sftp_transport_active()
+        return self._txadmin.is_sftp_connected()
 
     def is_ftp_connected(self) -> Optional[bool]:
         """相容舊介面，回報 SFTP 連線狀態"""
         return self.is_sftp_connected()
 
-    def _mark_txadmin_read(
-        self, ok: Optional[bool], error: Optional[str] = None, payload: Optional[dict] = None
-    ) -> None:
-        if ok is None:
-            self._last_txadmin_read_ok = None
-            self._last_txadmin_read_at = None
-            self._last_txadmin_read_error = None
-            return
-        self._last_txadmin_read_ok = ok
-        self._last_txadmin_read_at = time.time()
-        self._last_txadmin_read_error = error
-        if ok and payload is not None:
-            self._last_txadmin_payload = payload
-            self._last_txadmin_payload_at = self._last_txadmin_read_at
-
     def should_announce_txadmin(self, tx_status: dict) -> bool:
         if not tx_status:
             return False
@@ -0,0 +1,293 @@
+# bot/services/lottery_entries.py
+"""
+抽獎參與寫入緩衝
+每個進行中的抽獎在記憶體中維護一份參與池（抽獎資料 + 已參與用戶 + 有效參與人數），
+首次使用時由資料庫載入並保留到抽獎結束；參與時只檢查記憶體即回應，
+參與記錄依數量或時間以多列 INSERT IGNORE（unique_entry 鍵）批次寫入
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from potato_bot.db.lottery_dao import LotteryDAO
+from potato_bot.db.pool import db_pool
+from potato_bot.db.stats_rollup import stats_rollup
+from potato_shared.config import LOTTERY_ENTRY_FLUSH_INTERVAL, LOTTERY_ENTRY_FLUSH_SIZE
+from potato_shared.logger import logger
+
+
+class LotteryEntryPool:
+    """單一抽獎的記憶體參與池"""
+
+    def __init__(self, lottery: Dict[str, Any], rows: List[Tuple[int, Any]] = ()):
+        self.lottery = lottery
+        # 含無效參與者，避免重複寫入；participants 只計有效參與
+        self.entrants: Set[int] = set()
+        self.participants = 0
+        # 開獎前停止接受參與（呼叫端可能仍持有參與池參考）
+        self.closed = False
+        for user_id, is_valid in rows:
+            self.entrants.add(int(user_id))
+            if is_valid:
+                self.participants += 1
+
+    @property
+    def lottery_id(self) -> int:
+        return self.lottery["id"]
+
+    def try_add(self, user_id: int) -> bool:
+        """
+        記錄一位參與者；已參與或已停止參與時回傳 False
+        檢查與寫入之間沒有 await，在事件迴圈中為原子操作
+        """
+        if self.closed or user_id in self.entrants:
+            return False
+        self.entrants.add(user_id)
+        self.participants += 1
+        return True
+
+    def discard(self, user_id: int) -> None:
+        if user_id in self.entrants:
+            self.entrants.discard(user_id)
+            self.participants = max(0, self.participants - 1)
+
+
+class LotteryEntryBuffer:
+    """抽獎參與緩衝（記憶體參與池 + 批次寫入）"""
+
+    def __init__(
+        self,
+        flush_size: int = LOTTERY_ENTRY_FLUSH_SIZE,
+        flush_interval: float = LOTTERY_ENTRY_FLUSH_INTERVAL,
+        max_pending: Optional[int] = None,
+    ):
+        self.db = db_pool
+        self.dao = LotteryDAO()
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.1, flush_interval)
+        # 寫入失敗時最多保留的待寫入列數，避免 DB 長時間不可用時無限成長
+        self.max_pending = max_pending or self.flush_size * 50
+
+        self._pools: Dict[int, LotteryEntryPool] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        # 開獎中的抽獎，不再重新載入參與池（開獎完成、狀態已寫入後由 finish_lottery 移除）
+        self._closed_lotteries: Set[int] = set()
+
+        # 待寫入的 (lottery_id, user_id, username, entry_method) 列
+        self._pending: List[Tuple[int, int, str, str]] = []
+        self._flush_lock = asyncio.Lock()
+        self._wake_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self._stats: Dict[str, int] = {
+            "joins": 0,
+            "duplicates": 0,
+            "rejected_closed": 0,
+            "seeded": 0,
+            "flushed_rows": 0,
+            "flushes": 0,
+            "failures": 0,
+            "dropped": 0,
+        }
+
+    # ===== 生命週期 =====
+
+    def start(self) -> None:
+        """啟動背景寫入任務（重複呼叫無副作用）"""
+        if self._task and not self._task.done():
+            return
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name="lottery-entry-flush")
+
+    async def close(self) -> None:
+        """停止背景任務並寫入剩餘參與記錄"""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    # ===== 參與 =====
+
+    async def get(self, lottery_id: int) -> Optional[LotteryEntryPool]:
+        """取得進行中抽獎的參與池（同一抽獎只載入一次）；抽獎不存在或未進行時回傳 None"""
+        pool = self._pools.get(lottery_id)
+        if pool is not None:
+            return pool
+        if lottery_id in self._closed_lotteries:
+            return None
+
+        task = self._loading.get(lottery_id)
+        if task is None:
+            task = asyncio.create_task(self._seed(lottery_id))
+            self._loading[lottery_id] = task
+            task.add_done_callback(lambda _t, lid=lottery_id: self._loading.pop(lid, None))
+        return await asyncio.shield(task)
+
+    def add(self, pool: LotteryEntryPool, user_id: int, username: str, method: str) -> bool:
+        """記錄參與並排入批次寫入；已參與或抽獎已停止參與時回傳 False"""
+        if pool.closed:
+            self._stats["rejected_closed"] += 1
+            return False
+        if not pool.try_add(user_id):
+            self._stats["duplicates"] += 1
+            return False
+
+        self._stats["joins"] += 1
+        self._pending.append((pool.lottery_id, user_id, username, method))
+        if not self._closed:
+            self.start()
+        if len(self._pending) >= self.flush_size:
+            self._wake_event.set()
+        return True
+
+    async def remove(self, lottery_id: int, user_id: int) -> bool:
+        """
+        移除參與者
+        持有寫入鎖時處理，尚未寫入的記錄直接移除，已寫入的由資料庫刪除，
+        避免與寫入中的批次交錯造成已退出的參與者又被寫回
+        """
+        async with self._flush_lock:
+            before = len(self._pending)
+            self._pending = [
+                row for row in self._pending if not (row[0] == lottery_id and row[1] == user_id)
+            ]
+            removed = len(self._pending) != before
+            removed = await self.dao.remove_entry(lottery_id, user_id) or removed
+
+        pool = self._pools.get(lottery_id)
+        if removed and pool is not None:
+            pool.discard(user_id)
+        return removed
+
+    async def participant_count(self, lottery_id: int) -> int:
+        """有效參與人數：參與池已載入時取記憶體計數，否則查詢資料庫"""
+        pool = self._pools.get(lottery_id)
+        if pool is not None:
+            return pool.participants
+        return await self.dao.get_participant_count(lottery_id)
+
+    async def close_lottery(self, lottery_id: int) -> bool:
+        """
+        停止接受參與並寫入該抽獎剩餘記錄（開獎前呼叫）
+        先關閉並移除參與池再寫入，寫入期間的參與會被拒絕，不會留下未寫入的記錄；
+        仍有未寫入的記錄（寫入失敗）時回傳 False，再次呼叫即重試
+        """
+        self._closed_lotteries.add(lottery_id)
+        pool = self._pools.pop(lottery_id, None)
+        if pool is not None:
+            pool.closed = True
+        await self.flush()
+        return not any(row[0] == lottery_id for row in self._pending)
+
+    def finish_lottery(self, lottery_id: int) -> None:
+        """開獎完成（狀態已不是 active）後呼叫，之後由資料庫狀態拒絕重新載入"""
+        self._closed_lotteries.discard(lottery_id)
+
+    # ===== 寫入 =====
+
+    async def flush(self) -> int:
+        """立即寫入所有待寫入的參與記錄"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            try:
+                await self._write(rows)
+            except Exception as e:
+                self._stats["failures"] += 1
+                self._requeue(rows)
+                logger.error(f"❌ 抽獎參與批次寫入失敗（{len(rows)} 列），稍後重試: {e}")
+                return 0
+
+            self._stats["flushes"] += 1
+            self._stats["flushed_rows"] += len(rows)
+            stats_rollup.mark_many("lottery", {row[0] for row in rows})
+            return len(rows)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "pools": len(self._pools),
+            "closing": len(self._closed_lotteries),
+            "pending_rows": len(self._pending),
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    async def _seed(self, lottery_id: int) -> Optional[LotteryEntryPool]:
+        lottery = await self.dao.get_lottery(lottery_id)
+        if not lottery or lottery.get("status") != "active":
+            return None
+
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT user_id, is_valid FROM lottery_entries WHERE lottery_id = %s",
+                    (lottery_id,),
+                )
+                rows = await cur.fetchall()
+
+        if lottery_id in self._closed_lotteries:
+            return None
+        pool = LotteryEntryPool(lottery, rows)
+        # 載入期間已建立的參與池以記憶體為準（避免覆蓋尚未寫入的參與）
+        existing = self._pools.setdefault(lottery_id, pool)
+        if existing is pool:
+            self._stats["seeded"] += 1
+        return existing
+
+    def _requeue(self, rows: List[Tuple[int, int, str, str]]) -> None:
+        """寫入失敗時放回佇列前端，超過上限則丟棄最舊的列"""
+        self._pending = rows + self._pending
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self._stats["dropped"] += overflow
+            logger.warning(f"⚠️ 抽獎參與寫入緩衝已滿，丟棄 {overflow} 列最舊資料")
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                try:
+                    await asyncio.wait_for(self._wake_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake_event.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 抽獎參與寫入迴圈錯誤: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def _write(self, rows: List[Tuple[int, int, str, str]]) -> None:
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cur:
+                try:
+                    for i in range(0, len(rows), self.flush_size):
+                        chunk = rows[i : i + self.flush_size]
+                        placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+                        params = [value for row in chunk for value in row]
+                        # 唯一鍵 unique_entry (lottery_id, user_id)：重試時忽略已寫入的列
+                        await cur.execute(
+                            f"""
+                            INSERT IGNORE INTO lottery_entries
+                                (lottery_id, user_id, username, entry_method)
+                            VALUES {placeholders}
+                        """,
+                            params,
+                        )
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+
+
+# 全域實例
+lottery_entry_buffer = LotteryEntryBuffer()
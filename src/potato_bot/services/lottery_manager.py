@@ -4,15 +4,14 @@
 處理抽獎的創建、管理、開獎等核心邏輯
 """
 
-import asyncio
-import random
+import secrets
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 import discord
-from discord.ext import tasks
 
-from potato_bot.db.lottery_dao import LotteryDAO, LotteryData
+from potato_bot.db.lottery_dao import LotteryDAO, LotteryData, lottery_deadlines
+from potato_bot.services.lottery_entries import lottery_entry_buffer
 from potato_bot.utils.embed_builder import EmbedBuilder
 from potato_shared.logger import logger
 
@@ -23,15 +22,10 @@ class LotteryManager:
     def __init__(self, bot=None):
         self.bot = bot
         self.dao = LotteryDAO()
-        self._running_lotteries = {}  # lottery_id -> task
         self._cache = {}  # 簡單的記憶體快取
         self._cache_timeout = 300  # 5分鐘快取過期
         self._last_cleanup = datetime.now()
 
-        # 啟動背景任務
-        if bot:
-            self.lottery_scheduler.start()
-
     def _get_cache_key(self, *args) -> str:
         """生成快取鍵"""
         return ":".join(str(arg) for arg in args)
@@ -165,7 +159,7 @@ class LotteryManager:
 
             # 排程自動結束
             if lottery.get("auto_end", True):
-                await self._schedule_lottery_end(lottery_id, lottery["end_time"])
+                lottery_deadlines.schedule(lottery_id, lottery["end_time"])
 
             return True, "抽獎已開始", message
 
@@ -209,15 +203,17 @@ class LotteryManager:
     async def join_lottery(
         self, lottery_id: int, user: discord.Member, method: str = "reaction"
     ) -> Tuple[bool, str]:
-        """參與抽獎"""
+        """參與抽獎（只檢查記憶體中的參與池，參與記錄由 lottery_entry_buffer 批次寫入）"""
         try:
-            lottery = await self.dao.get_lottery(lottery_id)
-            if not lottery:
-                return False, "抽獎不存在"
-
-            if lottery["status"] != "active":
+            pool = await lottery_entry_buffer.get(lottery_id)
+            if pool is None:
+                lottery = await self.dao.get_lottery(lottery_id)
+                if not lottery:
+                    return False, "抽獎不存在"
                 return False, f"抽獎未在進行中 (狀態: {lottery['status']})"
 
+            lottery = pool.lottery
+
             # 檢查是否已過期
             if lottery["end_time"] < datetime.now():
                 return False, "抽獎已結束"
@@ -227,13 +223,15 @@ class LotteryManager:
             if not validation_result[0]:
                 return False, validation_result[1]
 
-            # 添加參與者
-            success = await self.dao.add_entry(lottery_id, user.id, user.display_name, method)
+            # 驗證期間可能已開始開獎（與 add 之間沒有 await）
+            if pool.closed:
+                return False, "抽獎已結束"
 
-            if success:
+            # 添加參與者
+            if lottery_entry_buffer.add(pool, user.id, user.display_name, method):
                 return True, "成功參與抽獎！"
             else:
-                return False, "參與抽獎失敗，您可能已經參與過了"
+                return False, "您已經參與過這個抽獎了"
 
         except Exception as e:
             logger.error(f"參與抽獎失敗: {e}")
@@ -250,7 +248,7 @@ class LotteryManager:
                 return False, f"抽獎未在進行中 (狀態: {lottery['status']})"
 
             # 移除參與者
-            success = await self.dao.remove_entry(lottery_id, user.id)
+            success = await lottery_entry_buffer.remove(lottery_id, user.id)
 
             if success:
                 return True, "已退出抽獎"
@@ -264,10 +262,10 @@ class LotteryManager:
     async def end_lottery(
         self,
         lottery_id: int,
-        channel: discord.TextChannel,
+        channel: Optional[discord.TextChannel],
         forced: bool = False,
     ) -> Tuple[bool, str, List[Dict]]:
-        """結束抽獎並選出中獎者"""
+        """結束抽獎並選出中獎者（channel 為 None 時只開獎、不公告）"""
         try:
             lottery = await self.dao.get_lottery(lottery_id)
             if not lottery:
@@ -276,42 +274,38 @@ class LotteryManager:
             if lottery["status"] != "active" and not forced:
                 return False, f"抽獎狀態不正確: {lottery['status']}", []
 
-            # 獲取所有參與者
-            entries = await self.dao.get_entries(lottery_id)
+            # 停止接受參與並寫入緩衝中的參與記錄
+            if not await lottery_entry_buffer.close_lottery(lottery_id):
+                return False, "參與記錄尚未寫入完成，請稍後再試", []
 
-            if not entries:
+            # 串流抽出中獎者（種子與參與人數隨結果保存，可重現本次開獎）
+            seed = secrets.token_hex(16)
+            winners_data, entry_count = await self.dao.draw_winners(
+                lottery_id, lottery["winner_count"], seed
+            )
+
+            if not entry_count:
                 # 沒有參與者
-                await self.dao.update_lottery_status(lottery_id, "cancelled")
+                if await self.dao.update_lottery_status(lottery_id, "cancelled"):
+                    lottery_entry_buffer.finish_lottery(lottery_id)
                 embed = EmbedBuilder.build(
                     title="🎲 抽獎結束",
                     description=f"**{lottery['name']}**\n\n❌ 沒有參與者，抽獎已取消",
                     color="warning",
                 )
-                await channel.send(embed=embed)
+                if channel is not None:
+                    await channel.send(embed=embed)
                 return True, "抽獎因沒有參與者而取消", []
 
-            # 選出中獎者
-            winner_count = min(lottery["winner_count"], len(entries))
-            winners_data = []
-
-            # 隨機選擇中獎者
-            selected_entries = random.sample(entries, winner_count)
-
-            for i, entry in enumerate(selected_entries, 1):
-                winners_data.append((entry["user_id"], entry["username"], i))
-
             # 儲存中獎者
-            await self.dao.select_winners(lottery_id, winners_data)
+            if await self.dao.select_winners(lottery_id, winners_data, seed, entry_count):
+                lottery_entry_buffer.finish_lottery(lottery_id)
 
             # 創建結果公告
             winners = await self.dao.get_winners(lottery_id)
-            embed = await self._create_results_embed(lottery, winners, len(entries))
-            await channel.send(embed=embed)
-
-            # 取消自動結束任務
-            if lottery_id in self._running_lotteries:
-                self._running_lotteries[lottery_id].cancel()
-                del self._running_lotteries[lottery_id]
+            if channel is not None:
+                embed = await self._create_results_embed(lottery, winners, entry_count, seed)
+                await channel.send(embed=embed)
 
             logger.info(f"抽獎結束: {lottery_id} - {lottery['name']}, 中獎者: {len(winners)}")
             return True, f"抽獎已結束，共 {len(winners)} 位中獎者", winners
@@ -332,8 +326,11 @@ class LotteryManager:
             if lottery["status"] != "ended":
                 return False, f"抽獎狀態不正確: {lottery['status']}", []
 
-            entries = await self.dao.get_entries(lottery_id)
-            if not entries:
+            seed = secrets.token_hex(16)
+            winners_data, entry_count = await self.dao.draw_winners(
+                lottery_id, lottery["winner_count"], seed
+            )
+            if not entry_count:
                 return False, "沒有參與者，無法重新開獎", []
 
             # 取得頻道
@@ -343,18 +340,11 @@ class LotteryManager:
             # 清除舊中獎者
             await self.dao.delete_winners(lottery_id)
 
-            winner_count = min(lottery["winner_count"], len(entries))
-            winners_data = []
-            selected_entries = random.sample(entries, winner_count)
-
-            for i, entry in enumerate(selected_entries, 1):
-                winners_data.append((entry["user_id"], entry["username"], i))
-
-            await self.dao.select_winners(lottery_id, winners_data)
+            await self.dao.select_winners(lottery_id, winners_data, seed, entry_count)
             winners = await self.dao.get_winners(lottery_id)
 
             if channel:
-                embed = await self._create_results_embed(lottery, winners, len(entries))
+                embed = await self._create_results_embed(lottery, winners, entry_count, seed)
                 await channel.send(embed=embed)
 
             return True, f"重新開獎完成，共 {len(winners)} 位中獎者", winners
@@ -371,8 +361,7 @@ class LotteryManager:
                 return None
 
             # 獲取參與者數量
-            entries = await self.dao.get_entries(lottery_id)
-            lottery["participant_count"] = len(entries)
+            lottery["participant_count"] = await lottery_entry_buffer.participant_count(lottery_id)
 
             # 獲取中獎者（如果已結束）
             if lottery["status"] == "ended":
@@ -503,7 +492,11 @@ class LotteryManager:
         return embed
 
     async def _create_results_embed(
-        self, lottery: Dict, winners: List[Dict], total_participants: int
+        self,
+        lottery: Dict,
+        winners: List[Dict],
+        total_participants: int,
+        seed: Optional[str] = None,
     ) -> discord.Embed:
         """創建抽獎結果嵌入"""
         embed = EmbedBuilder.build(title=f"🏆 {lottery['name']} - 抽獎結果", color="success")
@@ -533,54 +526,52 @@ class LotteryManager:
             inline=True,
         )
 
-        embed.set_footer(text=f"抽獎 ID: {lottery['id']} | 結束時間")
+        footer = f"抽獎 ID: {lottery['id']}"
+        if seed:
+            footer += f" | 開獎種子: {seed}"
+        embed.set_footer(text=f"{footer} | 結束時間")
         embed.timestamp = datetime.now()
 
         return embed
 
-    async def _schedule_lottery_end(self, lottery_id: int, end_time: datetime):
-        """安排抽獎自動結束"""
-        try:
-            delay = (end_time - datetime.now()).total_seconds()
-            if delay <= 0:
-                return  # 已過期
-
-            async def end_task():
-                try:
-                    await asyncio.sleep(delay)
-
-                    # 獲取頻道
-                    lottery = await self.dao.get_lottery(lottery_id)
-                    if lottery and self.bot:
-                        channel = self.bot.get_channel(lottery["channel_id"])
-                        if channel:
-                            await self.end_lottery(lottery_id, channel, forced=True)
-
-                except asyncio.CancelledError:
-                    pass
-                except Exception as e:
-                    logger.error(f"自動結束抽獎失敗: {e}")
-
-            # 創建並儲存任務
-            task = asyncio.create_task(end_task())
-            self._running_lotteries[lottery_id] = task
+    # ===== 開獎排程 =====
 
-        except Exception as e:
-            logger.error(f"安排抽獎結束失敗: {e}")
+    async def start_scheduler(self):
+        """由進行中抽獎重建開獎排程並啟動（單一背景任務，只在下一個截止時間喚醒）"""
+        lottery_deadlines.configure(self._end_lottery_deadline, self.dao.get_pending_end_times)
+        await lottery_deadlines.start()
 
-    @tasks.loop(minutes=10)
-    async def lottery_scheduler(self):
-        """抽獎排程器 - 定期檢查和清理"""
-        try:
-            # 清理過期抽獎
-            await self.dao.cleanup_expired_lotteries()
+    async def stop_scheduler(self):
+        await lottery_deadlines.stop()
 
-        except Exception as e:
-            logger.error(f"抽獎排程器錯誤: {e}")
+    async def _end_lottery_deadline(self, lottery_id: int):
+        """抽獎截止時由排程器呼叫；失敗時拋出例外交由排程器重試"""
+        if self.bot:
+            await self.bot.wait_until_ready()
 
-    @lottery_scheduler.before_loop
-    async def before_lottery_scheduler(self):
-        await self.bot.wait_until_ready()
+        lottery = await self.dao.get_lottery(lottery_id)
+        if not lottery or lottery["status"] != "active" or not lottery.get("auto_end", True):
+            return
+
+        # 截止時間尚未到（與資料庫時鐘有誤差）：依最新時間重新排程
+        if lottery["end_time"] and lottery["end_time"] > datetime.now():
+            lottery_deadlines.schedule(lottery_id, lottery["end_time"])
+            return
+
+        if not self.bot:
+            raise RuntimeError("未設定 bot，無法取得抽獎頻道")
+        channel = self.bot.get_channel(lottery["channel_id"])
+        if channel is None:
+            try:
+                channel = await self.bot.fetch_channel(lottery["channel_id"])
+            except (discord.NotFound, discord.Forbidden):
+                # 頻道已刪除或無權限：照常開獎並結束抽獎，避免永遠停在 active 重試
+                logger.warning(f"抽獎 {lottery_id} 的頻道 {lottery['channel_id']} 已無法存取，開獎但不公告")
+                channel = None
+
+        success, message, _ = await self.end_lottery(lottery_id, channel)
+        if not success:
+            raise RuntimeError(message)
 
     async def get_lottery_statistics(self, guild_id: int, days: int = 30) -> Dict[str, Any]:
         """獲取抽獎統計"""
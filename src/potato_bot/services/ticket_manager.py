@@ -10,12 +10,13 @@ from typing import Any, Dict, Optional, Tuple
 
 import discord
 
-from potato_bot.services.chat_transcript_manager import ChatTranscriptManager
+from potato_bot.services.chat_transcript_manager import ChatTranscriptManager, HistoryProgress
 from potato_bot.services.realtime_sync_manager import (
     SyncEvent,
     SyncEventType,
     realtime_sync,
 )
+from potato_bot.services.ticket_message_buffer import ticket_message_buffer
 from potato_bot.utils.ticket_constants import TicketConstants
 from potato_bot.utils.ticket_utils import get_support_roles_for_ticket
 from potato_bot.views.ticket_views import TicketControlView
@@ -296,12 +297,21 @@ class TicketManager:
                 )
                 return
 
+            async def report_progress(scanned: int, recorded: int) -> None:
+                try:
+                    await interaction.edit_original_response(
+                        content=f"📝 正在保存聊天記錄…已掃描 {scanned} 則、新增 {recorded} 則"
+                    )
+                except discord.HTTPException:
+                    pass
+
             # 關閉票券
             success = await self.close_ticket(
                 ticket_id=ticket["id"],
                 closed_by=interaction.user.id,
                 reason="按鈕關閉",
-                channel=interaction.channel
+                channel=interaction.channel,
+                progress=report_progress,
             )
 
             if success:
@@ -324,14 +334,18 @@ class TicketManager:
         closed_by: int,
         reason: str = None,
         channel: discord.TextChannel = None,
+        progress: Optional[HistoryProgress] = None,
     ) -> bool:
-        """關閉票券"""
+        """關閉票券（progress 接收頻道歷史回填進度：已掃描、已新增訊息數）"""
         try:
+            # 先寫入緩衝中的訊息，確保聊天記錄完整
+            await ticket_message_buffer.flush(ticket_id)
+
             # 自動匯出聊天記錄
             if channel:
                 try:
                     message_count = await self.transcript_manager.batch_record_channel_history(
-                        ticket_id, channel, limit=None
+                        ticket_id, channel, limit=None, progress=progress
                     )
                     logger.info(f"📝 票券 #{ticket_id:04d} 已匯入 {message_count} 條歷史訊息")
                 except Exception as transcript_error:
@@ -340,6 +354,13 @@ class TicketManager:
             success = await self.repository.close_ticket(ticket_id, closed_by, reason)
 
             if success:
+                # 聊天記錄已增量寫入，關閉時只補上頁尾（含關閉狀態）
+                config = self.transcript_manager.config
+                if config.auto_export_on_close:
+                    await self.transcript_manager.export_transcript(
+                        ticket_id, config.format_preference
+                    )
+
                 # 發布即時同步事件
                 await realtime_sync.publish_event(
                     SyncEvent(
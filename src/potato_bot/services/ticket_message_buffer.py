@@ -0,0 +1,316 @@
+# bot/services/ticket_message_buffer.py
+"""
+票券訊息寫入緩衝（write-behind）
+收集 ticket_messages 列與合併後的 last_activity 更新，
+依數量或時間觸發，以多列 INSERT 與單一 UPDATE ... WHERE id IN (...) 批次寫入，
+寫入成功後將同一批訊息附加到增量聊天記錄檔
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import aiomysql
+
+from potato_bot.db.pool import db_pool
+from potato_bot.services.transcript_builder import transcript_builder
+from potato_shared.config import TICKET_MESSAGE_FLUSH_INTERVAL, TICKET_MESSAGE_FLUSH_SIZE
+from potato_shared.logger import logger
+
+_MESSAGE_COLUMNS = (
+    "ticket_id, message_id, author_id, author_name, content, "
+    "attachments, message_type, timestamp, reply_to"
+)
+_ROW_PLACEHOLDER = "(%s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+
+class TicketMessageBuffer:
+    """票券訊息寫入緩衝"""
+
+    def __init__(
+        self,
+        flush_size: int = TICKET_MESSAGE_FLUSH_SIZE,
+        flush_interval: float = TICKET_MESSAGE_FLUSH_INTERVAL,
+        max_pending: Optional[int] = None,
+    ):
+        self.db = db_pool
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.1, flush_interval)
+        # 寫入失敗時最多保留的待寫入列數，避免 DB 長時間不可用時無限成長
+        self.max_pending = max_pending or self.flush_size * 50
+
+        self._rows: List[Tuple] = []
+        self._activity_ids: Set[int] = set()
+        self._flush_lock = asyncio.Lock()
+        self._wake_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # 統計
+        self._stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "flushed_rows": 0,
+            "flushed_activity": 0,
+            "updated_rows": 0,
+            "flushes": 0,
+            "failures": 0,
+            "dropped": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    # ===== 生命週期 =====
+
+    def start(self) -> None:
+        """啟動背景 flush 任務（重複呼叫無副作用）"""
+        if self._task and not self._task.done():
+            return
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name="ticket-message-buffer")
+
+    async def close(self) -> None:
+        """停止背景任務並寫入所有剩餘資料"""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    # ===== 寫入介面 =====
+
+    def enqueue(self, row: Tuple) -> None:
+        """加入一列 ticket_messages（欄位順序同 ChatTranscriptManager.build_message_row）"""
+        self._rows.append(row)
+        self._activity_ids.add(row[0])
+        self._stats["enqueued"] += 1
+
+        if not self._closed:
+            self.start()
+        if len(self._rows) >= self.flush_size:
+            self._wake_event.set()
+
+    def touch(self, ticket_id: int) -> None:
+        """僅更新票券最後活動時間（合併至下次 flush）"""
+        self._activity_ids.add(ticket_id)
+        if not self._closed:
+            self.start()
+
+    async def flush(self, ticket_id: Optional[int] = None) -> int:
+        """
+        立即寫入緩衝資料
+        ticket_id 僅作為呼叫端語義（例如匯出前確保該票券已落盤），實際會寫入全部緩衝
+        """
+        async with self._flush_lock:
+            if not self._rows and not self._activity_ids:
+                return 0
+
+            rows, self._rows = self._rows, []
+            activity_ids, self._activity_ids = self._activity_ids, set()
+
+            start = time.perf_counter()
+            try:
+                await self._write(rows, activity_ids)
+            except aiomysql.IntegrityError as e:
+                # 個別列違反約束（通常是票券已刪除的外鍵）：排除問題列，不阻塞其他票券的訊息
+                self._stats["failures"] += 1
+                logger.warning(f"⚠️ 票券訊息批次寫入違反資料表約束，改為逐列排除: {e}")
+                try:
+                    rows, remaining = await self._write_isolated(rows, activity_ids)
+                except Exception as isolate_error:
+                    self._requeue(rows, activity_ids)
+                    logger.error(f"❌ 票券訊息逐列寫入失敗（{len(rows)} 列）: {isolate_error}")
+                    return 0
+                if remaining:
+                    self._requeue(remaining, set())
+            except Exception as e:
+                self._stats["failures"] += 1
+                self._requeue(rows, activity_ids)
+                logger.error(
+                    f"❌ 票券訊息批次寫入失敗（{len(rows)} 列，"
+                    f"{len(activity_ids)} 張票券）: {e}"
+                )
+                return 0
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._stats["flushes"] += 1
+            self._stats["flushed_rows"] += len(rows)
+            self._stats["flushed_activity"] += len(activity_ids)
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+
+            if elapsed_ms > 1000:
+                logger.warning(f"⚠️ 票券訊息批次寫入耗時過長: {elapsed_ms:.0f}ms ({len(rows)} 列)")
+
+            # 已落盤的訊息同步附加到聊天記錄檔（失敗不影響寫入，關閉時由資料庫補齊）
+            await transcript_builder.append_rows(rows)
+            return len(rows)
+
+    async def insert_rows(self, rows: List[Tuple]) -> int:
+        """
+        不經佇列直接以多列 INSERT 寫入（歷史訊息回填等已成批的資料）
+        失敗時拋出例外，由呼叫端決定是否重試
+        """
+        if not rows:
+            return 0
+        await self._write(rows, set())
+        self._stats["flushed_rows"] += len(rows)
+        await transcript_builder.append_rows(rows)
+        return len(rows)
+
+    async def update_rows(self, rows: List[Tuple]) -> int:
+        """
+        以新內容更新已記錄的訊息（編輯過的訊息；ticket_messages 的 message_id 沒有唯一鍵，
+        不能以 INSERT 覆寫），並通知聊天記錄檔於關閉時重建。失敗時拋出例外
+        """
+        if not rows:
+            return 0
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.executemany(
+                        """
+                        UPDATE ticket_messages
+                        SET content = %s, attachments = %s, edited_timestamp = NOW()
+                        WHERE ticket_id = %s AND message_id = %s
+                    """,
+                        [(row[4], row[5], row[0], row[1]) for row in rows],
+                    )
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+        self._stats["updated_rows"] += len(rows)
+        # 已記錄的訊息 ID 再次附加時，聊天記錄檔會標記為需重建
+        await transcript_builder.append_rows(rows)
+        return len(rows)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """取得佇列深度與 flush 延遲統計"""
+        flushes = self._stats["flushes"]
+        return {
+            "queue_depth": len(self._rows),
+            "pending_activity": len(self._activity_ids),
+            "enqueued": self._stats["enqueued"],
+            "flushed_rows": self._stats["flushed_rows"],
+            "flushed_activity": self._stats["flushed_activity"],
+            "updated_rows": self._stats["updated_rows"],
+            "flushes": flushes,
+            "failures": self._stats["failures"],
+            "dropped": self._stats["dropped"],
+            "last_flush_ms": round(self._stats["last_flush_ms"], 2),
+            "avg_flush_ms": round(self._stats["total_flush_ms"] / flushes, 2) if flushes else 0.0,
+            "max_flush_ms": round(self._stats["max_flush_ms"], 2),
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval,
+        }
+
+    # ===== 內部 =====
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                try:
+                    await asyncio.wait_for(self._wake_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake_event.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 票券訊息緩衝迴圈錯誤: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def _write(self, rows: List[Tuple], activity_ids: Set[int]) -> None:
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    for i in range(0, len(rows), self.flush_size):
+                        chunk = rows[i : i + self.flush_size]
+                        placeholders = ", ".join([_ROW_PLACEHOLDER] * len(chunk))
+                        params = [value for row in chunk for value in row]
+                        await cursor.execute(
+                            f"""
+                            INSERT INTO ticket_messages ({_MESSAGE_COLUMNS})
+                            VALUES {placeholders}
+                            ON DUPLICATE KEY UPDATE
+                            content = VALUES(content),
+                            edited_timestamp = NOW()
+                        """,
+                            params,
+                        )
+
+                    if activity_ids:
+                        ids = sorted(activity_ids)
+                        id_placeholders = ", ".join(["%s"] * len(ids))
+                        await cursor.execute(
+                            f"UPDATE tickets SET last_activity = NOW() WHERE id IN ({id_placeholders})",
+                            ids,
+                        )
+
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+
+    async def _write_isolated(
+        self, rows: List[Tuple], activity_ids: Set[int]
+    ) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        排除違反約束的列後寫入，回傳 (已寫入, 未處理)
+        先略過不存在票券的列並整批重寫；仍失敗時逐列寫入，只丟棄違反約束的列。
+        逐列寫入途中遇到其他錯誤（例如連線中斷）時停止，剩餘的列交由呼叫端放回佇列
+        """
+        ticket_ids = sorted({row[0] for row in rows})
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                placeholders = ", ".join(["%s"] * len(ticket_ids))
+                await cursor.execute(
+                    f"SELECT id FROM tickets WHERE id IN ({placeholders})", ticket_ids
+                )
+                existing = {int(row[0]) for row in await cursor.fetchall()}
+
+        kept = [row for row in rows if row[0] in existing]
+        written: List[Tuple] = []
+        remaining: List[Tuple] = []
+        try:
+            await self._write(kept, activity_ids & existing)
+            written = kept
+        except aiomysql.IntegrityError:
+            await self._write([], activity_ids & existing)
+            for i, row in enumerate(kept):
+                try:
+                    await self._write([row], set())
+                except aiomysql.IntegrityError as e:
+                    logger.debug(f"略過違反約束的票券訊息 (message_id={row[1]}): {e}")
+                    continue
+                except Exception:
+                    remaining = kept[i:]
+                    break
+                written.append(row)
+
+        dropped = len(rows) - len(written) - len(remaining)
+        if dropped:
+            self._stats["dropped"] += dropped
+            logger.warning(f"⚠️ 丟棄 {dropped} 列違反資料表約束的票券訊息（票券可能已刪除）")
+        return written, remaining
+
+    def _requeue(self, rows: List[Tuple], activity_ids: Set[int]) -> None:
+        """寫入失敗時放回佇列前端，超過上限則丟棄最舊的列"""
+        self._rows = rows + self._rows
+        self._activity_ids |= activity_ids
+        overflow = len(self._rows) - self.max_pending
+        if overflow > 0:
+            del self._rows[:overflow]
+            self._stats["dropped"] += overflow
+            logger.warning(f"⚠️ 票券訊息緩衝已滿，丟棄 {overflow} 列最舊資料")
+
+
+# 全域實例
+ticket_message_buffer = TicketMessageBuffer()
@@ -0,0 +1,522 @@
+# bot/services/transcript_builder.py
+"""
+增量聊天記錄產生器
+訊息寫入資料庫後即渲染並附加到該票券的進行中檔案（transcripts/live），同時累計 SHA-256；
+關閉票券時只寫入頁尾並移到正式目錄，不需再讀取全部訊息重建整份文件。
+重啟後首次寫入時掃描既有檔案一次，還原已記錄的訊息 ID 與雜湊狀態。
+檔案依附加順序寫入；若有訊息晚於較新的訊息才寫入（例如關閉時才回填的機器人訊息），
+或已記錄的訊息再次寫入（編輯後的內容），關閉時改由資料庫依時間順序重建整份檔案
+"""
+
+import asyncio
+import hashlib
+import html
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiofiles
+import aiomysql
+
+from potato_bot.db.pool import db_pool
+from potato_shared.logger import logger
+
+# 格式 → 副檔名
+TRANSCRIPT_FORMATS = {"html": "html", "text": "txt", "json": "json"}
+LIVE_SUFFIX = ".part"
+BACKFILL_BATCH_SIZE = 500
+
+# ticket_messages 列（欄位順序同 ChatTranscriptManager.build_message_row）：
+# (ticket_id, message_id, author_id, author_name, content, attachments, message_type, timestamp, reply_to)
+MessageRow = Tuple[Any, ...]
+
+
+@dataclass
+class TranscriptFile:
+    """已完成的聊天記錄檔"""
+
+    path: Path
+    sha256: str
+    size: int
+    message_count: int
+
+
+@dataclass
+class _LiveTranscript:
+    """進行中的聊天記錄檔狀態"""
+
+    ticket_id: int
+    fmt: str
+    path: Path
+    hasher: Any = field(default_factory=hashlib.sha256)
+    size: int = 0
+    message_ids: Set[int] = field(default_factory=set)
+    # 已附加的最大訊息 ID（Discord 訊息 ID 依時間遞增）
+    last_message_id: int = 0
+    # 檔案順序或內容已與資料庫不一致，關閉時需重建
+    needs_rebuild: bool = False
+
+    @property
+    def message_count(self) -> int:
+        return len(self.message_ids)
+
+
+def _message_from_row(row: MessageRow) -> Dict[str, Any]:
+    attachments = row[5]
+    if isinstance(attachments, (str, bytes)):
+        try:
+            attachments = json.loads(attachments) if attachments else []
+        except ValueError:
+            attachments = []
+    return {
+        "message_id": int(row[1]),
+        "author_id": int(row[2]),
+        "author_name": row[3] or "",
+        "content": row[4] or "",
+        "attachments": attachments or [],
+        "message_type": row[6] or "user",
+        "timestamp": row[7],
+        "reply_to": row[8],
+    }
+
+
+def _format_time(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value) if value is not None else "Unknown"
+
+
+def _ticket_number(info: Dict[str, Any]) -> str:
+    ticket_id = info.get("id")
+    return f"{ticket_id:04d}" if isinstance(ticket_id, int) else "Unknown"
+
+
+# ===== 渲染器 =====
+
+
+class _HtmlRenderer:
+    """HTML：每則訊息一行，data-message-id 供重啟後還原"""
+
+    id_pattern = re.compile(r'data-message-id="(\d+)"')
+
+    def header(self, info: Dict[str, Any]) -> str:
+        number = _ticket_number(info)
+        return f"""<!DOCTYPE html>
+<html lang="zh-TW">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>票券 #{number} 聊天記錄</title>
+<style>
+body {{ font-family: 'Microsoft JhengHei', Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }}
+.header, .footer {{ background: #7289da; color: white; padding: 20px; border-radius: 8px; margin: 20px 0; }}
+.message {{ background: white; margin: 10px 0; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
+.message.staff {{ background: #e8f5e8; }}
+.message.bot {{ background: #fff2e8; }}
+.message.system {{ background: #f0f0f0; }}
+.author {{ font-weight: bold; color: #7289da; margin-bottom: 5px; }}
+.author span {{ font-size: 12px; color: #888; }}
+.timestamp {{ font-size: 12px; color: #666; margin-bottom: 8px; }}
+.content {{ line-height: 1.4; word-wrap: break-word; }}
+.attachments {{ margin-top: 10px; padding: 10px; background: #f8f8f8; border-radius: 4px; }}
+.attachment {{ margin: 5px 0; }}
+.reply {{ border-left: 4px solid #7289da; padding-left: 10px; margin-bottom: 8px; background: rgba(114, 137, 218, 0.1); }}
+</style>
+</head>
+<body>
+<div class="header">
+<h1>票券 #{number} 聊天記錄</h1>
+<p><strong>建立者:</strong> {html.escape(str(info.get('username', 'Unknown')))}</p>
+<p><strong>類型:</strong> {html.escape(str(info.get('type', 'Unknown')))}</p>
+<p><strong>建立時間:</strong> {_format_time(info.get('created_at'))}</p>
+</div>
+"""
+
+    def message(self, msg: Dict[str, Any], first: bool) -> str:
+        reply_html = '<div class="reply">回覆某則訊息</div>' if msg["reply_to"] else ""
+        attachments_html = ""
+        if msg["attachments"]:
+            items = "".join(
+                f'<div class="attachment">📎 {html.escape(str(att.get("filename", "")))} '
+                f'({att.get("size", 0)} bytes)</div>'
+                for att in msg["attachments"]
+            )
+            attachments_html = f'<div class="attachments"><strong>附件:</strong><br>{items}</div>'
+        content = html.escape(msg["content"]).replace("\r\n", "\n").replace("\n", "<br>")
+        message_type = html.escape(msg["message_type"])
+        return (
+            f'<div class="message {message_type}" data-message-id="{msg["message_id"]}">'
+            f'<div class="author">{html.escape(msg["author_name"])} <span>({message_type})</span></div>'
+            f'<div class="timestamp">{_format_time(msg["timestamp"])}</div>'
+            f'{reply_html}<div class="content">{content}</div>{attachments_html}</div>\n'
+        )
+
+    def footer(self, info: Dict[str, Any], message_count: int) -> str:
+        return f"""<div class="footer">
+<p><strong>狀態:</strong> {html.escape(str(info.get('status', 'Unknown')))}</p>
+<p><strong>關閉時間:</strong> {_format_time(info.get('closed_at'))}</p>
+<p><strong>訊息數量:</strong> {message_count} 條</p>
+</div>
+</body>
+</html>
+"""
+
+    def parse_id(self, line: str) -> Optional[int]:
+        match = self.id_pattern.search(line)
+        return int(match.group(1)) if match else None
+
+
+class _TextRenderer:
+    """純文字：訊息標頭行以 [#訊息ID] 結尾，內容每行縮排兩格"""
+
+    id_pattern = re.compile(r"^\[[^\]]*\] .* \[#(\d+)\]$")
+
+    def header(self, info: Dict[str, Any]) -> str:
+        lines = [
+            f"票券 #{_ticket_number(info)} 聊天記錄",
+            "=" * 50,
+            f"建立者: {info.get('username', 'Unknown')}",
+            f"類型: {info.get('type', 'Unknown')}",
+            f"建立時間: {_format_time(info.get('created_at'))}",
+            "=" * 50,
+            "",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def message(self, msg: Dict[str, Any], first: bool) -> str:
+        author_name = msg["author_name"].replace("\n", " ")
+        lines = [
+            f"[{_format_time(msg['timestamp'])}] {author_name} ({msg['message_type']}) "
+            f"[#{msg['message_id']}]"
+        ]
+        lines.extend(f"  {line}" for line in msg["content"].splitlines() or [""])
+        if msg["attachments"]:
+            lines.append("  附件:")
+            lines.extend(f"    📎 {att.get('filename', '')}" for att in msg["attachments"])
+        lines.append("")
+        return "\n".join(lines) + "\n"
+
+    def footer(self, info: Dict[str, Any], message_count: int) -> str:
+        lines = [
+            "=" * 50,
+            f"狀態: {info.get('status', 'Unknown')}",
+            f"關閉時間: {_format_time(info.get('closed_at'))}",
+            f"訊息數量: {message_count} 條",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def parse_id(self, line: str) -> Optional[int]:
+        match = self.id_pattern.match(line.rstrip("\n"))
+        return int(match.group(1)) if match else None
+
+
+class _JsonRenderer:
+    """JSON：messages 陣列中每則訊息一行（第二則起以逗號開頭），頁尾補上統計欄位"""
+
+    def header(self, info: Dict[str, Any]) -> str:
+        ticket_info = {
+            "id": info.get("id"),
+            "username": info.get("username"),
+            "type": info.get("type"),
+            "created_at": str(info.get("created_at")),
+        }
+        return '{"ticket_info": ' + json.dumps(ticket_info, ensure_ascii=False) + ', "messages": [\n'
+
+    def message(self, msg: Dict[str, Any], first: bool) -> str:
+        data = dict(msg)
+        data["timestamp"] = (
+            msg["timestamp"].isoformat() if isinstance(msg["timestamp"], datetime) else msg["timestamp"]
+        )
+        line = json.dumps(data, ensure_ascii=False, default=str)
+        return ("" if first else ",") + line + "\n"
+
+    def footer(self, info: Dict[str, Any], message_count: int) -> str:
+        summary = {
+            "status": info.get("status"),
+            "closed_at": str(info.get("closed_at")) if info.get("closed_at") else None,
+            "message_count": message_count,
+        }
+        return "], " + json.dumps(summary, ensure_ascii=False)[1:] + "\n"
+
+    def parse_id(self, line: str) -> Optional[int]:
+        line = line.lstrip(",")
+        if not line.startswith('{"message_id"'):
+            return None
+        try:
+            return int(json.loads(line)["message_id"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+_RENDERERS = {"html": _HtmlRenderer(), "text": _TextRenderer(), "json": _JsonRenderer()}
+
+
+class TranscriptBuilder:
+    """增量聊天記錄產生器"""
+
+    def __init__(self, root: Path = Path("transcripts"), live_format: str = "html"):
+        self.db = db_pool
+        self.root = root
+        self.live_dir = root / "live"
+        self.live_format = live_format if live_format in TRANSCRIPT_FORMATS else "html"
+
+        self._live: Dict[Tuple[int, str], _LiveTranscript] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+        self._stats: Dict[str, int] = {
+            "appended": 0,
+            "duplicates": 0,
+            "restored": 0,
+            "finalized": 0,
+            "backfilled": 0,
+            "rebuilt": 0,
+            "failures": 0,
+        }
+
+    # ===== 寫入 =====
+
+    async def append_rows(self, rows: Iterable[MessageRow]) -> int:
+        """
+        將已寫入資料庫的訊息附加到各票券的進行中檔案（已記錄的訊息 ID 略過）
+        失敗只記錄錯誤，關閉時會由資料庫補齊
+        """
+        by_ticket: Dict[int, List[MessageRow]] = {}
+        for row in rows:
+            by_ticket.setdefault(int(row[0]), []).append(row)
+
+        appended = 0
+        for ticket_id, ticket_rows in by_ticket.items():
+            try:
+                async with self._lock(ticket_id):
+                    state = await self._open(ticket_id, self.live_format)
+                    appended += await self._append(state, ticket_rows)
+            except Exception as e:
+                self._stats["failures"] += 1
+                logger.error(f"❌ 附加票券 #{ticket_id:04d} 聊天記錄失敗: {e}")
+        return appended
+
+    async def finalize(
+        self, ticket_id: int, fmt: str, destination: Path, ticket_info: Dict[str, Any]
+    ) -> Optional[TranscriptFile]:
+        """
+        完成聊天記錄：寫入頁尾並移到 destination，回傳檔案路徑與雜湊
+        進行中檔案的訊息數與資料庫一致時不讀取任何訊息；否則（舊票券、非預設格式、
+        或先前附加失敗）由資料庫補上缺少的訊息。補上的訊息打亂時間順序、或有訊息被編輯時，
+        由資料庫依時間順序重建整份檔案。沒有任何訊息時回傳 None
+        """
+        if fmt not in TRANSCRIPT_FORMATS:
+            raise ValueError(f"不支援的格式: {fmt}")
+
+        async with self._lock(ticket_id):
+            state = await self._open(ticket_id, fmt, ticket_info)
+            if state.message_count < await self._count_messages(ticket_id):
+                await self._backfill(state)
+            if state.needs_rebuild:
+                state = await self._rebuild(state, ticket_info)
+
+            key = (ticket_id, fmt)
+            if state.message_count == 0:
+                self._live.pop(key, None)
+                state.path.unlink(missing_ok=True)
+                return None
+
+            await self._write(state, _RENDERERS[fmt].footer(ticket_info, state.message_count))
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            state.path.replace(destination)
+            self._live.pop(key, None)
+
+        self._locks.pop(ticket_id, None)
+        self._stats["finalized"] += 1
+        return TranscriptFile(
+            path=destination,
+            sha256=state.hasher.hexdigest(),
+            size=state.size,
+            message_count=state.message_count,
+        )
+
+    def discard(self, ticket_id: int) -> None:
+        """移除票券所有進行中檔案"""
+        for fmt in TRANSCRIPT_FORMATS:
+            self._live.pop((ticket_id, fmt), None)
+            self._live_path(ticket_id, fmt).unlink(missing_ok=True)
+        self._locks.pop(ticket_id, None)
+
+    def cleanup_stale(self, days: int) -> int:
+        """刪除超過 days 天未更新的進行中檔案（票券未經正常關閉流程即被刪除）"""
+        if not self.live_dir.exists():
+            return 0
+        cutoff = time.time() - days * 86400
+        deleted = 0
+        for path in self.live_dir.glob(f"*{LIVE_SUFFIX}"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    deleted += 1
+            except OSError as e:
+                logger.warning(f"刪除進行中聊天記錄 {path.name} 失敗: {e}")
+        self._live = {key: state for key, state in self._live.items() if state.path.exists()}
+        return deleted
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {"live_transcripts": len(self._live), "live_format": self.live_format, **self._stats}
+
+    # ===== 內部 =====
+
+    def _lock(self, ticket_id: int) -> asyncio.Lock:
+        lock = self._locks.get(ticket_id)
+        if lock is None:
+            lock = self._locks[ticket_id] = asyncio.Lock()
+        return lock
+
+    def _live_path(self, ticket_id: int, fmt: str) -> Path:
+        return self.live_dir / f"ticket_{ticket_id:04d}.{TRANSCRIPT_FORMATS[fmt]}{LIVE_SUFFIX}"
+
+    async def _open(
+        self, ticket_id: int, fmt: str, ticket_info: Optional[Dict[str, Any]] = None
+    ) -> _LiveTranscript:
+        """取得進行中檔案：記憶體 → 既有檔案（重啟後還原）→ 新建並寫入頁首"""
+        key = (ticket_id, fmt)
+        state = self._live.get(key)
+        if state is not None:
+            return state
+
+        path = self._live_path(ticket_id, fmt)
+        state = _LiveTranscript(ticket_id=ticket_id, fmt=fmt, path=path)
+        if path.exists():
+            await asyncio.to_thread(self._restore, state)
+            self._stats["restored"] += 1
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            info = ticket_info or await self._get_ticket_info(ticket_id)
+            await self._write(state, _RENDERERS[fmt].header(info), mode="wb")
+        self._live[key] = state
+        return state
+
+    @staticmethod
+    def _restore(state: _LiveTranscript) -> None:
+        """由既有檔案還原雜湊、大小與已記錄的訊息 ID（在執行緒中執行）"""
+        renderer = _RENDERERS[state.fmt]
+        with open(state.path, "rb") as f:
+            for line in f:
+                state.hasher.update(line)
+                state.size += len(line)
+                message_id = renderer.parse_id(line.decode("utf-8", errors="replace"))
+                if message_id is not None:
+                    state.message_ids.add(message_id)
+                    if message_id < state.last_message_id:
+                        state.needs_rebuild = True
+                    state.last_message_id = max(state.last_message_id, message_id)
+
+    async def _append(
+        self, state: _LiveTranscript, rows: Iterable[MessageRow], from_db: bool = False
+    ) -> int:
+        """
+        附加訊息；from_db 為由資料庫補齊（已記錄的訊息屬正常重複）。
+        其餘來源再次寫入已記錄的訊息代表內容已更新，或訊息早於已附加的訊息時，標記需重建
+        """
+        renderer = _RENDERERS[state.fmt]
+        parts = []
+        for row in rows:
+            message = _message_from_row(row)
+            message_id = message["message_id"]
+            if message_id in state.message_ids:
+                self._stats["duplicates"] += 1
+                if not from_db:
+                    state.needs_rebuild = True
+                continue
+            if message_id < state.last_message_id:
+                state.needs_rebuild = True
+            state.last_message_id = max(state.last_message_id, message_id)
+            parts.append(renderer.message(message, first=not state.message_ids))
+            state.message_ids.add(message_id)
+        if parts:
+            await self._write(state, "".join(parts))
+            self._stats["appended"] += len(parts)
+        return len(parts)
+
+    async def _write(self, state: _LiveTranscript, text: str, mode: str = "ab") -> None:
+        data = text.encode("utf-8")
+        async with aiofiles.open(state.path, mode) as f:
+            await f.write(data)
+        state.hasher.update(data)
+        state.size += len(data)
+
+    async def _backfill(self, state: _LiveTranscript) -> None:
+        """
+        由資料庫依時間順序補上進行中檔案缺少的訊息（keyset 分批）
+        message_id 沒有唯一鍵，重複記錄的訊息只取最後寫入（id 最大）的一列
+        """
+        last: Optional[Tuple[Any, int]] = None
+        while True:
+            async with self.db.connection() as conn:
+                async with conn.cursor() as cursor:
+                    query = """
+                        SELECT ticket_id, message_id, author_id, author_name, content,
+                               attachments, message_type, timestamp, reply_to, id
+                        FROM ticket_messages
+                        WHERE ticket_id = %s
+                          AND id IN (
+                              SELECT MAX(id) FROM ticket_messages
+                              WHERE ticket_id = %s GROUP BY message_id
+                          )
+                    """
+                    params: List[Any] = [state.ticket_id, state.ticket_id]
+                    if last is not None:
+                        query += " AND (timestamp > %s OR (timestamp = %s AND id > %s))"
+                        params.extend([last[0], last[0], last[1]])
+                    query += " ORDER BY timestamp ASC, id ASC LIMIT %s"
+                    params.append(BACKFILL_BATCH_SIZE)
+                    await cursor.execute(query, params)
+                    rows = await cursor.fetchall()
+
+            if not rows:
+                break
+            self._stats["backfilled"] += await self._append(state, rows, from_db=True)
+            if len(rows) < BACKFILL_BATCH_SIZE:
+                break
+            last = (rows[-1][7], rows[-1][9])
+
+    async def _rebuild(
+        self, state: _LiveTranscript, ticket_info: Dict[str, Any]
+    ) -> _LiveTranscript:
+        """捨棄進行中檔案，由資料庫依時間順序（含最新內容）重新寫入"""
+        fresh = _LiveTranscript(ticket_id=state.ticket_id, fmt=state.fmt, path=state.path)
+        await self._write(fresh, _RENDERERS[fresh.fmt].header(ticket_info), mode="wb")
+        self._live[(state.ticket_id, state.fmt)] = fresh
+        await self._backfill(fresh)
+        self._stats["rebuilt"] += 1
+        return fresh
+
+    async def _count_messages(self, ticket_id: int) -> int:
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT COUNT(DISTINCT message_id) FROM ticket_messages WHERE ticket_id = %s",
+                    (ticket_id,),
+                )
+                row = await cursor.fetchone()
+                return int(row[0] or 0) if row else 0
+
+    async def _get_ticket_info(self, ticket_id: int) -> Dict[str, Any]:
+        try:
+            async with self.db.connection() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT id, username, type, status, created_at, closed_at
+                        FROM tickets WHERE id = %s
+                    """,
+                        (ticket_id,),
+                    )
+                    return await cursor.fetchone() or {"id": ticket_id}
+        except Exception as e:
+            logger.error(f"獲取票券資訊失敗 (ticket_id={ticket_id}): {e}")
+            return {"id": ticket_id}
+
+
+# 全域實例
+transcript_builder = TranscriptBuilder()
@@ -0,0 +1,287 @@
+# bot/services/transcript_store.py
+"""
+聊天記錄封存
+完成的聊天記錄壓縮（有 zstandard 時用 zstd，否則 gzip）後依 伺服器/年-月 分目錄存放，
+每個分目錄以 manifest.jsonl 記錄檔案清單；HTML 共用的樣式表依內容雜湊只存一份。
+保留期限清理只需列出分目錄：整月過期直接刪除目錄，邊界月份依 manifest 逐筆刪除，
+不必對每個檔案 stat
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import re
+import shutil
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from potato_shared.logger import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST_NAME = "manifest.jsonl"
+UNKNOWN_GUILD = 0
+READ_CHUNK_SIZE = 1024 * 1024
+# 樣式區塊只會出現在檔案開頭
+HEAD_SCAN_BYTES = 64 * 1024
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 10
+
+_STYLE_RE = re.compile(rb"<style>(.*?)</style>", re.DOTALL)
+_ASSET_LINK_RE = re.compile(rb'<link rel="stylesheet" href="[^"]*" data-asset="([0-9a-f]{64})">')
+
+
+@dataclass
+class ArchivedTranscript:
+    """manifest 中的一筆封存記錄"""
+
+    file: str  # 相對於 transcripts 根目錄
+    ticket_id: int
+    format: str
+    sha256: str  # 原始（未壓縮、樣式內嵌）內容的雜湊
+    raw_size: int
+    stored_size: int
+    compression: str
+    archived_at: str
+    assets: List[str] = field(default_factory=list)
+
+
+class TranscriptStore:
+    """聊天記錄封存區"""
+
+    def __init__(self, root: Path = Path("transcripts"), compression: Optional[str] = None):
+        self.root = root
+        self.archive_dir = root / "archive"
+        self.asset_dir = self.archive_dir / "assets"
+        if compression is None:
+            compression = "zstd" if zstandard is not None else "gzip"
+        if compression == "zstd" and zstandard is None:
+            logger.warning("⚠️ 未安裝 zstandard，聊天記錄改用 gzip 壓縮")
+            compression = "gzip"
+        self.compression = compression
+
+        self._lock = asyncio.Lock()
+        self._stats: Dict[str, int] = {
+            "archived": 0,
+            "raw_bytes": 0,
+            "stored_bytes": 0,
+            "pruned_files": 0,
+            "pruned_shards": 0,
+        }
+
+    # ===== 封存 =====
+
+    async def archive(
+        self,
+        source: Path,
+        *,
+        ticket_id: int,
+        fmt: str,
+        sha256: Optional[str] = None,
+        guild_id: Optional[int] = None,
+        archived_at: Optional[datetime] = None,
+    ) -> ArchivedTranscript:
+        """
+        壓縮 source 並移入 伺服器/年-月 分目錄（在執行緒中執行），完成後刪除 source
+        未提供 sha256 時於壓縮途中計算
+        """
+        async with self._lock:
+            entry = await asyncio.to_thread(
+                self._archive_sync,
+                source,
+                ticket_id,
+                fmt,
+                sha256,
+                guild_id or UNKNOWN_GUILD,
+                archived_at or datetime.now(),
+            )
+        self._stats["archived"] += 1
+        self._stats["raw_bytes"] += entry.raw_size
+        self._stats["stored_bytes"] += entry.stored_size
+        return entry
+
+    def read(self, relative_path: str) -> bytes:
+        """讀取封存的聊天記錄並還原共用樣式（同步；大量讀取請放到執行緒）"""
+        path = self.root / relative_path
+        if path.suffix == ".zst":
+            with open(path, "rb") as f:
+                data = b"".join(zstandard.ZstdDecompressor().read_to_iter(f))
+        elif path.suffix == ".gz":
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+        else:
+            data = path.read_bytes()
+
+        return _ASSET_LINK_RE.sub(
+            lambda m: b"<style>" + self._asset_path(m.group(1).decode()).read_bytes() + b"</style>",
+            data,
+            count=1,
+        )
+
+    # ===== 保留期限 =====
+
+    async def prune(self, days: int) -> List[ArchivedTranscript]:
+        """刪除封存超過 days 天的聊天記錄，回傳被刪除的項目"""
+        async with self._lock:
+            removed, shards = await asyncio.to_thread(self._prune_sync, days)
+        self._stats["pruned_files"] += len(removed)
+        self._stats["pruned_shards"] += shards
+        return removed
+
+    def get_statistics(self) -> Dict[str, Any]:
+        raw, stored = self._stats["raw_bytes"], self._stats["stored_bytes"]
+        return {
+            "compression": self.compression,
+            "compression_ratio": round(raw / stored, 2) if stored else None,
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    def _archive_sync(
+        self,
+        source: Path,
+        ticket_id: int,
+        fmt: str,
+        sha256: Optional[str],
+        guild_id: int,
+        archived_at: datetime,
+    ) -> ArchivedTranscript:
+        shard = self.archive_dir / str(guild_id) / archived_at.strftime("%Y-%m")
+        shard.mkdir(parents=True, exist_ok=True)
+        suffix = ".zst" if self.compression == "zstd" else ".gz"
+        target = shard / f"{source.name}{suffix}"
+        temp = target.with_name(target.name + ".tmp")
+
+        assets: List[str] = []
+        hasher = hashlib.sha256()
+        raw_size = 0
+        with open(source, "rb") as src, open(temp, "wb") as raw_out:
+            out = self._compressor(raw_out)
+            try:
+                head = src.read(HEAD_SCAN_BYTES)
+                hasher.update(head)
+                raw_size += len(head)
+                if fmt == "html":
+                    head = self._extract_style(head, assets)
+                out.write(head)
+                while True:
+                    chunk = src.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    raw_size += len(chunk)
+                    out.write(chunk)
+            finally:
+                out.close()
+
+        temp.replace(target)
+        entry = ArchivedTranscript(
+            file=target.relative_to(self.root).as_posix(),
+            ticket_id=ticket_id,
+            format=fmt,
+            sha256=sha256 or hasher.hexdigest(),
+            raw_size=raw_size,
+            stored_size=target.stat().st_size,
+            compression=self.compression,
+            archived_at=archived_at.isoformat(timespec="seconds"),
+            assets=assets,
+        )
+        with open(shard / MANIFEST_NAME, "a", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+        source.unlink()
+        return entry
+
+    def _compressor(self, raw_out):
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw_out, closefd=False)
+        return gzip.GzipFile(fileobj=raw_out, mode="wb", compresslevel=GZIP_LEVEL)
+
+    def _extract_style(self, head: bytes, assets: List[str]) -> bytes:
+        """將樣式區塊存為以雜湊命名的共用檔，原處改為引用"""
+        match = _STYLE_RE.search(head)
+        if not match:
+            return head
+        css = match.group(1)
+        digest = hashlib.sha256(css).hexdigest()
+        asset = self._asset_path(digest)
+        if not asset.exists():
+            asset.parent.mkdir(parents=True, exist_ok=True)
+            temp = asset.with_name(asset.name + ".tmp")
+            temp.write_bytes(css)
+            temp.replace(asset)
+        assets.append(digest)
+        href = Path("..", "..", "assets", asset.name).as_posix()
+        link = f'<link rel="stylesheet" href="{href}" data-asset="{digest}">'.encode()
+        return head[: match.start()] + link + head[match.end() :]
+
+    def _asset_path(self, digest: str) -> Path:
+        return self.asset_dir / f"{digest}.css"
+
+    def _prune_sync(self, days: int) -> Tuple[List[ArchivedTranscript], int]:
+        if not self.archive_dir.exists():
+            return [], 0
+        cutoff = datetime.now() - timedelta(days=days)
+        cutoff_month = cutoff.strftime("%Y-%m")
+
+        removed: List[ArchivedTranscript] = []
+        shards = 0
+        for guild_dir in self.archive_dir.iterdir():
+            if not guild_dir.is_dir() or guild_dir == self.asset_dir:
+                continue
+            for shard in guild_dir.iterdir():
+                if not shard.is_dir() or shard.name > cutoff_month:
+                    continue
+                entries = self._read_manifest(shard)
+                if shard.name < cutoff_month:
+                    # 整個月份都已過期
+                    shutil.rmtree(shard, ignore_errors=True)
+                    removed.extend(entries)
+                    shards += 1
+                    continue
+
+                keep = []
+                for entry in entries:
+                    if datetime.fromisoformat(entry.archived_at) < cutoff:
+                        (self.root / entry.file).unlink(missing_ok=True)
+                        removed.append(entry)
+                    else:
+                        keep.append(entry)
+                if len(keep) != len(entries):
+                    self._write_manifest(shard, keep)
+            if not any(guild_dir.iterdir()):
+                guild_dir.rmdir()
+        return removed, shards
+
+    @staticmethod
+    def _read_manifest(shard: Path) -> List[ArchivedTranscript]:
+        path = shard / MANIFEST_NAME
+        if not path.exists():
+            return []
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(ArchivedTranscript(**json.loads(line)))
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"⚠️ 略過無法解析的聊天記錄清單項目 ({shard}): {e}")
+        return entries
+
+    @staticmethod
+    def _write_manifest(shard: Path, entries: List[ArchivedTranscript]) -> None:
+        path = shard / MANIFEST_NAME
+        temp = path.with_name(MANIFEST_NAME + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+        temp.replace(path)
+
+
+# 全域實例
+transcript_store = TranscriptStore()
@@ -0,0 +1,355 @@
+# bot/services/vote_tally.py
+"""
+投票即時計票引擎
+每個投票在記憶體中維護一份計票（各選項票數 + 已投票用戶集合），首次使用時由 vote_responses 載入；
+投票直接更新記憶體並以多列 INSERT 批次寫入，投票訊息的重新渲染依訊息合併，
+每則訊息每 N 秒最多編輯一次，以最後狀態為準
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from potato_bot.db import vote_dao
+from potato_bot.db.pool import db_pool
+from potato_bot.db.stats_rollup import stats_rollup
+from potato_bot.db.vote_dao import VoteSubmitResult, VoteSubmitStatus
+from potato_shared.config import (
+    VOTE_FLUSH_INTERVAL,
+    VOTE_FLUSH_SIZE,
+    VOTE_RENDER_INTERVAL,
+    VOTE_WRITE_BEHIND,
+)
+from potato_shared.logger import logger
+
+RenderCallback = Callable[[], Awaitable[None]]
+
+# 記住最近釋放的投票數量（載入中途被釋放的計票不再寫回記憶體）
+EVICTED_HISTORY = 1000
+
+
+class VoteTally:
+    """單一投票的記憶體計票"""
+
+    def __init__(self, vote_id: int, rows: Iterable[Tuple[int, str]] = ()):
+        self.vote_id = vote_id
+        self.counts: Dict[str, int] = {}
+        self.voters: Set[int] = set()
+        self.loaded_at = time.monotonic()
+        for user_id, option in rows:
+            self.voters.add(int(user_id))
+            self.counts[option] = self.counts.get(option, 0) + 1
+
+    def has_voted(self, user_id: int) -> bool:
+        return user_id in self.voters
+
+    def try_record(self, user_id: int, options: List[str]) -> bool:
+        """
+        記錄一位用戶的投票；已投過票時回傳 False
+        檢查與寫入之間沒有 await，在事件迴圈中為原子操作
+        """
+        if user_id in self.voters:
+            return False
+        self.voters.add(user_id)
+        for option in options:
+            self.counts[option] = self.counts.get(option, 0) + 1
+        return True
+
+    def stats(self, options: Optional[List[str]] = None) -> Dict[str, int]:
+        """各選項票數（指定 options 時依選項順序並補 0）"""
+        if options is None:
+            return dict(self.counts)
+        return {opt: self.counts.get(opt, 0) for opt in options}
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def participants(self) -> int:
+        return len(self.voters)
+
+
+class VoteTallyEngine:
+    """投票計票引擎（記憶體計票 + 批次寫入 + 訊息渲染合併）"""
+
+    def __init__(
+        self,
+        flush_size: int = VOTE_FLUSH_SIZE,
+        flush_interval: float = VOTE_FLUSH_INTERVAL,
+        render_interval: float = VOTE_RENDER_INTERVAL,
+        write_behind: bool = VOTE_WRITE_BEHIND,
+        max_pending: Optional[int] = None,
+    ):
+        self.db = db_pool
+        self.write_behind = write_behind
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.1, flush_interval)
+        self.render_interval = max(0.5, render_interval)
+        # 寫入失敗時最多保留的待寫入列數，避免 DB 長時間不可用時無限成長
+        self.max_pending = max_pending or self.flush_size * 50
+
+        self._tallies: Dict[int, VoteTally] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        self._evicted: "OrderedDict[int, None]" = OrderedDict()
+
+        # 待寫入的 (vote_id, user_id, option) 列
+        self._pending: List[Tuple[int, int, str]] = []
+        self._flush_lock = asyncio.Lock()
+        self._wake_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # 渲染合併：message_id → 最新的渲染回呼 / 上次編輯時間 / 排程中的任務
+        self._render_callbacks: Dict[int, RenderCallback] = {}
+        self._render_tasks: Dict[int, asyncio.Task] = {}
+        self._last_render: Dict[int, float] = {}
+
+        self._stats: Dict[str, int] = {
+            "votes": 0,
+            "duplicates": 0,
+            "seeded": 0,
+            "flushed_rows": 0,
+            "flushes": 0,
+            "failures": 0,
+            "dropped": 0,
+            "renders": 0,
+            "coalesced_renders": 0,
+        }
+
+    # ===== 生命週期 =====
+
+    def start(self) -> None:
+        """啟動背景寫入任務（重複呼叫無副作用）"""
+        if self._task and not self._task.done():
+            return
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name="vote-tally-flush")
+
+    async def close(self) -> None:
+        """停止背景任務與排程中的渲染，並寫入剩餘票數"""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._render_tasks.values()):
+            task.cancel()
+        self._render_tasks.clear()
+        await self.flush()
+
+    # ===== 計票 =====
+
+    async def get(self, vote_id: int) -> VoteTally:
+        """
+        取得計票；首次使用時由資料庫載入（同一投票只會載入一次）
+        已結束或已釋放的投票只回傳一次性的計票，不保留在記憶體
+        """
+        tally = self._tallies.get(vote_id)
+        if tally is not None:
+            return tally
+
+        task = self._loading.get(vote_id)
+        if task is None:
+            task = asyncio.create_task(self._seed(vote_id))
+            self._loading[vote_id] = task
+            task.add_done_callback(lambda _t, vid=vote_id: self._loading.pop(vid, None))
+        return await asyncio.shield(task)
+
+    def peek(self, vote_id: int) -> Optional[VoteTally]:
+        """只讀記憶體，不觸發載入"""
+        return self._tallies.get(vote_id)
+
+    async def record(self, vote_id: int, user_id: int, options: List[str]) -> VoteSubmitResult:
+        """
+        記錄投票
+        write_behind 時更新記憶體並排入批次寫入；否則以 vote_dao.submit_vote 單一交易寫入，
+        成功後才更新記憶體
+        """
+        tally = await self.get(vote_id)
+        if tally.has_voted(user_id):
+            self._stats["duplicates"] += 1
+            return VoteSubmitResult(VoteSubmitStatus.ALREADY_VOTED)
+
+        if not self.write_behind:
+            result = await vote_dao.submit_vote(vote_id, user_id, options)
+            if result.accepted:
+                tally.try_record(user_id, list(result.options))
+                self._stats["votes"] += 1
+            elif result.status is VoteSubmitStatus.ALREADY_VOTED:
+                self._stats["duplicates"] += 1
+            return result
+
+        if not tally.try_record(user_id, options):
+            self._stats["duplicates"] += 1
+            return VoteSubmitResult(VoteSubmitStatus.ALREADY_VOTED)
+
+        self._stats["votes"] += 1
+        self._pending.extend((vote_id, user_id, option) for option in options)
+        if not self._closed:
+            self.start()
+        if len(self._pending) >= self.flush_size:
+            self._wake_event.set()
+        return VoteSubmitResult(VoteSubmitStatus.ACCEPTED, tuple(options))
+
+    async def evict(self, vote_id: int) -> None:
+        """投票結束後寫入剩餘票數並釋放記憶體"""
+        self._evicted[vote_id] = None
+        self._evicted.move_to_end(vote_id)
+        while len(self._evicted) > EVICTED_HISTORY:
+            self._evicted.popitem(last=False)
+        await self.flush()
+        self._tallies.pop(vote_id, None)
+
+    # ===== 寫入 =====
+
+    async def flush(self) -> int:
+        """立即寫入所有待寫入的票"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            try:
+                await self._write(rows)
+            except Exception as e:
+                self._stats["failures"] += 1
+                self._requeue(rows)
+                logger.error(f"❌ 投票批次寫入失敗（{len(rows)} 列），稍後重試: {e}")
+                return 0
+
+            self._stats["flushes"] += 1
+            self._stats["flushed_rows"] += len(rows)
+            stats_rollup.mark_many("vote", {row[0] for row in rows})
+            return len(rows)
+
+    # ===== 訊息渲染合併 =====
+
+    def schedule_render(self, message_id: int, render: RenderCallback) -> None:
+        """
+        排程重新渲染投票訊息
+        同一訊息在間隔內的多次請求只保留最後一個回呼，間隔到後執行一次
+        """
+        self._render_callbacks[message_id] = render
+        if message_id in self._render_tasks:
+            self._stats["coalesced_renders"] += 1
+            return
+
+        elapsed = time.monotonic() - self._last_render.get(message_id, 0.0)
+        delay = max(0.0, self.render_interval - elapsed)
+        self._render_tasks[message_id] = asyncio.create_task(
+            self._render_later(message_id, delay), name=f"vote-render-{message_id}"
+        )
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "tallies": len(self._tallies),
+            "pending_rows": len(self._pending),
+            "pending_renders": len(self._render_tasks),
+            "render_interval": self.render_interval,
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    def _requeue(self, rows: List[Tuple[int, int, str]]) -> None:
+        """寫入失敗時放回佇列前端，超過上限則丟棄最舊的列"""
+        self._pending = rows + self._pending
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self._stats["dropped"] += overflow
+            logger.warning(f"⚠️ 投票寫入緩衝已滿，丟棄 {overflow} 列最舊資料")
+
+    async def _seed(self, vote_id: int) -> VoteTally:
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT end_time <= UTC_TIMESTAMP() FROM votes WHERE id = %s", (vote_id,)
+                )
+                row = await cur.fetchone()
+                await cur.execute(
+                    "SELECT user_id, option_text FROM vote_responses WHERE vote_id = %s",
+                    (vote_id,),
+                )
+                rows = await cur.fetchall()
+
+        tally = VoteTally(vote_id, rows)
+        if row is None or row[0] or vote_id in self._evicted:
+            # 不存在、已結束或載入期間已被釋放：不常駐記憶體
+            return tally
+        # 載入期間已寫入記憶體的票以記憶體為準（避免覆蓋尚未寫入的票）
+        existing = self._tallies.setdefault(vote_id, tally)
+        if existing is tally:
+            self._stats["seeded"] += 1
+        return existing
+
+    async def _render_later(self, message_id: int, delay: float) -> None:
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            render = self._render_callbacks.pop(message_id, None)
+            self._last_render[message_id] = time.monotonic()
+            if render is not None:
+                self._stats["renders"] += 1
+                await render()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"投票訊息更新失敗 (message_id: {message_id}): {e}")
+        finally:
+            self._render_tasks.pop(message_id, None)
+            # 執行期間又有新的渲染請求：依間隔再排一次
+            if message_id in self._render_callbacks and not self._closed:
+                self.schedule_render(message_id, self._render_callbacks[message_id])
+            elif len(self._last_render) > 1000:
+                self._prune_render_history()
+
+    def _prune_render_history(self) -> None:
+        cutoff = time.monotonic() - self.render_interval
+        for message_id, last in list(self._last_render.items()):
+            if last < cutoff and message_id not in self._render_tasks:
+                del self._last_render[message_id]
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                try:
+                    await asyncio.wait_for(self._wake_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake_event.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 投票寫入迴圈錯誤: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def _write(self, rows: List[Tuple[int, int, str]]) -> None:
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cur:
+                try:
+                    for i in range(0, len(rows), self.flush_size):
+                        chunk = rows[i : i + self.flush_size]
+                        placeholders = ", ".join(["(%s, %s, %s)"] * len(chunk))
+                        params = [value for row in chunk for value in row]
+                        # 主鍵 (vote_id, user_id, option_text)：重試時忽略已寫入的列
+                        await cur.execute(
+                            f"""
+                            INSERT IGNORE INTO vote_responses (vote_id, user_id, option_text)
+                            VALUES {placeholders}
+                        """,
+                            params,
+                        )
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+
+
+# 全域實例
+vote_tally_engine = VoteTallyEngine()
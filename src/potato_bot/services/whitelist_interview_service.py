@@ -9,6 +9,7 @@ from datetime import date, datetime
 from typing import Any, Optional
 from zoneinfo import ZoneInfo
 
+from potato_bot.db.guild_settings_registry import guild_settings_registry
 from potato_bot.db.whitelist_interview_dao import WhitelistInterviewDAO
 
 
@@ -72,8 +73,8 @@ class WhitelistInterviewService:
         self.dao = dao
 
     async def load_settings(self, guild_id: int) -> WhitelistInterviewSettings:
-        row = await self.dao.get_settings(guild_id)
-        return self._from_row(guild_id, row)
+        snapshot = await guild_settings_registry.snapshot("whitelist_interview", guild_id)
+        return self._from_row(guild_id, snapshot.data)
 
     async def save_settings(self, guild_id: int, **settings: Any) -> WhitelistInterviewSettings:
         current = await self.dao.get_settings(guild_id) or {}
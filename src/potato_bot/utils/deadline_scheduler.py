@@ -0,0 +1,235 @@
+# bot/utils/deadline_scheduler.py
+"""
+截止時間排程器
+以最小堆積保存 (截止時間, key)，背景任務只睡到下一個截止時間就喚醒處理；
+改期或取消時不從堆積中刪除，而是讓舊項目在彈出時被略過（lazy expiration）。
+處理失敗時以有上限的指數退避持續重試，直到成功或被取消。
+啟動時由 loader 從資料庫重建，供投票公告與抽獎開獎等共用
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
+
+from potato_shared.logger import logger
+
+Deadline = Union[datetime, float, int]
+DeadlineHandler = Callable[[Any], Awaitable[None]]
+DeadlineLoader = Callable[[], Awaitable[Iterable[Tuple[Any, Deadline]]]]
+
+
+class DeadlineScheduler:
+    """最小堆積截止時間排程器"""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Optional[DeadlineHandler] = None,
+        loader: Optional[DeadlineLoader] = None,
+        *,
+        assume_utc: bool = True,
+        max_sleep: float = 3600.0,
+        max_concurrency: int = 5,
+        retry_delay: float = 60.0,
+        max_retry_delay: float = 1800.0,
+    ):
+        self.name = name
+        self.handler = handler
+        self.loader = loader
+        # 不帶時區的 datetime 視為 UTC（投票）或本地時間（抽獎）
+        self.assume_utc = assume_utc
+        # 最長睡眠秒數，避免系統時間被調整時長時間不醒
+        self.max_sleep = max(1.0, max_sleep)
+        # 失敗後第 n 次重試等待 retry_delay * 2^(n-1) 秒，最長 max_retry_delay
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max(retry_delay, max_retry_delay)
+
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int]] = {}
+        self._attempts: Dict[Hashable, int] = {}
+        self._counter = itertools.count()
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+        self._stats: Dict[str, int] = {"fired": 0, "failures": 0, "retries": 0, "stale_skipped": 0}
+
+    # ===== 生命週期 =====
+
+    def configure(self, handler: DeadlineHandler, loader: Optional[DeadlineLoader] = None) -> None:
+        self.handler = handler
+        if loader is not None:
+            self.loader = loader
+
+    async def start(self) -> None:
+        """由 loader 重建排程並啟動背景任務（重複呼叫無副作用）"""
+        if self._task and not self._task.done():
+            return
+        await self.rebuild()
+        self._task = asyncio.create_task(self._run(), name=f"deadline-scheduler-{self.name}")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def rebuild(self) -> int:
+        """重新由 loader 載入所有截止時間（保留載入期間新排入的項目）"""
+        if not self.loader:
+            return 0
+        try:
+            rows = await self.loader()
+        except Exception as e:
+            logger.error(f"❌ 重建 {self.name} 排程失敗: {e}")
+            return 0
+
+        count = 0
+        for key, deadline in rows or []:
+            if deadline is None:
+                continue
+            if key not in self._entries:
+                self.schedule(key, deadline)
+            count += 1
+        logger.info(f"✅ {self.name} 排程已載入 {count} 筆截止時間")
+        return count
+
+    # ===== 排程 =====
+
+    def schedule(self, key: Hashable, deadline: Deadline) -> None:
+        """排入或改期（同一 key 只保留最後一次排程）"""
+        ts = self._to_timestamp(deadline)
+        seq = next(self._counter)
+        self._entries[key] = (ts, seq)
+        heapq.heappush(self._heap, (ts, seq, key))
+        self._maybe_compact()
+        if self._heap[0][1] == seq:
+            # 新的最早截止時間，喚醒背景任務重新計算睡眠時間
+            self._wake.set()
+
+    def cancel(self, key: Hashable) -> bool:
+        self._attempts.pop(key, None)
+        return self._entries.pop(key, None) is not None
+
+    def next_deadline(self) -> Optional[float]:
+        self._drop_stale_head()
+        return self._heap[0][0] if self._heap else None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        next_ts = self.next_deadline()
+        return {
+            "name": self.name,
+            "scheduled": len(self._entries),
+            "heap_size": len(self._heap),
+            "running": len(self._running),
+            "retrying": len(self._attempts),
+            "next_in_seconds": round(next_ts - time.time(), 1) if next_ts else None,
+            **self._stats,
+        }
+
+    # ===== 內部 =====
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self._wake.clear()
+                next_ts = self.next_deadline()
+                if next_ts is None:
+                    await self._wake.wait()
+                else:
+                    delay = next_ts - time.time()
+                    if delay > 0:
+                        try:
+                            await asyncio.wait_for(self._wake.wait(), timeout=min(delay, self.max_sleep))
+                        except asyncio.TimeoutError:
+                            pass
+
+                for key in self._pop_due():
+                    task = asyncio.create_task(self._fire(key))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ {self.name} 排程迴圈錯誤: {e}")
+                await asyncio.sleep(1)
+
+    def _pop_due(self) -> List[Hashable]:
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            ts, seq, key = heapq.heappop(self._heap)
+            if self._entries.get(key) != (ts, seq):
+                self._stats["stale_skipped"] += 1
+                continue
+            del self._entries[key]
+            due.append(key)
+        return due
+
+    async def _fire(self, key: Hashable) -> None:
+        if not self.handler:
+            return
+        async with self._semaphore:
+            try:
+                await self.handler(key)
+                self._stats["fired"] += 1
+                self._attempts.pop(key, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["failures"] += 1
+                if key in self._entries:
+                    # 處理期間已被重新排程，以新的截止時間為準
+                    self._attempts.pop(key, None)
+                    logger.error(f"❌ {self.name} 處理 {key} 失敗: {e}")
+                    return
+                attempts = self._attempts.get(key, 0) + 1
+                self._attempts[key] = attempts
+                self._stats["retries"] += 1
+                delay = self.retry_delay_for(attempts)
+                self.schedule(key, time.time() + delay)
+                logger.warning(
+                    f"⚠️ {self.name} 處理 {key} 失敗（第 {attempts} 次），{delay:.0f} 秒後重試: {e}"
+                )
+
+    def retry_delay_for(self, attempts: int) -> float:
+        """第 attempts 次失敗後的重試等待秒數"""
+        return min(self.max_retry_delay, self.retry_delay * 2 ** min(attempts - 1, 32))
+
+    def _drop_stale_head(self) -> None:
+        while self._heap:
+            ts, seq, key = self._heap[0]
+            if self._entries.get(key) == (ts, seq):
+                return
+            heapq.heappop(self._heap)
+            self._stats["stale_skipped"] += 1
+
+    def _maybe_compact(self) -> None:
+        """舊項目過多時重建堆積"""
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(ts, seq, key) for key, (ts, seq) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _to_timestamp(self, deadline: Deadline) -> float:
+        if isinstance(deadline, datetime):
+            if deadline.tzinfo is None and self.assume_utc:
+                deadline = deadline.replace(tzinfo=timezone.utc)
+            return deadline.timestamp()
+        return float(deadline)
@@ -0,0 +1,39 @@
+# bot/utils/reservoir_sampler.py
+"""
+蓄水池抽樣
+串流讀取時只保留固定數量的樣本（Algorithm R），記憶體用量與母體大小無關；
+亂數來自 random.Random(seed)，同一份輸入順序與種子必得到相同結果，供抽獎開獎稽核重現
+"""
+
+import random
+from typing import Generic, Hashable, List, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+class ReservoirSampler(Generic[T]):
+    """固定大小的可重現蓄水池抽樣"""
+
+    def __init__(self, size: int, seed: str):
+        self.size = max(0, size)
+        self.seen = 0
+        self._rng = random.Random(seed)
+        self._reservoir: List[T] = []
+
+    def add(self, item: T) -> None:
+        if self.seen < self.size:
+            self._reservoir.append(item)
+        else:
+            j = self._rng.randrange(self.seen + 1)
+            if j < self.size:
+                self._reservoir[j] = item
+        self.seen += 1
+
+    def draw(self) -> List[T]:
+        """
+        回傳抽出的樣本並決定名次（第一個為第一名）
+        蓄水池內順序與讀取過程有關，先排序再以同一個亂數產生器洗牌
+        """
+        ranked = sorted(self._reservoir)
+        self._rng.shuffle(ranked)
+        return ranked
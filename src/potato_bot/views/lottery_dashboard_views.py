@@ -10,6 +10,7 @@ from typing import Any, Dict, List
 import discord
 from discord import ui
 
+from potato_bot.services.data_export import data_export_service, lottery_dataset
 from potato_bot.services.lottery_manager import LotteryManager
 from potato_bot.utils.embed_builder import EmbedBuilder
 from potato_shared.logger import logger
@@ -112,7 +113,7 @@ class LotteryStatsDashboardView(ui.View):
             leaderboard_text = ""
             medals = ["🥇", "🥈", "🥉"]
 
-            for i, (user_id, username, win_count) in enumerate(leaderboard[:10]):
+            for i, (user_id, win_count) in enumerate(leaderboard[:10]):
                 medal = medals[i] if i < 3 else f"{i+1}."
                 leaderboard_text += f"{medal} <@{user_id}> - {win_count} 次中獎\n"
 
@@ -189,6 +190,23 @@ class LotteryStatsDashboardView(ui.View):
             logger.error(f"生成詳細報告失敗: {e}")
             await interaction.followup.send("❌ 生成報告時發生錯誤", ephemeral=True)
 
+    @ui.button(label="匯出資料", style=discord.ButtonStyle.secondary, emoji="📥")
+    async def export_data(self, interaction: discord.Interaction, button: ui.Button):
+        """匯出選定時間範圍內的抽獎參與與中獎資料（CSV，gzip 壓縮）"""
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("❌ 需要管理伺服器權限", ephemeral=True)
+            return
+
+        try:
+            await interaction.response.defer(ephemeral=True)
+
+            since = datetime.now() - timedelta(days=self.current_period)
+            await data_export_service.send(interaction, lottery_dataset(self.guild_id, since))
+
+        except Exception as e:
+            logger.error(f"匯出抽獎資料失敗: {e}")
+            await interaction.followup.send("❌ 匯出抽獎資料時發生錯誤", ephemeral=True)
+
     async def _create_stats_embed(self, stats: Dict[str, Any], period: int) -> discord.Embed:
         """創建統計嵌入"""
         embed = EmbedBuilder.create_info_embed(f"📊 抽獎統計儀表板 (最近 {period} 天)")
@@ -285,31 +303,7 @@ class LotteryStatsDashboardView(ui.View):
 
     async def _get_winners_leaderboard(self, period: int) -> List[tuple]:
         """獲取中獎排行榜"""
-        try:
-            async with self.lottery_manager.dao.db.connection() as conn:
-                async with conn.cursor() as cursor:
-                    query = """
-                    SELECT
-                        lw.user_id,
-                        lw.username,
-                        COUNT(*) as win_count
-                    FROM lottery_winners lw
-                    JOIN lotteries l ON lw.lottery_id = l.id
-                    WHERE l.guild_id = %s
-                    AND l.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    GROUP BY lw.user_id, lw.username
-                    ORDER BY win_count DESC
-                    LIMIT 20
-                    """
-
-                    await cursor.execute(query, (self.guild_id, period))
-                    results = await cursor.fetchall()
-
-                    return results
-
-        except Exception as e:
-            logger.error(f"獲取中獎排行榜失敗: {e}")
-            return []
+        return await self.lottery_manager.dao.get_winners_leaderboard(self.guild_id, period)
 
     async def _generate_detailed_report(self, period: int) -> Dict[str, Any]:
         """生成詳細報告"""
@@ -10,6 +10,7 @@ from typing import Any, Dict
 import discord
 from discord import ui
 
+from potato_bot.services.lottery_entries import lottery_entry_buffer
 from potato_bot.services.lottery_manager import LotteryManager
 from potato_bot.utils.embed_builder import EmbedBuilder
 from potato_shared.logger import logger
@@ -459,9 +460,7 @@ class LotteryPanelChannelSelect(discord.ui.ChannelSelect):
                 return
 
             # 獲取參與者數量
-            participant_count = await self.lottery_manager.dao.get_participant_count(
-                self.lottery_id
-            )
+            participant_count = await lottery_entry_buffer.participant_count(self.lottery_id)
 
             # 創建詳情嵌入
             embed = await self._create_info_embed(lottery, participant_count)
@@ -612,9 +611,7 @@ class LotteryManagementView(ui.View):
             embed = EmbedBuilder.create_info_embed(f"📋 活動抽獎 ({len(active_lotteries)})")
 
             for lottery in active_lotteries[:10]:  # 最多顯示10個
-                participant_count = await self.lottery_manager.dao.get_participant_count(
-                    lottery["id"]
-                )
+                participant_count = await lottery_entry_buffer.participant_count(lottery["id"])
 
                 end_time = lottery.get("end_time")
                 if isinstance(end_time, str):
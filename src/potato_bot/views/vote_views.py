@@ -11,6 +11,8 @@ import discord
 from discord import ui
 
 from potato_bot.db import vote_dao
+from potato_bot.services.data_export import data_export_service, vote_dataset
+from potato_bot.services.vote_tally import vote_tally_engine
 from potato_bot.utils.embed_builder import EmbedBuilder
 from potato_shared.logger import logger
 
@@ -188,8 +190,9 @@ class VoteButton(discord.ui.Button):
     async def callback(self, interaction: discord.Interaction):
         """處理投票按鈕點擊"""
         try:
-            # 檢查是否已投票
-            if await vote_dao.has_voted(self.vote_id, interaction.user.id):
+            # 檢查是否已投票（記憶體計票，未載入時交由 handle_vote_submit 處理）
+            tally = vote_tally_engine.peek(self.vote_id)
+            if tally and tally.has_voted(interaction.user.id):
                 await interaction.response.send_message("❌ 您已經投過票了", ephemeral=True)
                 return
 
@@ -794,8 +797,7 @@ class VoteManagementView(ui.View):
             )
 
             for vote in votes[:5]:  # 只顯示前5個
-                stats = await vote_dao.get_vote_statistics(vote["id"])
-                total_votes = sum(stats.values())
+                total_votes = (await vote_tally_engine.get(vote["id"])).total
 
                 embed.add_field(
                     name=f"#{vote['id']} - {vote['title'][:30]}{'...' if len(vote['title']) > 30 else ''}",
@@ -861,8 +863,7 @@ class ActiveVotesButton(ui.Button):
             )
 
             for vote in active_votes[:10]:  # 限制顯示數量
-                stats = await vote_dao.get_vote_statistics(vote["id"])
-                total_votes = sum(stats.values())
+                total_votes = (await vote_tally_engine.get(vote["id"])).total
 
                 embed.add_field(
                     name=f"#{vote['id']} - {vote['title'][:40]}",
@@ -953,5 +954,18 @@ class ExportDataButton(ui.Button):
         self.guild_id = guild_id
 
     async def callback(self, interaction: discord.Interaction):
-        """匯出投票資料"""
-        await interaction.response.send_message("📥 資料匯出功能開發中...", ephemeral=True)
+        """匯出投票資料（CSV，gzip 壓縮）"""
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("❌ 需要管理伺服器權限", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            # 先寫入計票引擎中尚未落地的票，匯出內容才完整
+            await vote_tally_engine.flush()
+            await data_export_service.send(interaction, vote_dataset(self.guild_id))
+
+        except Exception as e:
+            logger.error(f"匯出投票資料失敗: {e}")
+            await interaction.followup.send("❌ 匯出投票資料時發生錯誤", ephemeral=True)
@@ -466,38 +466,9 @@ class WebhookDetailView(ui.View):
         try:
             from potato_bot.db.webhook_dao import WebhookDAO
 
-            webhook_dao = WebhookDAO()
-
-            logs, total_count = await webhook_dao.get_webhook_logs(
-                webhook_id=self.webhook_id, days=7, page=1, page_size=10
-            )
-
-            embed = EmbedBuilder.build(
-                title=f"📜 {self.webhook_data['name']} 執行日誌",
-                description=f"最近7天的執行記錄 (共 {total_count} 筆)",
-                color=0x95A5A6,
-            )
-
-            if logs:
-                for log in logs[:5]:  # 只顯示最近5筆
-                    status_emoji = {
-                        "success": "✅",
-                        "failure": "❌",
-                        "timeout": "⏰",
-                        "error": "🚫",
-                    }.get(log["status"], "❓")
-
-                    embed.add_field(
-                        name=f"{status_emoji} {log['event_type']}",
-                        value=f"時間: <t:{int(log['created_at'].timestamp())}:R>\n"
-                        f"執行時間: {log['execution_time']:.3f}s\n"
-                        f"HTTP狀態: {log['http_status'] or 'N/A'}",
-                        inline=True,
-                    )
-            else:
-                embed.add_field(name="ℹ️ 無記錄", value="最近7天沒有執行記錄", inline=False)
-
-            await interaction.followup.send(embed=embed, ephemeral=True)
+            view = WebhookLogsView(self.webhook_id, self.webhook_data, self.user_id, WebhookDAO())
+            embed = await view.load_page()
+            await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
         except Exception as e:
             logger.error(f"獲取日誌失敗: {e}")
@@ -522,6 +493,97 @@ class WebhookDetailView(ui.View):
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 
+class WebhookLogsView(ui.View):
+    """Webhook執行日誌分頁界面（以游標翻頁）"""
+
+    PAGE_SIZE = 5
+
+    def __init__(
+        self,
+        webhook_id: str,
+        webhook_data: Dict[str, Any],
+        user_id: int,
+        webhook_dao,
+        timeout=300,
+    ):
+        super().__init__(timeout=timeout)
+        self.webhook_id = webhook_id
+        self.webhook_data = webhook_data
+        self.user_id = user_id
+        self.webhook_dao = webhook_dao
+        self.page_number = 1
+        self.next_cursor = None
+        self.prev_cursor = None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """檢查互動權限"""
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message(
+                "❌ 只有原始命令使用者可以操作此介面", ephemeral=True
+            )
+            return False
+        return True
+
+    async def load_page(self, cursor: str = None) -> discord.Embed:
+        """載入一頁日誌並更新按鈕狀態"""
+        page = await self.webhook_dao.get_webhook_logs_page(
+            webhook_id=self.webhook_id,
+            days=7,
+            limit=self.PAGE_SIZE,
+            cursor=cursor,
+            with_total=True,
+        )
+        self.next_cursor = page.next_cursor
+        self.prev_cursor = page.prev_cursor
+        self.previous_page.disabled = not page.has_prev
+        self.next_page.disabled = not page.has_next
+
+        total_count = page.total or 0
+        total_pages = max(1, (total_count + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
+
+        embed = EmbedBuilder.build(
+            title=f"📜 {self.webhook_data['name']} 執行日誌",
+            description=f"最近7天的執行記錄 (共 {total_count} 筆)",
+            color=0x95A5A6,
+        )
+
+        if page.items:
+            for log in page.items:
+                status_emoji = {
+                    "success": "✅",
+                    "failure": "❌",
+                    "timeout": "⏰",
+                    "error": "🚫",
+                }.get(log["status"], "❓")
+
+                embed.add_field(
+                    name=f"{status_emoji} {log['event_type']}",
+                    value=f"時間: <t:{int(log['created_at'].timestamp())}:R>\n"
+                    f"執行時間: {log['execution_time']:.3f}s\n"
+                    f"HTTP狀態: {log['http_status'] or 'N/A'}",
+                    inline=True,
+                )
+            embed.set_footer(text=f"第 {self.page_number}/{max(total_pages, self.page_number)} 頁")
+        else:
+            embed.add_field(name="ℹ️ 無記錄", value="最近7天沒有執行記錄", inline=False)
+
+        return embed
+
+    @ui.button(label="上一頁", style=discord.ButtonStyle.secondary, emoji="⬅️", disabled=True)
+    async def previous_page(self, interaction: discord.Interaction, button: ui.Button):
+        """上一頁"""
+        self.page_number = max(1, self.page_number - 1)
+        embed = await self.load_page(self.prev_cursor)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @ui.button(label="下一頁", style=discord.ButtonStyle.secondary, emoji="➡️", disabled=True)
+    async def next_page(self, interaction: discord.Interaction, button: ui.Button):
+        """下一頁"""
+        self.page_number += 1
+        embed = await self.load_page(self.next_cursor)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+
 class WebhookDeleteConfirmView(ui.View):
     """刪除Webhook確認界面"""
 
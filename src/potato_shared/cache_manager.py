@@ -6,14 +6,19 @@ Redis 相關功能已完全移除
 
 import asyncio
 import hashlib
+import heapq
 import json
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Callable, Dict, List
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from potato_shared.logger import logger
 
+# 快取未命中的哨兵值：需要區分「未命中」與「已快取的 None（查無資料）」時作為 get() 的 default
+MISSING = object()
+
 
 class CacheStrategy(Enum):
     """快取策略（目前僅影響語義）"""
@@ -29,6 +34,7 @@ class CacheConfig:
 
     l1_max_size: int = 1000  # 最大條目數
     l1_ttl: int = 300  # 秒
+    negative_ttl: int = 60  # 查無資料（None）結果的快取秒數
     enable_statistics: bool = True
 
 
@@ -40,6 +46,18 @@ class CacheEntry:
     ttl: int
     access_count: int = 0
     last_access: float = 0.0
+    tags: Tuple[str, ...] = ()
+    stale_ttl: int = 0
+    negative: bool = False
+
+    @property
+    def expires_at(self) -> float:
+        return self.timestamp + self.ttl
+
+    @property
+    def evict_at(self) -> float:
+        """實際移除時間（過期後仍可在 stale_ttl 內作為舊值回傳）"""
+        return self.expires_at + self.stale_ttl
 
 
 @dataclass
@@ -49,6 +67,15 @@ class CacheStatistics:
     total_requests: int = 0
     total_sets: int = 0
     total_deletes: int = 0
+    tag_invalidations: int = 0
+    pattern_scans: int = 0
+    loads: int = 0
+    coalesced: int = 0
+    stale_served: int = 0
+    load_errors: int = 0
+    discarded_loads: int = 0
+    negative_hits: int = 0
+    negative_sets: int = 0
 
     def hit_rate(self) -> float:
         total_hits = self.l1_hits
@@ -64,16 +91,42 @@ class CacheStatistics:
 
 
 class MultiLevelCacheManager:
-    """單層 L1 快取管理器（保留原介面）"""
+    """
+    單層 L1 快取管理器（保留原介面）
+
+    L1 以 OrderedDict 維護 LRU 順序（命中 move_to_end、淘汰 popitem），
+    過期時間以最小堆積 (expires_at, key) 追蹤，get/set/delete 皆為 O(1)
+    （過期清理為攤銷 O(log n)）。L1 操作內沒有 await，在事件迴圈上天然具原子性。
+
+    條目可附帶標籤（例如 guild / user），並以標籤 → 鍵集合的次級索引支援
+    invalidate_tags()，失效成本只與該標籤下的鍵數有關；clear_all() 的萬用字元
+    模式仍保留為需掃描全部鍵的慢速後備路徑。
+
+    get_or_load() 提供 single-flight：同一鍵同時未命中時只會執行一次 loader，
+    其他呼叫端共用同一個進行中的 Task；可選的 stale-while-revalidate 會在條目過期後
+    的 stale_ttl 內先回傳舊值，並只觸發一次背景重新載入。
+
+    None 是合法的快取值（負向快取，代表「查無資料」），使用較短的 negative_ttl；
+    get() 未命中時回傳 default，需要區分兩者時請傳入 MISSING 作為 default。
+
+    delete() / invalidate_tags() / clear_all() 會把受影響鍵上進行中的載入從 _inflight
+    摘除：該次載入完成時發現自己已不是登記中的載入，就不寫回快取（結果仍交給原本的
+    等待者），之後的呼叫端則會重新載入，避免失效前讀到的舊資料在失效後被寫回。
+    """
+
+    # 每次寫入時順帶清理的過期條目上限，避免單次寫入延遲抖動
+    EXPIRE_BATCH = 32
 
     def __init__(self, config: CacheConfig = None):
         self.config = config or CacheConfig()
-        self._l1_cache: Dict[str, CacheEntry] = {}
-        self._l1_access_order: List[str] = []
+        self._l1_cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._l1_expiry_heap: List[Tuple[float, str]] = []
+        self._tag_index: Dict[str, Set[str]] = {}
         self.stats = CacheStatistics()
 
         self._locks: Dict[str, asyncio.Lock] = {}
-        self._global_lock = asyncio.Lock()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._inflight_tags: Dict[str, Tuple[str, ...]] = {}
 
         self._preload_task = None
         self._cleanup_task = None
@@ -96,14 +149,14 @@ class MultiLevelCacheManager:
             asyncio.create_task(self._periodic_statistics_report())
 
     async def get(self, key: str, default: Any = None) -> Any:
-        """讀取快取"""
+        """讀取快取（負向快取命中時回傳 None，未命中時回傳 default）"""
         self.stats.total_requests += 1
         start = time.time()
         try:
-            value = await self._get_from_l1(key)
-            if value is not None:
-                self.stats.l1_hits += 1
-                return value
+            entry, fresh = self._peek_l1(key)
+            if entry is not None and fresh:
+                self._record_hit(entry)
+                return entry.value
 
             self.stats.l1_misses += 1
             return default
@@ -121,18 +174,24 @@ class MultiLevelCacheManager:
         value: Any,
         ttl: int = None,
         strategy: CacheStrategy = CacheStrategy.WRITE_THROUGH,
+        tags: Optional[Iterable[str]] = None,
+        stale_ttl: int = 0,
     ) -> bool:
-        """寫入快取（策略僅保留兼容性）"""
+        """寫入快取（策略僅保留兼容性；tags 供 invalidate_tags 使用；value 為 None 時視為負向快取）"""
         self.stats.total_sets += 1
         start = time.time()
         try:
-            ttl = ttl or self.config.l1_ttl
+            if value is None:
+                self.stats.negative_sets += 1
+                ttl = ttl or self.config.negative_ttl
+            else:
+                ttl = ttl or self.config.l1_ttl
 
             if strategy == CacheStrategy.WRITE_AROUND:
                 # 已無 L2，直接返回 False
                 return False
 
-            await self._set_to_l1(key, value, ttl)
+            await self._set_to_l1(key, value, ttl, tuple(tags) if tags else (), stale_ttl)
             return True
         except Exception as e:
             logger.error(f"❌ 寫入快取失敗 {key}: {e}")
@@ -142,24 +201,167 @@ class MultiLevelCacheManager:
             if duration > 0.05:
                 logger.warning(f"⚠️ 快取寫入耗時過長: {key} - {duration:.3f}s")
 
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = None,
+        negative_ttl: int = None,
+        tags: Optional[Iterable[str]] = None,
+        stale_ttl: int = 0,
+    ) -> Any:
+        """
+        讀取快取，未命中時以 loader 載入並寫回（single-flight）
+
+        - 同一鍵的並發未命中共用同一次 loader 呼叫
+        - stale_ttl > 0 時，過期但仍在 stale_ttl 內的值會直接回傳，並在背景重新載入一次
+        - loader 回傳 None 時以 negative_ttl 負向快取（預設 config.negative_ttl，0 表示不快取）
+        - loader 拋出例外時不寫入快取，例外會傳給所有等待者
+        """
+        self.stats.total_requests += 1
+        entry, fresh = self._peek_l1(key)
+
+        if entry is not None and fresh:
+            self._record_hit(entry)
+            return entry.value
+
+        if negative_ttl is None:
+            negative_ttl = self.config.negative_ttl
+
+        if entry is not None:
+            # 過期但仍可使用：回傳舊值並確保只有一個背景重新載入
+            self.stats.stale_served += 1
+            if key not in self._inflight:
+                self._start_load(key, loader, ttl, negative_ttl, tags, stale_ttl)
+            return entry.value
+
+        self.stats.l1_misses += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            task = self._start_load(key, loader, ttl, negative_ttl, tags, stale_ttl)
+
+        # shield：單一呼叫端被取消時不影響其他共用同一載入的呼叫端
+        return await asyncio.shield(task)
+
+    def _start_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        negative_ttl: int,
+        tags: Optional[Iterable[str]],
+        stale_ttl: int,
+    ) -> asyncio.Task:
+        self.stats.loads += 1
+        tags = tuple(tags) if tags else ()
+        task = asyncio.create_task(
+            self._run_loader(key, loader, ttl, negative_ttl, tags, stale_ttl)
+        )
+        self._inflight[key] = task
+        self._inflight_tags[key] = tags
+        task.add_done_callback(lambda t, k=key: self._finish_load(k, t))
+        return task
+
+    async def _run_loader(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        negative_ttl: int,
+        tags: Optional[Iterable[str]],
+        stale_ttl: int,
+    ) -> Any:
+        value = await loader()
+        if self._inflight.get(key) is not asyncio.current_task():
+            # 載入期間鍵或標籤已被失效：結果只交給既有等待者，不寫回快取
+            self.stats.discarded_loads += 1
+            return value
+        if value is not None:
+            await self.set(key, value, ttl, tags=tags, stale_ttl=stale_ttl)
+        elif negative_ttl > 0:
+            await self.set(key, None, negative_ttl, tags=tags)
+        return value
+
+    def _record_hit(self, entry: CacheEntry) -> None:
+        self.stats.l1_hits += 1
+        if entry.negative:
+            self.stats.negative_hits += 1
+
+    def _finish_load(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._inflight_tags.pop(key, None)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            # 背景重新載入沒有等待者，在此記錄以免例外被吞掉
+            self.stats.load_errors += 1
+            logger.error(f"❌ 快取載入失敗 {key}: {error}")
+
+    def _detach_inflight(self, key: str) -> None:
+        """摘除鍵上進行中的載入，使其完成時不寫回快取"""
+        if self._inflight.pop(key, None) is not None:
+            self._inflight_tags.pop(key, None)
+
     async def delete(self, key: str) -> bool:
         """刪除快取"""
         self.stats.total_deletes += 1
         try:
+            self._detach_inflight(key)
             return await self._delete_from_l1(key)
         except Exception as e:
             logger.error(f"❌ 刪除快取失敗 {key}: {e}")
             return False
 
+    async def invalidate_tags(self, *tags: str) -> int:
+        """刪除帶有任一指定標籤的條目，成本為 O(標籤下的鍵數)"""
+        count = 0
+        try:
+            if self._inflight_tags:
+                wanted = set(tags)
+                for key in [k for k, t in self._inflight_tags.items() if wanted.intersection(t)]:
+                    self._detach_inflight(key)
+            for tag in tags:
+                keys = self._tag_index.pop(tag, None)
+                if not keys:
+                    continue
+                for key in keys:
+                    entry = self._l1_cache.pop(key, None)
+                    if entry is not None:
+                        self._unindex_tags(key, entry, skip=tag)
+                        count += 1
+            self.stats.tag_invalidations += 1
+            self.stats.total_deletes += count
+            if count:
+                logger.debug(f"🏷️ 標籤失效 {tags}，共清理 {count} 個條目")
+            return count
+        except Exception as e:
+            logger.error(f"❌ 標籤失效失敗 {tags}: {e}")
+            return count
+
     async def clear_all(self, pattern: str = "*") -> int:
-        """清空快取（支援模式匹配）"""
+        """清空快取（支援模式匹配；模式匹配需掃描全部鍵，熱路徑請改用 invalidate_tags）"""
         count = 0
         try:
             if pattern == "*":
+                self._inflight.clear()
+                self._inflight_tags.clear()
                 count = len(self._l1_cache)
                 self._l1_cache.clear()
-                self._l1_access_order.clear()
+                self._l1_expiry_heap.clear()
+                self._tag_index.clear()
             else:
+                self.stats.pattern_scans += 1
+                if self.stats.pattern_scans % 100 == 1:
+                    logger.warning(
+                        f"⚠️ 快取模式刪除需掃描全部 {len(self._l1_cache)} 個鍵: {pattern} "
+                        f"(累計 {self.stats.pattern_scans} 次)，建議改用標籤失效"
+                    )
+                for key in [k for k in self._inflight if self._match_pattern(k, pattern)]:
+                    self._detach_inflight(key)
                 keys_to_delete = [k for k in self._l1_cache if self._match_pattern(k, pattern)]
                 for key in keys_to_delete:
                     await self._delete_from_l1(key)
@@ -191,72 +393,130 @@ class MultiLevelCacheManager:
             "operations": {
                 "sets": self.stats.total_sets,
                 "deletes": self.stats.total_deletes,
+                "tag_invalidations": self.stats.tag_invalidations,
+                "pattern_scans": self.stats.pattern_scans,
+            },
+            "tags": {
+                "indexed_tags": len(self._tag_index),
+            },
+            "loading": {
+                "loads": self.stats.loads,
+                "coalesced": self.stats.coalesced,
+                "stale_served": self.stats.stale_served,
+                "errors": self.stats.load_errors,
+                "discarded": self.stats.discarded_loads,
+                "inflight": len(self._inflight),
+            },
+            "negative": {
+                "hits": self.stats.negative_hits,
+                "sets": self.stats.negative_sets,
+                "ttl": self.config.negative_ttl,
             },
         }
 
     # ===== L1 操作 =====
-    async def _get_from_l1(self, key: str) -> Any:
-        async with self._global_lock:
-            entry = self._l1_cache.get(key)
-            if not entry:
-                return None
-            if time.time() - entry.timestamp > entry.ttl:
-                del self._l1_cache[key]
-                if key in self._l1_access_order:
-                    self._l1_access_order.remove(key)
-                return None
-            entry.access_count += 1
-            entry.last_access = time.time()
-            if key in self._l1_access_order:
-                self._l1_access_order.remove(key)
-            self._l1_access_order.append(key)
-            return entry.value
-
-    async def _set_to_l1(self, key: str, value: Any, ttl: int) -> bool:
-        async with self._global_lock:
-            if len(self._l1_cache) >= self.config.l1_max_size and key not in self._l1_cache:
-                if self._l1_access_order:
-                    oldest = self._l1_access_order.pop(0)
-                    self._l1_cache.pop(oldest, None)
-
-            entry = CacheEntry(
-                key=key,
-                value=value,
-                timestamp=time.time(),
-                ttl=ttl,
-                access_count=1,
-                last_access=time.time(),
-            )
-            self._l1_cache[key] = entry
-            if key in self._l1_access_order:
-                self._l1_access_order.remove(key)
-            self._l1_access_order.append(key)
-            return True
+    def _peek_l1(self, key: str) -> Tuple[Optional[CacheEntry], bool]:
+        """取得條目與是否仍在 TTL 內；超過 stale 期限的條目會直接移除"""
+        entry = self._l1_cache.get(key)
+        if entry is None:
+            return None, False
+        now = time.time()
+        if now >= entry.evict_at:
+            # 堆積中的對應項目會在之後的過期清理時被略過
+            del self._l1_cache[key]
+            self._unindex_tags(key, entry)
+            return None, False
+        entry.access_count += 1
+        entry.last_access = now
+        self._l1_cache.move_to_end(key)
+        return entry, now < entry.expires_at
+
+    async def _set_to_l1(
+        self, key: str, value: Any, ttl: int, tags: Tuple[str, ...] = (), stale_ttl: int = 0
+    ) -> bool:
+        now = time.time()
+        self._expire_l1(now, limit=self.EXPIRE_BATCH)
+
+        previous = self._l1_cache.get(key)
+        if previous is not None:
+            self._unindex_tags(key, previous)
+            self._l1_cache.move_to_end(key)
+        else:
+            while len(self._l1_cache) >= self.config.l1_max_size and self._l1_cache:
+                evicted_key, evicted = self._l1_cache.popitem(last=False)
+                self._unindex_tags(evicted_key, evicted)
+
+        entry = CacheEntry(
+            key=key,
+            value=value,
+            timestamp=now,
+            ttl=ttl,
+            access_count=1,
+            last_access=now,
+            tags=tags,
+            stale_ttl=stale_ttl,
+            negative=value is None,
+        )
+        self._l1_cache[key] = entry
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        heapq.heappush(self._l1_expiry_heap, (entry.evict_at, key))
+        self._compact_expiry_heap()
+        return True
 
     async def _delete_from_l1(self, key: str) -> bool:
-        async with self._global_lock:
-            if key in self._l1_cache:
-                del self._l1_cache[key]
-                if key in self._l1_access_order:
-                    self._l1_access_order.remove(key)
-                return True
+        entry = self._l1_cache.pop(key, None)
+        if entry is None:
             return False
+        self._unindex_tags(key, entry)
+        return True
+
+    def _unindex_tags(self, key: str, entry: CacheEntry, skip: str = None) -> None:
+        """從標籤索引移除鍵（skip 為呼叫端已整組移除的標籤）"""
+        for tag in entry.tags:
+            if tag == skip:
+                continue
+            keys = self._tag_index.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._tag_index[tag]
+
+    def _expire_l1(self, now: float, limit: int = None) -> int:
+        """依過期堆積移除到期條目；堆積中已被覆寫/刪除的舊項目直接略過"""
+        heap = self._l1_expiry_heap
+        removed = 0
+        processed = 0
+        while heap and heap[0][0] <= now:
+            if limit is not None and processed >= limit:
+                break
+            evict_at, key = heapq.heappop(heap)
+            processed += 1
+            entry = self._l1_cache.get(key)
+            if entry is not None and entry.evict_at == evict_at:
+                del self._l1_cache[key]
+                self._unindex_tags(key, entry)
+                removed += 1
+        return removed
+
+    def _compact_expiry_heap(self) -> None:
+        """覆寫/淘汰會留下過時的堆積項目，數量過多時重建堆積"""
+        if len(self._l1_expiry_heap) <= 2 * len(self._l1_cache) + 64:
+            return
+        self._l1_expiry_heap = [
+            (entry.evict_at, key) for key, entry in self._l1_cache.items()
+        ]
+        heapq.heapify(self._l1_expiry_heap)
 
     # ===== 背景任務 =====
     async def _cleanup_l1_cache(self):
         while True:
             try:
                 await asyncio.sleep(60)
-                current = time.time()
-                expired = []
-                async with self._global_lock:
-                    for key, entry in list(self._l1_cache.items()):
-                        if current - entry.timestamp > entry.ttl:
-                            expired.append(key)
-                for key in expired:
-                    await self._delete_from_l1(key)
+                expired = self._expire_l1(time.time())
                 if expired:
-                    logger.debug(f"🧹 L1 快取清理完成，移除 {len(expired)} 個過期條目")
+                    logger.debug(f"🧹 L1 快取清理完成，移除 {expired} 個過期條目")
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -289,6 +549,8 @@ class MultiLevelCacheManager:
                 self._cleanup_task.cancel()
             if self._preload_task:
                 self._preload_task.cancel()
+            for task in list(self._inflight.values()):
+                task.cancel()
             logger.info("✅ 快取管理器已關閉")
         except Exception as e:
             logger.error(f"❌ 關閉快取管理器失敗: {e}")
@@ -312,8 +574,13 @@ def cached(
     key_prefix: str = "",
     ttl: int = 300,
     strategy: CacheStrategy = CacheStrategy.WRITE_THROUGH,
+    stale_ttl: int = 0,
+    negative_ttl: int = 0,
 ):
-    """簡易快取裝飾器"""
+    """
+    簡易快取裝飾器（並發未命中共用同一次呼叫；stale_ttl > 0 啟用 stale-while-revalidate）
+    negative_ttl > 0 時會快取 None 結果；預設不快取，避免把錯誤時回傳的 None 當成查無資料
+    """
 
     def decorator(func: Callable):
         async def wrapper(*args, **kwargs):
@@ -326,14 +593,16 @@ def cached(
             cache_key = ":".join(filter(None, key_parts))
             cache_key = hashlib.sha256(cache_key.encode()).hexdigest()[:16]
 
-            result = await cache_manager.get(cache_key)
-            if result is not None:
-                return result
-
-            result = await func(*args, **kwargs)
-            if result is not None:
-                await cache_manager.set(cache_key, result, ttl, strategy)
-            return result
+            if strategy == CacheStrategy.WRITE_AROUND:
+                return await func(*args, **kwargs)
+
+            return await cache_manager.get_or_load(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl,
+                negative_ttl=negative_ttl,
+                stale_ttl=stale_ttl,
+            )
 
         return wrapper
 
@@ -55,6 +55,11 @@ DB_PORT = int(os.getenv("DB_PORT", 3306))
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
+# 連線池大小：MAX 為平時上限，持續等待時可自動擴充至 HARD_MAX
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_HARD_MAX = int(os.getenv("DB_POOL_HARD_MAX", 20))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 5.0))
 
 # ======================
 # 系統配置
@@ -62,6 +67,10 @@ DB_NAME = os.getenv("DB_NAME")
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
+# 伺服器設定快照最長存活秒數（寫入時會主動推送更新，此值僅作為外部改動的保底）
+GUILD_SETTINGS_MAX_AGE = int(os.getenv("GUILD_SETTINGS_MAX_AGE", 300))
+# 統計彙總表重新計算變動日期的間隔（秒）；儀表板讀取時也會先處理該伺服器的變動
+STATS_ROLLUP_INTERVAL = float(os.getenv("STATS_ROLLUP_INTERVAL", 60))
 
 # ======================
 # 自動回覆配置
@@ -100,6 +109,26 @@ SYNC_COMMANDS = os.getenv("SYNC_COMMANDS", "true").lower() == "true"
 TICKET_AUTO_REPLIES = os.getenv("TICKET_AUTO_REPLIES", "true").lower() == "true"
 TICKET_DEFAULT_AUTO_CLOSE_HOURS = int(os.getenv("TICKET_DEFAULT_AUTO_CLOSE_HOURS", 24))
 TICKET_MAX_PER_USER = int(os.getenv("TICKET_MAX_PER_USER", 3))
+# 票券訊息寫入緩衝（批次寫入 ticket_messages / last_activity）
+TICKET_MESSAGE_FLUSH_SIZE = int(os.getenv("TICKET_MESSAGE_FLUSH_SIZE", 200))
+TICKET_MESSAGE_FLUSH_INTERVAL = float(os.getenv("TICKET_MESSAGE_FLUSH_INTERVAL", 2.0))
+
+# ======================
+# 投票系統配置
+# ======================
+# 投票訊息重新渲染的最短間隔（秒），期間內的多次更新合併為一次編輯
+VOTE_RENDER_INTERVAL = float(os.getenv("VOTE_RENDER_INTERVAL", 3.0))
+VOTE_FLUSH_SIZE = int(os.getenv("VOTE_FLUSH_SIZE", 500))
+VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", 1.0))
+# false 時每次投票直接以單一交易寫入資料庫（多實例部署時使用）
+VOTE_WRITE_BEHIND = os.getenv("VOTE_WRITE_BEHIND", "true").lower() == "true"
+
+# ======================
+# 抽獎系統配置
+# ======================
+# 參與抽獎先記在記憶體並立即回應，依數量或時間以多列 INSERT IGNORE 批次寫入
+LOTTERY_ENTRY_FLUSH_SIZE = int(os.getenv("LOTTERY_ENTRY_FLUSH_SIZE", 500))
+LOTTERY_ENTRY_FLUSH_INTERVAL = float(os.getenv("LOTTERY_ENTRY_FLUSH_INTERVAL", 1.0))
 
 # ======================
 # 圖片處理配置
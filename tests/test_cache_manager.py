@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from potato_shared import cache_manager as cache_module
+from potato_shared.cache_manager import MISSING, CacheConfig, MultiLevelCacheManager
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", fake)
+    return fake
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_lru_evicts_least_recently_used(clock):
+    async def scenario():
+        cache = MultiLevelCacheManager(CacheConfig(l1_max_size=3))
+        for key in ("a", "b", "c"):
+            await cache.set(key, key.upper())
+        # 讀取 a 使其成為最近使用，下一次淘汰 b
+        assert await cache.get("a") == "A"
+        await cache.set("d", "D")
+        return cache
+
+    cache = run(scenario())
+    assert list(cache._l1_cache) == ["c", "a", "d"]
+
+
+def test_overwrite_refreshes_recency_without_evicting(clock):
+    async def scenario():
+        cache = MultiLevelCacheManager(CacheConfig(l1_max_size=2))
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.set("a", 3)
+        await cache.set("c", 4)
+        return cache
+
+    cache = run(scenario())
+    assert list(cache._l1_cache) == ["a", "c"]
+    assert cache._l1_cache["a"].value == 3
+
+
+def test_entries_expire_after_ttl(clock):
+    async def scenario():
+        cache = MultiLevelCacheManager(CacheConfig(negative_ttl=5))
+        await cache.set("short", "x", ttl=10)
+        await cache.set("long", "y", ttl=100)
+        await cache.set("none", None)
+
+        clock.now += 5
+        assert await cache.get("none", MISSING) is MISSING
+        assert await cache.get("short") == "x"
+
+        clock.now += 5
+        assert await cache.get("short") is None
+        assert await cache.get("long") == "y"
+        return cache
+
+    cache = run(scenario())
+    assert "short" not in cache._l1_cache
+
+
+def test_stale_value_served_within_stale_ttl(clock):
+    async def scenario():
+        cache = MultiLevelCacheManager()
+        await cache.set("k", "old", ttl=10, stale_ttl=20)
+        clock.now += 15
+        assert await cache.get("k") is None
+        entry, fresh = cache._peek_l1("k")
+        assert entry.value == "old" and not fresh
+
+        clock.now += 20
+        assert cache._peek_l1("k") == (None, False)
+
+    run(scenario())
+
+
+def test_expire_heap_removes_due_entries_and_skips_overwritten(clock):
+    async def scenario():
+        cache = MultiLevelCacheManager()
+        await cache.set("a", 1, ttl=10)
+        await cache.set("b", 2, ttl=10)
+        # 覆寫後舊的堆積項目過時，不能把新條目提早移除
+        await cache.set("a", 3, ttl=100)
+        await cache.set("tagged", 4, ttl=10, tags=["guild:1"])
+
+        clock.now += 10
+        removed = cache._expire_l1(clock.now)
+        return cache, removed
+
+    cache, removed = run(scenario())
+    assert removed == 2
+    assert list(cache._l1_cache) == ["a"]
+    assert "guild:1" not in cache._tag_index
+    assert len(cache._l1_expiry_heap) == 1
+
+
+def test_expire_batch_limits_work_per_write(clock):
+    async def scenario():
+        cache = MultiLevelCacheManager(CacheConfig(l1_max_size=1000))
+        for i in range(100):
+            await cache.set(f"k{i}", i, ttl=10)
+        clock.now += 10
+        await cache.set("new", 0, ttl=10)
+        return cache
+
+    cache = run(scenario())
+    assert len(cache._l1_cache) == 100 - MultiLevelCacheManager.EXPIRE_BATCH + 1
+
+
+def test_expiry_heap_is_compacted(clock):
+    async def scenario():
+        cache = MultiLevelCacheManager(CacheConfig(l1_max_size=10))
+        for i in range(1000):
+            await cache.set(f"k{i % 20}", i, ttl=300)
+        return cache
+
+    cache = run(scenario())
+    assert len(cache._l1_cache) == 10
+    assert len(cache._l1_expiry_heap) <= 2 * len(cache._l1_cache) + 64
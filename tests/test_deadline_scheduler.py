@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from potato_bot.utils.deadline_scheduler import DeadlineScheduler
+
+
+def test_pop_due_in_deadline_order():
+    scheduler = DeadlineScheduler("測試")
+    now = time.time()
+    scheduler.schedule("c", now - 1)
+    scheduler.schedule("a", now - 3)
+    scheduler.schedule("later", now + 3600)
+    scheduler.schedule("b", now - 2)
+
+    assert scheduler._pop_due() == ["a", "b", "c"]
+    assert "later" in scheduler and len(scheduler) == 1
+
+
+def test_reschedule_and_cancel_skip_stale_entries():
+    scheduler = DeadlineScheduler("測試")
+    now = time.time()
+    scheduler.schedule("moved", now - 5)
+    scheduler.schedule("cancelled", now - 4)
+    scheduler.schedule("kept", now - 3)
+    scheduler.schedule("moved", now - 1)
+    scheduler.cancel("cancelled")
+
+    assert scheduler._pop_due() == ["kept", "moved"]
+    assert scheduler.get_statistics()["stale_skipped"] == 2
+
+
+def test_naive_datetime_timezone():
+    naive = datetime(2024, 1, 1, 12, 0)
+    utc = DeadlineScheduler("utc")
+    local = DeadlineScheduler("local", assume_utc=False)
+
+    utc.schedule("k", naive)
+    local.schedule("k", naive)
+
+    assert utc.next_deadline() == naive.replace(tzinfo=timezone.utc).timestamp()
+    assert local.next_deadline() == naive.timestamp()
+
+
+def test_retry_delay_backs_off_and_caps():
+    scheduler = DeadlineScheduler("測試", retry_delay=10, max_retry_delay=60)
+    assert [scheduler.retry_delay_for(n) for n in range(1, 6)] == [10, 20, 40, 60, 60]
+    assert scheduler.retry_delay_for(10_000) == 60
+
+
+def test_failed_handler_is_rescheduled_until_it_succeeds():
+    async def scenario():
+        calls = []
+
+        async def handler(key):
+            calls.append(key)
+            if len(calls) < 3:
+                raise RuntimeError("暫時失敗")
+
+        scheduler = DeadlineScheduler("測試", handler, retry_delay=0.01, max_retry_delay=0.02)
+        scheduler.schedule("vote", time.time())
+        await scheduler.start()
+        try:
+            for _ in range(200):
+                if scheduler.get_statistics()["fired"]:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await scheduler.stop()
+        return calls, scheduler
+
+    calls, scheduler = asyncio.run(scenario())
+    stats = scheduler.get_statistics()
+    assert calls == ["vote", "vote", "vote"]
+    assert stats["failures"] == 2 and stats["retries"] == 2 and stats["fired"] == 1
+    assert stats["retrying"] == 0 and "vote" not in scheduler
+
+
+def test_rescheduled_during_failure_keeps_new_deadline():
+    async def scenario():
+        scheduler = DeadlineScheduler("測試", retry_delay=0.01)
+        later = datetime.now(timezone.utc) + timedelta(hours=1)
+
+        async def handler(key):
+            scheduler.schedule(key, later)
+            raise RuntimeError("失敗")
+
+        scheduler.configure(handler)
+        await scheduler._fire("lottery")
+        return scheduler, later
+
+    scheduler, later = asyncio.run(scenario())
+    assert scheduler.next_deadline() == later.timestamp()
+    assert scheduler.get_statistics()["retries"] == 0
+
+
+def test_fires_in_deadline_order():
+    async def scenario():
+        fired = []
+
+        async def handler(key):
+            fired.append(key)
+
+        scheduler = DeadlineScheduler("測試", handler, max_concurrency=1)
+        await scheduler.start()
+        now = time.time()
+        for key, offset in [("third", 0.06), ("first", 0.02), ("second", 0.04)]:
+            scheduler.schedule(key, now + offset)
+        try:
+            for _ in range(200):
+                if len(fired) == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await scheduler.stop()
+        return fired
+
+    assert asyncio.run(scenario()) == ["first", "second", "third"]
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from potato_bot.db.pagination import (
+    SortKey,
+    _seek_condition,
+    build_keyset_query,
+    build_page,
+    decode_cursor,
+    encode_cursor,
+)
+
+KEYS = [SortKey("t.created_at", "created_at"), SortKey("t.id", "id")]
+
+
+def test_cursor_round_trip_preserves_types():
+    keys = [
+        SortKey("a", "a"),
+        SortKey("b", "b", descending=False),
+        SortKey("c", "c"),
+        SortKey("d", "d"),
+    ]
+    row = {
+        "a": datetime(2024, 5, 1, 12, 30, 15),
+        "b": date(2024, 5, 1),
+        "c": Decimal("12.50"),
+        "d": 42,
+    }
+
+    values, backwards = decode_cursor(keys, encode_cursor(keys, row))
+
+    assert values == [row["a"], row["b"], row["c"], row["d"]]
+    assert [type(v) for v in values] == [datetime, date, Decimal, int]
+    assert backwards is False
+
+
+def test_cursor_keeps_direction():
+    row = {"created_at": datetime(2024, 1, 1), "id": 7}
+    _, backwards = decode_cursor(KEYS, encode_cursor(KEYS, row, backwards=True))
+    assert backwards is True
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor(KEYS, {"created_at": datetime(2024, 1, 1), "id": 123456789})
+    assert "=" not in cursor
+    assert "+" not in cursor and "/" not in cursor
+
+
+def test_cursor_rejects_other_sort_keys():
+    cursor = encode_cursor(KEYS, {"created_at": datetime(2024, 1, 1), "id": 1})
+    other = [SortKey("t.created_at", "created_at", descending=False), SortKey("t.id", "id")]
+    with pytest.raises(ValueError):
+        decode_cursor(other, cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30"])
+def test_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(KEYS, cursor)
+
+
+def test_seek_condition_descending():
+    sql, params = _seek_condition(KEYS, ["2024-01-01", 5], backwards=False)
+    assert sql == "((t.created_at < %s) OR (t.created_at = %s AND t.id < %s))"
+    assert params == ["2024-01-01", "2024-01-01", 5]
+
+
+def test_seek_condition_backwards_flips_operators():
+    sql, params = _seek_condition(KEYS, ["2024-01-01", 5], backwards=True)
+    assert sql == "((t.created_at > %s) OR (t.created_at = %s AND t.id > %s))"
+    assert params == ["2024-01-01", "2024-01-01", 5]
+
+
+def test_seek_condition_mixed_directions():
+    keys = [SortKey("priority", "priority", descending=False), SortKey("id", "id")]
+    sql, params = _seek_condition(keys, [2, 10], backwards=False)
+    assert sql == "((priority > %s) OR (priority = %s AND id < %s))"
+    assert params == [2, 2, 10]
+
+
+def test_build_keyset_query_ignores_invalid_cursor():
+    sql, params, backwards = build_keyset_query(
+        "SELECT * FROM t", ["guild_id = %s"], [1], KEYS, limit=10, cursor="broken"
+    )
+    assert backwards is None
+    assert sql == (
+        "SELECT * FROM t WHERE guild_id = %s ORDER BY t.created_at DESC, t.id DESC LIMIT %s"
+    )
+    assert params == [1, 11]
+
+
+def test_pages_link_forward_and_back():
+    rows = [{"created_at": datetime(2024, 1, 1), "id": i} for i in range(10, 0, -1)]
+
+    first = build_page(rows[:4], KEYS, limit=3, backwards=None)
+    assert [r["id"] for r in first.items] == [10, 9, 8]
+    assert first.has_next and not first.has_prev
+
+    values, backwards = decode_cursor(KEYS, first.next_cursor)
+    assert values[1] == 8 and backwards is False
+
+    second = build_page(rows[3:7], KEYS, limit=3, backwards=False)
+    assert [r["id"] for r in second.items] == [7, 6, 5]
+    assert second.has_next and second.has_prev
+
+    # 往回翻頁時查詢結果為反向排序
+    back = build_page(list(reversed(rows[:3])), KEYS, limit=3, backwards=True)
+    assert [r["id"] for r in back.items] == [10, 9, 8]
+    assert back.has_next and not back.has_prev
@@ -0,0 +1,41 @@
+from potato_bot.utils.reservoir_sampler import ReservoirSampler
+
+
+def draw(entries, size, seed):
+    sampler = ReservoirSampler(size, seed)
+    for entry in entries:
+        sampler.add(entry)
+    return sampler.draw(), sampler.seen
+
+
+def test_same_seed_reproduces_draw():
+    entries = range(1, 10_001)
+    first = draw(entries, 5, "a1b2c3")
+    assert draw(entries, 5, "a1b2c3") == first
+    assert first[1] == 10_000
+    assert len(first[0]) == len(set(first[0])) == 5
+    assert set(first[0]) <= set(entries)
+
+
+def test_different_seed_changes_draw():
+    entries = range(1, 10_001)
+    assert draw(entries, 5, "seed-1")[0] != draw(entries, 5, "seed-2")[0]
+
+
+def test_small_population_keeps_everyone():
+    winners, seen = draw([30, 10, 20], 5, "seed")
+    assert sorted(winners) == [10, 20, 30]
+    assert seen == 3
+    assert draw([30, 10, 20], 5, "seed")[0] == winners
+
+
+def test_empty_population():
+    assert draw([], 3, "seed") == ([], 0)
+
+
+def test_every_entry_can_win():
+    entries = range(20)
+    winners = set()
+    for i in range(200):
+        winners.update(draw(entries, 2, f"seed-{i}")[0])
+    assert winners == set(entries)
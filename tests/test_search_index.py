@@ -0,0 +1,75 @@
+from potato_bot.db.search_index import SearchIndex, tokenize
+
+
+def make_index():
+    index = SearchIndex("測試")
+    index.add(1, 100, "Cannot login to the server")
+    index.add(2, 100, "Login works, payment failed")
+    index.add(3, 200, "payment refund request")
+    index.add(4, 100, "伺服器無法登入")
+    index.add(5, 200, "登入後伺服器斷線")
+    return index
+
+
+def ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def test_tokenize_words_and_cjk_bigrams():
+    assert tokenize("Login ＦＡＩＬＥＤ 42") == ["login", "failed", "42"]
+    assert tokenize("無法登入") == ["無法", "法登", "登入"]
+    assert tokenize("好") == ["好"]
+
+
+def test_and_semantics():
+    index = make_index()
+    assert ids(index.search_loaded("login payment")) == [2]
+    assert index.search_loaded("login refund") == []
+
+
+def test_unknown_term_returns_empty():
+    assert make_index().search_loaded("nonexistent") == []
+
+
+def test_prefix_match_ranks_below_exact():
+    index = make_index()
+    index.add(6, 100, "log rotation")
+    results = ids(index.search_loaded("log"))
+    assert results[0] == 6
+    assert set(results) == {1, 2, 6}
+
+
+def test_guild_filter():
+    index = make_index()
+    assert ids(index.search_loaded("payment", guild_id=200)) == [3]
+    assert set(ids(index.search_loaded("伺服器", guild_id=100))) == {4}
+    assert index.search_loaded("payment", guild_id=999) == []
+
+
+def test_cjk_bigram_search():
+    index = make_index()
+    assert set(ids(index.search_loaded("伺服器"))) == {4, 5}
+    assert ids(index.search_loaded("無法登入")) == [4]
+
+
+def test_unsupported_queries_fall_back():
+    index = make_index()
+    assert index.search_loaded("") is None
+    assert index.search_loaded("登") is None
+    assert index.get_statistics()["fallbacks"] == 2
+
+
+def test_removed_documents_are_skipped():
+    index = make_index()
+    index.remove(2)
+    assert ids(index.search_loaded("login")) == [1]
+    # 重複加入已存在的文件不影響結果
+    index.add(1, 100, "something else")
+    assert ids(index.search_loaded("login")) == [1]
+
+
+def test_limit_prefers_newer_documents_on_ties():
+    index = SearchIndex("測試")
+    for doc_id in range(1, 6):
+        index.add(doc_id, 1, "same text")
+    assert ids(index.search_loaded("same", limit=2)) == [5, 4]